@@ -8,6 +8,9 @@ This script fixes:
 3. Variants - merge adjective/noun variants into canonical forms
 4. Misspellings - correct or delete misspelled lemmas
 
+Merges and deletes go through lemma_merge.py (one transaction per section),
+so the script can be re-run safely.
+
 Generated from dictionary_validation_results.json
 """
 
@@ -16,6 +19,8 @@ import sys
 from dotenv import load_dotenv
 from supabase import create_client
 
+from lemma_merge import deletes_from_list, fetch_all_lemmas, merges_from_canonical_map, run_merges
+
 load_dotenv()
 db = create_client(
     os.getenv('VITE_SUPABASE_URL'),
@@ -25,78 +30,13 @@ db = create_client(
 
 def get_all_lemmas():
     """Fetch all lemmas with pagination."""
-    all_lemmas = []
-    offset = 0
-    while True:
-        batch = db.table('lemmas').select('*').range(offset, offset + 999).execute()
-        all_lemmas.extend(batch.data)
-        if len(batch.data) < 1000:
-            break
-        offset += 1000
-    return all_lemmas
-
-
-def merge_to_canonical(canonical_text, duplicates, lemma_lookup, stats, dry_run=True):
-    """Merge duplicate lemmas into canonical form."""
-    if canonical_text not in lemma_lookup:
-        print(f"  WARNING: Canonical '{canonical_text}' not found, skipping merge")
-        return
-
-    canonical = lemma_lookup[canonical_text]
-
-    for dup_text in duplicates:
-        if dup_text not in lemma_lookup:
-            continue
-
-        dup = lemma_lookup[dup_text]
-
-        # Count words
-        words = db.table('words').select('word_id', count='exact').eq('lemma_id', dup['lemma_id']).execute()
-        word_count = words.count or 0
-
-        print(f"  {dup_text} → {canonical_text} ({word_count} words)")
-
-        if not dry_run:
-            # Reassign words to canonical lemma
-            if word_count > 0:
-                db.table('words').update({'lemma_id': canonical['lemma_id']}).eq('lemma_id', dup['lemma_id']).execute()
-
-            # Delete validation report
-            db.table('validation_reports').delete().eq('lemma_id', dup['lemma_id']).execute()
-
-            # Delete duplicate lemma
-            db.table('lemmas').delete().eq('lemma_id', dup['lemma_id']).execute()
-
-        stats['merged'] += 1
-        stats['words_reassigned'] += word_count
+    return fetch_all_lemmas(db)
 
 
-def delete_garbage(lemma_text, lemma_lookup, stats, dry_run=True):
-    """Delete garbage lemma and its words."""
-    if lemma_text not in lemma_lookup:
-        return
-
-    lemma = lemma_lookup[lemma_text]
-
-    # Count words
-    words = db.table('words').select('word_id', count='exact').eq('lemma_id', lemma['lemma_id']).execute()
-    word_count = words.count or 0
-
-    print(f"  DELETE: {lemma_text} ({word_count} words)")
-
-    if not dry_run:
-        # Delete words
-        if word_count > 0:
-            db.table('words').delete().eq('lemma_id', lemma['lemma_id']).execute()
-
-        # Delete validation report
-        db.table('validation_reports').delete().eq('lemma_id', lemma['lemma_id']).execute()
-
-        # Delete lemma
-        db.table('lemmas').delete().eq('lemma_id', lemma['lemma_id']).execute()
-
-    stats['deleted'] += 1
-    stats['words_deleted'] += word_count
+def add_stats(stats, merge_stats):
+    """Fold lemma_merge counters into this script's stats."""
+    for key in ('merged', 'deleted', 'words_reassigned', 'words_deleted'):
+        stats[key] += merge_stats[key]
 
 
 def rename_lemma(old_text, new_text, lemma_lookup, stats, dry_run=True):
@@ -106,14 +46,20 @@ def rename_lemma(old_text, new_text, lemma_lookup, stats, dry_run=True):
 
     # Check if new form exists - merge instead of rename
     if new_text in lemma_lookup:
-        merge_to_canonical(new_text, [old_text], lemma_lookup, stats, dry_run)
+        remaining = list(lemma_lookup.values())
+        add_stats(stats, run_merges(db, [(old_text, new_text, None)], remaining, dry_run))
+        # run_merges drops merged lemmas from `remaining`; keep the lookup in step
+        kept = {l['lemma_id'] for l in remaining}
+        for text in [t for t, l in lemma_lookup.items() if l['lemma_id'] not in kept]:
+            del lemma_lookup[text]
         return
 
     print(f"  RENAME: {old_text} → {new_text}")
 
+    lemma = lemma_lookup.pop(old_text)
     if not dry_run:
-        lemma = lemma_lookup[old_text]
         db.table('lemmas').update({'lemma_text': new_text}).eq('lemma_id', lemma['lemma_id']).execute()
+    lemma_lookup[new_text] = {**lemma, 'lemma_text': new_text}
 
     stats['renamed'] += 1
 
@@ -131,9 +77,9 @@ def main():
     else:
         print("\n*** APPLYING CHANGES ***\n")
 
-    # Build lemma lookup - refresh for each section
+    # One prefetch for every section; run_merges keeps `lemmas` in step
     all_lemmas = get_all_lemmas()
-    lemma_lookup = {l['lemma_text']: l for l in all_lemmas}
+    lemmas = list(all_lemmas)
     print(f"Total lemmas before: {len(all_lemmas)}")
 
     stats = {
@@ -184,11 +130,7 @@ def main():
         'volver': ['volvía'],
     }
 
-    for canonical, dups in conjugation_merges.items():
-        # Refresh lookup
-        all_lemmas = get_all_lemmas()
-        lemma_lookup = {l['lemma_text']: l for l in all_lemmas}
-        merge_to_canonical(canonical, dups, lemma_lookup, stats, dry_run)
+    add_stats(stats, run_merges(db, merges_from_canonical_map(conjugation_merges), lemmas, dry_run))
 
     # =========================================================================
     # SECTION 2: Garbage lemmas to delete
@@ -227,11 +169,7 @@ def main():
         'la vend', 'la volvía',
     ]
 
-    all_lemmas = get_all_lemmas()
-    lemma_lookup = {l['lemma_text']: l for l in all_lemmas}
-
-    for garbage in garbage_lemmas:
-        delete_garbage(garbage, lemma_lookup, stats, dry_run)
+    add_stats(stats, run_merges(db, deletes_from_list(garbage_lemmas), lemmas, dry_run))
 
     # =========================================================================
     # SECTION 3: Variants to merge or rename
@@ -271,10 +209,7 @@ def main():
         'quién': ['quien'],
     }
 
-    for canonical, dups in variant_merges.items():
-        all_lemmas = get_all_lemmas()
-        lemma_lookup = {l['lemma_text']: l for l in all_lemmas}
-        merge_to_canonical(canonical, dups, lemma_lookup, stats, dry_run)
+    add_stats(stats, run_merges(db, merges_from_canonical_map(variant_merges), lemmas, dry_run))
 
     # =========================================================================
     # SECTION 4: Capitalization fixes for proper nouns
@@ -294,8 +229,7 @@ def main():
         'siberia': 'Siberia',
     }
 
-    all_lemmas = get_all_lemmas()
-    lemma_lookup = {l['lemma_text']: l for l in all_lemmas}
+    lemma_lookup = {l['lemma_text']: l for l in lemmas}
 
     for wrong, correct in capitalization_fixes.items():
         rename_lemma(wrong, correct, lemma_lookup, stats, dry_run)
@@ -1,12 +1,25 @@
 #!/usr/bin/env python3
 """
-Batch quick check for all chapters.
-Usage: python3 scripts/chapter_review/batch_quick_check.py
+Batch quick check for all chapters and songs.
+Usage: python3 scripts/chapter_review/batch_quick_check.py [options]
+
+Options:
+    --json FILE         Also write the report as JSON ('-' for stdout only)
+    --no-songs          Skip song lyrics
+    --strict            Exit with status 1 if any chapter or song fails
+
+The lemma rules and orphan-word check run in the database
+(get_quick_check_issues RPC) for every chapter and song at once, and chapter
+counts come from get_chapter_stats, so a full run is three queries.
 """
 
+import argparse
+import json
 import os
 import sys
 from datetime import datetime
+from typing import Dict, List, Optional
+
 from dotenv import load_dotenv
 from supabase import create_client
 
@@ -19,6 +32,16 @@ db = create_client(
     os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 )
 
+ISSUE_TYPES = (
+    'verbs_missing_to',
+    'nouns_missing_the',
+    'nouns_without_article',
+    'verbs_not_infinitive',
+    'orphan_words',
+)
+
+PAGE_SIZE = 1000
+
 
 def get_chapter_id(chapter_number: int):
     """Get chapter UUID from chapter number."""
@@ -26,62 +49,100 @@ def get_chapter_id(chapter_number: int):
     return result.data[0]['chapter_id'] if result.data else None
 
 
+def get_quick_check_issues(chapter_number: Optional[int] = None, include_songs: bool = True) -> List[Dict]:
+    """Fetch every rule violation (one row per issue) from get_quick_check_issues."""
+    params = {'p_chapter_number': chapter_number, 'p_include_songs': include_songs}
+    rows = []
+    offset = 0
+    while True:
+        result = db.rpc('get_quick_check_issues', params).range(offset, offset + PAGE_SIZE - 1).execute()
+        rows.extend(result.data or [])
+        if len(result.data or []) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    return rows
+
+
+def count_issues(rows: List[Dict]) -> Dict[str, int]:
+    """Count issue rows per issue type."""
+    issues = {issue_type: 0 for issue_type in ISSUE_TYPES}
+    for row in rows:
+        issues[row['issue_type']] += 1
+    return issues
+
+
 def run_automated_checks(chapter_number: int):
     """Run all automated quality checks for a chapter."""
-    chapter_id = get_chapter_id(chapter_number)
-    if not chapter_id:
+    if not get_chapter_id(chapter_number):
         return {'error': f'Chapter {chapter_number} not found'}
+    return count_issues(get_quick_check_issues(chapter_number, include_songs=False))
 
-    # Get lemma IDs for this chapter
-    words = db.table('words').select('lemma_id').eq('chapter_id', chapter_id).execute()
-    lemma_ids = list(set(w['lemma_id'] for w in words.data if w['lemma_id']))
 
-    issues = {
-        'verbs_missing_to': 0,
-        'nouns_missing_the': 0,
-        'nouns_without_article': 0,
-        'verbs_not_infinitive': 0,
-        'orphan_words': 0
-    }
-
-    if not lemma_ids:
-        return issues
-
-    # Get all lemmas for chapter
-    lemmas = db.table('lemmas').select('*').in_('lemma_id', lemma_ids).execute()
-
-    for l in lemmas.data:
-        pos = l.get('part_of_speech', '')
-        text = l.get('lemma_text', '')
-        defs = l.get('definitions', [])
-        first_def = defs[0] if defs else ''
-
-        # Verbs missing "to " prefix
-        if pos == 'VERB' and first_def and not first_def.startswith('to '):
-            issues['verbs_missing_to'] += 1
+def run_all_checks(include_songs: bool = True) -> Dict:
+    """
+    Quick-check every chapter (and song) in one pass.
+    Returns a JSON-serializable report with per-chapter / per-song issue
+    counts and details.
+    """
+    rows = get_quick_check_issues(include_songs=include_songs)
+    chapter_stats = db.rpc('get_chapter_stats', {'p_chapter_number': None}).execute().data or []
 
-        # Nouns missing "the " prefix
-        if pos == 'NOUN' and first_def and not first_def.startswith('the '):
-            issues['nouns_missing_the'] += 1
+    by_scope = {}
+    for row in rows:
+        key = (row['scope'], row['chapter_number'] if row['scope'] == 'chapter' else row['song_id'])
+        by_scope.setdefault(key, []).append(row)
 
-        # Nouns without article in Spanish
-        if pos == 'NOUN' and not text.startswith('el ') and not text.startswith('la '):
-            issues['nouns_without_article'] += 1
-
-        # Verbs not in infinitive (ending with accented vowel)
-        if pos == 'VERB' and text and text[-1] in 'éíóáú':
-            issues['verbs_not_infinitive'] += 1
-
-    # Check orphan words
-    orphans = db.table('words').select('word_id', count='exact').eq('chapter_id', chapter_id).is_('lemma_id', 'null').execute()
-    issues['orphan_words'] = orphans.count
-
-    return issues
+    def entry(scope_rows: List[Dict]) -> Dict:
+        issues = count_issues(scope_rows)
+        total = sum(issues.values())
+        return {
+            'issues': issues,
+            'total_issues': total,
+            'status': 'PASS' if total == 0 else 'FAIL',
+            'details': [
+                {k: row[k] for k in ('issue_type', 'item_id', 'item_text', 'detail')}
+                for row in scope_rows
+            ],
+        }
+
+    chapters = []
+    for stats in chapter_stats:
+        chapters.append({
+            'chapter_number': stats['chapter_number'],
+            'sentences': stats['sentences'],
+            'words': stats['words'],
+            'unique_lemmas': stats['unique_lemmas'],
+            **entry(by_scope.get(('chapter', stats['chapter_number']), [])),
+        })
+
+    songs = []
+    if include_songs:
+        song_rows = db.table('songs').select('song_id, title, artist').order('title').execute().data
+        for song in song_rows:
+            songs.append({
+                'song_id': song['song_id'],
+                'title': song['title'],
+                'artist': song['artist'],
+                **entry(by_scope.get(('song', song['song_id']), [])),
+            })
+
+    results = chapters + songs
+    return {
+        'generated': datetime.now().isoformat(),
+        'chapters': chapters,
+        'songs': songs,
+        'summary': {
+            'passed': sum(1 for r in results if r['status'] == 'PASS'),
+            'failed': sum(1 for r in results if r['status'] == 'FAIL'),
+            'total_issues': sum(r['total_issues'] for r in results),
+        },
+    }
 
 
-def main():
+def print_report(report: Dict) -> None:
     print("=" * 80)
-    print("BATCH QUICK CHECK - ALL 27 CHAPTERS")
+    print(f"BATCH QUICK CHECK - ALL {len(report['chapters'])} CHAPTERS"
+          + (f" + {len(report['songs'])} SONGS" if report['songs'] else ""))
     print(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 80)
     print()
@@ -90,49 +151,58 @@ def main():
     print(f"{'Ch':>3} | {'Sentences':>9} | {'Words':>6} | {'Lemmas':>6} | {'V-to':>4} | {'N-the':>5} | {'N-art':>5} | {'V-inf':>5} | {'Orphan':>6} | Status")
     print("-" * 80)
 
-    total_issues = 0
-    passed = 0
-    failed = 0
-
-    for chapter_num in range(1, 28):
-        chapter_id = get_chapter_id(chapter_num)
-        if not chapter_id:
-            print(f"{chapter_num:>3} | {'NOT FOUND':^60}")
-            continue
-
-        # Get stats
-        sentences = db.table('sentences').select('sentence_id', count='exact').eq('chapter_id', chapter_id).execute()
-        words = db.table('words').select('word_id', count='exact').eq('chapter_id', chapter_id).execute()
-        word_lemmas = db.table('words').select('lemma_id').eq('chapter_id', chapter_id).execute()
-        unique_lemmas = len(set(w['lemma_id'] for w in word_lemmas.data if w['lemma_id']))
-
-        # Run checks
-        issues = run_automated_checks(chapter_num)
-
-        total = sum(issues.values())
-        total_issues += total
-        status = "PASS" if total == 0 else "FAIL"
-
-        if total == 0:
-            passed += 1
-        else:
-            failed += 1
-
-        print(f"{chapter_num:>3} | {sentences.count:>9} | {words.count:>6} | {unique_lemmas:>6} | "
+    for ch in report['chapters']:
+        issues = ch['issues']
+        print(f"{ch['chapter_number']:>3} | {ch['sentences']:>9} | {ch['words']:>6} | {ch['unique_lemmas']:>6} | "
               f"{issues['verbs_missing_to']:>4} | {issues['nouns_missing_the']:>5} | "
               f"{issues['nouns_without_article']:>5} | {issues['verbs_not_infinitive']:>5} | "
-              f"{issues['orphan_words']:>6} | {status}")
-
+              f"{issues['orphan_words']:>6} | {ch['status']}")
+
+    if report['songs']:
+        print()
+        print(f"{'Song':<32} | {'V-to':>4} | {'N-the':>5} | {'N-art':>5} | {'V-inf':>5} | {'Orphan':>6} | Status")
+        print("-" * 80)
+        for song in report['songs']:
+            issues = song['issues']
+            print(f"{song['title'][:32]:<32} | "
+                  f"{issues['verbs_missing_to']:>4} | {issues['nouns_missing_the']:>5} | "
+                  f"{issues['nouns_without_article']:>5} | {issues['verbs_not_infinitive']:>5} | "
+                  f"{issues['orphan_words']:>6} | {song['status']}")
+
+    summary = report['summary']
     print("-" * 80)
     print()
-    print(f"SUMMARY: {passed} passed, {failed} failed, {total_issues} total issues")
+    print(f"SUMMARY: {summary['passed']} passed, {summary['failed']} failed, {summary['total_issues']} total issues")
     print()
 
-    if total_issues == 0:
+    if summary['total_issues'] == 0:
         print("ALL CHAPTERS PASS AUTOMATED QUALITY CHECKS!")
     else:
         print("Some chapters have issues that need attention.")
 
 
+def main():
+    parser = argparse.ArgumentParser(description='Automated quality checks for all chapters and songs')
+    parser.add_argument('--json', type=str, metavar='FILE', help="Write the report as JSON ('-' for stdout only)")
+    parser.add_argument('--no-songs', action='store_true', help='Skip song lyrics')
+    parser.add_argument('--strict', action='store_true', help='Exit with status 1 if any chapter or song fails')
+    args = parser.parse_args()
+
+    report = run_all_checks(include_songs=not args.no_songs)
+
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        print_report(report)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"\nReport written to: {args.json}")
+
+    if args.strict and report['summary']['failed']:
+        sys.exit(1)
+
+
 if __name__ == '__main__':
     main()
@@ -15,23 +15,43 @@ Usage:
 
 Options:
     --batch-size N      Number of lemmas per AI batch (default: 20)
-    --start-from N      Start from lemma N (for resuming)
+    --workers N         Concurrent AI batches (default: 4)
+    --rpm N             Max AI requests per minute across workers (default: 40)
+    --resume            Continue after the last checkpointed lemma id
+    --start-after ID    Continue after a specific lemma id
     --dry-run           Show what would be validated without calling AI
     --output FILE       Write results to JSON file
     --fix-mode          Generate SQL fix scripts for issues found
+    --full              Re-validate every lemma, ignoring stored fingerprints
+
+Lemmas whose content (text, POS, gender, definitions) and PROMPT_VERSION are
+unchanged since their last validation are skipped and their stored result is
+reused - see scripts/validation_cache.py.
+
+Lemmas are processed in lemma_id order. After each batch is upserted, the
+highest lemma id below which every batch is saved is written to the
+checkpoint file, so --resume is unaffected by lemmas added or merged since.
 """
 
 import argparse
 import json
 import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
 
 from dotenv import load_dotenv
 from supabase import create_client
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from claude_client import ClaudeClient
+from structured_output import Schema
+from validation_cache import ValidationCache
+
 # Load environment
 load_dotenv()
 
@@ -50,9 +70,72 @@ except ImportError:
     print("ERROR: anthropic package not installed. Run: pip install anthropic")
     sys.exit(1)
 
+DEFAULT_WORKERS = 4
+DEFAULT_REQUESTS_PER_MINUTE = 40
+
+# Lemma ids per get_lemma_contexts call
+CONTEXT_CHUNK_SIZE = 1000
+
+# Bump when the validation prompt changes so every lemma is re-validated
+PROMPT_VERSION = 1
+
+# Fixed instructions, sent as the cached system prefix (see claude_client.py)
+VALIDATION_INSTRUCTIONS = """You are validating Spanish vocabulary entries for a language learning app teaching "El Principito" (The Little Prince).
+
+VALIDATION RULES:
+1. VERBS must be infinitive form (ending in -ar, -er, -ir) and English must start with "to "
+2. NOUNS must have article prefix ("el " or "la ") in Spanish, and English must start with "the "
+3. Translations must be accurate and appropriate for the literary context
+4. POS tags must be correct (VERB, NOUN, ADJ, ADV, PRON, DET, ADP, CONJ, etc.)
+5. Gender must be correct for nouns (M for masculine, F for feminine)
+
+For EACH entry given, respond with a JSON object. Be STRICT - flag any issues.
+
+Respond with a JSON array of objects, one per entry:
+[
+  {"index": 1, "is_valid": true},
+  {"index": 2, "is_valid": false, "issues": [{"type": "translation", "description": "Translation is inaccurate - should be 'X'", "severity": "high", "suggested_fix": "correct translation"}]},
+  ...
+]
 
-def get_all_lemmas() -> List[Dict]:
-    """Fetch ALL lemmas from the database with pagination to get every single one."""
+IMPORTANT:
+- Check EVERY entry carefully
+- Flag even minor translation inaccuracies
+- Verbs MUST have "to " prefix in English
+- Nouns MUST have "the " prefix in English
+- Be thorough - we cannot miss any errors
+
+Respond ONLY with the JSON array, no other text."""
+
+# One element of the validation response array
+RESULT_SCHEMA = Schema({'index': int, 'is_valid': bool}, {'issues': list})
+
+# Last lemma_id below which every batch has been saved (for --resume)
+CHECKPOINT_FILE = Path(__file__).parent / '.exhaustive_validation_checkpoint.json'
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls evenly to stay under N per minute."""
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / max(requests_per_minute, 1)
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def get_all_lemmas(start_after: Optional[str] = None) -> List[Dict]:
+    """
+    Fetch ALL lemmas (in lemma_id order) with pagination to get every single one.
+    With start_after, only lemmas whose id sorts after it are returned.
+    """
     print("Fetching all lemmas from database...")
 
     all_lemmas = []
@@ -60,7 +143,10 @@ def get_all_lemmas() -> List[Dict]:
     offset = 0
 
     while True:
-        result = db.table('lemmas').select('*').order('lemma_text').range(offset, offset + page_size - 1).execute()
+        query = db.table('lemmas').select('*')
+        if start_after:
+            query = query.gt('lemma_id', start_after)
+        result = query.order('lemma_id').range(offset, offset + page_size - 1).execute()
         if not result.data:
             break
         all_lemmas.extend(result.data)
@@ -73,33 +159,59 @@ def get_all_lemmas() -> List[Dict]:
     return all_lemmas
 
 
-def get_lemma_context(lemma_id: str) -> Dict:
-    """Get usage context for a lemma (word forms, example sentences)."""
-    # Get word forms
-    words = db.table('words').select('word_text, sentence_id').eq('lemma_id', lemma_id).limit(20).execute()
-
-    word_forms = list(set(w['word_text'] for w in words.data))
-
-    # Get example sentence
-    example_sentence = None
-    if words.data:
-        sentence_id = words.data[0]['sentence_id']
-        sentence = db.table('sentences').select('sentence_text, sentence_translation').eq('sentence_id', sentence_id).execute()
-        if sentence.data:
-            example_sentence = {
-                'spanish': sentence.data[0]['sentence_text'],
-                'english': sentence.data[0]['sentence_translation']
+def load_checkpoint() -> Optional[str]:
+    """Return the last checkpointed lemma id, if any."""
+    if not CHECKPOINT_FILE.exists():
+        return None
+    with open(CHECKPOINT_FILE) as f:
+        return json.load(f).get('last_lemma_id')
+
+
+def save_checkpoint(last_lemma_id: str) -> None:
+    with open(CHECKPOINT_FILE, 'w') as f:
+        json.dump({'last_lemma_id': last_lemma_id, 'saved_at': datetime.now().isoformat()}, f)
+
+
+def get_lemma_contexts(lemma_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Get usage context (word forms, usage count, example sentence) for many
+    lemmas at once via the get_lemma_contexts RPC.
+    """
+    contexts = {lemma_id: {'word_forms': [], 'usage_count': 0, 'example': None} for lemma_id in lemma_ids}
+
+    for i in range(0, len(lemma_ids), CONTEXT_CHUNK_SIZE):
+        chunk = lemma_ids[i:i + CONTEXT_CHUNK_SIZE]
+        result = db.rpc('get_lemma_contexts', {'p_lemma_ids': chunk, 'p_max_forms': 10}).execute()
+        for row in result.data or []:
+            example_sentence = None
+            if row.get('example_sentence'):
+                example_sentence = {
+                    'spanish': row['example_sentence'],
+                    'english': row.get('example_translation')
+                }
+            contexts[row['lemma_id']] = {
+                'word_forms': row.get('word_forms') or [],
+                'usage_count': row['usage_count'],
+                'example': example_sentence
             }
 
-    return {
-        'word_forms': word_forms[:10],  # Limit to 10 forms
-        'usage_count': len(words.data),
-        'example': example_sentence
-    }
+    return contexts
 
 
-def validate_batch_with_ai(lemmas: List[Dict], client: Any) -> List[Dict]:
-    """Validate a batch of lemmas with Claude AI."""
+def get_lemma_context(lemma_id: str) -> Dict:
+    """Get usage context for a lemma (word forms, example sentences)."""
+    return get_lemma_contexts([lemma_id])[lemma_id]
+
+
+def validate_batch_with_ai(lemmas: List[Dict], client: ClaudeClient,
+                           retry: bool = False) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Validate a batch of lemmas with Claude AI.
+    Returns (results, unvalidated lemmas). Results are parsed as the response
+    streams in, so a failed request or malformed tail only leaves the lemmas
+    it didn't cover unvalidated. retry marks a re-request of the lemmas an
+    earlier response missed (usage ledger).
+    """
 
     # Build the batch prompt
     lemma_entries = []
@@ -115,92 +227,51 @@ def validate_batch_with_ai(lemmas: List[Dict], client: Any) -> List[Dict]:
 """
         lemma_entries.append(entry)
 
-    prompt = f"""You are validating Spanish vocabulary entries for a language learning app teaching "El Principito" (The Little Prince).
 
-VALIDATION RULES:
-1. VERBS must be infinitive form (ending in -ar, -er, -ir) and English must start with "to "
-2. NOUNS must have article prefix ("el " or "la ") in Spanish, and English must start with "the "
-3. Translations must be accurate and appropriate for the literary context
-4. POS tags must be correct (VERB, NOUN, ADJ, ADV, PRON, DET, ADP, CONJ, etc.)
-5. Gender must be correct for nouns (M for masculine, F for feminine)
 
-ENTRIES TO VALIDATE:
-{"".join(lemma_entries)}
+    response = client.request(
+        'exhaustive-validation', VALIDATION_INSTRUCTIONS,
+        "ENTRIES TO VALIDATE:\n" + "".join(lemma_entries),
+        RESULT_SCHEMA, max_tokens=4000, items=len(lemmas), retry=retry
+    )
+    if not response.complete or response.invalid:
+        print(f"Warning: AI response partly unusable ({len(response.items)}/{len(lemmas)} parsed): "
+              f"{response.error or response.invalid[0][1]}")
 
-For EACH entry, respond with a JSON object. Be STRICT - flag any issues.
+    # Merge results with original lemmas
+    results = {}
+    for result in response.items:
+        idx = result['index'] - 1
+        if 0 <= idx < len(lemmas) and idx not in results:
+            result['lemma'] = lemmas[idx]
+            results[idx] = result
 
-Respond with a JSON array of objects, one per entry:
-[
-  {{"index": 1, "is_valid": true}},
-  {{"index": 2, "is_valid": false, "issues": [{{"type": "translation", "description": "Translation is inaccurate - should be 'X'", "severity": "high", "suggested_fix": "correct translation"}}]}},
-  ...
-]
+    missing = [lemma for i, lemma in enumerate(lemmas) if i not in results]
+    return [results[i] for i in sorted(results)], missing
 
-IMPORTANT:
-- Check EVERY entry carefully
-- Flag even minor translation inaccuracies
-- Verbs MUST have "to " prefix in English
-- Nouns MUST have "the " prefix in English
-- Be thorough - we cannot miss any errors
 
-Respond ONLY with the JSON array, no other text."""
+def build_validation_record(lemma_id: str, result: Dict) -> Dict:
+    """Build a validation_reports row from an AI result."""
+    return {
+        'lemma_id': lemma_id,
+        'is_valid': result.get('is_valid', True),
+        'issues': result.get('issues', []),
+        'suggested_fixes': result.get('suggested_fixes', {}),
+        'confidence': result.get('confidence', 100 if result.get('is_valid') else 70),
+        'validated_at': datetime.now().isoformat()
+    }
 
-    try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4000,
-            messages=[{"role": "user", "content": prompt}]
-        )
-
-        text = response.content[0].text.strip()
-
-        # Parse JSON response
-        if text.startswith('['):
-            results = json.loads(text)
-        else:
-            # Try to extract JSON array from response
-            import re
-            match = re.search(r'\[.*\]', text, re.DOTALL)
-            if match:
-                results = json.loads(match.group())
-            else:
-                print(f"Warning: Could not parse AI response: {text[:200]}")
-                return [{'index': i+1, 'is_valid': True, 'parse_error': True} for i in range(len(lemmas))]
-
-        # Merge results with original lemmas
-        for result in results:
-            idx = result.get('index', 0) - 1
-            if 0 <= idx < len(lemmas):
-                result['lemma'] = lemmas[idx]
-
-        return results
 
-    except Exception as e:
-        print(f"Error calling AI: {e}")
-        return [{'index': i+1, 'is_valid': True, 'error': str(e)} for i in range(len(lemmas))]
+def save_validation_results(records: List[Dict]) -> None:
+    """Upsert a batch of validation results in one request."""
+    if records:
+        db.table('validation_reports').upsert(records, on_conflict='lemma_id').execute()
 
 
 def save_validation_result(lemma_id: str, result: Dict) -> None:
     """Save validation result to database."""
     try:
-        # Check if record exists
-        existing = db.table('validation_reports').select('report_id').eq('lemma_id', lemma_id).execute()
-
-        record = {
-            'lemma_id': lemma_id,
-            'is_valid': result.get('is_valid', True),
-            'issues': result.get('issues', []),
-            'suggested_fixes': result.get('suggested_fixes', {}),
-            'confidence': result.get('confidence', 100 if result.get('is_valid') else 70),
-            'validated_at': datetime.now().isoformat()
-        }
-
-        if existing.data:
-            # Update existing
-            db.table('validation_reports').update(record).eq('lemma_id', lemma_id).execute()
-        else:
-            # Insert new
-            db.table('validation_reports').insert(record).execute()
+        save_validation_results([build_validation_record(lemma_id, result)])
     except Exception as e:
         print(f"Warning: Could not save validation result for {lemma_id}: {e}")
 
@@ -268,9 +339,11 @@ def generate_fix_script(issues: List[Dict], output_file: str) -> None:
     print(f"Fix script written to: {output_file}")
 
 
-def run_exhaustive_validation(batch_size: int = 20, start_from: int = 0,
+def run_exhaustive_validation(batch_size: int = 20, start_after: Optional[str] = None,
                                dry_run: bool = False, output_file: str = None,
-                               fix_mode: bool = False) -> Dict:
+                               fix_mode: bool = False, workers: int = DEFAULT_WORKERS,
+                               requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+                               full: bool = False) -> Dict:
     """Run exhaustive validation on ALL lemmas."""
 
     print("=" * 80)
@@ -279,17 +352,26 @@ def run_exhaustive_validation(batch_size: int = 20, start_from: int = 0,
     print("=" * 80)
     print()
 
+    if start_after:
+        print(f"Resuming after lemma {start_after}")
+
     # Get all lemmas
-    all_lemmas = get_all_lemmas()
-    total_lemmas = len(all_lemmas)
+    all_lemmas = get_all_lemmas(start_after)
 
-    if start_from > 0:
-        print(f"Resuming from lemma {start_from}")
-        all_lemmas = all_lemmas[start_from:]
+    # Skip lemmas unchanged since their last validation
+    cache = ValidationCache(db, 'exhaustive', PROMPT_VERSION, full=full)
+    changed, unchanged = cache.split(all_lemmas)
+    cache.print_skip_ratio(len(all_lemmas), len(unchanged))
+
+    # Stored invalid results still count as open issues
+    cached_issues = [dict(result, lemma=lemma) for lemma, result in unchanged
+                     if result and not result.get('is_valid', True)]
+    all_lemmas = changed
 
     print(f"Lemmas to validate: {len(all_lemmas)}")
     print(f"Batch size: {batch_size}")
     print(f"Estimated batches: {(len(all_lemmas) + batch_size - 1) // batch_size}")
+    print(f"Workers: {workers} ({requests_per_minute} requests/minute)")
     print()
 
     if dry_run:
@@ -299,51 +381,92 @@ def run_exhaustive_validation(batch_size: int = 20, start_from: int = 0,
             print(f"  Would validate: {lemma['lemma_text']} ({lemma.get('part_of_speech')})")
         if len(all_lemmas) > 10:
             print(f"  ... and {len(all_lemmas) - 10} more")
-        return {'dry_run': True, 'total': len(all_lemmas)}
+        return {'dry_run': True, 'total': len(all_lemmas), 'skipped': len(unchanged)}
 
     # Initialize Anthropic client
-    client = Anthropic()
+    client = ClaudeClient(Anthropic())
+    limiter = RateLimiter(requests_per_minute)
 
     # Track results
     all_results = []
-    issues_found = []
+    issues_found = list(cached_issues)
     validated_count = 0
-
-    # Process in batches
-    num_batches = (len(all_lemmas) + batch_size - 1) // batch_size
-
-    for batch_idx in range(num_batches):
-        batch_start = batch_idx * batch_size
-        batch_end = min(batch_start + batch_size, len(all_lemmas))
-        batch = all_lemmas[batch_start:batch_end]
-
-        print(f"\nBatch {batch_idx + 1}/{num_batches} (lemmas {start_from + batch_start + 1}-{start_from + batch_end})")
-        print(f"  Validating: {', '.join(l['lemma_text'][:15] for l in batch[:5])}{'...' if len(batch) > 5 else ''}")
-
-        # Validate batch
-        results = validate_batch_with_ai(batch, client)
-        all_results.extend(results)
-
-        # Process results
-        for result in results:
-            lemma = result.get('lemma', {})
-            lemma_id = lemma.get('lemma_id')
-
-            if lemma_id:
-                # Save to database
-                save_validation_result(lemma_id, result)
-
-            if not result.get('is_valid', True):
-                issues_found.append(result)
-                print(f"  ISSUE: {lemma.get('lemma_text')} - {[iss.get('description', 'Unknown')[:50] for iss in result.get('issues', [])]}")
-
-        validated_count += len(batch)
-        valid_in_batch = sum(1 for r in results if r.get('is_valid', True))
-        print(f"  Result: {valid_in_batch}/{len(batch)} valid")
-
-        # Rate limiting - wait between batches
-        if batch_idx < num_batches - 1:
-            time.sleep(1)  # 1 second between batches to avoid rate limits
+    failed_batches = 0
+
+    batches = [all_lemmas[i:i + batch_size] for i in range(0, len(all_lemmas), batch_size)]
+    num_batches = len(batches)
+
+    def validate(batch: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        limiter.wait()
+        results, missing = validate_batch_with_ai(batch, client)
+        # Re-request only the lemmas the first response didn't cover
+        if missing and results:
+            limiter.wait()
+            retried, missing = validate_batch_with_ai(missing, client, retry=True)
+            results += retried
+        return results, missing
+
+    # Batches finish out of order: the checkpoint only advances past a
+    # contiguous run of saved batches
+    saved = [False] * num_batches
+    next_unsaved = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(validate, batch): idx for idx, batch in enumerate(batches)}
+
+        for done, future in enumerate(as_completed(futures), 1):
+            batch_idx = futures[future]
+            batch = batches[batch_idx]
+            results, missing = future.result()
+
+            print(f"\nBatch {batch_idx + 1}/{num_batches} ({done} done) - "
+                  f"{', '.join(l['lemma_text'][:15] for l in batch[:5])}{'...' if len(batch) > 5 else ''}")
+
+            if not results:
+                print("  FAILED - batch not saved, re-run with --resume to retry")
+                failed_batches += 1
+                continue
+
+            all_results.extend(results)
+
+            records = []
+            validated = []
+            for result in results:
+                lemma = result.get('lemma', {})
+                lemma_id = lemma.get('lemma_id')
+
+                if lemma_id:
+                    records.append(build_validation_record(lemma_id, result))
+                    validated.append((lemma, result))
+
+                if not result.get('is_valid', True):
+                    issues_found.append(result)
+                    print(f"  ISSUE: {lemma.get('lemma_text')} - {[iss.get('description', 'Unknown')[:50] for iss in result.get('issues', [])]}")
+
+            # Save to database - one upsert per batch
+            try:
+                save_validation_results(records)
+                cache.save(validated)
+            except Exception as e:
+                print(f"  Warning: Could not save batch results: {e}")
+                failed_batches += 1
+                continue
+
+            validated_count += len(results)
+            valid_in_batch = sum(1 for r in results if r.get('is_valid', True))
+            print(f"  Result: {valid_in_batch}/{len(results)} valid")
+
+            # Saved lemmas are fingerprinted, so --resume only re-sends the missing ones
+            if missing:
+                print(f"  PARTIAL - {len(missing)} lemmas not validated, re-run with --resume to retry")
+                failed_batches += 1
+                continue
+
+            saved[batch_idx] = True
+            if batch_idx == next_unsaved:
+                while next_unsaved < num_batches and saved[next_unsaved]:
+                    next_unsaved += 1
+                save_checkpoint(batches[next_unsaved - 1][-1]['lemma_id'])
 
     # Summary
     print()
@@ -352,8 +475,12 @@ def run_exhaustive_validation(batch_size: int = 20, start_from: int = 0,
     print("=" * 80)
     print()
     print(f"Total lemmas validated: {validated_count}")
-    print(f"Valid: {validated_count - len(issues_found)}")
-    print(f"Issues found: {len(issues_found)}")
+    print(f"Skipped (unchanged): {len(unchanged)}")
+    print(f"Valid: {validated_count + len(unchanged) - len(issues_found)}")
+    print(f"Issues found: {len(issues_found)} ({len(cached_issues)} from earlier runs)")
+    if failed_batches:
+        print(f"Failed batches: {failed_batches} (run again with --resume)")
+    client.print_usage()
     print()
 
     if issues_found:
@@ -385,6 +512,7 @@ def run_exhaustive_validation(batch_size: int = 20, start_from: int = 0,
             json.dump({
                 'timestamp': datetime.now().isoformat(),
                 'total_validated': validated_count,
+                'skipped_unchanged': len(unchanged),
                 'issues_count': len(issues_found),
                 'issues': issues_found
             }, f, indent=2, default=str)
@@ -397,7 +525,8 @@ def run_exhaustive_validation(batch_size: int = 20, start_from: int = 0,
 
     return {
         'total_validated': validated_count,
-        'valid': validated_count - len(issues_found),
+        'skipped': len(unchanged),
+        'valid': validated_count + len(unchanged) - len(issues_found),
         'issues': len(issues_found),
         'issues_detail': issues_found
     }
@@ -406,19 +535,32 @@ def run_exhaustive_validation(batch_size: int = 20, start_from: int = 0,
 def main():
     parser = argparse.ArgumentParser(description='Exhaustive AI validation of ALL lemmas')
     parser.add_argument('--batch-size', type=int, default=20, help='Lemmas per AI batch')
-    parser.add_argument('--start-from', type=int, default=0, help='Start from lemma N')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent AI batches')
+    parser.add_argument('--rpm', type=int, default=DEFAULT_REQUESTS_PER_MINUTE, help='Max AI requests per minute')
+    parser.add_argument('--resume', action='store_true', help='Continue after the last checkpointed lemma id')
+    parser.add_argument('--start-after', type=str, help='Continue after this lemma id')
     parser.add_argument('--dry-run', action='store_true', help='Show what would be validated')
     parser.add_argument('--output', type=str, default='validation_results.json', help='Output JSON file')
     parser.add_argument('--fix-mode', action='store_true', help='Generate SQL fix scripts')
+    parser.add_argument('--full', action='store_true', help='Re-validate lemmas even if unchanged since last run')
 
     args = parser.parse_args()
 
+    start_after = args.start_after
+    if args.resume and not start_after:
+        start_after = load_checkpoint()
+        if not start_after:
+            print("No checkpoint found - starting from the beginning")
+
     results = run_exhaustive_validation(
         batch_size=args.batch_size,
-        start_from=args.start_from,
+        start_after=start_after,
         dry_run=args.dry_run,
         output_file=args.output,
-        fix_mode=args.fix_mode
+        fix_mode=args.fix_mode,
+        workers=args.workers,
+        requests_per_minute=args.rpm,
+        full=args.full
     )
 
     print()
@@ -17,11 +17,17 @@ import json
 import os
 import sys
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from pathlib import Path
+from typing import List, Dict, Optional
 
 from dotenv import load_dotenv
 from supabase import create_client
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from claude_client import ClaudeClient
+from structured_output import NUMBER, Schema
+from usage_ledger import ledger
+
 # Load environment
 load_dotenv()
 
@@ -65,82 +71,37 @@ def initialize_review(chapter_number: int) -> Dict:
 
 
 def get_chapter_stats(chapter_number: int) -> Dict:
-    """Get comprehensive chapter statistics."""
-    chapter_id = get_chapter_id(chapter_number)
-    if not chapter_id:
+    """Get comprehensive chapter statistics (one get_chapter_stats RPC call)."""
+    result = db.rpc('get_chapter_stats', {'p_chapter_number': chapter_number}).execute()
+    if not result.data:
         return {'error': f'Chapter {chapter_number} not found'}
 
-    # Get sentence count
-    sentences = db.table('sentences').select('sentence_id', count='exact').eq('chapter_id', chapter_id).execute()
-
-    # Get word count
-    words = db.table('words').select('word_id', count='exact').eq('chapter_id', chapter_id).execute()
-
-    # Get unique lemmas
-    word_lemmas = db.table('words').select('lemma_id').eq('chapter_id', chapter_id).execute()
-    unique_lemmas = len(set(w['lemma_id'] for w in word_lemmas.data if w['lemma_id']))
-
-    # Get phrase occurrences for this chapter
-    sentence_ids = [s['sentence_id'] for s in db.table('sentences').select('sentence_id').eq('chapter_id', chapter_id).execute().data]
-    phrase_occs = db.table('phrase_occurrences').select('phrase_id', count='exact').in_('sentence_id', sentence_ids).execute() if sentence_ids else {'count': 0}
-
+    row = result.data[0]
     return {
         'chapter_number': chapter_number,
-        'sentences': sentences.count,
-        'words': words.count,
-        'unique_lemmas': unique_lemmas,
-        'phrase_occurrences': phrase_occs.count if hasattr(phrase_occs, 'count') else 0
+        'sentences': row['sentences'],
+        'words': row['words'],
+        'unique_lemmas': row['unique_lemmas'],
+        'phrase_occurrences': row['phrase_occurrences']
     }
 
 
 def get_chapter_lemmas(chapter_number: int) -> List[Dict]:
-    """Get all lemmas used in a chapter with usage counts."""
-    chapter_id = get_chapter_id(chapter_number)
-    if not chapter_id:
-        return []
-
-    # Get all words for chapter with lemma info
-    words = db.table('words').select('lemma_id, word_text').eq('chapter_id', chapter_id).execute()
-
-    # Count usage per lemma
-    lemma_usage = {}
-    lemma_forms = {}
-    for w in words.data:
-        lid = w['lemma_id']
-        if lid:
-            lemma_usage[lid] = lemma_usage.get(lid, 0) + 1
-            if lid not in lemma_forms:
-                lemma_forms[lid] = set()
-            lemma_forms[lid].add(w['word_text'])
-
-    # Get lemma details
-    if not lemma_usage:
-        return []
-
-    lemmas = db.table('lemmas').select('*').in_('lemma_id', list(lemma_usage.keys())).execute()
-
-    # Combine with usage
-    result = []
-    for l in lemmas.data:
-        result.append({
-            **l,
-            'usage_in_chapter': lemma_usage.get(l['lemma_id'], 0),
-            'word_forms': list(lemma_forms.get(l['lemma_id'], []))
-        })
-
-    # Sort by usage descending
-    return sorted(result, key=lambda x: x['usage_in_chapter'], reverse=True)
+    """Get all lemmas used in a chapter with usage counts, most used first."""
+    result = db.rpc('get_chapter_lemma_usage', {'p_chapter_number': chapter_number}).execute()
+    return result.data or []
 
 
 def run_automated_checks(chapter_number: int) -> Dict[str, List]:
-    """Run all automated quality checks for a chapter."""
+    """Run all automated quality checks for a chapter (one get_quick_check_issues RPC call)."""
     chapter_id = get_chapter_id(chapter_number)
     if not chapter_id:
         return {'error': f'Chapter {chapter_number} not found'}
 
-    # Get lemma IDs for this chapter
-    words = db.table('words').select('lemma_id').eq('chapter_id', chapter_id).execute()
-    lemma_ids = list(set(w['lemma_id'] for w in words.data if w['lemma_id']))
+    result = db.rpc('get_quick_check_issues', {
+        'p_chapter_number': chapter_number,
+        'p_include_songs': False
+    }).execute()
 
     issues = {
         'verbs_missing_to': [],
@@ -150,68 +111,24 @@ def run_automated_checks(chapter_number: int) -> Dict[str, List]:
         'orphan_words': []
     }
 
-    if not lemma_ids:
-        return issues
-
-    # Get all lemmas for chapter
-    lemmas = db.table('lemmas').select('*').in_('lemma_id', lemma_ids).execute()
-
-    for l in lemmas.data:
-        pos = l.get('part_of_speech', '')
-        text = l.get('lemma_text', '')
-        defs = l.get('definitions', [])
-        first_def = defs[0] if defs else ''
-
-        # Verbs missing "to " prefix
-        if pos == 'VERB' and first_def and not first_def.startswith('to '):
-            issues['verbs_missing_to'].append({
-                'lemma_id': l['lemma_id'],
-                'lemma_text': text,
-                'definition': first_def
-            })
-
-        # Nouns missing "the " prefix
-        if pos == 'NOUN' and first_def and not first_def.startswith('the '):
-            issues['nouns_missing_the'].append({
-                'lemma_id': l['lemma_id'],
-                'lemma_text': text,
-                'definition': first_def
-            })
-
-        # Nouns without article in Spanish
-        if pos == 'NOUN' and not text.startswith('el ') and not text.startswith('la '):
-            issues['nouns_without_article'].append({
-                'lemma_id': l['lemma_id'],
-                'lemma_text': text
+    for row in result.data or []:
+        issue_type = row['issue_type']
+        if issue_type == 'orphan_words':
+            issues[issue_type].append({'word_id': row['item_id'], 'word_text': row['item_text']})
+        elif issue_type in ('verbs_missing_to', 'nouns_missing_the'):
+            issues[issue_type].append({
+                'lemma_id': row['item_id'],
+                'lemma_text': row['item_text'],
+                'definition': row['detail']
             })
-
-        # Verbs not in infinitive (ending with accented vowel)
-        if pos == 'VERB' and text and text[-1] in 'éíóáú':
-            issues['verbs_not_infinitive'].append({
-                'lemma_id': l['lemma_id'],
-                'lemma_text': text
-            })
-
-    # Check orphan words
-    orphans = db.table('words').select('word_id, word_text').eq('chapter_id', chapter_id).is_('lemma_id', 'null').execute()
-    issues['orphan_words'] = [{'word_id': w['word_id'], 'word_text': w['word_text']} for w in orphans.data]
+        else:
+            issues[issue_type].append({'lemma_id': row['item_id'], 'lemma_text': row['item_text']})
 
     return issues
 
 
-def validate_lemma_with_ai(lemma: Dict, client: Any) -> Dict:
-    """Use Claude API to validate a single lemma."""
-    word_forms_str = ', '.join(lemma.get('word_forms', [])[:10])  # Limit to 10 forms
-    definitions = lemma.get('definitions', [])
-    first_def = definitions[0] if definitions else 'NO TRANSLATION'
-
-    prompt = f"""Validate this Spanish vocabulary entry:
-
-Spanish: {lemma['lemma_text']}
-POS: {lemma.get('part_of_speech', 'UNKNOWN')}
-Gender: {lemma.get('gender', 'N/A')}
-English: {first_def}
-Usage: {lemma.get('usage_in_chapter', 0)} times as forms: {word_forms_str}
+# Fixed instructions, sent as the cached system prefix (see claude_client.py)
+LEMMA_VALIDATION_INSTRUCTIONS = """Validate the given Spanish vocabulary entry.
 
 Check:
 1. Is Spanish form canonical? (verbs=infinitive, nouns=singular with article "el"/"la")
@@ -221,31 +138,40 @@ Check:
 5. Should multiple English meanings be included?
 
 Respond ONLY with valid JSON (no markdown, no extra text):
-{{"is_valid": true, "issues": [], "confidence": 95}}
+{"is_valid": true, "issues": [], "confidence": 95}
 OR
-{{"is_valid": false, "issues": [{{"type": "translation", "description": "...", "severity": "high"}}], "suggested_fixes": {{"definitions": ["improved translation"]}}, "confidence": 80}}
+{"is_valid": false, "issues": [{"type": "translation", "description": "...", "severity": "high"}], "suggested_fixes": {"definitions": ["improved translation"]}, "confidence": 80}
 """
 
-    try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=500,
-            messages=[{"role": "user", "content": prompt}]
-        )
-
-        text = response.content[0].text.strip()
-        # Try to parse JSON
-        if text.startswith('{'):
-            return json.loads(text)
-        else:
-            # Try to extract JSON from response
-            import re
-            match = re.search(r'\{.*\}', text, re.DOTALL)
-            if match:
-                return json.loads(match.group())
-        return {'is_valid': True, 'parse_error': True, 'raw': text[:200]}
-    except Exception as e:
-        return {'is_valid': True, 'error': str(e)}
+LEMMA_VALIDATION_SCHEMA = Schema(
+    {'is_valid': bool},
+    {'issues': list, 'suggested_fixes': dict, 'confidence': NUMBER},
+)
+
+
+def validate_lemma_with_ai(lemma: Dict, client: ClaudeClient) -> Optional[Dict]:
+    """
+    Use Claude API to validate a single lemma.
+    Returns None if the request failed or the response didn't match the schema.
+    """
+    word_forms_str = ', '.join(lemma.get('word_forms', [])[:10])  # Limit to 10 forms
+    definitions = lemma.get('definitions', [])
+    first_def = definitions[0] if definitions else 'NO TRANSLATION'
+
+    entry = f"""Spanish: {lemma['lemma_text']}
+POS: {lemma.get('part_of_speech', 'UNKNOWN')}
+Gender: {lemma.get('gender', 'N/A')}
+English: {first_def}
+Usage: {lemma.get('usage_in_chapter', 0)} times as forms: {word_forms_str}"""
+
+    result = client.request(
+        'lemma-validation', LEMMA_VALIDATION_INSTRUCTIONS, entry,
+        LEMMA_VALIDATION_SCHEMA, max_tokens=500
+    )
+    if not result.complete:
+        print(f"  Warning: No usable AI response for '{lemma['lemma_text']}': {result.error}")
+        return None
+    return result.value
 
 
 def log_issue(chapter_number: int, issue_type: str, lemma_id: Optional[str],
@@ -361,14 +287,17 @@ def review_chapter(chapter_number: int, ai_validate: bool = False, quick_check:
     # Step 4: AI Validation (if enabled)
     if ai_validate and HAS_ANTHROPIC:
         print("\nStep 4: Running AI validation on lemmas...")
-        client = Anthropic()
+        client = ClaudeClient(Anthropic())
         lemmas = get_chapter_lemmas(chapter_number)
 
         # Validate top 50 most-used lemmas
         ai_issues = []
+        ai_failed = []
         for i, lemma in enumerate(lemmas[:50]):
             result = validate_lemma_with_ai(lemma, client)
-            if not result.get('is_valid', True):
+            if result is None:
+                ai_failed.append(lemma['lemma_text'])
+            elif not result.get('is_valid', True):
                 ai_issues.append({
                     'lemma': lemma,
                     'validation': result
@@ -383,7 +312,11 @@ def review_chapter(chapter_number: int, ai_validate: bool = False, quick_check:
                 print(f"  Validated {i + 1}/50 lemmas...")
 
         results['ai_issues'] = ai_issues
+        results['ai_failed'] = ai_failed
         print(f"  AI flagged {len(ai_issues)} lemmas with issues")
+        if ai_failed:
+            print(f"  AI validation failed for {len(ai_failed)} lemmas (not validated): {', '.join(ai_failed)}")
+        client.print_usage()
     else:
         print("\nStep 4: Skipping AI validation (not enabled or anthropic not installed)")
 
@@ -417,6 +350,7 @@ def main():
     parser.add_argument('--mark-complete', action='store_true', help='Mark chapter as complete')
 
     args = parser.parse_args()
+    ledger.set_scope(f"chapter {args.chapter}")
 
     if args.show_issues:
         issues = show_issues(args.chapter)
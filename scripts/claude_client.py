@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Shared Claude client: cached instruction prefixes and per-phase token usage.
+
+Each script sends the same long instructions (validation rules, phrase
+detection rules, the slang/phrase reference...) with every request.
+ClaudeClient sends them as system blocks ending in a cache_control
+breakpoint, so after the first request of a run the API reads that prefix
+from its prompt cache; only the per-item content goes in the user message.
+Responses stream through structured_output, and the input tokens of every
+request - uncached, written to the cache, read from the cache - are totalled
+per phase for print_usage(). Each request is also recorded in the usage
+ledger (usage_ledger.py) with its latency, status and item count.
+
+Prefixes shorter than the model's minimum cacheable length (1024 tokens for
+Sonnet) are sent uncached by the API; the usage summary shows which phases
+actually hit the cache.
+
+Transports:
+    ClaudeClient(anthropic.Anthropic(api_key=...))   # anthropic SDK
+    ClaudeClient(api_key=...)                        # plain HTTP (requests)
+
+Both honor ANTHROPIC_BASE_URL, so any script can be pointed at the local stub:
+    python scripts/claude_stub.py --port 8787 &
+    ANTHROPIC_BASE_URL=http://localhost:8787 python scripts/import_chapter.py --validate-ai --chapter 1
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Union
+
+from structured_output import (
+    USAGE_FIELDS, Schema, StructuredResult, parse_sse_lines, stream_response,
+)
+from usage_ledger import UsageLedger, ledger as default_ledger
+
+DEFAULT_MODEL = "claude-sonnet-4-20250514"
+DEFAULT_BASE_URL = "https://api.anthropic.com"
+ANTHROPIC_VERSION = "2023-06-01"
+CACHE_CONTROL = {'type': 'ephemeral'}
+
+
+def cached_system(instructions: Union[str, Sequence[str]]) -> List[Dict]:
+    """
+    System blocks for instructions (one string, or several - most stable
+    first). The last block carries the cache breakpoint, so the whole prefix
+    is cached.
+    """
+    texts = [instructions] if isinstance(instructions, str) else list(instructions)
+    system = [{'type': 'text', 'text': text} for text in texts if text]
+    if system:
+        system[-1]['cache_control'] = CACHE_CONTROL
+    return system
+
+
+def result_status(result: StructuredResult, structured: bool) -> str:
+    """Ledger status: 'error' if the request failed, 'partial' if a JSON response was incomplete."""
+    if result.interrupted:
+        return 'error'
+    if structured and (not result.complete or result.invalid):
+        return 'partial'
+    return 'ok'
+
+
+class PromptUsage:
+    """Thread-safe per-phase totals of requests and token usage."""
+
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, usage: Dict[str, int]) -> None:
+        with self._lock:
+            totals = self.phases.setdefault(phase, dict.fromkeys(('requests',) + USAGE_FIELDS, 0))
+            totals['requests'] += 1
+            for name in USAGE_FIELDS:
+                totals[name] += usage.get(name, 0)
+
+    def print_summary(self) -> None:
+        """Print cached vs uncached input tokens per phase."""
+        if not self.phases:
+            return
+        print()
+        print("=" * 78)
+        print("CLAUDE TOKEN USAGE")
+        print("=" * 78)
+        print(f"  {'phase':<24} {'requests':>8} {'uncached':>10} {'cache write':>11} "
+              f"{'cache read':>10} {'output':>8} {'cached':>6}")
+        for phase, t in self.phases.items():
+            total_input = t['input_tokens'] + t['cache_creation_input_tokens'] + t['cache_read_input_tokens']
+            cached_pct = round(t['cache_read_input_tokens'] / total_input * 100) if total_input else 0
+            print(f"  {phase:<24} {t['requests']:>8} {t['input_tokens']:>10} {t['cache_creation_input_tokens']:>11} "
+                  f"{t['cache_read_input_tokens']:>10} {t['output_tokens']:>8} {cached_pct:>5}%")
+
+
+class ClaudeClient:
+    """Streams Messages API requests with a cached system prefix."""
+
+    def __init__(self, sdk_client=None, api_key: Optional[str] = None,
+                 model: str = DEFAULT_MODEL, timeout: int = 60, ledger: Optional[UsageLedger] = None):
+        self.sdk_client = sdk_client
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.base_url = (os.getenv('ANTHROPIC_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
+        self.usage = PromptUsage()
+        self.ledger = ledger or default_ledger
+
+    def request(self, phase: str, instructions: Union[str, Sequence[str]], content: str,
+                schema: Optional[Schema] = None, items_key: Optional[str] = None,
+                max_tokens: int = 1000, timeout: Optional[int] = None,
+                items: int = 1, retry: bool = False) -> StructuredResult:
+        """
+        Send instructions (cached system prefix) plus content (user message)
+        and parse the streamed response - see structured_output. Usage is
+        recorded under phase; items (lemmas, sentences, lines... in the
+        request) and retry go to the usage ledger for throughput reporting.
+        """
+        request = {
+            'model': self.model,
+            'max_tokens': max_tokens,
+            'system': cached_system(instructions),
+            'messages': [{'role': 'user', 'content': content}],
+        }
+        started = time.time()
+        start = time.perf_counter()
+        if self.sdk_client is not None:
+            result = stream_response(self.sdk_client, schema, items_key, **request)
+        else:
+            result = self._stream_http(request, schema, items_key, timeout or self.timeout)
+        self.usage.add(phase, result.usage)
+        status = result_status(result, schema is not None or items_key is not None)
+        self.ledger.record('anthropic', self.model, phase, started, time.perf_counter() - start, status,
+                           items=items, usage=result.usage, retry=retry,
+                           error=result.error if status != 'ok' else None)
+        return result
+
+    def _stream_http(self, request: Dict, schema: Optional[Schema], items_key: Optional[str],
+                     timeout: int) -> StructuredResult:
+        import requests
+
+        headers = {
+            'x-api-key': self.api_key,
+            'anthropic-version': ANTHROPIC_VERSION,
+            'Content-Type': 'application/json'
+        }
+        try:
+            response = requests.post(f"{self.base_url}/v1/messages", headers=headers,
+                                     json={**request, 'stream': True}, timeout=timeout, stream=True)
+        except requests.exceptions.Timeout:
+            return StructuredResult(error=f"Request timeout ({timeout}s)", interrupted=True)
+        except requests.exceptions.RequestException as e:
+            return StructuredResult(error=str(e), interrupted=True)
+
+        if response.status_code != 200:
+            return StructuredResult(error=f"HTTP {response.status_code}: {response.text}", interrupted=True)
+
+        with response:
+            return parse_sse_lines(response.iter_lines(decode_unicode=True), schema, items_key)
+
+    def print_usage(self) -> None:
+        self.usage.print_summary()
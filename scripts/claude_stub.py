@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Claude Messages API.
+
+Lets the content scripts run end to end - including prompt caching and the
+token usage summary of claude_client.py - without an API key or cost:
+
+    python scripts/claude_stub.py --port 8787 --replies replies.json
+    ANTHROPIC_BASE_URL=http://localhost:8787 ANTHROPIC_API_KEY=stub \\
+        python scripts/import_chapter.py --validate-ai --chapter 1
+
+Replies: --replies is a JSON list of {"match": "...", "reply": "..."}; the
+first entry whose match occurs in the request's user message answers it,
+otherwise --default-reply is sent.
+
+Usage mimics the API: tokens are estimated at 4 characters each, and the
+system prefix up to its last cache_control block is written to the cache
+the first time it is seen (if it reaches --min-cache-tokens) and read from
+the cache after that. Streaming (SSE) and plain requests are supported.
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+STREAM_CHUNK_CHARS = 16
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def message_text(content) -> str:
+    """Text of a message content (a string or a list of content blocks)."""
+    if isinstance(content, str):
+        return content
+    return ''.join(block.get('text', '') for block in content if isinstance(block, dict))
+
+
+class StubState:
+    """Canned replies and the simulated prompt cache."""
+
+    def __init__(self, replies, default_reply: str, min_cache_tokens: int, latency: float):
+        self.replies = replies
+        self.default_reply = default_reply
+        self.min_cache_tokens = min_cache_tokens
+        self.latency = latency
+        self.cached_prefixes = set()
+        self.lock = threading.Lock()
+
+    def reply_for(self, user_text: str) -> str:
+        for entry in self.replies:
+            if entry['match'] in user_text:
+                return entry['reply']
+        return self.default_reply
+
+    def usage_for(self, request: dict) -> dict:
+        """Input token usage, split into uncached / cache write / cache read."""
+        system = request.get('system') or []
+        if isinstance(system, str):
+            system = [{'type': 'text', 'text': system}]
+        user_text = ''.join(message_text(m.get('content', '')) for m in request.get('messages', []))
+
+        breakpoint = max((i for i, block in enumerate(system) if block.get('cache_control')), default=-1)
+        prefix = ''.join(block.get('text', '') for block in system[:breakpoint + 1])
+        rest = ''.join(block.get('text', '') for block in system[breakpoint + 1:]) + user_text
+
+        usage = {'input_tokens': estimate_tokens(rest), 'cache_creation_input_tokens': 0,
+                 'cache_read_input_tokens': 0}
+        prefix_tokens = estimate_tokens(prefix)
+        if prefix_tokens < self.min_cache_tokens:
+            usage['input_tokens'] += prefix_tokens
+            return usage
+
+        key = (request.get('model'), hashlib.sha256(prefix.encode('utf-8')).hexdigest())
+        with self.lock:
+            hit = key in self.cached_prefixes
+            self.cached_prefixes.add(key)
+        usage['cache_read_input_tokens' if hit else 'cache_creation_input_tokens'] = prefix_tokens
+        return usage
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_POST(self):
+            if self.path.rstrip('/') != '/v1/messages':
+                self.send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': self.path}})
+                return
+
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            user_text = message_text((request.get('messages') or [{}])[-1].get('content', ''))
+            reply = state.reply_for(user_text)
+            usage = state.usage_for(request)
+            if state.latency:
+                time.sleep(state.latency)
+
+            message = {
+                'id': f"msg_stub_{uuid.uuid4().hex[:12]}",
+                'type': 'message',
+                'role': 'assistant',
+                'model': request.get('model'),
+                'content': [],
+                'stop_reason': None,
+                'stop_sequence': None,
+                'usage': {**usage, 'output_tokens': 1},
+            }
+            output_tokens = estimate_tokens(reply)
+
+            if not request.get('stream'):
+                message.update(content=[{'type': 'text', 'text': reply}], stop_reason='end_turn',
+                               usage={**usage, 'output_tokens': output_tokens})
+                self.send_json(200, message)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+
+            self.send_event('message_start', {'type': 'message_start', 'message': message})
+            self.send_event('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                                    'content_block': {'type': 'text', 'text': ''}})
+            for i in range(0, len(reply), STREAM_CHUNK_CHARS):
+                self.send_event('content_block_delta', {
+                    'type': 'content_block_delta', 'index': 0,
+                    'delta': {'type': 'text_delta', 'text': reply[i:i + STREAM_CHUNK_CHARS]}
+                })
+            self.send_event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+            self.send_event('message_delta', {'type': 'message_delta',
+                                              'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                              'usage': {'output_tokens': output_tokens}})
+            self.send_event('message_stop', {'type': 'message_stop'})
+
+        def send_json(self, status: int, body: dict):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def send_event(self, event: str, data: dict):
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stub of the Claude Messages API')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--replies', type=str, help='JSON list of {"match", "reply"} entries')
+    parser.add_argument('--default-reply', type=str, default='{}', help='Reply when no entry matches')
+    parser.add_argument('--min-cache-tokens', type=int, default=1024,
+                        help='Shortest system prefix that is cached (default: 1024)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before replying')
+    args = parser.parse_args()
+
+    replies = []
+    if args.replies:
+        with open(args.replies, encoding='utf-8') as f:
+            replies = json.load(f)
+
+    state = StubState(replies, args.default_reply, args.min_cache_tokens, args.latency)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(state))
+    print(f"Claude stub listening on http://127.0.0.1:{args.port} (ANTHROPIC_BASE_URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
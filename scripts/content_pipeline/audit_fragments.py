@@ -3,7 +3,9 @@
 Fragment Generation Audit Script
 
 Analyzes the current state of sentence fragment generation.
-Read-only - does not modify any data.
+Read-only - does not modify any data. Counts come from the get_chapter_stats
+and get_sentences_without_fragments RPCs, so the audit takes a fixed number
+of queries regardless of book size.
 """
 
 import os
@@ -38,9 +40,8 @@ def run_audit():
     print(f"{'Ch':>3} | {'Total':>6} | {'With':>6} | {'Without':>7} | {'Frags':>6} | {'Coverage':>8}")
     print("-" * 70)
 
-    # Get all chapters
-    chapters_result = supabase.table('chapters').select('chapter_id, chapter_number').order('chapter_number').execute()
-    chapters = chapters_result.data
+    # Per-chapter counts in one aggregate query (see get_chapter_stats RPC)
+    chapters = supabase.rpc('get_chapter_stats', {}).execute().data
 
     total_sentences_all = 0
     total_with_fragments = 0
@@ -53,27 +54,14 @@ def run_audit():
     chapter_stats = []
 
     for ch in chapters:
-        ch_id = ch['chapter_id']
         ch_num = ch['chapter_number']
-
-        # Get all sentences for this chapter
-        sentences_result = supabase.table('sentences').select('sentence_id').eq('chapter_id', ch_id).execute()
-        sentence_ids = [s['sentence_id'] for s in sentences_result.data]
-        total_sentences = len(sentence_ids)
+        total_sentences = ch['sentences']
 
         if total_sentences == 0:
             continue
 
-        # Get sentences that have fragments
-        with_frags = 0
-        frag_count = 0
-
-        if sentence_ids:
-            # Count sentences with fragments
-            frags_result = supabase.table('sentence_fragments').select('sentence_id, fragment_id').in_('sentence_id', sentence_ids).execute()
-            sentences_with_frags = set(f['sentence_id'] for f in frags_result.data)
-            with_frags = len(sentences_with_frags)
-            frag_count = len(frags_result.data)
+        with_frags = ch['sentences_with_fragments']
+        frag_count = ch['fragments']
 
         without_frags = total_sentences - with_frags
         coverage = (with_frags / total_sentences * 100) if total_sentences > 0 else 0
@@ -112,27 +100,14 @@ def run_audit():
 
     missing_sentences = []
 
-    for ch in chapters:
-        ch_id = ch['chapter_id']
-        ch_num = ch['chapter_number']
-
-        # Get sentences for this chapter
-        sentences_result = supabase.table('sentences').select(
-            'sentence_id, sentence_order, sentence_text, sentence_translation'
-        ).eq('chapter_id', ch_id).order('sentence_order').execute()
-
-        for sent in sentences_result.data:
-            # Check if has fragments
-            frag_check = supabase.table('sentence_fragments').select('fragment_id').eq('sentence_id', sent['sentence_id']).limit(1).execute()
-
-            if not frag_check.data:
-                missing_sentences.append({
-                    'chapter': ch_num,
-                    'order': sent['sentence_order'],
-                    'text': sent['sentence_text'][:50] + '...' if len(sent['sentence_text']) > 50 else sent['sentence_text'],
-                    'has_translation': 'yes' if sent.get('sentence_translation') else 'no',
-                    'length': len(sent['sentence_text'])
-                })
+    for sent in supabase.rpc('get_sentences_without_fragments', {}).execute().data:
+        missing_sentences.append({
+            'chapter': sent['chapter_number'],
+            'order': sent['sentence_order'],
+            'text': sent['sentence_text'][:50] + '...' if len(sent['sentence_text']) > 50 else sent['sentence_text'],
+            'has_translation': 'yes' if sent.get('sentence_translation') else 'no',
+            'length': len(sent['sentence_text'])
+        })
 
     if missing_sentences:
         # Group by chapter
@@ -149,27 +124,16 @@ def run_audit():
     print("\n\n3. DUPLICATE FRAGMENT CHECK")
     print("-" * 70)
 
-    # Get all fragments grouped by sentence_id and fragment_order
-    all_frags = supabase.table('sentence_fragments').select('sentence_id, fragment_order').execute()
-
-    # Count duplicates
-    seen = {}
-    duplicates = []
-    for f in all_frags.data:
-        key = (f['sentence_id'], f['fragment_order'])
-        if key in seen:
-            seen[key] += 1
-        else:
-            seen[key] = 1
-
-    for key, count in seen.items():
-        if count > 1:
-            duplicates.append({'sentence_id': key[0], 'fragment_order': key[1], 'count': count})
+    # Extra rows per (sentence_id, fragment_order), counted server-side
+    duplicates = [
+        {'chapter': ch['chapter_number'], 'count': ch['duplicate_fragments']}
+        for ch in chapters if ch['duplicate_fragments']
+    ]
 
     if duplicates:
-        print(f"Found {len(duplicates)} duplicate entries:")
+        print(f"Found duplicate entries in {len(duplicates)} chapters:")
         for d in duplicates:
-            print(f"  sentence_id: {d['sentence_id']}, fragment_order: {d['fragment_order']}, count: {d['count']}")
+            print(f"  chapter: {d['chapter']}, extra fragments: {d['count']}")
     else:
         print("No duplicates found!")
 
@@ -177,24 +141,18 @@ def run_audit():
     print("\n\n4. LAST SUCCESSFULLY PROCESSED")
     print("-" * 70)
 
-    # Find the latest fragment by looking at sentences with fragments in highest chapters
+    # Highest chapter with fragments, and its highest sentence with fragments
     for ch in reversed(chapters):
-        ch_id = ch['chapter_id']
-        ch_num = ch['chapter_number']
-
-        sentences_result = supabase.table('sentences').select(
-            'sentence_id, sentence_order, sentence_text'
-        ).eq('chapter_id', ch_id).order('sentence_order', desc=True).execute()
-
-        for sent in sentences_result.data:
-            frag_check = supabase.table('sentence_fragments').select('fragment_id').eq('sentence_id', sent['sentence_id']).limit(1).execute()
-            if frag_check.data:
-                print(f"Chapter: {ch_num}")
-                print(f"Sentence Order: {sent['sentence_order']}")
-                print(f"Text: {sent['sentence_text'][:80]}...")
-                break
-        else:
+        if ch['last_fragment_sentence_order'] is None:
             continue
+
+        sent = supabase.table('sentences').select('sentence_text').eq(
+            'chapter_id', ch['chapter_id']
+        ).eq('sentence_order', ch['last_fragment_sentence_order']).execute().data[0]
+
+        print(f"Chapter: {ch['chapter_number']}")
+        print(f"Sentence Order: {ch['last_fragment_sentence_order']}")
+        print(f"Text: {sent['sentence_text'][:80]}...")
         break
 
     # 5. Error Pattern Analysis
@@ -231,7 +189,7 @@ def run_audit():
     print(f"Sentences with fragments: {total_with_fragments}")
     print(f"Sentences missing fragments: {total_without_fragments}")
     print()
-    print(f"Duplicates found: {len(duplicates)}")
+    print(f"Duplicates found: {sum(d['count'] for d in duplicates)}")
     print()
     print("RECOMMENDATION:")
 
@@ -6,22 +6,35 @@ Generates meaningful sentence fragments for the reading comprehension feature.
 Uses Claude API to intelligently segment Spanish sentences into 2-4 chunks
 that translate meaningfully on their own.
 
+Sentences that already have fragments are filtered out with one up-front
+query, Claude calls run in a bounded worker pool, and each chapter's
+fragments are written with a single multi-row insert. Untranslated sentences
+are translated and segmented in one Claude call (--two-call to use separate
+calls).
+
 Usage:
     python scripts/content_pipeline/generate_fragments.py --chapters 1 --dry-run
     python scripts/content_pipeline/generate_fragments.py --chapters 1 2 3
+    python scripts/content_pipeline/generate_fragments.py --all --workers 8
 
 Requirements:
     pip install anthropic supabase python-dotenv
 """
 
 import os
+import re
 import sys
-import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set, Tuple
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from claude_client import ClaudeClient
+from structured_output import Schema
+from usage_ledger import ledger
+
 # Load environment variables from project root
 load_dotenv(Path(__file__).parent.parent.parent / '.env')
 
@@ -29,6 +42,21 @@ load_dotenv(Path(__file__).parent.parent.parent / '.env')
 supabase_client = None
 anthropic_client = None
 
+# Concurrent Claude requests (keep under the account's rate limit)
+DEFAULT_WORKERS = 4
+
+# Rows per page when reading, ids per .in_() filter, rows per insert
+PAGE_SIZE = 1000
+ID_CHUNK_SIZE = 200
+INSERT_BATCH_SIZE = 500
+
+# Finished sentences buffered per chapter before an intermediate save
+SAVE_BATCH_SIZE = 50
+
+# Word tokens for alignment: words.word_position counts spaCy tokens that
+# aren't punctuation, which for Spanish text are runs of word characters
+WORD_RE = re.compile(r"\w+")
+
 
 def get_supabase():
     """Lazy load Supabase client with service role key."""
@@ -45,8 +73,8 @@ def get_supabase():
     return supabase_client
 
 
-def get_anthropic():
-    """Lazy load Anthropic client."""
+def get_anthropic() -> ClaudeClient:
+    """Lazy load the Claude client (anthropic SDK, cached instruction prefixes)."""
     global anthropic_client
     if anthropic_client is None:
         import anthropic
@@ -54,7 +82,7 @@ def get_anthropic():
         if not api_key:
             print("ERROR: ANTHROPIC_API_KEY not found in .env")
             sys.exit(1)
-        anthropic_client = anthropic.Anthropic(api_key=api_key)
+        anthropic_client = ClaudeClient(anthropic.Anthropic(api_key=api_key))
     return anthropic_client
 
 
@@ -70,56 +98,82 @@ def get_chapter_id(chapter_number: int) -> Optional[str]:
     return None
 
 
+def get_chapters(chapter_numbers: Optional[List[int]] = None) -> List[Dict]:
+    """Fetch chapter ids for the given chapter numbers (all chapters if None)."""
+    supabase = get_supabase()
+    query = supabase.table('chapters').select('chapter_id, chapter_number')
+    if chapter_numbers is not None:
+        query = query.in_('chapter_number', chapter_numbers)
+    result = query.order('chapter_number').execute()
+
+    return result.data or []
+
+
 def get_sentences_for_chapter(chapter_id: str) -> List[Dict]:
     """Fetch all sentences for a chapter."""
+    return get_sentences_for_chapters([chapter_id])
+
+
+def get_sentences_for_chapters(chapter_ids: List[str]) -> List[Dict]:
+    """Fetch all sentences for several chapters with pagination."""
     supabase = get_supabase()
-    result = supabase.table('sentences').select(
-        'sentence_id, sentence_order, sentence_text, sentence_translation'
-    ).eq('chapter_id', chapter_id).order('sentence_order').execute()
+    sentences = []
+    offset = 0
+    while True:
+        result = supabase.table('sentences').select(
+            'sentence_id, chapter_id, sentence_order, sentence_text, sentence_translation'
+        ).in_('chapter_id', chapter_ids).order('chapter_id').order('sentence_order').range(
+            offset, offset + PAGE_SIZE - 1
+        ).execute()
+        sentences.extend(result.data)
+        if len(result.data) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
 
-    return result.data or []
+    return sentences
 
 
 def has_existing_fragments(sentence_id: str) -> bool:
     """Check if sentence already has fragments."""
-    supabase = get_supabase()
-    result = supabase.table('sentence_fragments').select(
-        'fragment_id'
-    ).eq('sentence_id', sentence_id).limit(1).execute()
+    return bool(get_sentence_ids_with_fragments([sentence_id]))
 
-    return bool(result.data)
 
+def get_sentence_ids_with_fragments(sentence_ids: List[str]) -> Set[str]:
+    """Return the subset of sentence_ids that already have fragments."""
+    supabase = get_supabase()
+    existing = set()
+
+    for i in range(0, len(sentence_ids), ID_CHUNK_SIZE):
+        chunk = sentence_ids[i:i + ID_CHUNK_SIZE]
+        offset = 0
+        while True:
+            result = supabase.table('sentence_fragments').select('sentence_id').in_(
+                'sentence_id', chunk
+            ).range(offset, offset + PAGE_SIZE - 1).execute()
+            existing.update(f['sentence_id'] for f in result.data)
+            if len(result.data) < PAGE_SIZE:
+                break
+            offset += PAGE_SIZE
 
-def translate_sentence(spanish_text: str) -> str:
-    """Use Claude to translate a sentence if translation is missing."""
-    client = get_anthropic()
+    return existing
 
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=500,
-        messages=[{
-            "role": "user",
-            "content": f"""Translate this Spanish sentence to English. Return ONLY the English translation, nothing else.
 
-Spanish: {spanish_text}
+TRANSLATE_INSTRUCTIONS = "Translate this Spanish sentence to English. Return ONLY the English translation, nothing else."
 
-English:"""
-        }]
-    )
 
-    return response.content[0].text.strip()
+def translate_sentence(spanish_text: str, retry: bool = False) -> str:
+    """Use Claude to translate a sentence if translation is missing."""
+    client = get_anthropic()
 
+    result = client.request('translate', TRANSLATE_INSTRUCTIONS, f"Spanish: {spanish_text}\n\nEnglish:",
+                            max_tokens=500, retry=retry)
+    if result.interrupted:
+        raise RuntimeError(result.error)
 
-def generate_fragments(spanish_text: str, english_text: str) -> List[Dict]:
-    """
-    Use Claude to segment a sentence into meaningful fragments.
-    Returns list of {es, en, context_note?} dicts.
-    """
-    client = get_anthropic()
+    return result.text.strip()
 
-    prompt = f"""Segment this Spanish sentence into 2-4 meaningful fragments for language learners.
 
-RULES:
+SEGMENTATION_RULES = """RULES:
 1. Each fragment should be 4-10 words (prefer 5-8)
 2. Each fragment MUST translate meaningfully on its own
 3. Follow natural reading rhythm and clause boundaries
@@ -128,15 +182,20 @@ RULES:
    - Noun phrases with articles (la pequeña rosa → keep together)
    - Prepositional phrases (en el desierto → keep together)
 5. If sentence is < 5 words, return it as a single fragment
-6. Keep quoted text intact within fragments
-
-Spanish: {spanish_text}
-English: {english_text}
+6. Keep quoted text intact within fragments"""
 
-Respond with a JSON array of fragments. Each fragment has:
+FRAGMENT_FORMAT = """Each fragment has:
 - "es": Spanish text
 - "en": English translation
-- "context_note": (optional) Brief grammar note if fragment contains tricky pattern
+- "context_note": (optional) Brief grammar note if fragment contains tricky pattern"""
+
+# Fixed instructions, sent as the cached system prefix (see claude_client.py);
+# the sentence itself goes in the user message
+SEGMENT_INSTRUCTIONS = f"""Segment the given Spanish sentence into 2-4 meaningful fragments for language learners.
+
+{SEGMENTATION_RULES}
+
+Respond with a JSON array of fragments. {FRAGMENT_FORMAT}
 
 Example response:
 [
@@ -146,193 +205,508 @@ Example response:
 
 Return ONLY the JSON array, no other text."""
 
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=1000,
-        messages=[{
-            "role": "user",
-            "content": prompt
-        }]
+TRANSLATE_AND_SEGMENT_INSTRUCTIONS = f"""Translate the given Spanish sentence to English, then segment it into 2-4 meaningful fragments for language learners.
+
+{SEGMENTATION_RULES}
+
+Respond with a JSON object:
+- "translation": the full English translation of the sentence
+- "fragments": array of fragments. {FRAGMENT_FORMAT}
+
+Example response:
+{{
+  "translation": "When I was six years old, I saw a magnificent illustration.",
+  "fragments": [
+    {{"es": "Cuando yo tenía seis años,", "en": "When I was six years old,"}},
+    {{"es": "vi una magnífica lámina.", "en": "I saw a magnificent illustration.", "context_note": "magnífica agrees with feminine lámina"}}
+  ]
+}}
+
+Return ONLY the JSON object, no other text."""
+
+
+# Response schemas (see structured_output.py): each fragment is checked as it streams in
+FRAGMENT_SCHEMA = Schema(
+    {'es': str, 'en': str}, {'context_note': str},
+    check=lambda frag: None if frag['es'].strip() and frag['en'].strip() else "empty fragment text",
+)
+TRANSLATE_AND_SEGMENT_SCHEMA = Schema(
+    {'translation': str, 'fragments': list},
+    check=lambda data: None if data['translation'].strip() else "empty translation",
+)
+
+
+def covers_sentence(fragments: List[Dict], spanish_text: str) -> bool:
+    """Check that fragments spell out every word of the sentence, in order."""
+    tokens = [t for frag in fragments for t in normalize_tokens(frag['es'])]
+    return bool(tokens) and tokens == normalize_tokens(spanish_text)
+
+
+def generate_fragments(spanish_text: str, english_text: str, retry: bool = False) -> List[Dict]:
+    """
+    Use Claude to segment a sentence into meaningful fragments.
+    Returns list of {es, en, context_note?} dicts.
+    """
+    client = get_anthropic()
+
+    result = client.request(
+        'segment', SEGMENT_INSTRUCTIONS, f"Spanish: {spanish_text}\nEnglish: {english_text}",
+        FRAGMENT_SCHEMA, max_tokens=1000, retry=retry
     )
 
-    response_text = response.content[0].text.strip()
+    if result.complete and not result.invalid and result.items:
+        return result.items
 
-    # Parse JSON response
-    try:
-        # Handle potential markdown code blocks
-        if response_text.startswith('```'):
-            lines = response_text.split('\n')
-            # Remove first and last lines (code fence)
-            response_text = '\n'.join(lines[1:-1])
+    # A broken tail is harmless if the fragments parsed so far already
+    # cover the whole sentence
+    if not result.invalid and covers_sentence(result.items, spanish_text):
+        return result.items
 
-        fragments = json.loads(response_text)
-        return fragments
-    except json.JSONDecodeError as e:
-        print(f"    WARNING: Could not parse Claude response as JSON: {e}")
-        print(f"    Response was: {response_text[:200]}...")
-        return []
+    reason = result.error or (result.invalid[0][1] if result.invalid else 'no fragments')
+    print(f"    WARNING: Unusable fragment response ({len(result.items)} fragments parsed): {reason}")
+    return []
 
 
-def calculate_word_positions(sentence_text: str, fragment_text: str, start_from: int = 0) -> tuple:
+def translate_and_segment(spanish_text: str) -> Optional[tuple]:
     """
-    Calculate start and end word positions for a fragment within a sentence.
-    Returns (start_position, end_position, next_start).
+    Use one Claude call to translate an untranslated sentence and segment it.
+    Returns (english, fragments), or None if the response can't be parsed or
+    fails validation - callers then fall back to translate_sentence +
+    generate_fragments.
     """
-    sentence_words = sentence_text.split()
-    fragment_words = fragment_text.split()
-
-    # Find where fragment starts in sentence
-    fragment_start = None
-    for i in range(start_from, len(sentence_words)):
-        # Check if fragment matches starting at position i
-        matches = True
-        for j, frag_word in enumerate(fragment_words):
-            if i + j >= len(sentence_words):
-                matches = False
-                break
-            # Normalize for comparison (remove punctuation for matching)
-            sent_word = sentence_words[i + j].rstrip('.,;:!?»"\'').lstrip('«"\'¿¡')
-            frag_word_clean = frag_word.rstrip('.,;:!?»"\'').lstrip('«"\'¿¡')
-            if sent_word.lower() != frag_word_clean.lower():
-                matches = False
-                break
-        if matches:
-            fragment_start = i
-            break
+    client = get_anthropic()
 
-    if fragment_start is None:
-        # Fallback: use sequential positioning
-        return (start_from, start_from + len(fragment_words) - 1, start_from + len(fragment_words))
+    result = client.request(
+        'translate-and-segment', TRANSLATE_AND_SEGMENT_INSTRUCTIONS, f"Spanish: {spanish_text}",
+        FRAGMENT_SCHEMA, 'fragments', max_tokens=1500
+    )
 
-    start_pos = fragment_start
-    end_pos = fragment_start + len(fragment_words) - 1
-    next_start = end_pos + 1
+    if not result.complete or result.invalid:
+        return None
+    if TRANSLATE_AND_SEGMENT_SCHEMA.error(result.value) or not result.items:
+        return None
 
-    return (start_pos, end_pos, next_start)
+    return result.value['translation'].strip(), result.items
 
 
-def insert_fragments(sentence_id: str, fragments: List[Dict], sentence_text: str) -> int:
-    """Insert fragments into database. Returns count inserted."""
+def normalize_tokens(text: str) -> List[str]:
+    """Split text into lowercased word tokens, dropping punctuation."""
+    return [m.group().lower() for m in WORD_RE.finditer(text)]
+
+
+def get_sentence_words(sentence_ids: List[str]) -> Dict[str, List[Dict]]:
+    """Fetch words rows (word_text, word_position) for several sentences, keyed by sentence_id."""
     supabase = get_supabase()
+    words = {}
+
+    for i in range(0, len(sentence_ids), ID_CHUNK_SIZE):
+        chunk = sentence_ids[i:i + ID_CHUNK_SIZE]
+        offset = 0
+        while True:
+            result = supabase.table('words').select(
+                'sentence_id, word_text, word_position'
+            ).in_('sentence_id', chunk).order('sentence_id').order('word_position').range(
+                offset, offset + PAGE_SIZE - 1
+            ).execute()
+            for w in result.data:
+                words.setdefault(w['sentence_id'], []).append(w)
+            if len(result.data) < PAGE_SIZE:
+                break
+            offset += PAGE_SIZE
 
-    current_position = 0
-    inserted = 0
+    return words
+
+
+def sentence_tokens(sentence_text: str, words: Optional[List[Dict]] = None) -> List[Tuple[int, str]]:
+    """
+    Return (position, token) pairs for a sentence. Fragment positions are
+    0-based (like existing sentence_fragments rows and generate_fragments.js)
+    while words.word_position is 1-based, so with the sentence's words rows
+    the position is word_position - 1; otherwise tokens are numbered from 0.
+    """
+    if words:
+        return [
+            (w['word_position'] - 1, token)
+            for w in sorted(words, key=lambda w: w['word_position'])
+            for token in normalize_tokens(w['word_text'])
+        ]
+    return list(enumerate(normalize_tokens(sentence_text)))
+
+
+def find_token(tokens: List[Tuple[int, str]], token: str, start: int,
+               stop_at: Optional[str] = None) -> Optional[int]:
+    """
+    Index of the first tokens[k] (k >= start) equal to token, or None if it
+    isn't there or stop_at (the next fragment's first word) comes first.
+    """
+    for k in range(start, len(tokens)):
+        if tokens[k][1] == token:
+            return k
+        if tokens[k][1] == stop_at:
+            return None
+    return None
 
-    for i, frag in enumerate(fragments):
-        # Calculate word positions
-        start_pos, end_pos, next_pos = calculate_word_positions(
-            sentence_text, frag['es'], current_position
-        )
-        current_position = next_pos
 
-        # Build insert data
-        insert_data = {
+def calculate_word_positions(sentence_text: str, fragments: List[Dict],
+                             words: Optional[List[Dict]] = None) -> Tuple[List[Tuple[int, int]], bool]:
+    """
+    Align all fragments of a sentence in one left-to-right pass.
+
+    Returns ([(start_position, end_position), ...], confident). Positions are
+    0-based word indexes (see sentence_tokens). `confident` is False when any token
+    had to be skipped or substituted, a fragment matched nothing, or the
+    fragments didn't cover the whole sentence - the positions are then a best
+    effort and should be reviewed.
+    """
+    tokens = sentence_tokens(sentence_text, words)
+    spans = []
+    confident = True
+    i = 0
+
+    fragment_tokens = [normalize_tokens(frag['es']) for frag in fragments]
+
+    for k, frag_tokens in enumerate(fragment_tokens):
+        next_first = next((t[0] for t in fragment_tokens[k + 1:] if t), None)
+        first = last = None
+        j = 0
+
+        while j < len(frag_tokens) and i < len(tokens):
+            position, token = tokens[i]
+            if token == frag_tokens[j]:
+                if first is None:
+                    first = position
+                last = position
+                i += 1
+                j += 1
+            elif j > 0 and token == next_first:
+                # Don't run into the next fragment
+                break
+            elif j + 1 < len(frag_tokens) and frag_tokens[j + 1] == token:
+                # Fragment has a word the sentence doesn't - expected where
+                # the importer skipped a garbage word (gap in word_position)
+                if i == 0 or position - tokens[i - 1][0] <= 1:
+                    confident = False
+                j += 1
+            else:
+                confident = False
+                found = find_token(tokens, frag_tokens[j], i + 1, next_first)
+                if found is not None:
+                    # Fragment left out the sentence words before it
+                    i = found
+                elif token == next_first:
+                    # Fragment word missing and the next fragment starts here
+                    j += 1
+                else:
+                    # Substituted word
+                    if first is None:
+                        first = position
+                    last = position
+                    i += 1
+                    j += 1
+
+        if j < len(frag_tokens) or first is None:
+            confident = False
+
+        spans.append((first, last))
+
+    if i < len(tokens):
+        confident = False
+
+    # Fill fragments that matched nothing right after the previous one,
+    # stopping short of the next matched fragment where there is room
+    positions = []
+    previous_end = tokens[0][0] - 1 if tokens else -1
+    for k, ((first, last), frag_tokens) in enumerate(zip(spans, fragment_tokens)):
+        if first is None:
+            first = previous_end + 1
+            last = first + max(len(frag_tokens), 1) - 1
+            next_start = next((start for start, _ in spans[k + 1:] if start is not None), None)
+            if next_start is not None:
+                last = max(first, min(last, next_start - 1))
+        positions.append((first, last))
+        previous_end = last
+
+    return positions, confident
+
+
+def build_fragment_rows(sentence_id: str, fragments: List[Dict], sentence_text: str,
+                        words: Optional[List[Dict]] = None) -> Tuple[List[Dict], bool]:
+    """
+    Build sentence_fragments rows (with word positions) for one sentence.
+    Returns (rows, alignment_confident).
+    """
+    positions, confident = calculate_word_positions(sentence_text, fragments, words)
+    rows = []
+
+    for i, (frag, (start_pos, end_pos)) in enumerate(zip(fragments, positions)):
+        row = {
             'sentence_id': sentence_id,
             'fragment_order': i + 1,
             'start_word_position': start_pos,
             'end_word_position': end_pos,
             'fragment_text': frag['es'],
             'fragment_translation': frag['en'],
+            'context_note': frag.get('context_note') or None,
         }
+        rows.append(row)
 
-        if frag.get('context_note'):
-            insert_data['context_note'] = frag['context_note']
+    return rows, confident
 
-        supabase.table('sentence_fragments').insert(insert_data).execute()
-        inserted += 1
 
-    return inserted
+def insert_fragment_rows(rows: List[Dict]) -> int:
+    """Insert fragment rows with multi-row inserts. Returns count inserted."""
+    supabase = get_supabase()
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        supabase.table('sentence_fragments').insert(rows[i:i + INSERT_BATCH_SIZE]).execute()
+    return len(rows)
 
 
-def process_chapter(chapter_number: int, dry_run: bool = False) -> Dict:
-    """
-    Process all sentences in a chapter.
-    Returns stats dict.
-    """
-    print(f"\nProcessing Chapter {chapter_number}")
-    print("=" * 40)
+def insert_fragments(sentence_id: str, fragments: List[Dict], sentence_text: str) -> int:
+    """Insert fragments for one sentence in a single request. Returns count inserted."""
+    words = get_sentence_words([sentence_id]).get(sentence_id)
+    rows, _ = build_fragment_rows(sentence_id, fragments, sentence_text, words)
+    return insert_fragment_rows(rows)
 
-    chapter_id = get_chapter_id(chapter_number)
-    if not chapter_id:
-        print(f"  ERROR: Chapter {chapter_number} not found in database")
-        return {'sentences': 0, 'processed': 0, 'fragments': 0, 'skipped': 0, 'errors': 0}
 
-    sentences = get_sentences_for_chapter(chapter_id)
+def segment_sentence(sentence: Dict, combined: bool = True, scope: Optional[str] = None) -> Dict:
+    """
+    Worker: translate (if needed) and segment one sentence with Claude.
+    Untranslated sentences use one translate_and_segment call when `combined`
+    is set, falling back to the two-call path if its response is invalid.
+    Runs in the thread pool, so it only calls Claude - database writes
+    happen on the main thread. Calls are recorded in the usage ledger under
+    scope (e.g. 'chapter 3').
+    """
+    result = {'sentence': sentence, 'english': sentence['sentence_translation'],
+              'translated': False, 'combined': None, 'fragments': [], 'error': None}
+    try:
+        with ledger.scope(scope):
+            english = sentence['sentence_translation']
+            if (not english or english.strip() == '') and combined:
+                combined_result = translate_and_segment(sentence['sentence_text'])
+                result['combined'] = combined_result is not None
+                if combined_result:
+                    result['english'], result['fragments'] = combined_result
+                    result['translated'] = True
+                    return result
+
+            # The two-call path re-does a failed combined call
+            fallback = result['combined'] is False
+            if not english or english.strip() == '':
+                english = translate_sentence(sentence['sentence_text'], retry=fallback)
+                result['english'] = english
+                result['translated'] = True
+
+            result['fragments'] = generate_fragments(sentence['sentence_text'], english, retry=fallback)
+    except Exception as e:
+        result['error'] = str(e)
+
+    return result
+
+
+def print_result(result: Dict):
+    """Print the fragments generated for one sentence."""
+    order = result['sentence']['sentence_order']
+    if result['error']:
+        print(f"  [{order}] ERROR: {result['error']}")
+        return
+    if not result['fragments']:
+        print(f"  [{order}] ERROR: No fragments generated")
+        return
+
+    print(f"  [{order}] {len(result['fragments'])} fragments:")
+    for frag in result['fragments']:
+        has_note = '*' if frag.get('context_note') else ''
+        print(f"       → \"{frag['es']}\" = \"{frag['en']}\"{has_note}")
+
+
+def save_results(results: List[Dict], stats: Dict, dry_run: bool = False,
+                 sentence_words: Optional[Dict[str, List[Dict]]] = None):
+    """Write translations and fragments for one group of sentences, updating stats."""
+    supabase = get_supabase()
+    sentence_words = sentence_words or {}
+    rows = []
+    fragment_counts = {}
+
+    for result in results:
+        sentence = result['sentence']
+        if result['translated'] and not dry_run:
+            supabase.table('sentences').update({
+                'sentence_translation': result['english']
+            }).eq('sentence_id', sentence['sentence_id']).execute()
+
+        if result['error'] or not result['fragments']:
+            stats['errors'] += 1
+            continue
 
-    stats = {
-        'sentences': len(sentences),
+        sentence_rows, confident = build_fragment_rows(
+            sentence['sentence_id'], result['fragments'], sentence['sentence_text'],
+            sentence_words.get(sentence['sentence_id'])
+        )
+        if not confident:
+            print(f"  [{sentence['sentence_order']}] WARNING: fragment alignment uncertain, check word positions")
+            stats['uncertain_alignments'] += 1
+        fragment_counts[sentence['sentence_id']] = len(sentence_rows)
+        rows.extend(sentence_rows)
+
+    if not dry_run and rows:
+        try:
+            insert_fragment_rows(rows)
+        except Exception as e:
+            # Fall back to one insert per sentence so one bad row doesn't lose the chapter
+            print(f"  Bulk insert failed ({e}), retrying per sentence...")
+            for sentence_id in list(fragment_counts):
+                try:
+                    insert_fragment_rows([r for r in rows if r['sentence_id'] == sentence_id])
+                except Exception as e:
+                    print(f"       ERROR inserting {sentence_id}: {e}")
+                    stats['errors'] += 1
+                    del fragment_counts[sentence_id]
+
+    stats['processed'] += len(fragment_counts)
+    stats['fragments'] += sum(fragment_counts.values())
+
+
+def new_stats(sentence_count: int = 0) -> Dict:
+    return {
+        'sentences': sentence_count,
         'processed': 0,
         'fragments': 0,
         'skipped': 0,
         'errors': 0,
-        'translations_generated': 0
+        'translations_generated': 0,
+        'combined_calls': 0,
+        'combined_fallbacks': 0,
+        'uncertain_alignments': 0
     }
 
-    for sentence in sentences:
-        sentence_id = sentence['sentence_id']
-        sentence_order = sentence['sentence_order']
-        spanish = sentence['sentence_text']
-        english = sentence['sentence_translation']
 
-        # Skip if fragments already exist
-        if has_existing_fragments(sentence_id):
-            print(f"  [{sentence_order}] SKIPPED (fragments exist)")
-            stats['skipped'] += 1
-            continue
+def process_sentence_list(sentences: List[Dict], dry_run: bool = False,
+                          workers: int = DEFAULT_WORKERS, group_labels: Optional[Dict] = None,
+                          combined: bool = True, scopes: Optional[Dict] = None) -> Dict:
+    """
+    Generate fragments for a list of sentences.
+
+    Existing fragments are detected with one up-front query and Claude calls
+    run in a pool of `workers` threads. Each group (chapter) is written as
+    soon as its last sentence finishes, and large groups are flushed every
+    SAVE_BATCH_SIZE sentences, so an interrupted run keeps the work already
+    done. group_labels maps chapter_id to the header printed before that
+    chapter's results, scopes maps it to the usage ledger scope of its
+    Claude calls.
+    """
+    stats = new_stats(len(sentences))
+
+    existing = get_sentence_ids_with_fragments([s['sentence_id'] for s in sentences])
+    pending = [s for s in sentences if s['sentence_id'] not in existing]
+    stats['skipped'] = len(sentences) - len(pending)
+    if stats['skipped']:
+        print(f"  Skipping {stats['skipped']} sentences (fragments exist)")
+    if not pending:
+        return stats
+
+    remaining = {}
+    for sentence in pending:
+        group_id = sentence.get('chapter_id')
+        remaining[group_id] = remaining.get(group_id, 0) + 1
+    position = {s['sentence_id']: i for i, s in enumerate(pending)}
+    finished = {group_id: [] for group_id in remaining}
+    labelled = set()
+
+    def flush(group_id):
+        # Print and save in sentence order; word positions come from one bulk read
+        group_results = sorted(finished[group_id], key=lambda r: position[r['sentence']['sentence_id']])
+        finished[group_id] = []
+        if group_labels and group_id in group_labels and group_id not in labelled:
+            print(f"\n{group_labels[group_id]}")
+            print("=" * 40)
+            labelled.add(group_id)
+        for result in group_results:
+            print_result(result)
+            if result['translated']:
+                stats['translations_generated'] += 1
+            if result['combined'] is not None:
+                stats['combined_calls'] += 1
+                stats['combined_fallbacks'] += not result['combined']
+        sentence_words = get_sentence_words([r['sentence']['sentence_id'] for r in group_results])
+        save_results(group_results, stats, dry_run, sentence_words)
+
+    print(f"  Segmenting {len(pending)} sentences with {workers} workers...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(segment_sentence, s, combined, (scopes or {}).get(s.get('chapter_id'))): s
+                   for s in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            sentence = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'sentence': sentence, 'english': sentence.get('sentence_translation'),
+                          'translated': False, 'combined': None, 'fragments': [], 'error': str(e)}
+            group_id = sentence.get('chapter_id')
+            finished[group_id].append(result)
+            remaining[group_id] -= 1
+            if done % 25 == 0:
+                print(f"    {done}/{len(pending)} done")
+            if remaining[group_id] == 0 or len(finished[group_id]) >= SAVE_BATCH_SIZE:
+                flush(group_id)
 
-        # Generate translation if missing
-        if not english or english.strip() == '':
-            print(f"  [{sentence_order}] Generating translation...")
-            english = translate_sentence(spanish)
-            stats['translations_generated'] += 1
+    return stats
 
-            # Update sentence with translation if not dry run
-            if not dry_run:
-                supabase = get_supabase()
-                supabase.table('sentences').update({
-                    'sentence_translation': english
-                }).eq('sentence_id', sentence_id).execute()
 
-        # Generate fragments
-        fragments = generate_fragments(spanish, english)
+def process_chapters(chapter_numbers: Optional[List[int]], dry_run: bool = False,
+                     workers: int = DEFAULT_WORKERS, combined: bool = True) -> Dict:
+    """
+    Process all sentences in several chapters with one shared worker pool
+    (all chapters if chapter_numbers is None).
+    Returns stats dict.
+    """
+    chapters = get_chapters(chapter_numbers)
+    found = {ch['chapter_number'] for ch in chapters}
+    for number in chapter_numbers or []:
+        if number not in found:
+            print(f"  ERROR: Chapter {number} not found in database")
+    if not chapters:
+        return new_stats()
 
-        if not fragments:
-            print(f"  [{sentence_order}] ERROR: No fragments generated")
-            stats['errors'] += 1
-            continue
+    print(f"\nLoading sentences for {len(chapters)} chapters...")
+    sentences = get_sentences_for_chapters([ch['chapter_id'] for ch in chapters])
+    labels = {ch['chapter_id']: f"Chapter {ch['chapter_number']}" for ch in chapters}
+    scopes = {ch['chapter_id']: f"chapter {ch['chapter_number']}" for ch in chapters}
 
-        # Display fragments
-        print(f"  [{sentence_order}] {len(fragments)} fragments:")
-        for frag in fragments:
-            has_note = '*' if frag.get('context_note') else ''
-            print(f"       → \"{frag['es']}\" = \"{frag['en']}\"{has_note}")
+    return process_sentence_list(sentences, dry_run, workers, labels, combined, scopes)
 
-        # Insert if not dry run
-        if not dry_run:
-            try:
-                insert_fragments(sentence_id, fragments, spanish)
-            except Exception as e:
-                print(f"       ERROR inserting: {e}")
-                stats['errors'] += 1
-                continue
 
-        stats['processed'] += 1
-        stats['fragments'] += len(fragments)
+def process_chapter(chapter_number: int, dry_run: bool = False, workers: int = DEFAULT_WORKERS,
+                    combined: bool = True) -> Dict:
+    """
+    Process all sentences in a chapter.
+    Returns stats dict.
+    """
+    print(f"\nProcessing Chapter {chapter_number}")
+    print("=" * 40)
 
-    return stats
+    chapter_id = get_chapter_id(chapter_number)
+    if not chapter_id:
+        print(f"  ERROR: Chapter {chapter_number} not found in database")
+        return new_stats()
+
+    sentences = get_sentences_for_chapter(chapter_id)
+    return process_sentence_list(sentences, dry_run, workers, combined=combined,
+                                 scopes={chapter_id: f"chapter {chapter_number}"})
 
 
 def get_sentences_by_ids(sentence_ids: List[str]) -> List[Dict]:
     """Fetch specific sentences by their IDs."""
     supabase = get_supabase()
     result = supabase.table('sentences').select(
-        'sentence_id, sentence_order, sentence_text, sentence_translation'
+        'sentence_id, chapter_id, sentence_order, sentence_text, sentence_translation'
     ).in_('sentence_id', sentence_ids).order('sentence_order').execute()
 
     return result.data or []
 
 
-def process_sentences(sentence_ids: List[str], dry_run: bool = False) -> Dict:
+def process_sentences(sentence_ids: List[str], dry_run: bool = False, workers: int = DEFAULT_WORKERS,
+                      combined: bool = True) -> Dict:
     """
     Process specific sentences by ID.
     Returns stats dict.
@@ -344,69 +718,9 @@ def process_sentences(sentence_ids: List[str], dry_run: bool = False) -> Dict:
 
     if not sentences:
         print("  ERROR: No sentences found with those IDs")
-        return {'sentences': 0, 'processed': 0, 'fragments': 0, 'skipped': 0, 'errors': 0}
-
-    stats = {
-        'sentences': len(sentences),
-        'processed': 0,
-        'fragments': 0,
-        'skipped': 0,
-        'errors': 0,
-        'translations_generated': 0
-    }
-
-    for sentence in sentences:
-        sentence_id = sentence['sentence_id']
-        sentence_order = sentence['sentence_order']
-        spanish = sentence['sentence_text']
-        english = sentence['sentence_translation']
-
-        # Skip if fragments already exist
-        if has_existing_fragments(sentence_id):
-            print(f"  [{sentence_order}] SKIPPED (fragments exist)")
-            stats['skipped'] += 1
-            continue
-
-        # Generate translation if missing
-        if not english or english.strip() == '':
-            print(f"  [{sentence_order}] Generating translation...")
-            english = translate_sentence(spanish)
-            stats['translations_generated'] += 1
-
-            # Update sentence with translation if not dry run
-            if not dry_run:
-                supabase = get_supabase()
-                supabase.table('sentences').update({
-                    'sentence_translation': english
-                }).eq('sentence_id', sentence_id).execute()
-
-        # Generate fragments
-        fragments = generate_fragments(spanish, english)
-
-        if not fragments:
-            print(f"  [{sentence_order}] ERROR: No fragments generated")
-            stats['errors'] += 1
-            continue
-
-        # Display fragments
-        print(f"  [{sentence_order}] {len(fragments)} fragments:")
-        for frag in fragments:
-            has_note = '*' if frag.get('context_note') else ''
-            print(f"       → \"{frag['es']}\" = \"{frag['en']}\"{has_note}")
+        return new_stats()
 
-        # Insert if not dry run
-        if not dry_run:
-            try:
-                insert_fragments(sentence_id, fragments, spanish)
-            except Exception as e:
-                print(f"       ERROR inserting: {e}")
-                stats['errors'] += 1
-                continue
-
-        stats['processed'] += 1
-        stats['fragments'] += len(fragments)
-
-    return stats
+    return process_sentence_list(sentences, dry_run, workers, combined=combined)
 
 
 def main():
@@ -419,6 +733,11 @@ def main():
         type=int,
         help='Chapter numbers to process (e.g., --chapters 1 2 3)'
     )
+    parser.add_argument(
+        '--all',
+        action='store_true',
+        help='Process every chapter in the database'
+    )
     parser.add_argument(
         '--sentence-ids',
         nargs='+',
@@ -430,37 +749,35 @@ def main():
         action='store_true',
         help='Show output without saving to database'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f'Concurrent Claude requests (default: {DEFAULT_WORKERS})'
+    )
+    parser.add_argument(
+        '--two-call',
+        action='store_true',
+        help='Translate and segment untranslated sentences with separate Claude calls'
+    )
 
     args = parser.parse_args()
 
-    if not args.chapters and not args.sentence_ids:
-        parser.error('Either --chapters or --sentence-ids is required')
+    if not args.chapters and not args.sentence_ids and not args.all:
+        parser.error('One of --chapters, --all or --sentence-ids is required')
 
     if args.dry_run:
         print("\n" + "=" * 50)
         print("DRY RUN MODE - No database changes will be made")
         print("=" * 50)
 
-    total_stats = {
-        'sentences': 0,
-        'processed': 0,
-        'fragments': 0,
-        'skipped': 0,
-        'errors': 0,
-        'translations_generated': 0
-    }
-
     # Process by sentence IDs if provided
     if args.sentence_ids:
-        stats = process_sentences(args.sentence_ids, args.dry_run)
-        for key in total_stats:
-            total_stats[key] += stats.get(key, 0)
-    # Otherwise process by chapters
-    elif args.chapters:
-        for chapter_num in args.chapters:
-            stats = process_chapter(chapter_num, args.dry_run)
-            for key in total_stats:
-                total_stats[key] += stats.get(key, 0)
+        total_stats = process_sentences(args.sentence_ids, args.dry_run, args.workers, not args.two_call)
+    # Otherwise process chapters with one shared worker pool
+    else:
+        total_stats = process_chapters(None if args.all else args.chapters, args.dry_run, args.workers,
+                                       not args.two_call)
 
     # Print summary
     print("\n")
@@ -470,12 +787,16 @@ def main():
     if args.sentence_ids:
         print(f"  Sentences targeted: {len(args.sentence_ids)}")
     else:
-        print(f"  Chapters processed: {len(args.chapters)}")
+        print(f"  Chapters processed: {'all' if args.all else len(args.chapters)}")
     print(f"  Total sentences: {total_stats['sentences']}")
     print(f"  Processed: {total_stats['processed']}")
     print(f"  Skipped (existing): {total_stats['skipped']}")
     print(f"  Errors: {total_stats['errors']}")
+    print(f"  Uncertain alignments: {total_stats['uncertain_alignments']}")
     print(f"  Translations generated: {total_stats['translations_generated']}")
+    if total_stats['combined_calls']:
+        print(f"  Combined translate+segment calls: {total_stats['combined_calls']} "
+              f"({total_stats['combined_fallbacks']} fell back to two calls)")
     print()
 
     if args.dry_run:
@@ -484,6 +805,8 @@ def main():
     else:
         print(f"  Fragments created: {total_stats['fragments']}")
 
+    if anthropic_client is not None:
+        anthropic_client.print_usage()
     print()
 
 
@@ -10,6 +10,8 @@ import sys
 from dotenv import load_dotenv
 from supabase import create_client
 
+from lemma_merge import fetch_all_lemmas, merges_from_garbage_map, run_merges
+
 # Load environment
 load_dotenv()
 
@@ -188,15 +190,7 @@ CAPITALIZATION_FIXES = {
 
 def get_all_lemmas():
     """Fetch all lemmas with pagination."""
-    all_lemmas = []
-    offset = 0
-    while True:
-        batch = db.table('lemmas').select('*').range(offset, offset + 999).execute()
-        all_lemmas.extend(batch.data)
-        if len(batch.data) < 1000:
-            break
-        offset += 1000
-    return all_lemmas
+    return fetch_all_lemmas(db)
 
 
 def fix_garbage_lemmas(dry_run=True):
@@ -205,53 +199,10 @@ def fix_garbage_lemmas(dry_run=True):
     print("FIXING GARBAGE LEMMAS")
     print("="*80)
 
-    all_lemmas = get_all_lemmas()
-    lemma_lookup = {l['lemma_text']: l['lemma_id'] for l in all_lemmas}
-
-    fixed = 0
-    deleted = 0
-
-    for garbage, canonical in GARBAGE_TO_CANONICAL.items():
-        if garbage not in lemma_lookup:
-            continue
-
-        garbage_id = lemma_lookup[garbage]
-
-        # Count words assigned to this garbage lemma
-        words = db.table('words').select('word_id', count='exact').eq('lemma_id', garbage_id).execute()
-        word_count = words.count or 0
-
-        if canonical and canonical in lemma_lookup:
-            canonical_id = lemma_lookup[canonical]
-            print(f"  {garbage} → {canonical} ({word_count} words)")
-
-            if not dry_run:
-                # Reassign words to canonical lemma
-                if word_count > 0:
-                    db.table('words').update({'lemma_id': canonical_id}).eq('lemma_id', garbage_id).execute()
-
-                # Delete validation report for garbage lemma
-                db.table('validation_reports').delete().eq('lemma_id', garbage_id).execute()
-
-                # Delete garbage lemma
-                db.table('lemmas').delete().eq('lemma_id', garbage_id).execute()
-
-            fixed += 1
-        else:
-            print(f"  {garbage} → DELETE ({word_count} words will be deleted)")
-
-            if not dry_run:
-                # Delete words associated with this garbage lemma
-                if word_count > 0:
-                    db.table('words').delete().eq('lemma_id', garbage_id).execute()
-
-                # Delete validation report
-                db.table('validation_reports').delete().eq('lemma_id', garbage_id).execute()
-
-                # Delete garbage lemma
-                db.table('lemmas').delete().eq('lemma_id', garbage_id).execute()
-
-            deleted += 1
+    # Garbage with no (existing) canonical form is deleted with its words
+    stats = run_merges(db, merges_from_garbage_map(GARBAGE_TO_CANONICAL), get_all_lemmas(), dry_run,
+                       delete_if_canonical_missing=True)
+    fixed, deleted = stats['merged'], stats['deleted']
 
     print(f"\n  Total: {fixed} merged, {deleted} deleted")
     return fixed, deleted
@@ -263,47 +214,38 @@ def fix_spelling_corrections(dry_run=True):
     print("FIXING SPELLING ERRORS")
     print("="*80)
 
+    all_lemmas = get_all_lemmas()
+    lemma_lookup = {l['lemma_text']: l for l in all_lemmas}
+
+    # Corrections whose target already exists become merges
+    merges = {wrong: correct for wrong, correct in SPELLING_CORRECTIONS.items()
+              if wrong in lemma_lookup and correct in lemma_lookup}
+    stats = run_merges(db, merges_from_garbage_map(merges), all_lemmas, dry_run)
+    merged = stats['merged']
+
     fixed = 0
-    merged = 0
+    renamed_to = set()
     for wrong, correct in SPELLING_CORRECTIONS.items():
-        # Refresh lemma lookup each iteration to account for deletions/renames
-        all_lemmas = get_all_lemmas()
-        lemma_lookup = {l['lemma_text']: l for l in all_lemmas}
-
-        if wrong not in lemma_lookup:
+        if wrong not in lemma_lookup or wrong in merges:
             continue
 
-        wrong_lemma = lemma_lookup[wrong]
-        wrong_id = wrong_lemma['lemma_id']
-
-        # Check if correct form already exists
-        if correct in lemma_lookup:
-            # Merge words to the existing correct lemma
-            correct_id = lemma_lookup[correct]['lemma_id']
-            words = db.table('words').select('word_id', count='exact').eq('lemma_id', wrong_id).execute()
-            word_count = words.count or 0
-            print(f"  {wrong} → MERGE to {correct} ({word_count} words)")
-
+        # Two misspellings of the same word: rename the first, merge the rest into it
+        if correct in renamed_to:
+            print(f"  {wrong} → MERGE to {correct} (after rename)")
             if not dry_run:
-                # Reassign words to correct lemma
-                if word_count > 0:
-                    db.table('words').update({'lemma_id': correct_id}).eq('lemma_id', wrong_id).execute()
-
-                # Delete validation report
-                db.table('validation_reports').delete().eq('lemma_id', wrong_id).execute()
-
-                # Delete wrong lemma
-                db.table('lemmas').delete().eq('lemma_id', wrong_id).execute()
+                merged += run_merges(db, [(wrong, correct, None)], dry_run=False)['merged']
+            else:
+                merged += 1
+            continue
 
-            merged += 1
-        else:
-            # Simple rename
-            print(f"  {wrong} → {correct}")
+        # Simple rename
+        print(f"  {wrong} → {correct}")
 
-            if not dry_run:
-                db.table('lemmas').update({'lemma_text': correct}).eq('lemma_id', wrong_id).execute()
+        if not dry_run:
+            db.table('lemmas').update({'lemma_text': correct}).eq('lemma_id', lemma_lookup[wrong]['lemma_id']).execute()
 
-            fixed += 1
+        renamed_to.add(correct)
+        fixed += 1
 
     print(f"\n  Total: {fixed} renamed, {merged} merged")
     return fixed + merged
@@ -9,9 +9,14 @@ Usage:
     python scripts/import_chapter.py --chapter 1 --input data/chapter1.txt
     python scripts/import_chapter.py --chapter 1 --text "Cuando yo tenía..."
     python scripts/import_chapter.py --translate-only  # Just translate untranslated lemmas
+    python scripts/import_chapter.py --translate-only --ai-glosses  # ...in batched Claude requests
     python scripts/import_chapter.py --validate        # Print SQL validation queries
     python scripts/import_chapter.py --validate-ai --chapter 1  # Run AI validation on chapter
     python scripts/import_chapter.py --show-issues --chapter 1  # Show flagged lemmas with AI suggestions
+    python scripts/import_chapter.py --detect-phrases --chapter 1  # Detect phrases (known ones matched locally)
+    python scripts/import_chapter.py --detect-phrases --chapter 1 --no-prematch  # ...sending every sentence to Claude
+    python scripts/import_chapter.py --golden-corpus   # Check lemma rules against token_corpus_golden.json
+    python scripts/import_chapter.py --write-golden-corpus  # Regenerate it after an intended rule change
 
 Requirements:
     pip install spacy deepl supabase python-dotenv
@@ -24,10 +29,15 @@ import sys
 import json
 import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 
+from claude_client import ClaudeClient
+from structured_output import NUMBER, Schema
+from usage_ledger import ledger
+
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent / '.env')
 
@@ -65,6 +75,20 @@ def get_translator():
     return translator
 
 
+def deepl_translate(phase: str, text: str, **options) -> str:
+    """Translate Spanish text to English with DeepL, recording the call in the usage ledger."""
+    trans = get_translator()
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        result = trans.translate_text(text, source_lang="ES", target_lang="EN-US", **options)
+    except Exception as e:
+        ledger.record('deepl', None, phase, started, time.perf_counter() - start, 'error', error=str(e))
+        raise
+    ledger.record('deepl', None, phase, started, time.perf_counter() - start, characters=len(text))
+    return result.text
+
+
 def get_supabase():
     """Lazy load Supabase client."""
     global supabase
@@ -80,8 +104,8 @@ def get_supabase():
     return supabase
 
 
-def get_anthropic():
-    """Lazy load Anthropic client."""
+def get_anthropic() -> ClaudeClient:
+    """Lazy load the Claude client (anthropic SDK, cached instruction prefixes)."""
     global anthropic_client
     if anthropic_client is None:
         import anthropic
@@ -89,10 +113,16 @@ def get_anthropic():
         if not api_key:
             print("ERROR: ANTHROPIC_API_KEY not found in environment")
             sys.exit(1)
-        anthropic_client = anthropic.Anthropic(api_key=api_key)
+        anthropic_client = ClaudeClient(anthropic.Anthropic(api_key=api_key))
     return anthropic_client
 
 
+def print_claude_usage():
+    """Print per-phase Claude token usage, if Claude was called."""
+    if anthropic_client is not None:
+        anthropic_client.print_usage()
+
+
 # =============================================================================
 # PRIORITY 1: TRANSLATION PREFIX NORMALIZATION
 # =============================================================================
@@ -146,6 +176,34 @@ COMMONLY_REFLEXIVE = {
 }
 
 
+# Words that end in -ando/-iendo but are NOT gerunds
+NOT_GERUNDS = frozenset({
+    'cuando',      # when (conjunction)
+    'bando',       # edict, faction
+    'mando',       # command
+    'blando',      # soft
+    'orlando',     # proper name
+    'fernando',    # proper name
+    'normando',    # Norman
+    'comando',     # command
+    'contrabando', # contraband
+    'dando',       # actual gerund of dar, but dar is irregular
+})
+
+# Reflexive gerund endings -> infinitive suffix for the stem before them
+REFLEXIVE_GERUND_ENDINGS = {
+    ending: ('ar' if ending.startswith('á') else 'er')
+    for ending in ('ándome', 'iéndome', 'ándote', 'iéndote',
+                   'ándose', 'iéndose', 'ándonos', 'iéndonos',
+                   'ándoos', 'iéndoos', 'ándoles', 'iéndoles')
+}
+
+# Compiled once: matches any reflexive gerund ending at the end of a word
+REFLEXIVE_GERUND_RE = re.compile(
+    '(?:' + '|'.join(sorted(REFLEXIVE_GERUND_ENDINGS, key=len, reverse=True)) + ')$'
+)
+
+
 def extract_gerund_base(word_form: str) -> Optional[Tuple[str, bool]]:
     """
     Extract infinitive from gerund forms.
@@ -159,39 +217,15 @@ def extract_gerund_base(word_form: str) -> Optional[Tuple[str, bool]]:
     """
     word = word_form.lower()
 
-    # Words that end in -ando/-iendo but are NOT gerunds
-    NOT_GERUNDS = {
-        'cuando',      # when (conjunction)
-        'bando',       # edict, faction
-        'mando',       # command
-        'blando',      # soft
-        'orlando',     # proper name
-        'fernando',    # proper name
-        'orlando',     # proper name
-        'normando',    # Norman
-        'comando',     # command
-        'contrabando', # contraband
-        'dando',       # actual gerund of dar, but dar is irregular
-    }
-
     if word in NOT_GERUNDS:
         return None
 
     # Check for reflexive gerund endings: -ándome, -iéndome, -ándose, -iéndose, etc.
-    reflexive_endings = ('ándome', 'iéndome', 'ándote', 'iéndote',
-                         'ándose', 'iéndose', 'ándonos', 'iéndonos',
-                         'ándoos', 'iéndoos', 'ándoles', 'iéndoles')
-
-    for ending in reflexive_endings:
-        if word.endswith(ending):
-            # Extract base
-            if 'ánd' in ending:
-                base = word[:-len(ending)]
-                return (base + 'ar', True)
-            elif 'iénd' in ending:
-                base = word[:-len(ending)]
-                # Could be -er or -ir verb
-                return (base + 'er', True)  # Default to -er, will be corrected if needed
+    match = REFLEXIVE_GERUND_RE.search(word)
+    if match:
+        base = word[:match.start()]
+        # -iéndo- could be -er or -ir verb; default to -er, will be corrected if needed
+        return (base + REFLEXIVE_GERUND_ENDINGS[match.group(0)], True)
 
     # Non-reflexive gerunds: -ando, -iendo
     # Must have at least 2 characters before the suffix to be a valid gerund
@@ -211,6 +245,54 @@ def extract_gerund_base(word_form: str) -> Optional[Tuple[str, bool]]:
     return None
 
 
+def gerund_to_infinitive(base_infinitive: str, is_reflexive: bool) -> str:
+    """Resolve an extract_gerund_base result to the lemma we store."""
+    # Check if this is a known reflexive verb
+    if base_infinitive in REFLEXIVE_VERBS:
+        return REFLEXIVE_VERBS[base_infinitive]
+    elif is_reflexive and base_infinitive in COMMONLY_REFLEXIVE:
+        return COMMONLY_REFLEXIVE[base_infinitive]
+    elif is_reflexive:
+        # Generic reflexive: add -se
+        return base_infinitive + 'se'
+    return base_infinitive
+
+
+# Known spaCy lemmatization errors (hardcoded fixes)
+LEMMA_CORRECTIONS = {
+    # -ir verbs incorrectly lemmatized
+    'conocir': 'conocer',
+    'parecierar': 'parecer',
+    'pareciera': 'parecer',
+    # Missing accents
+    'oir': 'oír',
+    'reir': 'reír',
+    # Conjugation forms that slip through
+    'rehíce': 'rehacer',
+    'rehícer': 'rehacer',
+    'píntamir': 'pintar',
+    'píntame': 'pintar',
+    'imagínense': 'imaginar',
+    'haz': 'hacer',
+}
+
+# Conjugated forms used as lemmas (1st person preterite); these often slip through
+PRETERITE_TO_INFINITIVE = {
+    'viví': 'vivir',
+    'miré': 'mirar',
+    'saqué': 'sacar',
+    'logré': 'lograr',
+    'dibujé': 'dibujar',
+    'recordé': 'recordar',
+    'quedé': 'quedar',
+    'crees': 'creer',
+    'quieres': 'querer',
+    'ves': 'ver',
+    # Chapter 3 additions
+    'esforcé': 'esforzar',
+}
+
+
 def validate_verb_lemma(word_form: str, spacy_lemma: str, pos: str) -> str:
     """
     Ensure verbs are infinitives, not conjugations.
@@ -226,23 +308,6 @@ def validate_verb_lemma(word_form: str, spacy_lemma: str, pos: str) -> str:
     # =========================================================================
     # PATTERN 0a: Known spaCy lemmatization errors (hardcoded fixes)
     # =========================================================================
-    LEMMA_CORRECTIONS = {
-        # -ir verbs incorrectly lemmatized
-        'conocir': 'conocer',
-        'parecierar': 'parecer',
-        'pareciera': 'parecer',
-        # Missing accents
-        'oir': 'oír',
-        'reir': 'reír',
-        # Conjugation forms that slip through
-        'rehíce': 'rehacer',
-        'rehícer': 'rehacer',
-        'píntamir': 'pintar',
-        'píntame': 'pintar',
-        'imagínense': 'imaginar',
-        'haz': 'hacer',
-    }
-
     if lemma in LEMMA_CORRECTIONS:
         return LEMMA_CORRECTIONS[lemma]
 
@@ -261,20 +326,6 @@ def validate_verb_lemma(word_form: str, spacy_lemma: str, pos: str) -> str:
     # PATTERN 0c: Conjugated forms used as lemmas (1st person preterite)
     # =========================================================================
     # These often slip through: viví, miré, saqué, etc.
-    PRETERITE_TO_INFINITIVE = {
-        'viví': 'vivir',
-        'miré': 'mirar',
-        'saqué': 'sacar',
-        'logré': 'lograr',
-        'dibujé': 'dibujar',
-        'recordé': 'recordar',
-        'quedé': 'quedar',
-        'crees': 'creer',
-        'quieres': 'querer',
-        'ves': 'ver',
-        # Chapter 3 additions
-        'esforcé': 'esforzar',
-    }
     if lemma in PRETERITE_TO_INFINITIVE:
         return PRETERITE_TO_INFINITIVE[lemma]
     if word in PRETERITE_TO_INFINITIVE:
@@ -285,18 +336,7 @@ def validate_verb_lemma(word_form: str, spacy_lemma: str, pos: str) -> str:
     # =========================================================================
     gerund_result = extract_gerund_base(word)
     if gerund_result:
-        base_infinitive, is_reflexive = gerund_result
-
-        # Check if this is a known reflexive verb
-        if base_infinitive in REFLEXIVE_VERBS:
-            return REFLEXIVE_VERBS[base_infinitive]
-        elif is_reflexive and base_infinitive in COMMONLY_REFLEXIVE:
-            return COMMONLY_REFLEXIVE[base_infinitive]
-        elif is_reflexive:
-            # Generic reflexive: add -se
-            return base_infinitive + 'se'
-        else:
-            return base_infinitive
+        return gerund_to_infinitive(*gerund_result)
 
     # =========================================================================
     # PATTERN 1: Garbage lemmas with "él" or spaces
@@ -617,15 +657,70 @@ def normalize_noun_lemma(lemma_text: str, gender: Optional[str]) -> Tuple[str, s
         return f"el {base}", corrected_gender or 'M'
 
 
-def process_sentence(sentence_text: str) -> List[Dict]:
+# POS corrections for common spaCy misclassifications (applied in this order)
+# Pattern 1: Conjugated verbs tagged as ADJ or PROPN (matched on word or lemma)
+VERB_FORMS_MISCLASSIFIED = frozenset({
+    'logré', 'miré', 'saqué', 'viví', 'dibujé', 'recordé', 'quedé',
+    'crees', 'quieres', 'ves', 'imagínense', 'píntame', 'rehíce',
+})
+
+# Pattern 2: ADJ that should be ADV (adverbs don't need lemma normalization)
+ADVERBS_TAGGED_AS_ADJ = frozenset({'adentro', 'afuera', 'arriba', 'abajo', 'adelante', 'atrás'})
+
+# Pattern 3: Nouns tagged as PROPN (matched on word or lemma; Sáhara stays PROPN)
+NOUNS_TAGGED_AS_PROPN = frozenset({
+    'balsa', 'elefante', 'boa', 'cordero', 'carnero', 'sáhara',
+})
+
+# Pattern 4: Interjections mislabeled
+INTERJECTIONS = frozenset({'eh', 'ah', 'oh', 'ay', 'uy'})
+
+# spaCy morph features copied into words.grammatical_info
+GRAMMATICAL_FEATURES = (
+    ('Tense', 'tense'),
+    ('Person', 'person'),
+    ('Number', 'number'),
+    ('Gender', 'gender'),
+    ('Mood', 'mood'),
+)
+
+# Batch size for nlp.pipe when processing many sentences
+NLP_BATCH_SIZE = 64
+
+
+def correct_pos(word_lower: str, lemma_text: str, pos: str) -> Tuple[str, str]:
     """
-    Tokenize sentence and extract lemmas + POS tags.
+    Apply the POS correction patterns to a spaCy token.
+    Returns (lemma_text, pos).
+    """
+    if word_lower in VERB_FORMS_MISCLASSIFIED or lemma_text in VERB_FORMS_MISCLASSIFIED:
+        pos = 'VERB'
+
+    if word_lower in ADVERBS_TAGGED_AS_ADJ:
+        pos = 'ADV'
+        lemma_text = word_lower
+
+    if word_lower in NOUNS_TAGGED_AS_PROPN or lemma_text in NOUNS_TAGGED_AS_PROPN:
+        if word_lower != 'sáhara':
+            pos = 'NOUN'
+
+    if word_lower in INTERJECTIONS:
+        pos = 'INTJ'
+        lemma_text = word_lower
+
+    return lemma_text, pos
+
+
+def process_doc(doc, lemma_index=None) -> List[Dict]:
+    """
+    Extract lemmas + POS tags from a parsed spaCy Doc.
     Returns list of word data dictionaries.
     Filters out garbage lemmas during processing.
-    """
-    nlp = get_nlp()
-    doc = nlp(sentence_text)
 
+    If a lemma_index (see lemma_index.py) is given, word forms already in the
+    words tables resolve to their recorded lemma and skip the correction rules.
+    Those entries carry a 'lemma_id'.
+    """
     words = []
     position = 0
     garbage_count = 0
@@ -639,70 +734,36 @@ def process_sentence(sentence_text: str) -> List[Dict]:
 
         # Extract grammatical information
         grammatical_info = {}
+        morph = token.morph
+        for feature, key in GRAMMATICAL_FEATURES:
+            values = morph.get(feature)
+            if values:
+                grammatical_info[key] = values[0]
+
+        # Known form: reuse the lemma recorded by past imports and manual fixes
+        known = lemma_index.lookup(token.text) if lemma_index else None
+        if known:
+            words.append({
+                'word_text': token.text,
+                'lemma_text': known['lemma_text'],
+                'lemma_id': known['lemma_id'],
+                'pos': known['pos'] or token.pos_,
+                'word_position': position,
+                'grammatical_info': grammatical_info,
+                'gender': known['gender']
+            })
+            continue
 
-        if token.morph.get('Tense'):
-            grammatical_info['tense'] = token.morph.get('Tense')[0]
-        if token.morph.get('Person'):
-            grammatical_info['person'] = token.morph.get('Person')[0]
-        if token.morph.get('Number'):
-            grammatical_info['number'] = token.morph.get('Number')[0]
-        if token.morph.get('Gender'):
-            grammatical_info['gender'] = token.morph.get('Gender')[0]
-        if token.morph.get('Mood'):
-            grammatical_info['mood'] = token.morph.get('Mood')[0]
-
-        # Get base lemma from spaCy
-        lemma_text = token.lemma_.lower()
-        pos = token.pos_
+        # Get base lemma from spaCy, then fix common spaCy misclassifications
+        lemma_text, pos = correct_pos(token.text.lower(), token.lemma_.lower(), token.pos_)
         gender = None
-        word_lower = token.text.lower()
-
-        # =====================================================================
-        # POS CORRECTION: Fix common spaCy misclassifications
-        # =====================================================================
-
-        # Pattern 1: Conjugated verbs tagged as ADJ or PROPN
-        VERB_FORMS_MISCLASSIFIED = {
-            'logré', 'miré', 'saqué', 'viví', 'dibujé', 'recordé', 'quedé',
-            'crees', 'quieres', 'ves', 'imagínense', 'píntame', 'rehíce',
-        }
-        if word_lower in VERB_FORMS_MISCLASSIFIED or lemma_text in VERB_FORMS_MISCLASSIFIED:
-            pos = 'VERB'
-
-        # Pattern 2: ADJ that should be ADV
-        ADVERBS_TAGGED_AS_ADJ = {'adentro', 'afuera', 'arriba', 'abajo', 'adelante', 'atrás'}
-        if word_lower in ADVERBS_TAGGED_AS_ADJ:
-            pos = 'ADV'
-            lemma_text = word_lower  # Adverbs don't need normalization
-
-        # Pattern 3: Nouns tagged as PROPN (not proper nouns)
-        NOUNS_TAGGED_AS_PROPN = {
-            'balsa', 'elefante', 'boa', 'cordero', 'carnero', 'sáhara',
-        }
-        if word_lower in NOUNS_TAGGED_AS_PROPN or lemma_text in NOUNS_TAGGED_AS_PROPN:
-            if word_lower != 'sáhara':  # Keep Sáhara as PROPN
-                pos = 'NOUN'
-
-        # Pattern 4: Interjections mislabeled
-        INTERJECTIONS = {'eh', 'ah', 'oh', 'ay', 'uy'}
-        if word_lower in INTERJECTIONS:
-            pos = 'INTJ'
-            lemma_text = word_lower
 
         # Check for gerund forms FIRST (before POS-based normalization)
         # spaCy sometimes mis-tags gerunds as PROPN or other POS
         gerund_result = extract_gerund_base(token.text)
         if gerund_result:
-            base_infinitive, is_reflexive = gerund_result
             # Override spaCy's lemma and POS
-            if base_infinitive in REFLEXIVE_VERBS:
-                lemma_text = REFLEXIVE_VERBS[base_infinitive]
-            elif is_reflexive and base_infinitive in COMMONLY_REFLEXIVE:
-                lemma_text = COMMONLY_REFLEXIVE[base_infinitive]
-            elif is_reflexive:
-                lemma_text = base_infinitive + 'se'
-            else:
-                lemma_text = base_infinitive
+            lemma_text = gerund_to_infinitive(*gerund_result)
             pos = 'VERB'  # Correct the POS tag
             print(f"    Fixed gerund: '{token.text}' → '{lemma_text}' (VERB)")
 
@@ -738,6 +799,105 @@ def process_sentence(sentence_text: str) -> List[Dict]:
     return words
 
 
+def process_sentences(sentence_texts: List[str], lemma_index=None) -> List[List[Dict]]:
+    """
+    Tokenize a batch of sentences with nlp.pipe and extract lemmas + POS tags.
+    Returns one word data list per sentence, same as process_sentence.
+    """
+    nlp = get_nlp()
+    return [process_doc(doc, lemma_index) for doc in nlp.pipe(sentence_texts, batch_size=NLP_BATCH_SIZE)]
+
+
+def process_sentence(sentence_text: str, lemma_index=None) -> List[Dict]:
+    """
+    Tokenize sentence and extract lemmas + POS tags.
+    Returns list of word data dictionaries.
+    Filters out garbage lemmas during processing.
+    """
+    return process_doc(get_nlp()(sentence_text), lemma_index)
+
+
+# Golden tokenizer output for every chapter file (see check_token_corpus)
+TOKEN_CORPUS_FILE = Path(__file__).parent / 'token_corpus_golden.json'
+
+# Word fields compared by the golden corpus, stored as one row per word
+TOKEN_CORPUS_FIELDS = ('word_text', 'lemma_text', 'pos', 'word_position', 'gender', 'grammatical_info')
+
+
+def build_token_corpus(data_dir: Path = None) -> Dict[str, List[List[list]]]:
+    """Run process_sentences over all chapter files: {chapter: [[word row, ...] per sentence]}."""
+    data_dir = data_dir or Path(__file__).parent.parent / 'data'
+    corpus = {}
+    for chapter_number in range(1, 28):
+        chapter_file = data_dir / f'chapter{chapter_number}-spanish.txt'
+        if not chapter_file.exists():
+            continue
+        sentences = split_into_sentences(chapter_file.read_text(encoding='utf-8'))
+        corpus[str(chapter_number)] = [
+            [[word[f] for f in TOKEN_CORPUS_FIELDS] for word in words]
+            for words in process_sentences(sentences)
+        ]
+    return corpus
+
+
+def spacy_model_version() -> str:
+    """e.g. 'spacy 3.1.7, es_core_news_sm 3.1.0'"""
+    import spacy
+    meta = get_nlp().meta
+    return f"spacy {spacy.__version__}, {meta['lang']}_{meta['name']} {meta['version']}"
+
+
+def write_token_corpus(golden_path: Path = TOKEN_CORPUS_FILE) -> None:
+    """Regenerate the golden corpus - only after an intended change to the lemma rules."""
+    corpus = build_token_corpus()
+    golden = {'model': spacy_model_version(), 'chapters': corpus}
+    with open(golden_path, 'w', encoding='utf-8') as f:
+        json.dump(golden, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"\nWrote golden corpus for {len(corpus)} chapters to {golden_path}")
+
+
+def check_token_corpus(golden_path: Path = TOKEN_CORPUS_FILE, data_dir: Path = None) -> bool:
+    """
+    Run process_sentences over all chapter files and compare against the
+    golden corpus (committed, generated from the pre-nlp.pipe
+    process_sentence). Returns True if the output matches; a missing golden
+    file is an error. The golden file records the spaCy model it was made
+    with, since a different model version changes lemmas on its own.
+    """
+    golden_file = Path(golden_path)
+    if not golden_file.exists():
+        print(f"\nGolden corpus not found: {golden_path}")
+        return False
+
+    golden = json.loads(golden_file.read_text(encoding='utf-8'))
+    model = spacy_model_version()
+    if golden.get('model') != model:
+        print(f"  WARNING: golden corpus was made with {golden.get('model')}, running {model} - "
+              f"differences may come from the model")
+
+    corpus = build_token_corpus(data_dir)
+    expected_chapters = golden.get('chapters', {})
+    mismatches = 0
+    for chapter_key in sorted(set(expected_chapters) | set(corpus), key=int):
+        expected = expected_chapters.get(chapter_key, [])
+        actual = corpus.get(chapter_key, [])
+        if len(expected) != len(actual):
+            mismatches += 1
+            print(f"  Chapter {chapter_key}: {len(actual)} sentences (golden has {len(expected)})")
+            continue
+        for i, (exp_words, act_words) in enumerate(zip(expected, actual)):
+            if exp_words != act_words:
+                mismatches += 1
+                print(f"  Chapter {chapter_key}, sentence {i+1}: output differs from golden corpus")
+
+    if mismatches:
+        print(f"\nGolden corpus check FAILED: {mismatches} mismatches")
+        return False
+
+    print(f"\nGolden corpus check passed ({len(corpus)} chapters)")
+    return True
+
+
 # =============================================================================
 # STEP 4: GET OR CREATE LEMMAS
 # =============================================================================
@@ -813,8 +973,6 @@ def translate_lemma_with_context(lemma_text: str, pos: str, example_sentence: Op
     Translate Spanish lemma to English with sentence context for better accuracy.
     Always applies normalize_translation for proper prefixes.
     """
-    trans = get_translator()
-
     # Remove article for translation (DeepL handles it better)
     text_to_translate = lemma_text
     if lemma_text.startswith(('el ', 'la ')):
@@ -823,20 +981,9 @@ def translate_lemma_with_context(lemma_text: str, pos: str, example_sentence: Op
     try:
         # DeepL context parameter for better translation
         if example_sentence and pos in ['VERB', 'NOUN']:
-            result = trans.translate_text(
-                text_to_translate,
-                source_lang="ES",
-                target_lang="EN-US",
-                context=example_sentence
-            )
+            translation = deepl_translate('lemma-translation', text_to_translate, context=example_sentence)
         else:
-            result = trans.translate_text(
-                text_to_translate,
-                source_lang="ES",
-                target_lang="EN-US"
-            )
-
-        translation = result.text
+            translation = deepl_translate('lemma-translation', text_to_translate)
     except Exception as e:
         print(f"  Translation error for '{lemma_text}': {e}")
         translation = text_to_translate
@@ -847,13 +994,143 @@ def translate_lemma_with_context(lemma_text: str, pos: str, example_sentence: Op
     return translation
 
 
-def batch_translate_lemmas(limit: int = None, delay: float = 0.1):
-    """Translate all lemmas that have empty definitions."""
+# Lemma ids per get_lemma_contexts call
+LEMMA_CONTEXT_CHUNK_SIZE = 1000
+
+
+def get_lemma_contexts(lemma_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Fetch usage context for many lemmas via the get_lemma_contexts RPC.
+    Returns {lemma_id: {word_forms, usage_count, example_sentence, example_translation}};
+    lemmas with no words are absent.
+    """
+    db = get_supabase()
+    contexts = {}
+    for i in range(0, len(lemma_ids), LEMMA_CONTEXT_CHUNK_SIZE):
+        chunk = lemma_ids[i:i + LEMMA_CONTEXT_CHUNK_SIZE]
+        result = db.rpc('get_lemma_contexts', {'p_lemma_ids': chunk}).execute()
+        for row in result.data or []:
+            contexts[row['lemma_id']] = row
+    return contexts
+
+
+# Lemmas per Claude gloss request (--ai-glosses)
+GLOSS_BATCH_SIZE = 40
+
+LEMMA_GLOSS_PROMPT = """You are writing English glosses for Spanish vocabulary in a language learning app.
+
+For each numbered entry, give the single most common English meaning of the lemma as used in its example sentence (if any).
+- VERBS: start with "to " (e.g. "to live")
+- NOUNS: start with "the " (e.g. "the house"); the Spanish article is not part of the meaning
+- Keep glosses short: 1-4 words, lowercase, no explanations
+
+Return ONLY a JSON array with one object per entry, no markdown:
+[{"index": 1, "translation": "to live"}, {"index": 2, "translation": "the house"}]"""
+
+GLOSS_SCHEMA = Schema({'index': int, 'translation': str})
+
+
+def translate_lemmas_with_ai(lemmas: List[Dict], contexts: Dict[str, Dict]) -> Dict[str, str]:
+    """
+    Generate English glosses for a batch of lemmas in one Claude request.
+    Returns {lemma_id: normalized translation}; lemmas missing from the
+    response are left out. Entries are parsed as they stream in, so a
+    truncated or malformed tail only loses the entries it breaks.
+    """
+    client = get_anthropic()
+
+    entries = []
+    for i, lemma in enumerate(lemmas, 1):
+        entry = f"{i}. {lemma['lemma_text']} ({lemma['part_of_speech']})"
+        context = contexts.get(lemma['lemma_id'], {})
+        if context.get('example_sentence'):
+            entry += f"\n   Example: {context['example_sentence']}"
+            if context.get('example_translation'):
+                entry += f"\n   Example (English): {context['example_translation']}"
+        entries.append(entry)
+
+    result = client.request(
+        'glosses', LEMMA_GLOSS_PROMPT, "Entries:\n" + "\n".join(entries),
+        GLOSS_SCHEMA, max_tokens=2000, items=len(lemmas)
+    )
+    if not result.complete or result.invalid:
+        print(f"  Warning: Gloss response partly unusable ({len(result.items)} entries parsed): "
+              f"{result.error or result.invalid[0][1]}")
+
+    translations = {}
+    for item in result.items:
+        idx = item['index'] - 1
+        translation = item['translation'].strip()
+        if 0 <= idx < len(lemmas) and translation:
+            lemma = lemmas[idx]
+            translations[lemma['lemma_id']] = normalize_translation(translation, lemma['part_of_speech'])
+    return translations
+
+
+def batch_translate_lemmas_with_ai(untranslated: List[Dict], contexts: Dict[str, Dict],
+                                   batch_size: int = GLOSS_BATCH_SIZE, delay: float = 0.1):
+    """
+    Translate lemmas in batches of batch_size per Claude request, writing
+    each batch's definitions with one upsert as soon as it is glossed, so an
+    interrupted run keeps the batches already done. Lemmas a batch leaves out
+    fall back to DeepL (translate_lemma_with_context).
+    """
+    db = get_supabase()
+
+    translated_count = 0
+    error_count = 0
+    num_batches = (len(untranslated) + batch_size - 1) // batch_size
+
+    for b, start in enumerate(range(0, len(untranslated), batch_size), 1):
+        batch = untranslated[start:start + batch_size]
+        rows = []
+        translations = translate_lemmas_with_ai(batch, contexts)
+        print(f"  Batch {b}/{num_batches}: {len(translations)}/{len(batch)} glossed")
+
+        for lemma in batch:
+            translation = translations.get(lemma['lemma_id'])
+            if not translation:
+                try:
+                    example_sentence = contexts.get(lemma['lemma_id'], {}).get('example_sentence')
+                    translation = translate_lemma_with_context(
+                        lemma['lemma_text'], lemma['part_of_speech'], example_sentence
+                    )
+                except Exception as e:
+                    error_count += 1
+                    print(f"    ERROR: {lemma['lemma_text']} - {e}")
+                    continue
+
+            print(f"    {lemma['lemma_text']} -> {translation}")
+            rows.append({
+                'lemma_id': lemma['lemma_id'],
+                'lemma_text': lemma['lemma_text'],
+                'language_code': lemma['language_code'],
+                'definitions': [translation],
+            })
+
+        if rows:
+            db.table('lemmas').upsert(rows, on_conflict='lemma_id').execute()
+            translated_count += len(rows)
+
+        # Rate limiting
+        if delay and b < num_batches:
+            time.sleep(delay)
+
+    print(f"\nTranslation complete: {translated_count} translated, {error_count} errors")
+    return translated_count, error_count
+
+
+def batch_translate_lemmas(limit: int = None, delay: float = 0.1, ai_glosses: bool = False):
+    """
+    Translate all lemmas that have empty definitions.
+    With ai_glosses, lemmas are glossed by Claude in batches (see
+    batch_translate_lemmas_with_ai) instead of one DeepL call each.
+    """
     db = get_supabase()
 
     # Get untranslated lemmas
     query = db.table('lemmas').select(
-        'lemma_id, lemma_text, part_of_speech'
+        'lemma_id, lemma_text, language_code, part_of_speech'
     ).eq('definitions', [])
 
     if limit:
@@ -864,23 +1141,18 @@ def batch_translate_lemmas(limit: int = None, delay: float = 0.1):
 
     print(f"\nFound {len(untranslated)} untranslated lemmas")
 
+    # Example sentences for all lemmas in one round trip
+    contexts = get_lemma_contexts([l['lemma_id'] for l in untranslated])
+
+    if ai_glosses:
+        return batch_translate_lemmas_with_ai(untranslated, contexts, delay=delay)
+
     translated_count = 0
     error_count = 0
 
     for i, lemma in enumerate(untranslated):
         try:
-            # Get an example sentence for context
-            example_result = db.table('words').select(
-                'sentence_id'
-            ).eq('lemma_id', lemma['lemma_id']).limit(1).execute()
-
-            example_sentence = None
-            if example_result.data:
-                sent_result = db.table('sentences').select(
-                    'sentence_text'
-                ).eq('sentence_id', example_result.data[0]['sentence_id']).execute()
-                if sent_result.data:
-                    example_sentence = sent_result.data[0]['sentence_text']
+            example_sentence = contexts.get(lemma['lemma_id'], {}).get('example_sentence')
 
             # Translate with context and prefix normalization
             translation = translate_lemma_with_context(
@@ -918,15 +1190,7 @@ def batch_translate_lemmas(limit: int = None, delay: float = 0.1):
 
 def translate_sentence(sentence_text: str) -> str:
     """Translate Spanish sentence to English."""
-    trans = get_translator()
-
-    result = trans.translate_text(
-        sentence_text,
-        source_lang="ES",
-        target_lang="EN-US"
-    )
-
-    return result.text
+    return deepl_translate('sentence-translation', sentence_text)
 
 
 def batch_translate_sentences(chapter_id: str = None, delay: float = 0.1):
@@ -1065,7 +1329,8 @@ def truncate_vocabulary_tables():
     print("  Vocabulary tables truncated")
 
 
-def process_chapter(chapter_number: int, chapter_text: str, clear_existing: bool = True):
+def process_chapter(chapter_number: int, chapter_text: str, clear_existing: bool = True,
+                    lemma_index=None, ai_glosses: bool = False):
     """
     Complete pipeline for one chapter.
     """
@@ -1119,16 +1384,23 @@ def process_chapter(chapter_number: int, chapter_text: str, clear_existing: bool
     total_words = 0
     unique_lemmas = set()
 
-    for i, (sentence_id, sentence_text) in enumerate(zip(sentence_ids, sentences)):
-        words = process_sentence(sentence_text)
+    sentence_words = process_sentences(sentences, lemma_index)
+    indexed_words = 0
+
+    for i, (sentence_id, words) in enumerate(zip(sentence_ids, sentence_words)):
 
         for word_data in words:
-            # Get or create lemma with corrected gender
-            lemma_id = get_or_create_lemma(
-                word_data['lemma_text'],
-                word_data['pos'],
-                word_data.get('gender')
-            )
+            if word_data.get('lemma_id'):
+                # Resolved from the lemma index
+                lemma_id = word_data['lemma_id']
+                indexed_words += 1
+            else:
+                # Get or create lemma with corrected gender
+                lemma_id = get_or_create_lemma(
+                    word_data['lemma_text'],
+                    word_data['pos'],
+                    word_data.get('gender')
+                )
             unique_lemmas.add(lemma_id)
 
             # Insert word
@@ -1139,10 +1411,12 @@ def process_chapter(chapter_number: int, chapter_text: str, clear_existing: bool
             print(f"  Processed {i+1}/{len(sentences)} sentences...")
 
     print(f"  Total: {total_words} words, {len(unique_lemmas)} unique lemmas")
+    if lemma_index:
+        print(f"  Resolved from lemma index: {indexed_words} words")
 
     # Translate lemmas with context
     print("\nTranslating lemmas with context...")
-    translated, errors = batch_translate_lemmas(delay=0.1)
+    translated, errors = batch_translate_lemmas(delay=0.1, ai_glosses=ai_glosses)
 
     # Summary
     print(f"\n{'='*60}")
@@ -1246,6 +1520,20 @@ If the translation is excellent with no issues: {"is_valid": true, "translation_
 
 Return ONLY valid JSON, no markdown or explanation."""
 
+# Bump when LEMMA_VALIDATION_PROMPT changes so every lemma is re-validated
+LEMMA_VALIDATION_PROMPT_VERSION = 1
+
+LEMMA_VALIDATION_SCHEMA = Schema(
+    {'is_valid': bool},
+    {'confidence': NUMBER, 'issues': list, 'suggested_fixes': dict,
+     'has_multiple_meanings': bool, 'alternative_meanings': list},
+)
+SENTENCE_VALIDATION_SCHEMA = Schema(
+    {'is_valid': bool},
+    {'translation_quality': str, 'confidence': NUMBER, 'contextual_issues': list,
+     'suggested_translation': str},
+)
+
 
 def validate_lemma_with_ai(
     lemma_text: str,
@@ -1253,10 +1541,11 @@ def validate_lemma_with_ai(
     pos: str,
     gender: Optional[str],
     example_sentence: Optional[str] = None
-) -> Dict:
+) -> Optional[Dict]:
     """
     LAYER 1: Validate a single lemma using Claude API.
-    Returns validation result with issues, suggested fixes, and multiple meanings flag.
+    Returns validation result with issues, suggested fixes, and multiple meanings flag,
+    or None if the request failed or the response didn't match the schema.
     """
     client = get_anthropic()
 
@@ -1275,61 +1564,25 @@ def validate_lemma_with_ai(
 
     context = "\n".join(context_parts)
 
-    try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=500,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"{LEMMA_VALIDATION_PROMPT}\n\nValidate this entry:\n{context}"
-                }
-            ]
-        )
-
-        # Parse JSON response
-        result_text = response.content[0].text.strip()
-
-        # Handle potential markdown code blocks
-        if result_text.startswith("```"):
-            result_text = result_text.split("```")[1]
-            if result_text.startswith("json"):
-                result_text = result_text[4:]
-            result_text = result_text.strip()
-
-        result = json.loads(result_text)
-        return result
-
-    except json.JSONDecodeError as e:
-        print(f"  Warning: Could not parse AI response for '{lemma_text}': {e}")
-        return {
-            "is_valid": True,
-            "confidence": 50,
-            "issues": [{"type": "parse_error", "description": "Could not parse AI response", "severity": "warning"}],
-            "suggested_fixes": {},
-            "has_multiple_meanings": False,
-            "alternative_meanings": []
-        }
-    except Exception as e:
-        print(f"  Error validating '{lemma_text}': {e}")
-        return {
-            "is_valid": True,
-            "confidence": 0,
-            "issues": [{"type": "api_error", "description": str(e), "severity": "error"}],
-            "suggested_fixes": {},
-            "has_multiple_meanings": False,
-            "alternative_meanings": []
-        }
+    result = client.request(
+        'lemma-validation', LEMMA_VALIDATION_PROMPT, f"Validate this entry:\n{context}",
+        LEMMA_VALIDATION_SCHEMA, max_tokens=500
+    )
+    if not result.complete:
+        print(f"  Warning: No usable AI response for '{lemma_text}': {result.error}")
+        return None
+    return result.value
 
 
 def validate_sentence_with_ai(
     spanish_text: str,
     english_translation: str,
     lemmas_used: List[str]
-) -> Dict:
+) -> Optional[Dict]:
     """
     LAYER 2: Validate a sentence translation using Claude API.
     Checks for context-dependent meanings and translation quality.
+    Returns None if the request failed or the response didn't match the schema.
     """
     client = get_anthropic()
 
@@ -1337,56 +1590,26 @@ def validate_sentence_with_ai(
 English translation: {english_translation}
 Lemmas in sentence: {', '.join(lemmas_used)}"""
 
-    try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=500,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"{SENTENCE_VALIDATION_PROMPT}\n\nValidate this sentence:\n{context}"
-                }
-            ]
-        )
-
-        # Parse JSON response
-        result_text = response.content[0].text.strip()
-
-        # Handle potential markdown code blocks
-        if result_text.startswith("```"):
-            result_text = result_text.split("```")[1]
-            if result_text.startswith("json"):
-                result_text = result_text[4:]
-            result_text = result_text.strip()
-
-        result = json.loads(result_text)
-        return result
-
-    except json.JSONDecodeError as e:
-        print(f"  Warning: Could not parse AI response for sentence: {e}")
-        return {
-            "is_valid": True,
-            "translation_quality": "acceptable",
-            "confidence": 50,
-            "contextual_issues": [],
-            "suggested_translation": None
-        }
-    except Exception as e:
-        print(f"  Error validating sentence: {e}")
-        return {
-            "is_valid": True,
-            "translation_quality": "acceptable",
-            "confidence": 0,
-            "contextual_issues": [{"lemma": "unknown", "issue": str(e), "suggestion": "API error"}],
-            "suggested_translation": None
-        }
+    result = client.request(
+        'sentence-validation', SENTENCE_VALIDATION_PROMPT, f"Validate this sentence:\n{context}",
+        SENTENCE_VALIDATION_SCHEMA, max_tokens=500
+    )
+    if not result.complete:
+        print(f"  Warning: No usable AI response for sentence: {result.error}")
+        return None
+    return result.value
 
 
-def batch_validate_lemmas(chapter_number: int = None, limit: int = None, delay: float = 0.5) -> Dict:
+def batch_validate_lemmas(chapter_number: int = None, limit: int = None, delay: float = 0.5,
+                          full: bool = False) -> Dict:
     """
     LAYER 1: Validate all lemmas for a chapter using AI.
+    Lemmas unchanged since their last validation reuse the stored result
+    unless full is set (see validation_cache.py).
     Returns summary statistics including multiple meanings tracking.
     """
+    from validation_cache import ValidationCache
+
     db = get_supabase()
 
     print(f"\n{'='*60}")
@@ -1428,13 +1651,19 @@ def batch_validate_lemmas(chapter_number: int = None, limit: int = None, delay:
     lemmas_result = lemmas_query.execute()
     lemmas = lemmas_result.data
 
-    print(f"Validating {len(lemmas)} lemmas...")
+    cache = ValidationCache(db, 'chapter_lemma', LEMMA_VALIDATION_PROMPT_VERSION, full=full)
+    to_validate, unchanged = cache.split(lemmas)
+    cache.print_skip_ratio(len(lemmas), len(unchanged))
+
+    print(f"Validating {len(to_validate)} lemmas...")
 
     # Statistics
     stats = {
         "total": len(lemmas),
+        "skipped": len(unchanged),
         "valid": 0,
         "flagged": 0,
+        "failed": 0,
         "multiple_meanings": 0,
         "issues_by_type": {},
         "avg_confidence": 0
@@ -1442,20 +1671,31 @@ def batch_validate_lemmas(chapter_number: int = None, limit: int = None, delay:
 
     total_confidence = 0
 
-    for i, lemma in enumerate(lemmas):
-        # Get example sentence
-        example_sentence = None
-        word_result = db.table('words').select(
-            'sentence_id'
-        ).eq('lemma_id', lemma['lemma_id']).limit(1).execute()
+    # Example sentences for all lemmas being validated in one round trip
+    contexts = get_lemma_contexts([l['lemma_id'] for l in to_validate])
+
+    def record(result: Dict):
+        nonlocal total_confidence
+        if result.get('is_valid', True):
+            stats['valid'] += 1
+        else:
+            stats['flagged'] += 1
+
+        if result.get('has_multiple_meanings', False):
+            stats['multiple_meanings'] += 1
+
+        total_confidence += result.get('confidence', 0)
+
+        for issue in result.get('issues', []):
+            issue_type = issue.get('type', 'unknown')
+            stats['issues_by_type'][issue_type] = stats['issues_by_type'].get(issue_type, 0) + 1
 
-        if word_result.data:
-            sent_result = db.table('sentences').select(
-                'sentence_text'
-            ).eq('sentence_id', word_result.data[0]['sentence_id']).execute()
+    # Unchanged lemmas count with their stored result
+    for _, result in unchanged:
+        record(result or {})
 
-            if sent_result.data:
-                example_sentence = sent_result.data[0]['sentence_text']
+    for i, lemma in enumerate(to_validate):
+        example_sentence = contexts.get(lemma['lemma_id'], {}).get('example_sentence')
 
         # Get translation
         definitions = lemma.get('definitions', [])
@@ -1470,20 +1710,15 @@ def batch_validate_lemmas(chapter_number: int = None, limit: int = None, delay:
             example_sentence
         )
 
-        # Update statistics
-        if result.get('is_valid', True):
-            stats['valid'] += 1
-        else:
-            stats['flagged'] += 1
-
-        if result.get('has_multiple_meanings', False):
-            stats['multiple_meanings'] += 1
-
-        total_confidence += result.get('confidence', 0)
+        # No report is written for a failed call, and it is not fingerprinted,
+        # so the next run retries it
+        if result is None:
+            stats['failed'] += 1
+            print(f"  [{i+1}/{len(to_validate)}] ? {lemma['lemma_text']} (no usable response)")
+            continue
 
-        for issue in result.get('issues', []):
-            issue_type = issue.get('type', 'unknown')
-            stats['issues_by_type'][issue_type] = stats['issues_by_type'].get(issue_type, 0) + 1
+        # Update statistics
+        record(result)
 
         # Store result in database with multiple meanings
         db.table('validation_reports').upsert({
@@ -1497,13 +1732,15 @@ def batch_validate_lemmas(chapter_number: int = None, limit: int = None, delay:
             'reviewed_by_human': False
         }, on_conflict='lemma_id').execute()
 
+        cache.save([(lemma, result)])
+
         # Progress indicator
         status = "✓" if result.get('is_valid', True) else "✗"
         multi = " [MULTI]" if result.get('has_multiple_meanings', False) else ""
-        print(f"  [{i+1}/{len(lemmas)}] {status} {lemma['lemma_text']}{multi}")
+        print(f"  [{i+1}/{len(to_validate)}] {status} {lemma['lemma_text']}{multi}")
 
         # Rate limiting
-        if delay and i < len(lemmas) - 1:
+        if delay and i < len(to_validate) - 1:
             time.sleep(delay)
 
     # Calculate averages
@@ -1514,8 +1751,10 @@ def batch_validate_lemmas(chapter_number: int = None, limit: int = None, delay:
     # Print summary
     print(f"\n  Lemma Validation Complete:")
     print(f"    Total: {stats['total']}")
+    print(f"    Skipped (unchanged): {stats['skipped']}")
     print(f"    Valid: {stats['valid']} ({stats['valid_pct']}%)")
     print(f"    Flagged: {stats['flagged']} ({stats['flagged_pct']}%)")
+    print(f"    Failed (retried next run): {stats['failed']}")
     print(f"    Multiple meanings: {stats['multiple_meanings']}")
     print(f"    Avg confidence: {stats['avg_confidence']}%")
 
@@ -1570,6 +1809,7 @@ def batch_validate_sentences(chapter_number: int = None, limit: int = None, dela
         "total": len(sentences),
         "valid": 0,
         "flagged": 0,
+        "failed": 0,
         "quality_distribution": {},
         "contextual_issues_count": 0,
         "avg_confidence": 0
@@ -1596,6 +1836,12 @@ def batch_validate_sentences(chapter_number: int = None, limit: int = None, dela
             lemmas_used
         )
 
+        preview = sentence['sentence_text'][:40] + "..." if len(sentence['sentence_text']) > 40 else sentence['sentence_text']
+        if result is None:
+            stats['failed'] += 1
+            print(f"  [{i+1}/{len(sentences)}] ? {preview} (no usable response)")
+            continue
+
         # Update statistics
         if result.get('is_valid', True):
             stats['valid'] += 1
@@ -1623,7 +1869,6 @@ def batch_validate_sentences(chapter_number: int = None, limit: int = None, dela
         # Progress indicator
         status = "✓" if result.get('is_valid', True) else "✗"
         ctx_flag = f" [{len(contextual_issues)} ctx]" if contextual_issues else ""
-        preview = sentence['sentence_text'][:40] + "..." if len(sentence['sentence_text']) > 40 else sentence['sentence_text']
         print(f"  [{i+1}/{len(sentences)}] {status} [{quality}]{ctx_flag} {preview}")
 
         # Rate limiting
@@ -1640,6 +1885,7 @@ def batch_validate_sentences(chapter_number: int = None, limit: int = None, dela
     print(f"    Total: {stats['total']}")
     print(f"    Valid: {stats['valid']} ({stats['valid_pct']}%)")
     print(f"    Flagged: {stats['flagged']} ({stats['flagged_pct']}%)")
+    print(f"    Failed: {stats['failed']}")
     print(f"    Contextual issues found: {stats['contextual_issues_count']}")
     print(f"    Avg confidence: {stats['avg_confidence']}%")
 
@@ -1651,7 +1897,8 @@ def batch_validate_sentences(chapter_number: int = None, limit: int = None, dela
     return stats
 
 
-def run_full_validation(chapter_number: int = None, limit: int = None, delay: float = 0.5) -> Dict:
+def run_full_validation(chapter_number: int = None, limit: int = None, delay: float = 0.5,
+                        full: bool = False) -> Dict:
     """
     Run both Layer 1 (lemma) and Layer 2 (sentence) validation.
     Returns combined statistics.
@@ -1666,7 +1913,7 @@ def run_full_validation(chapter_number: int = None, limit: int = None, delay: fl
         print("Validating all content")
 
     # Run Layer 1: Lemma validation
-    lemma_stats = batch_validate_lemmas(chapter_number, limit, delay)
+    lemma_stats = batch_validate_lemmas(chapter_number, limit, delay, full)
 
     # Run Layer 2: Sentence validation
     sentence_stats = batch_validate_sentences(chapter_number, limit, delay)
@@ -1734,64 +1981,112 @@ If no idiomatic phrases found: {"phrases": []}
 
 Return ONLY valid JSON, no markdown or explanation."""
 
+# Appended to PHRASE_DETECTION_PROMPT when several sentences go in one request
+PHRASE_BATCH_INSTRUCTIONS = """You will receive several numbered sentences. Apply the rules above to each one
+(positions are per sentence) and return:
+{"sentences": [{"index": 1, "phrases": [...]}, {"index": 2, "phrases": []}]}
+
+Tokens are [word, lemma] by position; lemma omitted if same as word."""
+
+PHRASE_SCHEMA = Schema(
+    {'phrase_text': str},
+    {'phrase_type': str, 'definition': str, 'literal_meaning': str, 'confidence': NUMBER,
+     'component_words': list, 'start_position': int, 'end_position': int, 'learner_note': str},
+)
+PHRASE_BATCH_ENTRY_SCHEMA = Schema({'index': int, 'phrases': list})
+
+# Sentences per phrase detection request, and concurrent requests
+PHRASE_BATCH_SIZE = 8
+PHRASE_WORKERS = 4
+
+
+def encode_tokens(tokens: List[Dict]) -> str:
+    """
+    Compact token encoding for prompts: a JSON array of [word, lemma] pairs
+    whose index is the word position. The lemma is omitted when it equals
+    the lowercased word.
+    """
+    encoded = []
+    for t in tokens:
+        word = t['word_text']
+        lemma = t['lemma_text']
+        encoded.append([word] if lemma == word.lower() else [word, lemma])
+    return json.dumps(encoded, ensure_ascii=False, separators=(',', ':'))
+
+
+def confident_phrases(phrases: List) -> List[Dict]:
+    """Keep schema-valid phrases at or above the confidence threshold."""
+    return [p for p in phrases if not PHRASE_SCHEMA.error(p) and p.get('confidence', 0) >= 80]
+
 
 def detect_phrases_in_sentence(
     sentence_text: str,
     sentence_id: str,
     tokens: List[Dict],
-    lemma_mapping: Dict[str, str]
+    lemma_mapping: Dict[str, str],
+    retry: bool = False
 ) -> List[Dict]:
     """
     Use Claude API to detect idiomatic phrases in a sentence.
-    Returns list of phrase objects with metadata.
+    Returns list of phrase objects with metadata. Phrases are parsed as they
+    stream in, so those before a malformed tail are kept. retry marks a
+    sentence re-sent after a batch response missed it (usage ledger).
     """
     client = get_anthropic()
 
-    # Build token list for context
-    token_list = [{"position": i, "word": t['word_text'], "lemma": t['lemma_text']}
-                  for i, t in enumerate(tokens)]
-
     context = f"""Sentence: {sentence_text}
+Tokens ([word, lemma] by position; lemma omitted if same as word): {encode_tokens(tokens)}"""
 
-Tokens (with positions):
-{json.dumps(token_list, ensure_ascii=False, indent=2)}"""
+    result = client.request(
+        'phrase-detection', PHRASE_DETECTION_PROMPT, f"Analyze this sentence:\n{context}",
+        PHRASE_SCHEMA, 'phrases', max_tokens=1000, retry=retry
+    )
+    if not result.complete:
+        print(f"  Warning: Incomplete phrase detection response ({len(result.items)} phrases kept): {result.error}")
 
-    try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1000,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"{PHRASE_DETECTION_PROMPT}\n\nAnalyze this sentence:\n{context}"
-                }
-            ]
-        )
+    return confident_phrases(result.items)
 
-        # Parse JSON response
-        result_text = response.content[0].text.strip()
 
-        # Handle potential markdown code blocks
-        if result_text.startswith("```"):
-            result_text = result_text.split("```")[1]
-            if result_text.startswith("json"):
-                result_text = result_text[4:]
-            result_text = result_text.strip()
+def detect_phrases_in_sentences(batch: List[Tuple[Dict, List[Dict]]]) -> Dict[str, List[Dict]]:
+    """
+    Detect phrases in several (sentence, tokens) pairs with one Claude request.
+    Returns {sentence_id: phrases}. Sentence entries are parsed as they
+    stream in; only sentences missing from the response (or malformed) are
+    retried on their own with detect_phrases_in_sentence. If the request
+    fails before any entry arrives, the batch returns {}.
+    """
+    client = get_anthropic()
 
-        result = json.loads(result_text)
-        phrases = result.get('phrases', [])
+    entries = []
+    for i, (sentence, tokens) in enumerate(batch, 1):
+        entries.append(f"{i}. {sentence['sentence_text']}\n   Tokens: {encode_tokens(tokens)}")
 
-        # Filter by confidence threshold
-        phrases = [p for p in phrases if p.get('confidence', 0) >= 80]
+    result = client.request(
+        'phrase-detection', [PHRASE_DETECTION_PROMPT, PHRASE_BATCH_INSTRUCTIONS],
+        "Analyze these sentences:\n" + "\n".join(entries),
+        PHRASE_BATCH_ENTRY_SCHEMA, 'sentences', max_tokens=800 * len(batch), items=len(batch)
+    )
+    if result.interrupted and not result.items:
+        print(f"  Error detecting phrases: {result.error}")
+        return {}
 
-        return phrases
+    detected = {}
+    for entry in result.items:
+        idx = entry['index'] - 1
+        if 0 <= idx < len(batch):
+            detected[batch[idx][0]['sentence_id']] = confident_phrases(entry['phrases'])
+
+    missing = [(sentence, tokens) for sentence, tokens in batch if sentence['sentence_id'] not in detected]
+    if missing:
+        reason = f" ({result.error})" if result.error else ""
+        print(f"  Warning: Batch response covered {len(detected)}/{len(batch)} sentences{reason}, "
+              f"retrying {len(missing)} individually")
+        for sentence, tokens in missing:
+            detected[sentence['sentence_id']] = detect_phrases_in_sentence(
+                sentence['sentence_text'], sentence['sentence_id'], tokens, {}, retry=True
+            )
 
-    except json.JSONDecodeError as e:
-        print(f"  Warning: Could not parse phrase detection response: {e}")
-        return []
-    except Exception as e:
-        print(f"  Error detecting phrases: {e}")
-        return []
+    return detected
 
 
 def find_phrase_positions(phrase_text: str, tokens: List[Dict]) -> Tuple[int, int]:
@@ -1814,6 +2109,105 @@ def find_phrase_positions(phrase_text: str, tokens: List[Dict]) -> Tuple[int, in
     return (-1, -1)
 
 
+# Trie node key marking the end of a phrase
+PHRASE_END = '$'
+
+# Content words this close together (in tokens) may form an unknown phrase
+PHRASE_CANDIDATE_WINDOW = 2
+
+
+def strip_article(lemma_text: str) -> str:
+    """'la razón' -> 'razón' (noun lemmas carry their article)."""
+    if lemma_text.startswith(('el ', 'la ')):
+        return lemma_text[3:]
+    return lemma_text
+
+
+def token_keys(token: Dict) -> set:
+    """Forms a token can match in a phrase: the word itself and its bare lemma."""
+    keys = {token['word_text'].lower()}
+    if token.get('lemma_text'):
+        keys.add(strip_article(token['lemma_text'].lower()))
+    return keys
+
+
+def build_phrase_trie(phrases_map: Dict[str, Dict]) -> Dict:
+    """
+    Build a word trie of the reviewed phrases in phrases_map, e.g.
+    {'tener': {'razón': {'$': phrase_row}}}.
+    """
+    trie = {}
+    for text, phrase in phrases_map.items():
+        if not phrase.get('is_reviewed'):
+            continue
+        words = text.split()
+        if len(words) < 2:
+            continue
+        node = trie
+        for word in words:
+            node = node.setdefault(word, {})
+        node[PHRASE_END] = phrase
+    return trie
+
+
+def match_known_phrases(tokens: List[Dict], trie: Dict) -> List[Tuple[Dict, int, int]]:
+    """
+    Find reviewed phrases in a sentence without calling Claude.
+    Each token matches on its word or lemma, so "tiene razón" finds
+    "tener razón". Returns (phrase_row, start_position, end_position) for the
+    longest phrase starting at each position, with positions as in
+    find_phrase_positions.
+    """
+    keys = [token_keys(t) for t in tokens]
+    matches = []
+
+    for start in range(len(tokens)):
+        # Walk every path the token forms allow, keeping the longest match
+        frontier = [trie]
+        best = None
+        pos = start
+        while frontier and pos < len(tokens):
+            frontier = [node[key] for node in frontier for key in keys[pos] if key in node]
+            for node in frontier:
+                if PHRASE_END in node:
+                    best = (node[PHRASE_END], start, pos)
+            pos += 1
+        if best:
+            matches.append(best)
+
+    return matches
+
+
+def phrase_components(phrases_map: Dict[str, Dict]) -> set:
+    """Content words of every known phrase, e.g. {'tener', 'razón', 'echar', ...}."""
+    return {
+        word for text in phrases_map
+        for word in text.lower().split()
+        if word not in STOP_WORDS
+    }
+
+
+def has_phrase_candidates(tokens: List[Dict], covered: set, components: set) -> bool:
+    """
+    True if, outside already matched phrases, two content (non stop word)
+    tokens are within PHRASE_CANDIDATE_WINDOW of each other - i.e. something
+    a known phrase doesn't explain that could be a new one. A word of a known
+    phrase (see phrase_components) also counts as content even when it is a
+    stop word form, so "tiene miedo" qualifies through "tener".
+    """
+    content = [
+        i for i, t in enumerate(tokens)
+        if i not in covered
+        and (
+            token_keys(t) & components
+            or (t['word_text'].lower() not in STOP_WORDS
+                and strip_article((t.get('lemma_text') or '').lower()) not in STOP_WORDS)
+        )
+        and any(c.isalpha() for c in t['word_text'])
+    ]
+    return any(b - a <= PHRASE_CANDIDATE_WINDOW for a, b in zip(content, content[1:]))
+
+
 def get_component_lemma_ids(component_words: List[str], language_code: str = 'es') -> List[str]:
     """
     Get lemma IDs for the component words of a phrase.
@@ -1928,9 +2322,161 @@ def refresh_chapter_stats(chapter_id: str):
         print(f"  ⚠ Could not refresh vocabulary stats: {e}")
 
 
-def detect_phrases_for_chapter(chapter_number: int, delay: float = 0.5) -> Dict:
+def load_phrases_map() -> Dict[str, Dict]:
+    """Fetch all phrases as {phrase_text: row} (paginated)."""
+    db = get_supabase()
+    phrases = {}
+    offset = 0
+    while True:
+        result = db.table('phrases').select(
+            'phrase_id, phrase_text, is_reviewed, definitions, phrase_type'
+        ).range(offset, offset + 999).execute()
+        for row in result.data:
+            phrases[row['phrase_text']] = row
+        if len(result.data) < 1000:
+            break
+        offset += 1000
+    return phrases
+
+
+def get_chapter_tokens(chapter_id: str) -> Dict[str, List[Dict]]:
+    """Fetch all words of a chapter as {sentence_id: tokens in word order}."""
+    db = get_supabase()
+    tokens_by_sentence = {}
+    offset = 0
+    while True:
+        result = db.table('words').select(
+            'sentence_id, word_text, word_position, lemmas(lemma_text)'
+        ).eq('chapter_id', chapter_id).order('sentence_id').order('word_position').range(
+            offset, offset + 999
+        ).execute()
+        for w in result.data:
+            tokens_by_sentence.setdefault(w['sentence_id'], []).append({
+                'word_text': w['word_text'],
+                'lemma_text': w['lemmas']['lemma_text'] if w.get('lemmas') else '',
+                'word_position': w['word_position']
+            })
+        if len(result.data) < 1000:
+            break
+        offset += 1000
+    return tokens_by_sentence
+
+
+def get_component_lemma_id_map(words: List[str], language_code: str = 'es') -> Dict[str, str]:
+    """
+    Bulk version of get_component_lemma_ids: resolve many component words
+    (with and without article) to {lemma_text: lemma_id} in chunked queries.
+    """
+    db = get_supabase()
+    candidates = sorted({f"{prefix}{word}" for word in words for prefix in ['', 'el ', 'la ']})
+    lemma_ids = {}
+    for i in range(0, len(candidates), 200):
+        result = db.table('lemmas').select('lemma_id, lemma_text').in_(
+            'lemma_text', candidates[i:i + 200]
+        ).eq('language_code', language_code).execute()
+        for row in result.data:
+            lemma_ids[row['lemma_text']] = row['lemma_id']
+    return lemma_ids
+
+
+def save_detected_phrases(detections: List[Tuple[Dict, Dict, int, int]], chapter_id: str,
+                          phrases_map: Dict[str, Dict], language_code: str = 'es') -> int:
+    """
+    Write phrases and occurrences for (phrase, sentence, start, end) detections.
+    Same rules as insert_phrase (reviewed phrases are never changed, unreviewed
+    ones gain new definitions) but resolved against a preloaded phrases_map:
+    new phrases are inserted in one request and occurrences written with one
+    upsert on (phrase_id, sentence_id). Returns the number of new phrases.
+    """
+    db = get_supabase()
+
+    # Definitions and type per phrase text, in detection order
+    detected = {}
+    for phrase, _, _, _ in detections:
+        text = phrase['phrase_text'].lower().strip()
+        entry = detected.setdefault(text, {
+            'definitions': [],
+            'phrase_type': phrase.get('phrase_type', 'idiom'),
+            'component_words': phrase.get('component_words', [])
+        })
+        new_def = phrase.get('definition', '')
+        if new_def and new_def not in entry['definitions']:
+            entry['definitions'].append(new_def)
+
+    # Existing, unreviewed phrases: add new definitions
+    for text, entry in detected.items():
+        existing = phrases_map.get(text)
+        if not existing:
+            continue
+        if existing.get('is_reviewed', False):
+            print(f"    Phrase '{text}' already reviewed - skipping update")
+            continue
+        existing_defs = list(existing.get('definitions') or [])
+        existing_defs.extend(d for d in entry['definitions'] if d not in existing_defs)
+        if existing_defs != existing.get('definitions') or entry['phrase_type'] != existing.get('phrase_type'):
+            db.table('phrases').update({
+                'definitions': existing_defs or [''],
+                'phrase_type': entry['phrase_type']
+            }).eq('phrase_id', existing['phrase_id']).execute()
+            existing['definitions'] = existing_defs
+            existing['phrase_type'] = entry['phrase_type']
+
+    # New phrases: one insert
+    new_texts = [text for text in detected if text not in phrases_map]
+    if new_texts:
+        lemma_ids = get_component_lemma_id_map(
+            [w for text in new_texts for w in detected[text]['component_words']], language_code
+        )
+        rows = []
+        for text in new_texts:
+            entry = detected[text]
+            component_lemma_ids = []
+            for word in entry['component_words']:
+                for prefix in ['', 'el ', 'la ']:
+                    if f"{prefix}{word}" in lemma_ids:
+                        component_lemma_ids.append(lemma_ids[f"{prefix}{word}"])
+                        break
+            rows.append({
+                'phrase_text': text,
+                'definitions': entry['definitions'] or [''],
+                'component_lemmas': component_lemma_ids,
+                'phrase_type': entry['phrase_type'],
+                'is_reviewed': False
+            })
+        inserted = db.table('phrases').insert(rows).execute()
+        for row in inserted.data:
+            phrases_map[row['phrase_text']] = row
+
+    # Occurrences: one upsert
+    occurrences = {}
+    for phrase, sentence, start_pos, end_pos in detections:
+        phrase_id = phrases_map[phrase['phrase_text'].lower().strip()]['phrase_id']
+        occurrences[(phrase_id, sentence['sentence_id'])] = {
+            'phrase_id': phrase_id,
+            'sentence_id': sentence['sentence_id'],
+            'chapter_id': chapter_id,
+            'start_position': start_pos,
+            'end_position': end_pos
+        }
+    if occurrences:
+        db.table('phrase_occurrences').upsert(
+            list(occurrences.values()), on_conflict='phrase_id,sentence_id'
+        ).execute()
+
+    return len(new_texts)
+
+
+def detect_phrases_for_chapter(chapter_number: int, delay: float = 0.5,
+                               batch_size: int = PHRASE_BATCH_SIZE,
+                               workers: int = PHRASE_WORKERS,
+                               prematch: bool = True) -> Dict:
     """
     Run phrase detection on all sentences in a chapter.
+    With prematch, reviewed phrases are first matched locally
+    (match_known_phrases) and only sentences with unexplained candidates
+    (has_phrase_candidates) go to Claude. Sentences are sent batch_size per
+    request with up to `workers` requests in flight; all database writes
+    happen afterwards in save_detected_phrases.
     Returns summary statistics.
     """
     db = get_supabase()
@@ -1963,72 +2509,105 @@ def detect_phrases_for_chapter(chapter_number: int, delay: float = 0.5) -> Dict:
         "total_sentences": len(sentences),
         "sentences_with_phrases": 0,
         "total_phrases": 0,
+        "new_phrases": 0,
+        "prematched_phrases": 0,
+        "sentences_sent": 0,
         "phrases_by_type": {},
         "phrases_found": []
     }
 
-    for i, sentence in enumerate(sentences):
-        # Get words for this sentence
-        words_result = db.table('words').select(
-            'word_text, lemma_id, word_position, lemmas(lemma_text)'
-        ).eq('sentence_id', sentence['sentence_id']).order('word_position').execute()
-
-        if not words_result.data:
+    # Words for every sentence and all known phrases, up front
+    tokens_by_sentence = get_chapter_tokens(chapter_id)
+    phrases_map = load_phrases_map()
+
+    # Local pass: reviewed phrases cost no API call
+    known_by_sentence = {}
+    work = []
+    trie = build_phrase_trie(phrases_map) if prematch else {}
+    components = phrase_components(phrases_map) if prematch else set()
+    for sentence in sentences:
+        tokens = tokens_by_sentence.get(sentence['sentence_id'])
+        if not tokens:
             continue
+        known = match_known_phrases(tokens, trie)
+        known_by_sentence[sentence['sentence_id']] = known
+        covered = {pos for _, start, end in known for pos in range(start, end + 1)}
+        if not prematch or has_phrase_candidates(tokens, covered, components):
+            work.append((sentence, tokens))
 
-        # Build token list and lemma mapping
-        tokens = []
-        lemma_mapping = {}
-        for w in words_result.data:
-            tokens.append({
-                'word_text': w['word_text'],
-                'lemma_text': w['lemmas']['lemma_text'] if w.get('lemmas') else '',
-                'word_position': w['word_position']
-            })
-            lemma_mapping[w['word_text'].lower()] = w['lemmas']['lemma_text'] if w.get('lemmas') else ''
-
-        # Detect phrases
-        phrases = detect_phrases_in_sentence(
-            sentence['sentence_text'],
-            sentence['sentence_id'],
-            tokens,
-            lemma_mapping
-        )
+    stats['sentences_sent'] = len(work)
+    if prematch:
+        print(f"Known phrases matched locally in {sum(1 for k in known_by_sentence.values() if k)} sentences; "
+              f"sending {len(work)}/{len(known_by_sentence)} sentences to Claude")
 
-        if phrases:
-            stats['sentences_with_phrases'] += 1
-
-            for phrase in phrases:
-                # Find positions
-                start_pos, end_pos = find_phrase_positions(phrase['phrase_text'], tokens)
-                if start_pos == -1:
-                    # Use AI-provided positions if available
-                    start_pos = phrase.get('start_position', 0)
-                    end_pos = phrase.get('end_position', 0)
-
-                # Insert phrase
-                phrase_id = insert_phrase(phrase)
-
-                # Insert occurrence
-                insert_phrase_occurrence(phrase_id, sentence['sentence_id'], chapter_id, start_pos, end_pos)
-
-                # Update stats
-                stats['total_phrases'] += 1
-                phrase_type = phrase.get('phrase_type', 'unknown')
-                stats['phrases_by_type'][phrase_type] = stats['phrases_by_type'].get(phrase_type, 0) + 1
-                stats['phrases_found'].append({
-                    'phrase_text': phrase['phrase_text'],
-                    'definition': phrase.get('definition', ''),
-                    'type': phrase_type,
-                    'confidence': phrase.get('confidence', 0),
-                    'sentence_order': sentence['sentence_order']
-                })
-
-                print(f"  [{i+1}/{len(sentences)}] Found: \"{phrase['phrase_text']}\" ({phrase_type}) - {phrase.get('definition', '')}")
+    batches = [work[i:i + batch_size] for i in range(0, len(work), batch_size)]
 
+    def detect(batch):
+        detected = detect_phrases_in_sentences(batch)
         # Rate limiting
-        if delay and i < len(sentences) - 1:
+        if delay:
             time.sleep(delay)
+        return detected
+
+    phrases_by_sentence = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(detect, batch) for batch in batches]
+        for done, future in enumerate(as_completed(futures), 1):
+            phrases_by_sentence.update(future.result())
+            print(f"  Batch {done}/{len(batches)} done")
+
+    detections = []
+    for i, sentence in enumerate(sentences):
+        tokens = tokens_by_sentence.get(sentence['sentence_id'], [])
+
+        found = []
+        for row, start_pos, end_pos in known_by_sentence.get(sentence['sentence_id'], []):
+            phrase = {
+                'phrase_text': row['phrase_text'],
+                'phrase_type': row.get('phrase_type'),
+                'definition': (row.get('definitions') or [''])[0],
+                'confidence': 100,
+                'prematched': True
+            }
+            found.append((phrase, start_pos, end_pos))
+
+        seen = {phrase['phrase_text'] for phrase, _, _ in found}
+        for phrase in phrases_by_sentence.get(sentence['sentence_id'], []):
+            if phrase['phrase_text'].lower().strip() in seen:
+                continue
+            # Find positions
+            start_pos, end_pos = find_phrase_positions(phrase['phrase_text'], tokens)
+            if start_pos == -1:
+                # Use AI-provided positions if available
+                start_pos = phrase.get('start_position', 0)
+                end_pos = phrase.get('end_position', 0)
+            found.append((phrase, start_pos, end_pos))
+
+        if not found:
+            continue
+
+        stats['sentences_with_phrases'] += 1
+
+        for phrase, start_pos, end_pos in found:
+            detections.append((phrase, sentence, start_pos, end_pos))
+            if phrase.get('prematched'):
+                stats['prematched_phrases'] += 1
+
+            # Update stats
+            stats['total_phrases'] += 1
+            phrase_type = phrase.get('phrase_type', 'unknown')
+            stats['phrases_by_type'][phrase_type] = stats['phrases_by_type'].get(phrase_type, 0) + 1
+            stats['phrases_found'].append({
+                'phrase_text': phrase['phrase_text'],
+                'definition': phrase.get('definition', ''),
+                'type': phrase_type,
+                'confidence': phrase.get('confidence', 0),
+                'sentence_order': sentence['sentence_order']
+            })
+
+            print(f"  [{i+1}/{len(sentences)}] Found: \"{phrase['phrase_text']}\" ({phrase_type}) - {phrase.get('definition', '')}")
+
+    stats['new_phrases'] = save_detected_phrases(detections, chapter_id, phrases_map)
 
     # Print summary
     print(f"\n{'='*60}")
@@ -2036,7 +2615,9 @@ def detect_phrases_for_chapter(chapter_number: int, delay: float = 0.5) -> Dict:
     print(f"{'='*60}")
     print(f"  Sentences processed: {stats['total_sentences']}")
     print(f"  Sentences with phrases: {stats['sentences_with_phrases']}")
-    print(f"  Total phrases found: {stats['total_phrases']}")
+    print(f"  Total phrases found: {stats['total_phrases']} ({stats['new_phrases']} new)")
+    print(f"  Matched locally: {stats['prematched_phrases']}")
+    print(f"  Sentences sent to Claude: {stats['sentences_sent']}")
 
     if stats['phrases_by_type']:
         print(f"\n  Phrases by type:")
@@ -2323,6 +2904,9 @@ def main():
     parser.add_argument('--text', type=str, help='Chapter text directly (alternative to --input)')
     parser.add_argument('--translate-only', action='store_true',
                         help='Only translate untranslated lemmas')
+    parser.add_argument('--ai-glosses', action='store_true',
+                        help='Translate lemmas with batched Claude requests instead of DeepL '
+                             '(requires ANTHROPIC_API_KEY)')
     parser.add_argument('--no-clear', action='store_true',
                         help='Do not clear existing chapter data')
     parser.add_argument('--truncate', action='store_true',
@@ -2335,13 +2919,37 @@ def main():
                         help='Show flagged lemmas with AI suggestions')
     parser.add_argument('--detect-phrases', action='store_true',
                         help='Detect idiomatic phrases in chapter (requires ANTHROPIC_API_KEY)')
+    parser.add_argument('--no-prematch', action='store_true',
+                        help='With --detect-phrases, send every sentence to Claude instead of '
+                             'matching reviewed phrases locally first')
     parser.add_argument('--show-phrases', action='store_true',
                         help='Show detected phrases for chapter')
     parser.add_argument('--limit', type=int, default=None,
                         help='Limit number of lemmas to validate')
+    parser.add_argument('--full', action='store_true',
+                        help='With --validate-ai, re-validate lemmas even if unchanged since last run')
+    parser.add_argument('--lemma-index', type=str, metavar='PATH',
+                        help='Resolve known word forms from an exported lemma index (see lemma_index.py)')
+    parser.add_argument('--golden-corpus', nargs='?', const=str(TOKEN_CORPUS_FILE), metavar='PATH',
+                        help='Check tokenization of all chapters against the golden JSON corpus '
+                             '(default: %(const)s)')
+    parser.add_argument('--write-golden-corpus', nargs='?', const=str(TOKEN_CORPUS_FILE), metavar='PATH',
+                        help='Regenerate the golden corpus from the current rules (default: %(const)s)')
 
     args = parser.parse_args()
 
+    if args.chapter:
+        ledger.set_scope(f"chapter {args.chapter}")
+
+    if args.write_golden_corpus:
+        write_token_corpus(Path(args.write_golden_corpus))
+        return
+
+    if args.golden_corpus:
+        if not check_token_corpus(Path(args.golden_corpus)):
+            sys.exit(1)
+        return
+
     if args.validate:
         print_validation_queries()
         return
@@ -2353,7 +2961,8 @@ def main():
     if args.detect_phrases:
         if not args.chapter:
             parser.error("--chapter is required for phrase detection")
-        detect_phrases_for_chapter(args.chapter)
+        detect_phrases_for_chapter(args.chapter, prematch=not args.no_prematch)
+        print_claude_usage()
         return
 
     if args.show_phrases:
@@ -2365,12 +2974,14 @@ def main():
     if args.validate_ai:
         if not args.chapter:
             print("Running AI validation on all content...")
-        run_full_validation(chapter_number=args.chapter, limit=args.limit)
+        run_full_validation(chapter_number=args.chapter, limit=args.limit, full=args.full)
+        print_claude_usage()
         return
 
     if args.translate_only:
         print("Translating untranslated lemmas...")
-        batch_translate_lemmas()
+        batch_translate_lemmas(ai_glosses=args.ai_glosses)
+        print_claude_usage()
         return
 
     if args.truncate:
@@ -2390,14 +3001,30 @@ def main():
     else:
         parser.error("Either --input or --text is required")
 
+    lemma_index = None
+    if args.lemma_index:
+        from lemma_index import LemmaIndex, fetch_lemma_ids
+        lemma_index = LemmaIndex.open(Path(args.lemma_index))
+        if not lemma_index:
+            parser.error(f"Lemma index not found: {args.lemma_index}")
+        print(f"Loaded lemma index: {len(lemma_index)} word forms "
+              f"(exported {lemma_index.exported_at:%Y-%m-%d %H:%M})")
+        stale = lemma_index.drop_missing(fetch_lemma_ids(get_supabase()))
+        if stale:
+            print(f"  WARNING: ignoring {stale} forms whose lemma no longer exists "
+                  f"- rebuild with lemma_index.py --build")
+
     # Process chapter
     process_chapter(
         args.chapter,
         chapter_text,
-        clear_existing=not args.no_clear
+        clear_existing=not args.no_clear,
+        lemma_index=lemma_index,
+        ai_glosses=args.ai_glosses
     )
 
     print_validation_queries()
+    print_claude_usage()
 
 
 if __name__ == '__main__':
@@ -12,9 +12,21 @@ Phase 7: Extract words with spaCy, create song_line_words (--extract-lemmas flag
 Phase 8: Detect phrase/slang occurrences with positions (--detect-occurrences flag)
 Phase 9: AI-powered translation fixing (--fix-translations flag)
 
+Songs are matched to the songs table by normalized title. A title shared
+by songs on several albums is matched by the album file's "Album Title:"
+header, and skipped as ambiguous if that doesn't single one out.
+
+Preview mode writes nothing, but it reads the songs table when Supabase
+credentials are set (song_mappings.json is used otherwise).
+
+Phases 2, 3, 7 and 8 are incremental: each song_lines row carries a
+content_hash of its text and each phase records the hash it last processed,
+so after editing lyrics a re-run only reworks the lines that changed.
+
 Usage:
-    python3 scripts/import_lyrics.py                      # Preview only
+    python3 scripts/import_lyrics.py                      # Preview only (no writes)
     python3 scripts/import_lyrics.py --output out.json    # Save parsed JSON
+    python3 scripts/import_lyrics.py --album 'docs/Lyrics/*.txt' --write  # Import several albums
     python3 scripts/import_lyrics.py --write              # Write to database
     python3 scripts/import_lyrics.py --translate          # Translate untranslated lines
     python3 scripts/import_lyrics.py --flag-skippable     # Flag vocalization lines
@@ -23,19 +35,32 @@ Usage:
     python3 scripts/import_lyrics.py --extract-lemmas     # Extract words with spaCy
     python3 scripts/import_lyrics.py --detect-occurrences # Detect phrase/slang occurrences
     python3 scripts/import_lyrics.py --fix-translations   # Fix translations with Claude AI
+    python3 scripts/import_lyrics.py --phases all         # Run every phase in one process
+    python3 scripts/import_lyrics.py --phases translate,extract-lemmas,detect-occurrences
+    python3 scripts/import_lyrics.py --check-vocalizations  # Check vocalization rules against vocalization_golden.json
 """
 
+import glob
+import hashlib
 import json
 import math
 import os
 import re
+import sys
 import time
 import unicodedata
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import requests
 
+from phase_runner import Phase, PhaseRunner, SharedData
+from claude_client import ClaudeClient
+from structured_output import Schema, StructuredResult
+from usage_ledger import ledger
+
 
 def load_env_file(env_path: Path) -> None:
     """Load environment variables from .env file (simple parser)."""
@@ -67,6 +92,8 @@ PROJECT_ROOT = SCRIPT_DIR.parent
 ALBUM_FILE = PROJECT_ROOT / "docs" / "Lyrics" / "Debí Tirar Más Fotos - Album.txt"
 SONG_MAPPINGS_FILE = SCRIPT_DIR / "song_mappings.json"
 PARSED_LYRICS_FILE = SCRIPT_DIR / "parsed_lyrics.json"
+SONG_TITLE_PATTERN = re.compile(r'^Song Title:\s*(.+)$')
+ALBUM_TITLE_PATTERN = re.compile(r'^Album Title:\s*(.+)$')
 
 # Supabase config
 SUPABASE_URL = os.getenv('VITE_SUPABASE_URL')
@@ -77,13 +104,20 @@ DEEPL_API_KEY = os.getenv('VITE_DEEPL_API_KEY')
 DEEPL_API_URL = "https://api.deepl.com/v2/translate"
 TRANSLATION_BATCH_SIZE = 50
 
+# Bulk reads / occurrence detection
+PAGE_SIZE = 1000
+OCCURRENCE_WORKERS = os.cpu_count() or 1
+
 # Claude API config
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
-ANTHROPIC_API_URL = "https://api.anthropic.com/v1/messages"
 CLAUDE_MODEL = "claude-sonnet-4-20250514"
 VOCABULARY_ANALYSIS_FILE = SCRIPT_DIR / "vocabulary_analysis.json"
 VOCABULARY_CLEANED_FILE = SCRIPT_DIR / "vocabulary_analysis_cleaned.json"
 TRANSLATION_FIXES_FILE = SCRIPT_DIR / "translation_fixes.json"
+VOCALIZATION_GOLDEN_FILE = SCRIPT_DIR / "vocalization_golden.json"
+
+# Claude over plain HTTP, with fixed instructions as a cached system prefix
+claude = ClaudeClient(api_key=ANTHROPIC_API_KEY, model=CLAUDE_MODEL)
 
 # Vulgar words for formality detection
 VULGAR_WORDS = {'cabrón', 'coño', 'carajo', 'puñeta', 'mierda', 'verga', 'culo',
@@ -130,6 +164,41 @@ class SupabaseClient:
         else:
             return False, f"HTTP {response.status_code}: {response.text}"
 
+    def update_in(self, table: str, data: dict, column: str, values: List[str],
+                  chunk_size: int = 200) -> Tuple[bool, str, int]:
+        """
+        Apply the same update to every row whose `column` is in `values`, one
+        request per chunk. Returns (success, message, number of values updated)
+        - on failure, the chunks written before the error.
+        """
+        url = f"{self.base_url}/{table}"
+        headers = {**self.headers, 'Prefer': 'return=minimal'}
+
+        for i in range(0, len(values), chunk_size):
+            params = {column: f"in.({','.join(values[i:i + chunk_size])})"}
+            response = requests.patch(url, headers=headers, json=data, params=params)
+            if response.status_code not in (200, 204):
+                return False, f"HTTP {response.status_code}: {response.text}", i
+
+        return True, "Updated", len(values)
+
+    def upsert(self, table: str, data: dict | list, on_conflict: str,
+               ignore_duplicates: bool = False) -> Tuple[bool, dict | list | str]:
+        """
+        Insert row(s), updating rows that conflict on `on_conflict` columns -
+        or, with ignore_duplicates, leaving them untouched (only the inserted
+        rows are returned). Returns (success, data_or_error).
+        """
+        url = f"{self.base_url}/{table}"
+        resolution = 'ignore-duplicates' if ignore_duplicates else 'merge-duplicates'
+        headers = {**self.headers, 'Prefer': f'resolution={resolution},return=representation'}
+        response = requests.post(url, headers=headers, json=data, params={'on_conflict': on_conflict})
+
+        if response.status_code in (200, 201):
+            return True, response.json()
+        else:
+            return False, f"HTTP {response.status_code}: {response.text}"
+
     def delete(self, table: str, filters: dict) -> Tuple[bool, str]:
         """Delete rows matching filters. Returns (success, message)."""
         url = f"{self.base_url}/{table}"
@@ -142,15 +211,61 @@ class SupabaseClient:
         else:
             return False, f"HTTP {response.status_code}: {response.text}"
 
+    def delete_in(self, table: str, column: str, values: List[str],
+                  chunk_size: int = 200) -> Tuple[bool, str]:
+        """Delete every row whose `column` is in `values`. Returns (success, message)."""
+        url = f"{self.base_url}/{table}"
+
+        for i in range(0, len(values), chunk_size):
+            params = {column: f"in.({','.join(values[i:i + chunk_size])})"}
+            response = requests.delete(url, headers=self.headers, params=params)
+            if response.status_code not in (200, 204):
+                return False, f"HTTP {response.status_code}: {response.text}"
+
+        return True, "Deleted"
+
+    def rpc(self, function: str, params: dict) -> Tuple[bool, dict | list | str]:
+        """Call a Postgres function. Returns (success, result_or_error)."""
+        url = f"{self.base_url}/rpc/{function}"
+        response = requests.post(url, headers=self.headers, json=params)
+
+        if response.status_code in (200, 204):
+            return True, response.json() if response.content else None
+        else:
+            return False, f"HTTP {response.status_code}: {response.text}"
+
+    def select_in(self, table: str, columns: str, column: str, values: List[str],
+                  filters: dict = None, chunk_size: int = 100) -> Tuple[bool, list | str]:
+        """Select rows whose `column` is one of `values` (quoted, so text values may contain commas)."""
+        url = f"{self.base_url}/{table}"
+        rows = []
+
+        for i in range(0, len(values), chunk_size):
+            quoted = ','.join('"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"'
+                              for v in values[i:i + chunk_size])
+            params = {"select": columns, column: f"in.({quoted})"}
+            for k, v in (filters or {}).items():
+                params[k] = f"eq.{v}"
+            response = requests.get(url, headers=self.headers, params=params)
+            if response.status_code != 200:
+                return False, f"HTTP {response.status_code}: {response.text}"
+            rows.extend(response.json())
+
+        return True, rows
+
     def select(self, table: str, columns: str = "*", filters: dict = None,
-               or_filters: List[str] = None) -> Tuple[bool, list | str]:
+               or_filters: List[str] = None, order: str = None) -> Tuple[bool, list | str]:
         """
         Select rows from table. Returns (success, data_or_error).
         or_filters: list of filter strings for OR conditions, e.g. ["translation.eq.", "translation.is.null"]
+        order: PostgREST order, e.g. "title" or "line_order.desc"
         """
         url = f"{self.base_url}/{table}"
         params = {"select": columns}
 
+        if order:
+            params["order"] = order
+
         if filters:
             for k, v in filters.items():
                 params[k] = f"eq.{v}"
@@ -166,6 +281,36 @@ class SupabaseClient:
             return False, f"HTTP {response.status_code}: {response.text}"
 
 
+def select_all(client: SupabaseClient, table: str, columns: str, order: str,
+               filters: dict = None) -> Tuple[bool, list | str]:
+    """
+    Select every row of a table (matching the equality filters), paging past
+    the PostgREST row limit.
+    """
+    url = f"{client.base_url}/{table}"
+    rows = []
+    offset = 0
+    while True:
+        params = {"select": columns, "order": order, "limit": PAGE_SIZE, "offset": offset}
+        for k, v in (filters or {}).items():
+            params[k] = f"eq.{v}"
+        response = requests.get(url, headers=client.headers, params=params)
+        if response.status_code != 200:
+            return False, f"HTTP {response.status_code}: {response.text}"
+        page = response.json()
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return True, rows
+        offset += PAGE_SIZE
+
+
+def load_shared(shared: SharedData | None, key: str, loader, *args) -> Tuple[bool, object]:
+    """Load a dataset through the pipeline's shared cache, or directly when run standalone."""
+    if shared is None:
+        return loader(*args)
+    return shared.get(key, lambda: loader(*args))
+
+
 def normalize_title(title: str) -> str:
     """Normalize title for matching (lowercase, remove accents, strip punctuation)."""
     title = title.lower().strip()
@@ -176,146 +321,302 @@ def normalize_title(title: str) -> str:
     return title
 
 
-def load_song_mappings() -> Dict[str, dict]:
+def index_songs(songs: List[dict]) -> Dict[str, List[dict]]:
+    """
+    Group songs by normalized title: {normalized title: [{song_id, title, album}]}.
+    Titles shared by songs on different albums keep every candidate.
+    """
+    index = {}
+    for song in songs:
+        index.setdefault(normalize_title(song['title']), []).append({
+            'song_id': song['song_id'],
+            'title': song['title'],
+            'album': song.get('album')
+        })
+    return index
+
+
+def load_song_mappings() -> Dict[str, List[dict]]:
     """Load song_id mappings from JSON file."""
     with open(SONG_MAPPINGS_FILE, 'r', encoding='utf-8') as f:
         songs = json.load(f)
 
-    mappings = {}
-    for song in songs:
-        normalized = normalize_title(song['title'])
-        mappings[normalized] = {
-            'song_id': song['song_id'],
-            'title': song['title']
-        }
+    return index_songs(songs)
 
-    return mappings
 
+def load_songs_index(client: SupabaseClient) -> Tuple[bool, Dict[str, List[dict]] | str]:
+    """Get {normalized title: [{song_id, title, album}]} for every song in the songs table."""
+    success, data = client.select('songs', 'song_id,title,album')
+    if not success:
+        return False, data
+
+    return True, index_songs(data)
+
+
+def resolve_album_paths(spec: str) -> List[Path]:
+    """Expand an album file, a directory of .txt album files, or a glob pattern."""
+    path = Path(spec)
+    if path.is_dir():
+        return sorted(path.glob('*.txt'))
+    if any(c in spec for c in '*?['):
+        return sorted(Path(p) for p in glob.glob(spec))
+    return [path]
+
+
+def _parsed_song(title: str, sections: List[List[str]], album: str | None) -> dict:
+    return {
+        'parsed_title': title,
+        'album': album,
+        'sections': sections,
+        'total_sections': len(sections),
+        'total_lines': sum(len(s) for s in sections)
+    }
+
+
+def iter_album_songs(filepath: Path) -> Iterator[dict]:
+    """
+    Stream songs from an album file, yielding each one as soon as the next
+    'Song Title:' line (or end of file) closes it. Sections are separated by
+    blank lines; text before the first title is ignored apart from the
+    'Album Title:' header.
+    """
+    album = None
+    title = None
+    sections = []
+    current = []
 
-def parse_album_file(filepath: Path) -> List[dict]:
-    """Parse the album file and extract songs with sections."""
     with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+        for raw_line in f:
+            line = raw_line.strip()
+            match = SONG_TITLE_PATTERN.match(line)
+
+            if match:
+                if title is not None:
+                    if current:
+                        sections.append(current)
+                    yield _parsed_song(title, sections, album)
+                title = match.group(1).strip()
+                sections = []
+                current = []
+            elif title is None:
+                album_match = ALBUM_TITLE_PATTERN.match(line)
+                if album_match:
+                    album = album_match.group(1).strip()
+            elif line:
+                current.append(line)
+            elif current:
+                sections.append(current)
+                current = []
+
+    if title is not None:
+        if current:
+            sections.append(current)
+        yield _parsed_song(title, sections, album)
 
-    song_pattern = re.compile(r'^Song Title:\s*(.+)$', re.MULTILINE)
-    matches = list(song_pattern.finditer(content))
 
-    parsed_songs = []
+def parse_album_file(filepath: Path) -> List[dict]:
+    """Parse the album file and extract songs with sections."""
+    return list(iter_album_songs(filepath))
+
 
-    for i, match in enumerate(matches):
-        title = match.group(1).strip()
-        start_pos = match.end()
-        end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+def song_candidates(song: dict, index: Dict[str, List[dict]]) -> List[dict]:
+    """
+    Database songs a parsed song could be. A title shared by several songs is
+    narrowed to the one whose album matches the album file's title.
+    """
+    candidates = index.get(normalize_title(song['parsed_title']), [])
+    if len(candidates) > 1:
+        album = normalize_title(song.get('album') or '')
+        candidates = [c for c in candidates if album and normalize_title(c['album'] or '') == album]
+    return candidates
 
-        lyrics_text = content[start_pos:end_pos].strip()
-        raw_sections = re.split(r'\n\s*\n', lyrics_text)
 
-        sections = []
-        for section_text in raw_sections:
-            lines = [line.strip() for line in section_text.strip().split('\n') if line.strip()]
-            if lines:
-                sections.append(lines)
+def unmatched_label(song: dict, index: Dict[str, List[dict]]) -> str:
+    """How an unmatched song is reported: its title, noting ambiguous ones."""
+    candidates = index.get(normalize_title(song['parsed_title']), [])
+    if len(candidates) > 1:
+        return f"{song['parsed_title']} (ambiguous: {len(candidates)} songs share this title)"
+    return song['parsed_title']
 
-        total_lines = sum(len(s) for s in sections)
 
-        parsed_songs.append({
-            'parsed_title': title,
-            'sections': sections,
-            'total_sections': len(sections),
-            'total_lines': total_lines
-        })
+def match_song(song: dict, index: Dict[str, List[dict]]) -> dict | None:
+    """Match one parsed song to its database entry, or None if unknown or ambiguous."""
+    candidates = song_candidates(song, index)
+    if len(candidates) != 1:
+        return None
+    db_song = candidates[0]
 
-    return parsed_songs
+    return {
+        'title': db_song['title'],
+        'song_id': db_song['song_id'],
+        'parsed_title': song['parsed_title'],
+        'sections': [
+            {'section_order': i + 1, 'lines': lines}
+            for i, lines in enumerate(song['sections'])
+        ],
+        'total_sections': song['total_sections'],
+        'total_lines': song['total_lines']
+    }
 
 
-def match_songs_to_database(parsed_songs: List[dict], mappings: Dict[str, dict]) -> Tuple[List[dict], List[str]]:
+def match_songs_to_database(parsed_songs: List[dict], mappings: Dict[str, List[dict]]) -> Tuple[List[dict], List[str]]:
     """Match parsed songs to database entries."""
     matched = []
     unmatched = []
 
     for song in parsed_songs:
-        normalized = normalize_title(song['parsed_title'])
-
-        if normalized in mappings:
-            db_song = mappings[normalized]
-            matched.append({
-                'title': db_song['title'],
-                'song_id': db_song['song_id'],
-                'parsed_title': song['parsed_title'],
-                'sections': [
-                    {'section_order': i + 1, 'lines': lines}
-                    for i, lines in enumerate(song['sections'])
-                ],
-                'total_sections': song['total_sections'],
-                'total_lines': song['total_lines']
-            })
+        db_song = match_song(song, mappings)
+        if db_song:
+            matched.append(db_song)
         else:
-            unmatched.append(song['parsed_title'])
+            unmatched.append(unmatched_label(song, mappings))
 
     return matched, unmatched
 
 
+def iter_matched_songs(paths: List[Path], index: Dict[str, List[dict]], unmatched: List[str]) -> Iterator[dict]:
+    """
+    Stream matched songs from every album file in one pass. Titles with no
+    (or no unambiguous) database entry are appended to `unmatched` and skipped.
+    """
+    for path in paths:
+        for song in iter_album_songs(path):
+            db_song = match_song(song, index)
+            if db_song:
+                yield db_song
+            else:
+                unmatched.append(unmatched_label(song, index))
+
+
+def get_song_structure(client: SupabaseClient, song_id: str) -> Tuple[bool, dict | str]:
+    """
+    Get a song's current sections and lines.
+    Returns (success, {section_order: {section_id, total_lines, lines: {line_order: line}}}).
+    """
+    success, data = client.select(
+        'song_sections',
+        'section_id,section_order,total_lines,song_lines(line_id,line_order,line_text,translation)',
+        {'song_id': song_id}
+    )
+    if not success:
+        return False, data
+
+    structure = {}
+    for section in data:
+        structure[section['section_order']] = {
+            'section_id': section['section_id'],
+            'total_lines': section['total_lines'],
+            'lines': {line['line_order']: line for line in section.get('song_lines') or []}
+        }
+    return True, structure
+
+
 def import_song_to_database(client: SupabaseClient, song: dict) -> Tuple[bool, str]:
     """
-    Import a single song's sections and lines to database.
-    Returns (success, message).
+    Sync a single song's sections and lines to the database.
+    Only new or edited lines are written (edited lines keep their translation
+    until --translate sees the new content_hash); lines and sections no longer
+    in the album file are removed. Returns (success, message).
     """
     song_id = song['song_id']
-    sections_imported = 0
-    lines_imported = 0
+    counts = {'added': 0, 'changed': 0, 'removed': 0}
 
     try:
-        # Insert each section
-        for section_data in song['sections']:
-            section_order = section_data['section_order']
-            lines = section_data['lines']
+        success, existing = get_song_structure(client, song_id)
+        if not success:
+            return False, f"Failed to load existing sections: {existing}"
 
-            # Insert section
-            section_record = {
+        # Insert new sections
+        section_records = [
+            {
                 'song_id': song_id,
                 'section_type': 'stanza',
-                'section_order': section_order,
+                'section_order': section_data['section_order'],
                 'section_label': None,
                 'is_skippable': False,
-                'total_lines': len(lines)
+                'total_lines': len(section_data['lines'])
             }
+            for section_data in song['sections']
+            if section_data['section_order'] not in existing
+        ]
 
-            success, result = client.insert('song_sections', section_record)
+        if section_records:
+            success, result = client.insert('song_sections', section_records)
             if not success:
-                return False, f"Section {section_order} insert failed: {result}"
+                return False, f"Section insert failed: {result}"
+            for row in result:
+                existing[row['section_order']] = {
+                    'section_id': row['section_id'],
+                    'total_lines': row['total_lines'],
+                    'lines': {}
+                }
 
-            section_id = result[0]['section_id']
-            sections_imported += 1
+        # Diff lines against what is stored
+        line_records = []
+        removed_line_ids = []
 
-            # Insert lines for this section
-            line_records = [
-                {
-                    'section_id': section_id,
+        for section_data in song['sections']:
+            section = existing[section_data['section_order']]
+            lines = section_data['lines']
+
+            for i, line_text in enumerate(lines):
+                stored = section['lines'].get(i + 1)
+                if stored and stored['line_text'] == line_text:
+                    continue
+
+                counts['changed' if stored else 'added'] += 1
+                line_records.append({
+                    'section_id': section['section_id'],
                     'line_order': i + 1,
                     'line_text': line_text,
-                    'translation': '',
-                    'is_skippable': False
-                }
-                for i, line_text in enumerate(lines)
-            ]
+                    'translation': stored['translation'] if stored else ''
+                })
+
+            removed_line_ids.extend(
+                line['line_id'] for order, line in section['lines'].items() if order > len(lines)
+            )
 
-            if line_records:
-                success, result = client.insert('song_lines', line_records)
+            if section['total_lines'] != len(lines):
+                success, msg = client.update(
+                    'song_sections', {'total_lines': len(lines)}, {'section_id': section['section_id']}
+                )
                 if not success:
-                    return False, f"Lines for section {section_order} insert failed: {result}"
+                    return False, f"Section {section_data['section_order']} update failed: {msg}"
+
+        if line_records:
+            success, result = client.upsert('song_lines', line_records, 'section_id,line_order')
+            if not success:
+                return False, f"Lines upsert failed: {result}"
+
+        if removed_line_ids:
+            success, msg = client.delete_in('song_lines', 'line_id', removed_line_ids)
+            if not success:
+                return False, f"Line delete failed: {msg}"
+            counts['removed'] += len(removed_line_ids)
 
-                lines_imported += len(line_records)
+        # Sections beyond the end of the song (their lines cascade)
+        removed_sections = [
+            section for order, section in existing.items() if order > len(song['sections'])
+        ]
+        if removed_sections:
+            success, msg = client.delete_in(
+                'song_sections', 'section_id', [section['section_id'] for section in removed_sections]
+            )
+            if not success:
+                return False, f"Section delete failed: {msg}"
+            counts['removed'] += sum(len(section['lines']) for section in removed_sections)
 
         # Update song counts
         success, msg = client.update('songs', {
-            'total_sections': sections_imported,
-            'total_lines': lines_imported
+            'total_sections': song['total_sections'],
+            'total_lines': song['total_lines']
         }, {'song_id': song_id})
 
         if not success:
             return False, f"Song update failed: {msg}"
 
-        return True, f"{sections_imported} sections, {lines_imported} lines"
+        return True, (f"{song['total_sections']} sections, {song['total_lines']} lines "
+                      f"({counts['added']} added, {counts['changed']} changed, {counts['removed']} removed)")
 
     except Exception as e:
         return False, str(e)
@@ -329,8 +630,8 @@ def rollback_song(client: SupabaseClient, song_id: str) -> None:
     pass
 
 
-def write_to_database(songs: List[dict]) -> dict:
-    """Write all songs to database. Returns summary."""
+def write_to_database(songs: Iterable[dict]) -> dict:
+    """Write songs to database as they arrive (list or stream). Returns summary."""
     client = SupabaseClient(SUPABASE_URL, SUPABASE_KEY)
 
     results = {
@@ -391,42 +692,51 @@ def translate_batch_deepl(texts: List[str]) -> Tuple[bool, List[str] | str, int]
     # Count characters for cost tracking
     chars_used = sum(len(t) for t in texts)
 
+    started = time.time()
+    start = time.perf_counter()
     try:
         response = requests.post(DEEPL_API_URL, headers=headers, json=payload)
 
         if response.status_code == 200:
             result = response.json()
             translations = [t['text'] for t in result['translations']]
+            ledger.record('deepl', None, 'translate', started, time.perf_counter() - start,
+                          items=len(texts), characters=chars_used)
             return True, translations, chars_used
         else:
-            return False, f"HTTP {response.status_code}: {response.text}", chars_used
+            error = f"HTTP {response.status_code}: {response.text}"
 
     except Exception as e:
-        return False, str(e), chars_used
+        error = str(e)
+
+    # Failed requests aren't billed, so no characters are recorded
+    ledger.record('deepl', None, 'translate', started, time.perf_counter() - start, 'error',
+                  items=len(texts), error=error)
+    return False, error, chars_used
 
 
 def get_untranslated_lines(client: SupabaseClient) -> Tuple[bool, list | str]:
     """
-    Query all song_lines where translation is empty or NULL.
-    Returns (success, lines_or_error).
+    Query all song_lines whose translation is empty or was made from older
+    line text (translated_hash differs from content_hash).
+    Returns (success, lines_or_error). PostgREST can't compare two columns,
+    so every line is read (paged) and the hashes are compared here.
     """
-    url = f"{client.base_url}/song_lines"
-    params = {
-        "select": "line_id,line_text",
-        "or": "(translation.eq.,translation.is.null)",
-        "order": "line_id"
-    }
-
-    response = requests.get(url, headers=client.headers, params=params)
+    success, lines = select_all(
+        client, 'song_lines', 'line_id,section_id,line_order,line_text,translation,content_hash,translated_hash',
+        'line_id'
+    )
+    if not success:
+        return False, lines
 
-    if response.status_code == 200:
-        return True, response.json()
-    else:
-        return False, f"HTTP {response.status_code}: {response.text}"
+    return True, [
+        line for line in lines
+        if not line['translation'] or line['translated_hash'] != line['content_hash']
+    ]
 
 
 def translate_lines() -> dict:
-    """Translate all untranslated song lines via DeepL. Returns summary."""
+    """Translate new and edited song lines via DeepL. Returns summary."""
     if not DEEPL_API_KEY:
         print("ERROR: DEEPL_API_KEY not found in environment.")
         return {'error': 'Missing API key'}
@@ -497,17 +807,25 @@ def translate_lines() -> dict:
             time.sleep(1)
             continue
 
-        # Update database with translations
-        update_errors = 0
-        for i, (line_id, translation) in enumerate(zip(line_ids, translations)):
-            success, msg = client.update('song_lines', {'translation': translation}, {'line_id': line_id})
-            if not success:
-                update_errors += 1
-                results['failed_lines'].append(line_id)
+        # Update database with translations (one upsert per batch)
+        rows = [
+            {
+                'line_id': line['line_id'],
+                'section_id': line['section_id'],
+                'line_order': line['line_order'],
+                'line_text': line['line_text'],
+                'translation': translation,
+                'translated_hash': line['content_hash']
+            }
+            for line, translation in zip(batch_lines, translations)
+        ]
+        success, msg = client.upsert('song_lines', rows, 'line_id')
+        update_errors = 0 if success else batch_size
 
-        if update_errors > 0:
-            print(f"{batch_size - update_errors} lines ✓ ({update_errors} update errors)")
+        if not success:
+            print(f"✗ {msg}")
             results['errors'] += update_errors
+            results['failed_lines'].extend(line_ids)
         else:
             print(f"{batch_size} lines ✓")
 
@@ -539,6 +857,19 @@ STANDALONE_INTERJECTIONS = [
 ]
 
 
+# Every token a vocalization line may consist of: each syllable, plus its
+# doubled/tripled forms ("ohoh", "lalala") up to 6 characters
+VOCALIZATION_TOKENS = frozenset(
+    VOCALIZATION_SYLLABLES +
+    [syl * n for syl in VOCALIZATION_SYLLABLES for n in (2, 3) if len(syl * n) <= 6]
+)
+STANDALONE_INTERJECTION_SET = frozenset(STANDALONE_INTERJECTIONS)
+
+# Punctuation stripped before analysis (hyphens are kept for "eh-eh-eh")
+VOCALIZATION_PUNCTUATION = re.compile(r'[,.\'"!?¿¡()[\]{}]')
+VOCALIZATION_SEPARATORS = re.compile(r'[\s\-]+')
+
+
 def is_vocalization_line(line_text: str) -> bool:
     """
     Determine if a line is a pure vocalization (no real Spanish words).
@@ -547,54 +878,57 @@ def is_vocalization_line(line_text: str) -> bool:
     if not line_text:
         return True
 
-    text = line_text.strip().lower()
+    cleaned = VOCALIZATION_PUNCTUATION.sub('', line_text.strip().lower()).strip()
 
-    # Empty or whitespace only
-    if not text:
+    # Empty, punctuation only, or a single standalone interjection
+    if not cleaned or cleaned in STANDALONE_INTERJECTION_SET:
         return True
 
-    # Remove punctuation for analysis but keep hyphens for syllable patterns
-    # First, let's normalize the text
-    cleaned = re.sub(r'[,.\'"!?¿¡()[\]{}]', '', text)
-    cleaned = cleaned.strip()
-
-    if not cleaned:
-        return True
-
-    # Check if it's a single standalone interjection
-    if cleaned in STANDALONE_INTERJECTIONS:
-        return True
-
-    # Check for repeated syllable patterns like "eh-eh-eh" or "la la la" or "ve-ve-ve-ve"
-    # Split by spaces and hyphens
-    parts = re.split(r'[\s\-]+', cleaned)
+    # Repeated syllable patterns like "eh-eh-eh", "la la la" or "ohoh":
+    # every space/hyphen separated part must be a vocalization token
+    return all(
+        part in VOCALIZATION_TOKENS
+        for part in VOCALIZATION_SEPARATORS.split(cleaned)
+        if part
+    )
 
-    # Filter out empty parts
-    parts = [p for p in parts if p]
 
-    if not parts:
+def check_vocalizations(golden_path: Path, album_paths: List[Path]) -> bool:
+    """
+    Run is_vocalization_line over every line of the album files and compare
+    against a golden JSON file of {line: expected}. Writes the golden file
+    instead if it doesn't exist yet. Returns True if every line matches (or
+    the file was just written).
+    """
+    actual = {}
+    for path in album_paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for raw_line in f:
+                line = raw_line.strip()
+                if line:
+                    actual[line] = is_vocalization_line(line)
+
+    if not golden_path.exists():
+        golden_path.write_text(json.dumps(actual, ensure_ascii=False, indent=1), encoding='utf-8')
+        print(f"Wrote {len(actual)} lines to {golden_path}")
         return True
 
-    # Check if ALL parts are vocalization syllables
-    all_vocalizations = all(
-        part in VOCALIZATION_SYLLABLES or
-        # Also check for doubled syllables like "ohoh" or "eheh"
-        (len(part) <= 6 and any(part == syl * 2 or part == syl * 3 for syl in VOCALIZATION_SYLLABLES))
-        for part in parts
-    )
-
-    if all_vocalizations:
-        return True
+    golden = json.loads(golden_path.read_text(encoding='utf-8'))
+    mismatches = 0
+    for line, result in actual.items():
+        if line not in golden:
+            print(f"  Not in golden file: {line!r} -> {result}")
+            mismatches += 1
+        elif golden[line] != result:
+            print(f"  {line!r}: {result} (golden: {golden[line]})")
+            mismatches += 1
 
-    # Check for pattern: single syllable repeated many times
-    # e.g., "ve-ve-ve-ve-ve-ve-ve-ve-ve-ve-ve"
-    if len(parts) >= 3:
-        unique_parts = set(parts)
-        # Only flag if the repeated part is a known vocalization syllable
-        if len(unique_parts) == 1 and parts[0] in VOCALIZATION_SYLLABLES:
-            return True
+    if mismatches:
+        print(f"Vocalization check FAILED: {mismatches} of {len(actual)} lines differ")
+        return False
 
-    return False
+    print(f"Vocalization check passed ({len(actual)} lines)")
+    return True
 
 
 def get_all_lines(client: SupabaseClient) -> Tuple[bool, list | str]:
@@ -661,33 +995,26 @@ def flag_skippable_lines() -> dict:
         print(f"  • {text}{already}")
     print()
 
-    # Update database
+    # Update database (one bulk update for every newly flagged line)
     print("Updating database... ", end='', flush=True)
-    flagged_count = 0
+    newly_flagged = [line['line_id'] for line in to_flag if not line['is_skippable']]
     errors = []
+    updated = 0
 
-    for line in to_flag:
-        if not line['is_skippable']:  # Only update if not already flagged
-            success, msg = client.update(
-                'song_lines',
-                {'is_skippable': True},
-                {'line_id': line['line_id']}
-            )
-            if success:
-                flagged_count += 1
-            else:
-                errors.append({'line_id': line['line_id'], 'error': msg})
-        else:
-            flagged_count += 1  # Count already flagged
+    if newly_flagged:
+        success, msg, updated = client.update_in('song_lines', {'is_skippable': True}, 'line_id', newly_flagged)
+        if not success:
+            # Chunks before the failing one were written
+            errors.append({'line_ids': newly_flagged[updated:], 'error': msg})
 
     if errors:
-        print(f"✗ {len(errors)} errors")
+        print(f"✗ {msg} ({updated}/{len(newly_flagged)} lines updated)")
     else:
         print("✓")
 
     return {
         'flagged': len(to_flag),
-        'newly_flagged': flagged_count - sum(1 for l in to_flag if l['is_skippable']),
+        'newly_flagged': updated,
         'learnable': total_lines - len(to_flag),
         'flagged_lines': [l['line_text'] for l in to_flag],
         'errors': errors
@@ -713,65 +1040,27 @@ Return JSON only, no explanation:
   "slang": [...],
   "phrases": [...]
 }
-
-LYRICS:
 """
 
+SLANG_ANALYSIS_SCHEMA = Schema({'slang': list, 'phrases': list})
+
 
-def call_claude_api(prompt: str, timeout: int = 30) -> Tuple[bool, dict | str]:
+def call_claude_api(phase: str, instructions: str | List[str], content: str, timeout: int = 30,
+                    schema: Schema = None, items_key: str = None,
+                    items: int = 1) -> Tuple[bool, StructuredResult | str]:
     """
-    Call Claude API with a prompt.
-    Returns (success, response_json_or_error).
+    Call Claude API: instructions go in the cached system prefix, content in
+    the user message, and the streamed response is parsed by structured_output.
+    Returns (success, StructuredResult_or_error). success is False only if
+    the request itself failed; a result can still be incomplete (check
+    .complete), in which case .items holds the items parsed before the break.
+    items (lyric lines sent) is recorded in the usage ledger.
     """
-    headers = {
-        'x-api-key': ANTHROPIC_API_KEY,
-        'anthropic-version': '2023-06-01',
-        'Content-Type': 'application/json'
-    }
-
-    payload = {
-        'model': CLAUDE_MODEL,
-        'max_tokens': 4096,
-        'messages': [
-            {'role': 'user', 'content': prompt}
-        ]
-    }
-
-    try:
-        response = requests.post(ANTHROPIC_API_URL, headers=headers, json=payload, timeout=timeout)
-
-        if response.status_code == 200:
-            result = response.json()
-            # Extract text from response
-            text = result['content'][0]['text']
-            # Parse JSON from response (handle potential markdown code blocks)
-            text = text.strip()
-            if text.startswith('```'):
-                # Remove markdown code block
-                lines = text.split('\n')
-                text = '\n'.join(lines[1:-1] if lines[-1] == '```' else lines[1:])
-
-            # Try to find JSON object in response if direct parse fails
-            try:
-                return True, json.loads(text)
-            except json.JSONDecodeError:
-                # Try to extract JSON from the text (find { ... })
-                start = text.find('{')
-                end = text.rfind('}')
-                if start != -1 and end != -1 and end > start:
-                    json_str = text[start:end + 1]
-                    return True, json.loads(json_str)
-                # If no JSON found, return empty fixes
-                return True, {"fixes": []}
-        else:
-            return False, f"HTTP {response.status_code}: {response.text}"
-
-    except requests.exceptions.Timeout:
-        return False, "Request timeout (30s)"
-    except json.JSONDecodeError as e:
-        return False, f"JSON parse error: {e}"
-    except Exception as e:
-        return False, str(e)
+    result = claude.request(phase, instructions, content, schema, items_key, max_tokens=4096, timeout=timeout,
+                            items=items)
+    if result.interrupted and not result.text:
+        return False, result.error
+    return True, result
 
 
 def get_learnable_lines_by_song(client: SupabaseClient) -> Tuple[bool, dict | str]:
@@ -906,18 +1195,20 @@ def analyze_vocabulary() -> dict:
         title = song_data['title']
         print(f"Analyzing {title}... ", end='', flush=True)
 
-        # Build prompt with lyrics
+        # Call Claude API with the lyrics
         lyrics_text = '\n'.join(song_data['lines'])
-        prompt = SLANG_ANALYSIS_PROMPT + lyrics_text
-
-        # Call Claude API
-        success, analysis = call_claude_api(prompt)
+        with ledger.scope(f"song {title}"):
+            success, response = call_claude_api('analyze', SLANG_ANALYSIS_PROMPT, "LYRICS:\n" + lyrics_text,
+                                                schema=SLANG_ANALYSIS_SCHEMA, items=len(song_data['lines']))
+        if success and not response.complete:
+            success, response = False, f"Unusable response: {response.error}"
 
         if not success:
-            print(f"✗ {analysis}")
-            results['errors'].append({'song': title, 'error': analysis})
+            print(f"✗ {response}")
+            results['errors'].append({'song': title, 'error': response})
             time.sleep(2)
             continue
+        analysis = response.value
 
         # Process slang terms
         slang_count = 0
@@ -1006,41 +1297,41 @@ def get_song_id_by_title(client: SupabaseClient, title: str) -> str | None:
     return None
 
 
-def get_slang_id_by_term(client: SupabaseClient, term: str) -> str | None:
-    """Look up slang_id by term (case-insensitive)."""
-    url = f"{client.base_url}/slang_terms"
-    params = {"select": "slang_id", "term": f"ilike.{term}"}
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        return data[0]['slang_id'] if data else None
-    return None
+def get_slang_id_map(client: SupabaseClient) -> Tuple[bool, dict | str]:
+    """Get {term (lowercase): slang_id} for all slang terms."""
+    success, data = select_all(client, 'slang_terms', 'slang_id,term', 'slang_id')
+    if not success:
+        return False, data
+    return True, {s['term'].lower(): s['slang_id'] for s in data}
 
 
-def get_phrase_id_by_text(client: SupabaseClient, phrase_text: str) -> str | None:
-    """Look up phrase_id by phrase_text (case-insensitive)."""
-    url = f"{client.base_url}/phrases"
-    params = {"select": "phrase_id", "phrase_text": f"ilike.{phrase_text}"}
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        return data[0]['phrase_id'] if data else None
-    return None
+def get_phrase_id_map(client: SupabaseClient) -> Tuple[bool, dict | str]:
+    """Get {phrase_text (lowercase): phrase_id} for all phrases."""
+    success, data = select_all(client, 'phrases', 'phrase_id,phrase_text', 'phrase_id')
+    if not success:
+        return False, data
+    return True, {p['phrase_text'].lower(): p['phrase_id'] for p in data}
 
 
-def link_exists(client: SupabaseClient, table: str, filters: dict) -> bool:
-    """Check if a link already exists."""
-    url = f"{client.base_url}/{table}"
-    params = {f"{k}": f"eq.{v}" for k, v in filters.items()}
-    params["select"] = "song_id"
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code == 200:
-        return len(response.json()) > 0
-    return False
+def get_existing_links(client: SupabaseClient, table: str, id_column: str) -> Tuple[bool, set | str]:
+    """Get all (song_id, <id_column>) pairs in a song link table."""
+    success, data = select_all(client, table, f"song_id,{id_column}", f"song_id,{id_column}")
+    if not success:
+        return False, data
+    return True, {(row['song_id'], row[id_column]) for row in data}
 
 
-def insert_vocabulary() -> dict:
-    """Insert cleaned vocabulary into database. Returns summary."""
+def insert_vocabulary(shared: SharedData = None) -> dict:
+    """
+    Insert cleaned vocabulary into database. Returns summary.
+
+    Existing slang terms, phrases and song links are prefetched once; new
+    terms and phrases are each created with one multi-row insert, and all
+    song links are written with one upsert per link table, so re-running
+    the phase is idempotent. Inserts ignore duplicates: a term or phrase
+    that exists without having been prefetched (e.g. a phrase added by a
+    chapter import meanwhile) is linked, never overwritten.
+    """
     client = SupabaseClient(SUPABASE_URL, SUPABASE_KEY)
 
     print()
@@ -1066,6 +1357,24 @@ def insert_vocabulary() -> dict:
         songs = json.load(f)
     song_id_map = {s['title']: s['song_id'] for s in songs}
     print(f"{len(song_id_map)} songs")
+
+    # Prefetch existing vocabulary and links
+    print("Loading existing vocabulary... ", end='', flush=True)
+    prefetch = {
+        'slang': load_shared(shared, 'slang_ids', get_slang_id_map, client),
+        'phrases': get_phrase_id_map(client),
+        'song_slang': get_existing_links(client, 'song_slang', 'slang_id'),
+        'song_phrases': get_existing_links(client, 'song_phrases', 'phrase_id'),
+    }
+    for name, (success, value) in prefetch.items():
+        if not success:
+            print("✗")
+            return {'error': f"Failed to load {name}: {value}"}
+    slang_ids = prefetch['slang'][1]
+    phrase_ids = prefetch['phrases'][1]
+    slang_links = prefetch['song_slang'][1]
+    phrase_links = prefetch['song_phrases'][1]
+    print(f"{len(slang_ids)} slang terms, {len(phrase_ids)} phrases")
     print()
 
     results = {
@@ -1087,6 +1396,10 @@ def insert_vocabulary() -> dict:
     flagged_slang = [s for s in data['new_slang_to_create'] if '_flag' in s]
     results['skipped_flagged'] += len(flagged_slang)
 
+    # (song_id, term) links to create, and whether the term already existed
+    slang_to_link = []
+    slang_records = {}
+
     for slang in new_slang:
         term = slang['term']
         song_title = slang.get('found_in', '')
@@ -1096,11 +1409,19 @@ def insert_vocabulary() -> dict:
             results['errors'].append(f"No song_id for '{song_title}'")
             continue
 
+        if term.lower() in slang_ids:
+            # Term already exists, just link it
+            slang_to_link.append((song_id, term, True))
+            continue
+
+        slang_to_link.append((song_id, term, False))
+        if term.lower() in slang_records:
+            continue
+
         # Determine formality
         formality = 'vulgar' if is_vulgar_term(term) or is_vulgar_term(slang.get('meaning', '')) else 'informal'
 
-        # Insert slang term
-        slang_record = {
+        slang_records[term.lower()] = {
             'term': term,
             'definition': slang.get('meaning', ''),
             'standard_equivalent': slang.get('standard', ''),
@@ -1109,25 +1430,28 @@ def insert_vocabulary() -> dict:
             'is_approved': False
         }
 
-        success, result = client.insert('slang_terms', slang_record)
-        if not success:
-            if 'duplicate' in str(result).lower():
-                # Term already exists, just link it
-                slang_id = get_slang_id_by_term(client, term)
-                if slang_id and not link_exists(client, 'song_slang', {'song_id': song_id, 'slang_id': slang_id}):
-                    client.insert('song_slang', {'song_id': song_id, 'slang_id': slang_id})
-                    results['slang_linked_existing'] += 1
-            else:
-                results['errors'].append(f"Slang '{term}': {result}")
-            continue
-
-        slang_id = result[0]['slang_id']
-        results['slang_created'] += 1
-
-        # Create song_slang link
-        client.insert('song_slang', {'song_id': song_id, 'slang_id': slang_id})
-
-        print(f"  + {term} [{formality}]")
+    created_slang = set()
+    if slang_records:
+        success, result = client.upsert('slang_terms', list(slang_records.values()), 'term,region',
+                                        ignore_duplicates=True)
+        if success:
+            for row in result:
+                slang_ids[row['term'].lower()] = row['slang_id']
+                created_slang.add(row['term'].lower())
+                results['slang_created'] += 1
+                print(f"  + {row['term']} [{row['formality']}]")
+            # Terms that already existed aren't returned by the insert
+            existing = [r['term'] for key, r in slang_records.items() if key not in created_slang]
+            if existing:
+                success, rows = client.select_in('slang_terms', 'slang_id,term', 'term', existing,
+                                                 {'region': 'Puerto Rico'})
+                if success:
+                    for row in rows:
+                        slang_ids[row['term'].lower()] = row['slang_id']
+                else:
+                    results['errors'].append(f"Slang lookup: {rows}")
+        else:
+            results['errors'].append(f"Slang insert: {result}")
 
     print(f"  Created: {results['slang_created']}, Skipped flagged: {len(flagged_slang)}")
     print()
@@ -1139,19 +1463,29 @@ def insert_vocabulary() -> dict:
     print("-" * 40)
 
     for match in data.get('existing_slang_matched', []):
-        term = match['term']
-        song_title = match.get('found_in', '')
-        song_id = song_id_map.get(song_title)
-
-        if not song_id:
+        song_id = song_id_map.get(match.get('found_in', ''))
+        if song_id:
+            slang_to_link.append((song_id, match['term'], True))
+
+    new_links = {}
+    for song_id, term, existing in slang_to_link:
+        slang_id = slang_ids.get(term.lower())
+        key = (song_id, slang_id)
+        if not slang_id or key in slang_links or key in new_links:
             continue
+        new_links[key] = existing or term.lower() not in created_slang
 
-        slang_id = get_slang_id_by_term(client, term)
-        if slang_id and not link_exists(client, 'song_slang', {'song_id': song_id, 'slang_id': slang_id}):
-            success, _ = client.insert('song_slang', {'song_id': song_id, 'slang_id': slang_id})
-            if success:
-                results['slang_linked_existing'] += 1
-                print(f"  → {term} → {song_title}")
+    if new_links:
+        success, result = client.upsert(
+            'song_slang',
+            [{'song_id': song_id, 'slang_id': slang_id} for song_id, slang_id in new_links],
+            'song_id,slang_id'
+        )
+        if success:
+            slang_links.update(new_links)
+            results['slang_linked_existing'] += sum(1 for existing in new_links.values() if existing)
+        else:
+            results['errors'].append(f"Slang links: {result}")
 
     print(f"  Linked: {results['slang_linked_existing']}")
     print()
@@ -1166,6 +1500,9 @@ def insert_vocabulary() -> dict:
     flagged_phrases = [p for p in data['new_phrases_to_create'] if '_flag' in p]
     results['skipped_flagged'] += len(flagged_phrases)
 
+    phrases_to_link = []
+    phrase_records = {}
+
     for phrase in new_phrases:
         phrase_text = phrase['phrase']
         song_title = phrase.get('found_in', '')
@@ -1175,6 +1512,15 @@ def insert_vocabulary() -> dict:
             results['errors'].append(f"No song_id for '{song_title}'")
             continue
 
+        if phrase_text.lower() in phrase_ids:
+            # Phrase already exists, just link it
+            phrases_to_link.append((song_id, phrase_text, 'duplicate'))
+            continue
+
+        phrases_to_link.append((song_id, phrase_text, 'new'))
+        if phrase_text.lower() in phrase_records:
+            continue
+
         # Build definition combining actual and literal meanings
         actual_meaning = phrase.get('actual', '')
         literal_meaning = phrase.get('literal', '')
@@ -1184,8 +1530,7 @@ def insert_vocabulary() -> dict:
         if literal_meaning and literal_meaning != actual_meaning:
             definitions.append(f"(lit: {literal_meaning})")
 
-        # Insert phrase
-        phrase_record = {
+        phrase_records[phrase_text.lower()] = {
             'phrase_text': phrase_text,
             'definitions': definitions,
             'phrase_type': 'idiom',
@@ -1193,25 +1538,27 @@ def insert_vocabulary() -> dict:
             'component_lemmas': []
         }
 
-        success, result = client.insert('phrases', phrase_record)
-        if not success:
-            if 'duplicate' in str(result).lower():
-                # Phrase already exists, just link it
-                phrase_id = get_phrase_id_by_text(client, phrase_text)
-                if phrase_id and not link_exists(client, 'song_phrases', {'song_id': song_id, 'phrase_id': phrase_id}):
-                    client.insert('song_phrases', {'song_id': song_id, 'phrase_id': phrase_id})
-                    results['phrases_linked_existing'] += 1
-            else:
-                results['errors'].append(f"Phrase '{phrase_text}': {result}")
-            continue
-
-        phrase_id = result[0]['phrase_id']
-        results['phrases_created'] += 1
-
-        # Create song_phrases link
-        client.insert('song_phrases', {'song_id': song_id, 'phrase_id': phrase_id})
-
-        print(f"  + {phrase_text[:40]}...")
+    created_phrases = set()
+    if phrase_records:
+        success, result = client.upsert('phrases', list(phrase_records.values()), 'phrase_text',
+                                        ignore_duplicates=True)
+        if success:
+            for row in result:
+                phrase_ids[row['phrase_text'].lower()] = row['phrase_id']
+                created_phrases.add(row['phrase_text'].lower())
+                results['phrases_created'] += 1
+                print(f"  + {row['phrase_text'][:40]}...")
+            # Phrases that already existed (e.g. from a chapter) aren't returned by the insert
+            existing = [r['phrase_text'] for key, r in phrase_records.items() if key not in created_phrases]
+            if existing:
+                success, rows = client.select_in('phrases', 'phrase_id,phrase_text', 'phrase_text', existing)
+                if success:
+                    for row in rows:
+                        phrase_ids[row['phrase_text'].lower()] = row['phrase_id']
+                else:
+                    results['errors'].append(f"Phrase lookup: {rows}")
+        else:
+            results['errors'].append(f"Phrase insert: {result}")
 
     print(f"  Created: {results['phrases_created']}, Skipped flagged: {len(flagged_phrases)}")
     print()
@@ -1222,21 +1569,34 @@ def insert_vocabulary() -> dict:
     print("LINKING EXISTING PHRASES:")
     print("-" * 40)
 
-    existing_phrase_links = 0
     for match in data.get('existing_phrases_matched', []):
-        phrase_text = match['phrase']
-        song_title = match.get('found_in', '')
-        song_id = song_id_map.get(song_title)
-
-        if not song_id:
+        song_id = song_id_map.get(match.get('found_in', ''))
+        if song_id:
+            phrases_to_link.append((song_id, match['phrase'], 'matched'))
+
+    new_links = {}
+    for song_id, phrase_text, source in phrases_to_link:
+        phrase_id = phrase_ids.get(phrase_text.lower())
+        key = (song_id, phrase_id)
+        if not phrase_id or key in phrase_links or key in new_links:
             continue
+        if source == 'new' and phrase_text.lower() not in created_phrases:
+            source = 'duplicate'
+        new_links[key] = source
 
-        phrase_id = get_phrase_id_by_text(client, phrase_text)
-        if phrase_id and not link_exists(client, 'song_phrases', {'song_id': song_id, 'phrase_id': phrase_id}):
-            success, _ = client.insert('song_phrases', {'song_id': song_id, 'phrase_id': phrase_id})
-            if success:
-                existing_phrase_links += 1
-                print(f"  → {phrase_text} → {song_title}")
+    existing_phrase_links = 0
+    if new_links:
+        success, result = client.upsert(
+            'song_phrases',
+            [{'song_id': song_id, 'phrase_id': phrase_id} for song_id, phrase_id in new_links],
+            'song_id,phrase_id'
+        )
+        if success:
+            phrase_links.update(new_links)
+            results['phrases_linked_existing'] += sum(1 for s in new_links.values() if s == 'duplicate')
+            existing_phrase_links = sum(1 for s in new_links.values() if s == 'matched')
+        else:
+            results['errors'].append(f"Phrase links: {result}")
 
     print(f"  Linked: {existing_phrase_links}")
     print()
@@ -1247,15 +1607,14 @@ def insert_vocabulary() -> dict:
     print("UPDATING SONG COUNTS:")
     print("-" * 40)
 
+    slang_counts = {}
+    for song_id, _ in slang_links:
+        slang_counts[song_id] = slang_counts.get(song_id, 0) + 1
+
     for song in songs:
         song_id = song['song_id']
         title = song['title']
-
-        # Count slang for this song
-        url = f"{client.base_url}/song_slang"
-        params = {"select": "slang_id", "song_id": f"eq.{song_id}"}
-        response = requests.get(url, headers=client.headers, params=params)
-        slang_count = len(response.json()) if response.status_code == 200 else 0
+        slang_count = slang_counts.get(song_id, 0)
 
         # Update song
         success, _ = client.update('songs', {'unique_slang_terms': slang_count}, {'song_id': song_id})
@@ -1302,41 +1661,40 @@ def get_learnable_lines_with_songs(client: SupabaseClient) -> Tuple[bool, list |
     Get all learnable lines with their song info.
     Returns (success, [line_data, ...] or error).
     Each line_data includes: line_id, line_text, section_id, song_id, song_title
+    and the content_hash / words_hash / occurrences_hash used for incremental runs
     """
     # Get sections with their songs
-    url = f"{client.base_url}/song_sections"
-    params = {"select": "section_id,song_id,songs(title)"}
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code != 200:
-        return False, f"HTTP {response.status_code}: {response.text}"
+    success, sections = select_all(client, 'song_sections', 'section_id,song_id,songs(title)', 'section_id')
+    if not success:
+        return False, sections
 
     section_to_song = {}
-    for s in response.json():
+    for s in sections:
         section_to_song[s['section_id']] = {
             'song_id': s['song_id'],
             'title': s['songs']['title'] if s['songs'] else 'Unknown'
         }
 
     # Get learnable lines with line_id
-    url = f"{client.base_url}/song_lines"
-    params = {
-        "select": "line_id,line_text,section_id",
-        "is_skippable": "eq.false",
-        "order": "line_id"
-    }
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code != 200:
-        return False, f"HTTP {response.status_code}: {response.text}"
+    success, lines = select_all(
+        client, 'song_lines', 'line_id,line_text,section_id,content_hash,words_hash,occurrences_hash',
+        'line_id', {'is_skippable': 'false'}
+    )
+    if not success:
+        return False, lines
 
     result = []
-    for line in response.json():
+    for line in lines:
         song_info = section_to_song.get(line['section_id'], {})
         result.append({
             'line_id': line['line_id'],
             'line_text': line['line_text'],
             'section_id': line['section_id'],
             'song_id': song_info.get('song_id'),
-            'song_title': song_info.get('title', 'Unknown')
+            'song_title': song_info.get('title', 'Unknown'),
+            'content_hash': line['content_hash'],
+            'words_hash': line['words_hash'],
+            'occurrences_hash': line['occurrences_hash']
         })
 
     return True, result
@@ -1356,18 +1714,6 @@ def get_existing_lemmas_map(client: SupabaseClient) -> Tuple[bool, dict | str]:
         return False, f"HTTP {response.status_code}: {response.text}"
 
 
-def get_slang_terms_set(client: SupabaseClient) -> Tuple[bool, set | str]:
-    """Get all slang terms as lowercase set for filtering."""
-    url = f"{client.base_url}/slang_terms"
-    params = {"select": "term"}
-    response = requests.get(url, headers=client.headers, params=params)
-
-    if response.status_code == 200:
-        return True, {t['term'].lower() for t in response.json()}
-    else:
-        return False, f"HTTP {response.status_code}: {response.text}"
-
-
 def guess_gender_by_ending(noun: str) -> str:
     """
     Guess grammatical gender based on Spanish word endings.
@@ -1434,26 +1780,6 @@ def format_lemma_text(lemma: str, pos: str, gender: str | None) -> str:
         return lemma
 
 
-def get_songs_with_words(client: SupabaseClient) -> set:
-    """Get set of song_ids that already have song_line_words entries."""
-    url = f"{client.base_url}/song_line_words"
-    params = {"select": "song_id"}
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code == 200:
-        return {entry['song_id'] for entry in response.json()}
-    return set()
-
-
-def get_lines_with_words(client: SupabaseClient) -> set:
-    """Get set of line_ids that already have song_line_words entries."""
-    url = f"{client.base_url}/song_line_words"
-    params = {"select": "line_id"}
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code == 200:
-        return {entry['line_id'] for entry in response.json()}
-    return set()
-
-
 def process_single_song(
     client: SupabaseClient,
     nlp,
@@ -1462,20 +1788,24 @@ def process_single_song(
     song_lines: List[dict],
     existing_lemmas: dict,
     slang_terms: set,
-    lines_with_words: set
+    lemma_index=None
 ) -> dict:
     """
-    Process a single song: extract tokens, create song_line_words records.
-    song_lines is a list of dicts with: line_id, line_text, section_id
+    Process a single song: extract tokens, replace song_line_words records.
+    song_lines is a list of dicts with: line_id, line_text, section_id,
+    content_hash - only the lines whose words are out of date. Their old words
+    are replaced and words_hash recorded in one replace_song_line_words call.
+    lemma_index (optional, see lemma_index.py) resolves known word forms
+    to their recorded lemma before spaCy's lemma is used.
     Returns stats dict for this song.
     """
     stats = {
         'title': song_title,
         'lines_processed': 0,
-        'lines_skipped': 0,
         'words_created': 0,
         'lemmas_matched': 0,
         'lemmas_created': 0,
+        'lemmas_indexed': 0,
         'skipped_slang': 0,
         'error': None
     }
@@ -1488,11 +1818,6 @@ def process_single_song(
             line_text = line_data['line_text']
             section_id = line_data['section_id']
 
-            # Skip if line already has words (resume capability)
-            if line_id in lines_with_words:
-                stats['lines_skipped'] += 1
-                continue
-
             if not line_text or not line_text.strip():
                 continue
 
@@ -1507,14 +1832,18 @@ def process_single_song(
                 if len(token.text.strip()) <= 1:
                     continue
 
+                # Known form: reuse the lemma recorded by past imports and manual fixes
+                known = lemma_index.lookup(token.text) if lemma_index else None
+                # Lemmas with no part_of_speech are exported with pos ''
+                pos = (known['pos'] if known else None) or token.pos_
+
                 # Only include meaningful POS
-                if token.pos_ not in INCLUDE_POS:
+                if pos not in INCLUDE_POS:
                     continue
 
                 word_position += 1
                 word_text = token.text
-                lemma = token.lemma_.lower()
-                pos = token.pos_
+                lemma = known['lemma_text'].lower() if known else token.lemma_.lower()
 
                 # Skip slang terms
                 if lemma in slang_terms or word_text.lower() in slang_terms:
@@ -1523,20 +1852,25 @@ def process_single_song(
 
                 # Determine gender for nouns
                 gender = None
-                if pos in ('NOUN', 'PROPN'):
+                if known:
+                    gender = known['gender']
+                elif pos in ('NOUN', 'PROPN'):
                     gender_morph = token.morph.get("Gender")
                     if gender_morph:
                         gender = gender_morph[0] if isinstance(gender_morph, list) else gender_morph
                     else:
                         gender = guess_gender_by_ending(lemma)
 
-                # Format lemma text
-                formatted_lemma = format_lemma_text(lemma, pos, gender)
+                # Format lemma text (indexed lemmas are already stored in DB format)
+                formatted_lemma = known['lemma_text'] if known else format_lemma_text(lemma, pos, gender)
                 formatted_lower = formatted_lemma.lower()
 
                 # Look up or create lemma
                 lemma_id = None
-                if formatted_lower in existing_lemmas:
+                if known:
+                    lemma_id = known['lemma_id']
+                    stats['lemmas_indexed'] += 1
+                elif formatted_lower in existing_lemmas:
                     lemma_id = existing_lemmas[formatted_lower]
                     stats['lemmas_matched'] += 1
                 else:
@@ -1599,18 +1933,19 @@ def process_single_song(
 
             stats['lines_processed'] += 1
 
-        # Batch insert word records for this song
-        if word_records:
-            # Insert in batches of 100 to avoid payload size issues
-            batch_size = 100
-            for i in range(0, len(word_records), batch_size):
-                batch = word_records[i:i + batch_size]
-                success, result = client.insert('song_line_words', batch)
-                if success:
-                    stats['words_created'] += len(batch)
-                else:
-                    stats['error'] = f"Failed to insert batch: {result}"
-                    break
+        # Replace the words of these lines and record their content hash
+        processed_lines = [
+            {'line_id': line_data['line_id'], 'content_hash': line_data['content_hash']}
+            for line_data in song_lines
+        ]
+        success, result = client.rpc('replace_song_line_words', {
+            'p_lines': processed_lines,
+            'p_words': word_records
+        })
+        if success:
+            stats['words_created'] = len(word_records)
+        else:
+            stats['error'] = f"Failed to replace words: {result}"
 
     except Exception as e:
         stats['error'] = str(e)
@@ -1618,11 +1953,12 @@ def process_single_song(
     return stats
 
 
-def extract_lemmas() -> dict:
+def extract_lemmas(lemma_index_path: Path = None, shared: SharedData = None) -> dict:
     """
     Extract lemmas from learnable lines using spaCy.
     Creates song_line_words records with word positions and grammatical info.
-    Processes one song at a time with resume capability at line level.
+    Processes one song at a time; only lines whose words_hash differs from
+    their content_hash (new or edited lines) are re-tokenized.
     """
     client = SupabaseClient(SUPABASE_URL, SUPABASE_KEY)
 
@@ -1641,35 +1977,48 @@ def extract_lemmas() -> dict:
 
     # Get existing lemmas (shared cache across songs)
     print("Loading existing lemmas... ", end='', flush=True)
-    success, existing_lemmas = get_existing_lemmas_map(client)
+    success, existing_lemmas = load_shared(shared, 'lemma_map', get_existing_lemmas_map, client)
     if not success:
         print(f"FAILED: {existing_lemmas}")
         return {'error': existing_lemmas}
     print(f"{len(existing_lemmas)} lemmas")
 
+    # Load exported word form -> lemma index (optional)
+    lemma_index = None
+    if lemma_index_path:
+        from lemma_index import LemmaIndex
+        print("Loading lemma index... ", end='', flush=True)
+        lemma_index = LemmaIndex.open(lemma_index_path)
+        if not lemma_index:
+            print(f"FAILED: {lemma_index_path} not found")
+            return {'error': f"Lemma index not found: {lemma_index_path}"}
+        success, lemma_rows = select_all(client, 'lemmas', 'lemma_id', 'lemma_id')
+        if not success:
+            print(f"FAILED: {lemma_rows}")
+            return {'error': lemma_rows}
+        stale = lemma_index.drop_missing({row['lemma_id'] for row in lemma_rows})
+        print(f"{len(lemma_index)} word forms (exported {lemma_index.exported_at:%Y-%m-%d %H:%M})")
+        if stale:
+            print(f"  WARNING: ignoring {stale} forms whose lemma no longer exists "
+                  f"- rebuild with lemma_index.py --build")
+
     # Get slang terms to filter out
     print("Loading slang terms... ", end='', flush=True)
-    success, slang_terms = get_slang_terms_set(client)
+    success, slang_ids = load_shared(shared, 'slang_ids', get_slang_id_map, client)
     if not success:
-        print(f"FAILED: {slang_terms}")
-        return {'error': slang_terms}
+        print(f"FAILED: {slang_ids}")
+        return {'error': slang_ids}
+    slang_terms = set(slang_ids)
     print(f"{len(slang_terms)} terms")
 
-    # Get lines that already have words (for resume capability)
-    print("Checking existing word records... ", end='', flush=True)
-    lines_with_words = get_lines_with_words(client)
-    print(f"{len(lines_with_words)} lines already processed")
-
-    # Get songs that already have words (for skip display)
-    completed_songs = get_songs_with_words(client)
-
     # Get learnable lines grouped by song
     print("Loading learnable lines... ", end='', flush=True)
-    success, lines = get_learnable_lines_with_songs(client)
+    success, lines = load_shared(shared, 'learnable_lines', get_learnable_lines_with_songs, client)
     if not success:
         print(f"FAILED: {lines}")
         return {'error': lines}
-    print(f"{len(lines)} lines")
+    stale = sum(1 for line in lines if line['words_hash'] != line['content_hash'])
+    print(f"{len(lines)} lines ({stale} new or edited)")
     print()
 
     # Group lines by song (keeping full line data)
@@ -1681,12 +2030,8 @@ def extract_lemmas() -> dict:
                 'title': line['song_title'],
                 'lines': []
             }
-        # Keep full line data including line_id and section_id
-        songs_lines[song_id]['lines'].append({
-            'line_id': line['line_id'],
-            'line_text': line['line_text'],
-            'section_id': line['section_id']
-        })
+        # Keep the line dicts themselves so words_hash updates reach later phases
+        songs_lines[song_id]['lines'].append(line)
 
     # Results tracking
     results = {
@@ -1695,6 +2040,7 @@ def extract_lemmas() -> dict:
         'words_created': 0,
         'lemmas_matched': 0,
         'lemmas_created': 0,
+        'lemmas_indexed': 0,
         'skipped_slang': 0,
         'per_song': [],
         'errors': []
@@ -1706,14 +2052,12 @@ def extract_lemmas() -> dict:
     for song_id, song_data in songs_lines.items():
         title = song_data['title']
 
-        # Skip songs that are fully completed
-        if song_id in completed_songs:
-            # Check if ALL lines for this song have words
-            song_line_ids = {l['line_id'] for l in song_data['lines']}
-            if song_line_ids.issubset(lines_with_words):
-                print(f"  [skip] {title}: already completed")
-                results['songs_skipped'] += 1
-                continue
+        # Only lines that are new or changed since their words were extracted
+        stale_lines = [l for l in song_data['lines'] if l['words_hash'] != l['content_hash']]
+        if not stale_lines:
+            print(f"  [skip] {title}: up to date")
+            results['songs_skipped'] += 1
+            continue
 
         # Process this song
         print(f"  Processing {title}... ", end='', flush=True)
@@ -1723,22 +2067,24 @@ def extract_lemmas() -> dict:
             nlp=nlp,
             song_id=song_id,
             song_title=title,
-            song_lines=song_data['lines'],
+            song_lines=stale_lines,
             existing_lemmas=existing_lemmas,
             slang_terms=slang_terms,
-            lines_with_words=lines_with_words
+            lemma_index=lemma_index
         )
 
         if stats['error']:
             print(f"ERROR: {stats['error']}")
             results['errors'].append(f"{title}: {stats['error']}")
         else:
-            skip_msg = f" (skipped {stats['lines_skipped']} lines)" if stats['lines_skipped'] > 0 else ""
+            unchanged = len(song_data['lines']) - len(stale_lines)
+            skip_msg = f" (skipped {unchanged} unchanged lines)" if unchanged > 0 else ""
             print(f"Created {stats['words_created']} words{skip_msg}")
             results['songs_processed'] += 1
             results['words_created'] += stats['words_created']
             results['lemmas_matched'] += stats['lemmas_matched']
             results['lemmas_created'] += stats['lemmas_created']
+            results['lemmas_indexed'] += stats['lemmas_indexed']
             results['skipped_slang'] += stats['skipped_slang']
             results['per_song'].append({
                 'title': title,
@@ -1747,9 +2093,8 @@ def extract_lemmas() -> dict:
                 'lemmas_new': stats['lemmas_created']
             })
 
-            # Update lines_with_words for next song's resume check
-            for line_data in song_data['lines']:
-                lines_with_words.add(line_data['line_id'])
+            for line_data in stale_lines:
+                line_data['words_hash'] = line_data['content_hash']
 
     print()
 
@@ -1762,6 +2107,8 @@ def extract_lemmas() -> dict:
     print(f"  Words created:      {results['words_created']}")
     print(f"  Lemmas matched:     {results['lemmas_matched']}")
     print(f"  Lemmas created:     {results['lemmas_created']}")
+    if lemma_index:
+        print(f"  From lemma index:   {results['lemmas_indexed']}")
     print(f"  Slang skipped:      {results['skipped_slang']}")
 
     if results['errors']:
@@ -1886,110 +2233,70 @@ def find_phrase_positions(
     return None
 
 
-def get_song_phrases_for_detection(client: SupabaseClient, song_id: str) -> Tuple[bool, list | str]:
-    """Get phrases linked to a song via song_phrases."""
-    url = f"{client.base_url}/song_phrases"
-    params = {"select": "phrase_id", "song_id": f"eq.{song_id}"}
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code != 200:
-        return False, f"HTTP {response.status_code}: {response.text}"
+def get_song_vocabulary_for_detection(client: SupabaseClient) -> Tuple[bool, dict | str]:
+    """
+    Get the phrases and slang linked to every song (song_phrases / song_slang).
+    Returns (success, {song_id: {'phrases': [...], 'slang': [...]}}).
+    """
+    vocabulary = {}
 
-    phrase_ids = [p['phrase_id'] for p in response.json()]
-    if not phrase_ids:
-        return True, []
+    success, rows = select_all(client, 'song_phrases', 'song_id,phrases(phrase_id,phrase_text)', 'song_id,phrase_id')
+    if not success:
+        return False, rows
+    for row in rows:
+        if row['phrases']:
+            vocabulary.setdefault(row['song_id'], {'phrases': [], 'slang': []})['phrases'].append(row['phrases'])
 
-    ids_str = ','.join(f'"{pid}"' for pid in phrase_ids)
-    url = f"{client.base_url}/phrases"
-    params = {"select": "phrase_id,phrase_text", "phrase_id": f"in.({ids_str})"}
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code == 200:
-        return True, response.json()
-    return False, f"HTTP {response.status_code}: {response.text}"
+    success, rows = select_all(client, 'song_slang', 'song_id,slang_terms(slang_id,term)', 'song_id,slang_id')
+    if not success:
+        return False, rows
+    for row in rows:
+        if row['slang_terms']:
+            vocabulary.setdefault(row['song_id'], {'phrases': [], 'slang': []})['slang'].append(row['slang_terms'])
 
+    return True, vocabulary
 
-def get_song_slang_for_detection(client: SupabaseClient, song_id: str) -> Tuple[bool, list | str]:
-    """Get slang terms linked to a song via song_slang."""
-    url = f"{client.base_url}/song_slang"
-    params = {"select": "slang_id", "song_id": f"eq.{song_id}"}
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code != 200:
-        return False, f"HTTP {response.status_code}: {response.text}"
 
-    slang_ids = [s['slang_id'] for s in response.json()]
-    if not slang_ids:
-        return True, []
+def get_line_words_for_detection(client: SupabaseClient) -> Tuple[bool, dict | str]:
+    """Get {line_id: [{word_text, word_position}, ...]} for all lines, ordered by position."""
+    success, rows = select_all(client, 'song_line_words', 'line_id,word_text,word_position', 'line_id,word_position')
+    if not success:
+        return False, rows
 
-    ids_str = ','.join(f'"{sid}"' for sid in slang_ids)
-    url = f"{client.base_url}/slang_terms"
-    params = {"select": "slang_id,term", "slang_id": f"in.({ids_str})"}
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code == 200:
-        return True, response.json()
-    return False, f"HTTP {response.status_code}: {response.text}"
+    words = {}
+    for row in rows:
+        words.setdefault(row['line_id'], []).append(
+            {'word_text': row['word_text'], 'word_position': row['word_position']}
+        )
+    return True, words
 
 
-def get_line_words_for_detection(client: SupabaseClient, line_id: str) -> list:
-    """Get word records for a line, ordered by position."""
-    url = f"{client.base_url}/song_line_words"
-    params = {
-        "select": "word_text,word_position",
-        "line_id": f"eq.{line_id}",
-        "order": "word_position"
+def get_existing_occurrences(client: SupabaseClient, table: str, id_column: str) -> Tuple[bool, dict | str]:
+    """Get {(line_id, <id_column>, start, end): occurrence_id} for an occurrence table."""
+    success, rows = select_all(
+        client, table, f"occurrence_id,line_id,{id_column},start_position,end_position", 'occurrence_id'
+    )
+    if not success:
+        return False, rows
+    return True, {
+        (row['line_id'], row[id_column], row['start_position'], row['end_position']): row['occurrence_id']
+        for row in rows
     }
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code == 200:
-        return response.json()
-    return []
-
-
-def get_songs_with_occurrences(client: SupabaseClient) -> set:
-    """Get song_ids that have occurrence records (for resume)."""
-    phrase_songs = set()
-    slang_songs = set()
-
-    url = f"{client.base_url}/song_line_phrase_occurrences"
-    params = {"select": "song_id"}
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code == 200:
-        phrase_songs = {r['song_id'] for r in response.json()}
-
-    url = f"{client.base_url}/song_line_slang_occurrences"
-    params = {"select": "song_id"}
-    response = requests.get(url, headers=client.headers, params=params)
-    if response.status_code == 200:
-        slang_songs = {r['song_id'] for r in response.json()}
-
-    return phrase_songs | slang_songs
 
 
 def detect_occurrences_for_song(
-    client: SupabaseClient,
     song_id: str,
-    song_title: str,
-    lines: List[dict]
-) -> dict:
+    lines: List[dict],
+    line_words: Dict[str, List[dict]],
+    phrases: List[dict],
+    slang_terms: List[dict]
+) -> Tuple[List[dict], List[dict]]:
     """
-    Detect phrase and slang occurrences for a single song.
-    lines is list of {line_id, line_text, section_id}.
+    Detect phrase and slang occurrences for a single song (no database access,
+    so songs can be matched in a process pool).
+    lines is list of {line_id, line_text, section_id}; line_words maps line_id
+    to its words. Returns (phrase_records, slang_records).
     """
-    stats = {
-        'title': song_title,
-        'phrase_occurrences': 0,
-        'slang_occurrences': 0,
-        'error': None
-    }
-
-    # Get phrases and slang for this song
-    success, phrases = get_song_phrases_for_detection(client, song_id)
-    if not success:
-        stats['error'] = f"Failed to get phrases: {phrases}"
-        return stats
-
-    success, slang_terms = get_song_slang_for_detection(client, song_id)
-    if not success:
-        stats['error'] = f"Failed to get slang: {slang_terms}"
-        return stats
-
     phrase_records = []
     slang_records = []
 
@@ -2001,11 +2308,11 @@ def detect_occurrences_for_song(
         if not line_text:
             continue
 
-        line_words = get_line_words_for_detection(client, line_id)
+        words = line_words.get(line_id, [])
 
         # Check phrases
         for phrase in phrases:
-            positions = find_phrase_positions(line_text, phrase['phrase_text'], line_words)
+            positions = find_phrase_positions(line_text, phrase['phrase_text'], words)
             if positions:
                 phrase_records.append({
                     'phrase_id': phrase['phrase_id'],
@@ -2018,7 +2325,7 @@ def detect_occurrences_for_song(
 
         # Check slang
         for slang in slang_terms:
-            positions = find_phrase_positions(line_text, slang['term'], line_words)
+            positions = find_phrase_positions(line_text, slang['term'], words)
             if positions:
                 slang_records.append({
                     'slang_id': slang['slang_id'],
@@ -2029,31 +2336,57 @@ def detect_occurrences_for_song(
                     'end_position': positions[1]
                 })
 
-    # Insert phrase occurrences
-    if phrase_records:
-        success, result = client.insert('song_line_phrase_occurrences', phrase_records)
-        if success:
-            stats['phrase_occurrences'] = len(phrase_records)
-        else:
-            stats['error'] = f"Failed to insert phrase occurrences: {result}"
-            return stats
+    return phrase_records, slang_records
 
-    # Insert slang occurrences
-    if slang_records:
-        success, result = client.insert('song_line_slang_occurrences', slang_records)
-        if success:
-            stats['slang_occurrences'] = len(slang_records)
-        else:
-            stats['error'] = f"Failed to insert slang occurrences: {result}"
-            return stats
 
-    return stats
+def vocabulary_fingerprint(phrases: List[dict], slang_terms: List[dict]) -> str:
+    """Hash of the phrases and slang a song's lines are matched against."""
+    entries = sorted([f"phrase:{p['phrase_id']}:{p['phrase_text']}" for p in phrases] +
+                     [f"slang:{s['slang_id']}:{s['term']}" for s in slang_terms])
+    return hashlib.md5('\n'.join(entries).encode('utf-8')).hexdigest()
+
+
+def occurrences_hash(content_hash: str, fingerprint: str) -> str:
+    """
+    occurrences_hash of a line matched at content_hash against a vocabulary:
+    it goes stale when the line's text or its song's vocabulary changes.
+    """
+    return hashlib.md5(f"{content_hash}:{fingerprint}".encode('utf-8')).hexdigest()
 
 
-def detect_occurrences() -> dict:
+def diff_occurrences(
+    records: List[dict],
+    existing: Dict[tuple, str],
+    id_column: str,
+    line_ids: set
+) -> Tuple[List[dict], List[str]]:
+    """
+    Compare detected records with stored occurrences of the same lines.
+    Returns (records to insert, occurrence_ids to delete).
+    """
+    detected = {
+        (r['line_id'], r[id_column], r['start_position'], r['end_position']): r
+        for r in records
+    }
+    inserts = [r for key, r in detected.items() if key not in existing]
+    deletes = [
+        occurrence_id for key, occurrence_id in existing.items()
+        if key[0] in line_ids and key not in detected
+    ]
+    return inserts, deletes
+
+
+def detect_occurrences(shared: SharedData = None) -> dict:
     """
     Detect phrase and slang occurrences in song lines.
-    Creates position records in song_line_phrase_occurrences and song_line_slang_occurrences.
+    Loads lines, words, song vocabulary and stored occurrences in a few bulk
+    reads, matches the songs with stale lines in a process pool, and applies
+    only the resulting inserts/deletes (plus occurrences_hash) in one
+    apply_song_line_occurrence_changes call. A line is stale when its
+    occurrences_hash doesn't match its content_hash and its song's current
+    vocabulary, so after editing a verse only that line is re-matched, and
+    after linking new vocabulary only that song's lines. Lines whose words
+    are out of date (words_hash) wait for --extract-lemmas.
     """
     client = SupabaseClient(SUPABASE_URL, SUPABASE_KEY)
 
@@ -2063,11 +2396,6 @@ def detect_occurrences() -> dict:
     print("=" * 60)
     print()
 
-    # Get songs with existing occurrences (for resume)
-    print("Checking existing occurrence records... ", end='', flush=True)
-    completed_songs = get_songs_with_occurrences(client)
-    print(f"{len(completed_songs)} songs already processed")
-
     # Get all songs
     print("Loading songs... ", end='', flush=True)
     success, songs = client.select('songs', 'song_id,title', order='title')
@@ -2078,65 +2406,147 @@ def detect_occurrences() -> dict:
 
     # Get learnable lines for all songs
     print("Loading learnable lines... ", end='', flush=True)
-    success, all_lines = get_learnable_lines_with_songs(client)
+    success, all_lines = load_shared(shared, 'learnable_lines', get_learnable_lines_with_songs, client)
     if not success:
         print(f"FAILED: {all_lines}")
         return {'error': all_lines}
     print(f"{len(all_lines)} lines")
+
+    print("Loading words... ", end='', flush=True)
+    success, line_words = get_line_words_for_detection(client)
+    if not success:
+        print(f"FAILED: {line_words}")
+        return {'error': line_words}
+    print(f"{sum(len(w) for w in line_words.values())} words")
+
+    print("Loading song phrases and slang... ", end='', flush=True)
+    success, vocabulary = get_song_vocabulary_for_detection(client)
+    if not success:
+        print(f"FAILED: {vocabulary}")
+        return {'error': vocabulary}
+    print(f"{len(vocabulary)} songs with vocabulary")
+
+    print("Loading existing occurrences... ", end='', flush=True)
+    success, existing_phrases = get_existing_occurrences(client, 'song_line_phrase_occurrences', 'phrase_id')
+    if not success:
+        print(f"FAILED: {existing_phrases}")
+        return {'error': existing_phrases}
+    success, existing_slang = get_existing_occurrences(client, 'song_line_slang_occurrences', 'slang_id')
+    if not success:
+        print(f"FAILED: {existing_slang}")
+        return {'error': existing_slang}
+    print(f"{len(existing_phrases)} phrase, {len(existing_slang)} slang")
     print()
 
     # Group lines by song
     songs_lines = {}
     for line in all_lines:
-        song_id = line['song_id']
-        if song_id not in songs_lines:
-            songs_lines[song_id] = []
-        songs_lines[song_id].append({
-            'line_id': line['line_id'],
-            'line_text': line['line_text'],
-            'section_id': line['section_id']
-        })
+        songs_lines.setdefault(line['song_id'], []).append(line)
 
     # Results tracking
     results = {
         'songs_processed': 0,
         'songs_skipped': 0,
+        'songs_unchanged': 0,
+        'lines_waiting': 0,
         'phrase_occurrences': 0,
         'slang_occurrences': 0,
+        'inserted': 0,
+        'deleted': 0,
         'errors': []
     }
 
     print("PROCESSING SONGS:")
     print("-" * 60)
 
+    # Only lines whose words are current can be matched, and only stale ones need to be
+    jobs = []
+    target_hashes = {}
     for song in songs:
         song_id = song['song_id']
-        song_title = song['title']
+        lines = songs_lines.get(song_id, [])
+        ready = [l for l in lines if l['words_hash'] == l['content_hash']]
+        results['lines_waiting'] += len(lines) - len(ready)
 
-        # Skip if already processed
-        if song_id in completed_songs:
-            print(f"  [skip] {song_title}: already processed")
+        if not ready:
+            reason = f"{len(lines)} lines need --extract-lemmas first" if lines else "no lines"
+            print(f"  [skip] {song['title']}: {reason}")
             results['songs_skipped'] += 1
             continue
 
-        lines = songs_lines.get(song_id, [])
-        if not lines:
-            print(f"  [skip] {song_title}: no lines")
-            results['songs_skipped'] += 1
+        song_vocabulary = vocabulary.get(song_id, {'phrases': [], 'slang': []})
+        fingerprint = vocabulary_fingerprint(song_vocabulary['phrases'], song_vocabulary['slang'])
+        for l in ready:
+            target_hashes[l['line_id']] = occurrences_hash(l['content_hash'], fingerprint)
+        stale = [l for l in ready if l['occurrences_hash'] != target_hashes[l['line_id']]]
+
+        if not stale:
+            results['songs_unchanged'] += 1
             continue
 
-        print(f"  Processing {song_title}... ", end='', flush=True)
+        jobs.append((song, stale, {l['line_id']: line_words.get(l['line_id'], []) for l in stale},
+                     song_vocabulary['phrases'], song_vocabulary['slang']))
 
-        stats = detect_occurrences_for_song(client, song_id, song_title, lines)
+    if results['songs_unchanged']:
+        print(f"  {results['songs_unchanged']} songs up to date")
 
-        if stats['error']:
-            print(f"ERROR: {stats['error']}")
-            results['errors'].append(f"{song_title}: {stats['error']}")
+    print(f"  Matching {len(jobs)} songs ({OCCURRENCE_WORKERS} workers)...")
+
+    # Spawn rather than fork: the phase runner has other threads (and their
+    # locks) live while this phase runs
+    mp_context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=OCCURRENCE_WORKERS, mp_context=mp_context) as executor:
+        futures = [
+            executor.submit(detect_occurrences_for_song, song['song_id'], lines, words, phrases, slang)
+            for song, lines, words, phrases, slang in jobs
+        ]
+        detections = [future.result() for future in futures]
+
+    # Diff against stored occurrences
+    changes = {'lines': [], 'phrase_inserts': [], 'phrase_deletes': [], 'slang_inserts': [], 'slang_deletes': []}
+
+    for (song, lines, _, _, _), (phrase_records, slang_records) in zip(jobs, detections):
+        line_ids = {l['line_id'] for l in lines}
+
+        phrase_inserts, phrase_deletes = diff_occurrences(phrase_records, existing_phrases, 'phrase_id', line_ids)
+        slang_inserts, slang_deletes = diff_occurrences(slang_records, existing_slang, 'slang_id', line_ids)
+
+        changes['phrase_inserts'].extend(phrase_inserts)
+        changes['phrase_deletes'].extend(phrase_deletes)
+        changes['slang_inserts'].extend(slang_inserts)
+        changes['slang_deletes'].extend(slang_deletes)
+        changes['lines'].extend(
+            {'line_id': l['line_id'], 'content_hash': target_hashes[l['line_id']]} for l in lines
+        )
+
+        inserted = len(phrase_inserts) + len(slang_inserts)
+        deleted = len(phrase_deletes) + len(slang_deletes)
+        print(f"  {song['title']}: {len(phrase_records)} phrases, {len(slang_records)} slang "
+              f"(+{inserted} -{deleted})")
+
+        results['songs_processed'] += 1
+        results['phrase_occurrences'] += len(phrase_records)
+        results['slang_occurrences'] += len(slang_records)
+        results['inserted'] += inserted
+        results['deleted'] += deleted
+
+    # Apply all inserts/deletes in one transaction
+    if results['inserted'] or results['deleted'] or changes['lines']:
+        print()
+        print("Applying changes... ", end='', flush=True)
+        success, error = client.rpc('apply_song_line_occurrence_changes', {
+            'p_lines': changes['lines'],
+            'p_phrase_deletes': changes['phrase_deletes'],
+            'p_slang_deletes': changes['slang_deletes'],
+            'p_phrase_inserts': changes['phrase_inserts'],
+            'p_slang_inserts': changes['slang_inserts']
+        })
+        if success:
+            print("✓")
         else:
-            print(f"{stats['phrase_occurrences']} phrases, {stats['slang_occurrences']} slang")
-            results['songs_processed'] += 1
-            results['phrase_occurrences'] += stats['phrase_occurrences']
-            results['slang_occurrences'] += stats['slang_occurrences']
+            print(f"✗ {error}")
+            results['errors'].append(f"Failed to apply occurrence changes: {error}")
+            results['inserted'] = results['deleted'] = 0
 
     print()
 
@@ -2146,8 +2556,13 @@ def detect_occurrences() -> dict:
     print("=" * 60)
     print(f"  Songs processed:      {results['songs_processed']}")
     print(f"  Songs skipped:        {results['songs_skipped']}")
+    print(f"  Songs up to date:     {results['songs_unchanged']}")
+    if results['lines_waiting']:
+        print(f"  Lines waiting:        {results['lines_waiting']} (run --extract-lemmas first)")
     print(f"  Phrase occurrences:   {results['phrase_occurrences']}")
     print(f"  Slang occurrences:    {results['slang_occurrences']}")
+    print(f"  Rows inserted:        {results['inserted']}")
+    print(f"  Rows deleted:         {results['deleted']}")
 
     if results['errors']:
         print()
@@ -2162,6 +2577,59 @@ def detect_occurrences() -> dict:
 # PHASE 9: FIX TRANSLATIONS
 # =============================================================================
 
+FIX_TRANSLATIONS_PROMPT = """Review the given Spanish lyrics and their English translations. Fix any translations that are wrong due to:
+1. Idiomatic phrases translated literally
+2. Puerto Rican slang not recognized
+3. Phonetic contractions misunderstood (e.g., pa' = para, 'ta = está)
+
+For each line that needs fixing, respond with JSON:
+{
+  "fixes": [
+    {
+      "line_order": 5,
+      "original_translation": "the current wrong translation",
+      "corrected_translation": "the improved translation",
+      "reason": "brief explanation of what was wrong"
+    }
+  ]
+}
+
+Only include lines that NEED fixes. If translation is correct, don't include it.
+If no fixes needed, return {"fixes": []}
+"""
+
+# One element of the "fixes" array in a fix-translations response
+TRANSLATION_FIX_SCHEMA = Schema(
+    {'line_order': int, 'corrected_translation': str},
+    {'original_translation': str, 'reason': str},
+)
+
+def get_learnable_lines_for_fixes(client: SupabaseClient) -> Tuple[bool, dict | str]:
+    """
+    Load every learnable line once, with its section's song_id and order embedded.
+    Returns (success, {song_id: [line, ...]} or error), each song's lines in
+    lyric order (section_order, then line_order within the section).
+    """
+    success, lines = select_all(
+        client, 'song_lines',
+        'line_id,section_id,line_order,line_text,translation,song_sections(song_id,section_order)',
+        'line_id', {'is_skippable': 'false'}
+    )
+    if not success:
+        return False, lines
+
+    lines_by_song = {}
+    for line in lines:
+        section = line.pop('song_sections') or {}
+        line['section_order'] = section.get('section_order', 0)
+        lines_by_song.setdefault(section.get('song_id'), []).append(line)
+
+    for lines in lines_by_song.values():
+        lines.sort(key=lambda l: (l['section_order'], l['line_order']))
+
+    return True, lines_by_song
+
+
 def fix_translations() -> dict:
     """
     Use Claude AI to fix translation errors caused by:
@@ -2169,7 +2637,8 @@ def fix_translations() -> dict:
     - Puerto Rican slang not recognized
     - Phonetic contractions misunderstood
 
-    Processes songs one at a time with incremental saves.
+    Processes songs one at a time with incremental saves: all lines are
+    loaded once up front and each song's fixes are written with one upsert.
     """
     print()
     print("=" * 60)
@@ -2228,11 +2697,23 @@ def fix_translations() -> dict:
         results['error'] = f"Failed to load songs: {songs}"
         return results
     print(f"  Found {len(songs)} songs")
+
+    # Step 4: Load all learnable lines, grouped by song
+    success, lines_by_song = get_learnable_lines_for_fixes(client)
+    if not success:
+        results['error'] = f"Failed to load lines: {lines_by_song}"
+        return results
+    print(f"  Loaded {sum(len(v) for v in lines_by_song.values())} learnable lines")
     print()
 
-    # Build slang and phrase reference strings (truncate if too long)
+    # Build slang and phrase reference strings (truncate if too long). They are
+    # the same for every song, so they go in the cached system prefix.
     slang_ref_str = "\n".join(slang_reference[:150])  # Limit to prevent token overflow
     phrase_ref_str = "\n".join(phrase_reference[:50])
+    instructions = [
+        FIX_TRANSLATIONS_PROMPT,
+        f"SLANG REFERENCE (Puerto Rican Spanish):\n{slang_ref_str}\n\nPHRASE REFERENCE:\n{phrase_ref_str}",
+    ]
 
     print("PROCESSING SONGS (one at a time):")
     print("-" * 40)
@@ -2242,91 +2723,48 @@ def fix_translations() -> dict:
         song_title = song['title']
 
         try:
-            # Get learnable lines for this song
-            url = f"{client.base_url}/song_lines"
-            params = {
-                "select": "line_id,line_order,line_text,translation,section_id",
-                "is_skippable": "eq.false"
-            }
-            # Need to filter by song through sections
-            response = requests.get(url, headers=client.headers, params=params)
-
-            if response.status_code != 200:
-                print(f"  → {song_title}... ✗ Error: Failed to load lines")
-                results['errors'].append({'song': song_title, 'error': 'Failed to load lines'})
-                continue
-
-            all_lines = response.json()
-
-            # Get sections for this song to filter lines
-            success, sections = client.select('song_sections', 'section_id', {'song_id': song_id})
-            if not success:
-                print(f"  → {song_title}... ✗ Error: Failed to load sections")
-                results['errors'].append({'song': song_title, 'error': 'Failed to load sections'})
-                continue
-
-            section_ids = {s['section_id'] for s in sections}
-            song_lines = [l for l in all_lines if l['section_id'] in section_ids]
+            song_lines = lines_by_song.get(song_id, [])
 
             if not song_lines:
                 print(f"  ⊘ {song_title}: skipped (no learnable lines)")
                 results['songs_skipped'] += 1
                 continue
 
-            # Sort by line_order
-            song_lines.sort(key=lambda x: x['line_order'])
-
-            # Build lyrics for prompt
+            # Build lyrics for prompt. line_order restarts in every section,
+            # so lines are numbered by their position in the song instead.
             lyrics_for_prompt = []
-            for line in song_lines:
+            for position, line in enumerate(song_lines, 1):
                 lyrics_for_prompt.append({
-                    'line_order': line['line_order'],
+                    'line_order': position,
                     'spanish': line['line_text'],
                     'english': line['translation'] or '(no translation)'
                 })
 
-            # Build Claude prompt
-            prompt = f"""Review these Spanish lyrics and their English translations. Fix any translations that are wrong due to:
-1. Idiomatic phrases translated literally
-2. Puerto Rican slang not recognized
-3. Phonetic contractions misunderstood (e.g., pa' = para, 'ta = está)
-
-SLANG REFERENCE (Puerto Rican Spanish):
-{slang_ref_str}
-
-PHRASE REFERENCE:
-{phrase_ref_str}
-
-LYRICS TO REVIEW:
-{json.dumps(lyrics_for_prompt, ensure_ascii=False, indent=2)}
-
-For each line that needs fixing, respond with JSON:
-{{
-  "fixes": [
-    {{
-      "line_order": 5,
-      "original_translation": "the current wrong translation",
-      "corrected_translation": "the improved translation",
-      "reason": "brief explanation of what was wrong"
-    }}
-  ]
-}}
-
-Only include lines that NEED fixes. If translation is correct, don't include it.
-If no fixes needed, return {{"fixes": []}}
-"""
-
             # Call Claude API with 60-second timeout
-            success, response_data = call_claude_api(prompt, timeout=60)
+            with ledger.scope(f"song {song_title}"):
+                success, response = call_claude_api(
+                    'fix-translations', instructions,
+                    f"LYRICS TO REVIEW:\n{json.dumps(lyrics_for_prompt, ensure_ascii=False, indent=2)}",
+                    timeout=60, schema=TRANSLATION_FIX_SCHEMA, items_key='fixes', items=len(song_lines)
+                )
 
             if not success:
-                print(f"  → {song_title}... ✗ Error: {str(response_data)[:50]}")
-                results['errors'].append({'song': song_title, 'error': str(response_data)[:100]})
+                print(f"  → {song_title}... ✗ Error: {str(response)[:50]}")
+                results['errors'].append({'song': song_title, 'error': str(response)[:100]})
                 time.sleep(2)  # Still wait before next call
                 continue
 
-            # Parse fixes from response
-            fixes = response_data.get('fixes', [])
+            # Fixes parsed before a malformed or cut-off tail are still applied;
+            # the song is reported so the rest can be reviewed on a re-run
+            fixes = response.items
+            if not response.complete or response.invalid:
+                reason = response.error or response.invalid[0][1]
+                print(f"  → {song_title}... ⚠ Incomplete response, {len(fixes)} fixes parsed: {reason[:50]}")
+                results['errors'].append({'song': song_title,
+                                          'error': f"Incomplete response ({len(fixes)} fixes kept): {reason[:100]}"})
+                if not fixes:
+                    time.sleep(2)
+                    continue
 
             if not fixes:
                 print(f"  ✓ {song_title}: 0 fixes needed")
@@ -2335,37 +2773,46 @@ If no fixes needed, return {{"fixes": []}}
                 time.sleep(2)
                 continue
 
-            # Apply fixes to database
-            fixes_applied = 0
+            # Collect fixes, then apply them with one bulk write
+            fixed_rows = {}
+            fix_log = []
             for fix in fixes:
-                line_order = fix.get('line_order')
-                new_translation = fix.get('corrected_translation')
+                line_order = fix['line_order']
+                new_translation = fix['corrected_translation']
 
-                if not line_order or not new_translation:
+                if not new_translation:
                     continue
 
-                # Find the line_id for this line_order
-                matching_line = next((l for l in song_lines if l['line_order'] == line_order), None)
-                if not matching_line:
+                # line_order is the 1-based position in song_lines
+                if not 1 <= line_order <= len(song_lines):
                     continue
+                matching_line = song_lines[line_order - 1]
+
+                fixed_rows[matching_line['line_id']] = {
+                    'line_id': matching_line['line_id'],
+                    'section_id': matching_line['section_id'],
+                    'line_order': matching_line['line_order'],
+                    'line_text': matching_line['line_text'],
+                    'translation': new_translation
+                }
+                fix_log.append({
+                    'song': song_title,
+                    'line_order': line_order,
+                    'spanish': matching_line['line_text'],
+                    'original': fix.get('original_translation'),
+                    'corrected': new_translation,
+                    'reason': fix.get('reason')
+                })
 
-                # Update the translation
-                update_success, msg = client.update(
-                    'song_lines',
-                    {'translation': new_translation},
-                    {'line_id': matching_line['line_id']}
-                )
-
+            fixes_applied = 0
+            if fixed_rows:
+                update_success, msg = client.upsert('song_lines', list(fixed_rows.values()), 'line_id')
                 if update_success:
-                    fixes_applied += 1
-                    results['all_fixes'].append({
-                        'song': song_title,
-                        'line_order': line_order,
-                        'spanish': matching_line['line_text'],
-                        'original': fix.get('original_translation'),
-                        'corrected': new_translation,
-                        'reason': fix.get('reason')
-                    })
+                    fixes_applied = len(fixed_rows)
+                    results['all_fixes'].extend(fix_log)
+                else:
+                    print(f"  → {song_title}... ✗ Error saving fixes: {str(msg)[:50]}")
+                    results['errors'].append({'song': song_title, 'error': str(msg)[:100]})
 
             print(f"  ✓ {song_title}: {fixes_applied} lines fixed")
             results['total_fixes'] += fixes_applied
@@ -2394,8 +2841,109 @@ If no fixes needed, return {{"fixes": []}}
     return results
 
 
+# =============================================================================
+# PIPELINE: RUN SEVERAL PHASES IN ONE PROCESS
+# =============================================================================
+
+PIPELINE_PHASES = [
+    'parse', 'write', 'translate', 'flag-skippable', 'analyze',
+    'insert-vocab', 'extract-lemmas', 'detect-occurrences', 'fix-translations'
+]
+
+
+def load_album_songs(album: str) -> Tuple[bool, list | str]:
+    """Parse every album file and match its songs to the songs table (phase 1)."""
+    client = SupabaseClient(SUPABASE_URL, SUPABASE_KEY)
+
+    success, index = load_songs_index(client)
+    if not success:
+        return False, index
+
+    paths = resolve_album_paths(album)
+    if not paths:
+        return False, f"No album files found for: {album}"
+
+    unmatched = []
+    songs = list(iter_matched_songs(paths, index, unmatched))
+    print(f"Parsed {len(songs)} songs from {len(paths)} album file(s)")
+    if unmatched:
+        print(f"  Unmatched (skipped): {unmatched}")
+    return True, songs
+
+
+def build_pipeline(args) -> PhaseRunner:
+    """
+    The import phases as a DAG. Independent branches overlap, e.g. --translate
+    runs while vocabulary is inserted and words are extracted. insert-vocab
+    reads the reviewed vocabulary_analysis_cleaned.json, not analyze's output.
+    """
+    def album_songs(shared: SharedData) -> Tuple[bool, list | str]:
+        return shared.get('album_songs', lambda: load_album_songs(args.album))
+
+    def parse(shared: SharedData) -> dict:
+        success, songs = album_songs(shared)
+        if not success:
+            return {'error': songs}
+        return {
+            'songs_matched': len(songs),
+            'total_sections': sum(s['total_sections'] for s in songs),
+            'total_lines': sum(s['total_lines'] for s in songs)
+        }
+
+    def write(shared: SharedData) -> dict:
+        success, songs = album_songs(shared)
+        if not success:
+            return {'error': songs}
+        results = write_to_database(songs)
+        shared.invalidate('learnable_lines')
+        if results['failed']:
+            results['error'] = f"{len(results['failed'])} songs failed to import"
+        return results
+
+    def flag_skippable(shared: SharedData) -> dict:
+        results = flag_skippable_lines()
+        shared.invalidate('learnable_lines')
+        return results
+
+    lemma_index_path = Path(args.lemma_index) if args.lemma_index else None
+
+    return PhaseRunner([
+        Phase('parse', parse),
+        Phase('write', write, ('parse',)),
+        Phase('translate', lambda shared: translate_lines(), ('write',)),
+        Phase('flag-skippable', flag_skippable, ('write',)),
+        Phase('analyze', lambda shared: analyze_vocabulary(), ('flag-skippable',)),
+        Phase('insert-vocab', insert_vocabulary, ('write',)),
+        Phase('extract-lemmas', lambda shared: extract_lemmas(lemma_index_path, shared),
+              ('flag-skippable', 'insert-vocab')),
+        Phase('detect-occurrences', detect_occurrences, ('extract-lemmas', 'insert-vocab')),
+        Phase('fix-translations', lambda shared: fix_translations(), ('translate', 'flag-skippable')),
+    ])
+
+
+def run_pipeline(args) -> dict:
+    """Run the phases named by --phases in dependency order, sharing loaded data."""
+    names = PIPELINE_PHASES if args.phases == 'all' else [p.strip() for p in args.phases.split(',') if p.strip()]
+    runner = build_pipeline(args)
+
+    try:
+        order = runner.resolve(names)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return {'error': str(e)}
+
+    print(f"Phases: {' -> '.join(order)}")
+
+    results = runner.run(order, SharedData())
+    runner.print_timings()
+    claude.print_usage()
+    return results
+
+
 def main():
     parser = argparse.ArgumentParser(description='Parse and import lyrics')
+    parser.add_argument('--album', default=str(ALBUM_FILE), metavar='PATH',
+                        help='Album file, directory of .txt album files, or glob (default: %(default)s)')
     parser.add_argument('--output', '-o', help='Output JSON file path')
     parser.add_argument('--write', '-w', action='store_true', help='Write to database')
     parser.add_argument('--translate', '-t', action='store_true', help='Translate untranslated lines via DeepL')
@@ -2405,8 +2953,33 @@ def main():
     parser.add_argument('--extract-lemmas', action='store_true', help='Extract words with spaCy')
     parser.add_argument('--detect-occurrences', action='store_true', help='Detect phrase/slang occurrences')
     parser.add_argument('--fix-translations', action='store_true', help='Fix translations with Claude AI')
+    parser.add_argument('--lemma-index', type=str, metavar='PATH',
+                        help='With --extract-lemmas: resolve known word forms from an exported lemma index')
+    parser.add_argument('--phases', type=str, metavar='LIST',
+                        help=f"Run comma-separated phases in one process, in dependency order, or 'all' "
+                             f"({', '.join(PIPELINE_PHASES)})")
+    parser.add_argument('--check-vocalizations', nargs='?', const=str(VOCALIZATION_GOLDEN_FILE), metavar='PATH',
+                        help='Check vocalization detection on every album line against a golden JSON file '
+                             '(writes it if missing; default: %(const)s)')
     args = parser.parse_args()
 
+    if args.check_vocalizations:
+        if not check_vocalizations(Path(args.check_vocalizations), resolve_album_paths(args.album)):
+            sys.exit(1)
+        return
+
+    # Pipeline: several phases in one process
+    if args.phases:
+        print("=" * 60)
+        print("LYRICS IMPORT SCRIPT")
+        print("=" * 60)
+
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            print("ERROR: Supabase credentials not found.")
+            return
+
+        return run_pipeline(args)
+
     # Phase 9: Fix translations (skip parsing)
     if args.fix_translations:
         print("=" * 60)
@@ -2443,6 +3016,7 @@ def main():
                 for err in results['errors'][:5]:
                     print(f"    - {err['song']}: {err['error'][:40]}...")
 
+        claude.print_usage()
         return results
 
     # Phase 8: Detect occurrences (skip parsing)
@@ -2489,7 +3063,7 @@ def main():
             print("ERROR: Supabase credentials not found.")
             return
 
-        results = extract_lemmas()
+        results = extract_lemmas(Path(args.lemma_index) if args.lemma_index else None)
 
         print()
         print("=" * 60)
@@ -2585,6 +3159,7 @@ def main():
             print(f"  Results saved to: {VOCABULARY_ANALYSIS_FILE}")
             print("  Review the file before importing vocabulary.")
 
+        claude.print_usage()
         return results
 
     # Phase 4: Flag skippable lines (skip parsing)
@@ -2653,43 +3228,72 @@ def main():
     print("=" * 60)
     print()
 
-    # Load song mappings
-    print(f"Loading song mappings from: {SONG_MAPPINGS_FILE}")
-    mappings = load_song_mappings()
-    print(f"  Found {len(mappings)} songs in database")
-    print()
+    if args.write and (not SUPABASE_URL or not SUPABASE_KEY):
+        print("ERROR: Supabase credentials not found. Cannot write to database.")
+        return
 
-    # Parse album file
-    print(f"Parsing album file: {ALBUM_FILE}")
-    parsed_songs = parse_album_file(ALBUM_FILE)
-    print(f"  Found {len(parsed_songs)} songs in file")
+    # Load song index (songs table, or song_mappings.json without credentials)
+    if SUPABASE_URL and SUPABASE_KEY:
+        print("Loading songs from database... ", end='', flush=True)
+        success, mappings = load_songs_index(SupabaseClient(SUPABASE_URL, SUPABASE_KEY))
+        if not success:
+            print(f"✗ {mappings}")
+            return
+        print(f"{sum(len(songs) for songs in mappings.values())} songs")
+    else:
+        print(f"Loading song mappings from: {SONG_MAPPINGS_FILE}")
+        mappings = load_song_mappings()
+        print(f"  Found {sum(len(songs) for songs in mappings.values())} songs in database")
     print()
 
-    # Match to database
-    print("Matching songs to database...")
-    matched, unmatched = match_songs_to_database(parsed_songs, mappings)
-    print(f"  Matched: {len(matched)}/{len(parsed_songs)}")
-    if unmatched:
-        print(f"  Unmatched: {unmatched}")
+    # Resolve album files
+    album_paths = resolve_album_paths(args.album)
+    if not album_paths:
+        print(f"ERROR: No album files found for: {args.album}")
+        return
+    print(f"Album files ({len(album_paths)}):")
+    for path in album_paths:
+        print(f"  {path}")
     print()
 
+    # Stream, match and (optionally) import songs in one pass
+    unmatched = []
+    matched = []
+    breakdown = []
+
+    def track(songs: Iterable[dict]) -> Iterator[dict]:
+        for song in songs:
+            breakdown.append((song['title'], song['total_sections'], song['total_lines']))
+            if args.output:
+                matched.append(song)
+            yield song
+
+    songs = track(iter_matched_songs(album_paths, mappings, unmatched))
+
+    if args.write:
+        results = write_to_database(songs)
+    else:
+        for _ in songs:
+            pass
+
     # Build output
     output = {
         'songs': matched,
         'summary': {
-            'songs_matched': len(matched),
+            'songs_matched': len(breakdown),
             'songs_unmatched': len(unmatched),
             'unmatched_titles': unmatched,
-            'total_sections': sum(s['total_sections'] for s in matched),
-            'total_lines': sum(s['total_lines'] for s in matched)
+            'total_sections': sum(sections for _, sections, _ in breakdown),
+            'total_lines': sum(lines for _, _, lines in breakdown)
         }
     }
 
     # Print summary
+    print()
     print("=" * 60)
     print("PHASE 1 SUMMARY: PARSING")
     print("=" * 60)
-    print(f"  Songs matched:    {output['summary']['songs_matched']}/17")
+    print(f"  Songs matched:    {output['summary']['songs_matched']}/{len(breakdown) + len(unmatched)}")
     if unmatched:
         print(f"  Songs unmatched:  {unmatched}")
     print(f"  Total sections:   {output['summary']['total_sections']}")
@@ -2699,8 +3303,8 @@ def main():
     # Per-song breakdown
     print("PER-SONG BREAKDOWN:")
     print("-" * 60)
-    for song in matched:
-        print(f"  {song['title'][:30]:<30} {song['total_sections']:>3} sections, {song['total_lines']:>3} lines")
+    for title, sections, lines in breakdown:
+        print(f"  {title[:30]:<30} {sections:>3} sections, {lines:>3} lines")
     print()
 
     # Save parsed output
@@ -2713,21 +3317,14 @@ def main():
 
     # Phase 2: Write to database
     if args.write:
-        if not SUPABASE_URL or not SUPABASE_KEY:
-            print("ERROR: Supabase credentials not found. Cannot write to database.")
-            return
-
         if unmatched:
-            print(f"WARNING: {len(unmatched)} songs unmatched. They will be skipped.")
+            print(f"WARNING: {len(unmatched)} songs unmatched. They were skipped.")
             print()
 
-        results = write_to_database(matched)
-
-        print()
         print("=" * 60)
         print("PHASE 2 SUMMARY: DATABASE IMPORT")
         print("=" * 60)
-        print(f"  Songs imported:   {len(results['success'])}/17")
+        print(f"  Songs imported:   {len(results['success'])}/{len(breakdown)}")
         print(f"  Songs failed:     {len(results['failed'])}")
         print(f"  Total sections:   {results['total_sections']}")
         print(f"  Total lines:      {results['total_lines']}")
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Inflection-to-Lemma Index
+
+Exports every (word form -> lemma) decision already recorded in the `words`
+and `song_line_words` tables into a compact sorted binary file. The importers
+load it with mmap and consult it before the spaCy lemma rules, so forms we
+have seen before resolve instantly and consistently with past manual fixes
+(merge_duplicate_lemmas, fix_validation_issues, ...).
+
+Only unambiguous forms are exported: if the same word form is linked to more
+than one lemma (e.g. "como" -> comer / como), it is left out and spaCy decides.
+
+The index is a snapshot: lemmas merged or deleted after the export would
+leave forms pointing at lemma_ids that no longer exist. The header records
+the export time, and importers pass the current lemma ids to drop_missing()
+so such forms fall back to spaCy until the index is rebuilt.
+
+Usage:
+    python scripts/lemma_index.py --build                  # Build scripts/lemma_index.bin
+    python scripts/lemma_index.py --build --output idx.bin
+    python scripts/lemma_index.py --lookup tenía           # Look up a form
+
+File layout (all integers little-endian):
+    b'VQLX2\\n'                 magic
+    uint32 count                number of records
+    uint64 exported_at          export time (Unix seconds)
+    uint32 offsets[count]       record offsets relative to the data section
+    data                        records sorted by form (UTF-8 bytes):
+                                form \\0 lemma_id \\0 lemma_text \\0 pos \\0 gender \\n
+
+Requirements:
+    pip install supabase python-dotenv   (only needed for --build)
+"""
+
+import os
+import sys
+import mmap
+import struct
+import argparse
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+SCRIPT_DIR = Path(__file__).parent
+DEFAULT_INDEX_FILE = SCRIPT_DIR / "lemma_index.bin"
+
+INDEX_MAGIC = b'VQLX2\n'
+HEADER = struct.Struct('<IQ')
+OFFSET = struct.Struct('<I')
+
+PAGE_SIZE = 1000
+
+
+class LemmaIndex:
+    """Read-only, memory-mapped view of an exported lemma index."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a lemma index file (or predates {INDEX_MAGIC.strip().decode()}; "
+                             f"rebuild it with --build)")
+
+        pos = len(INDEX_MAGIC)
+        self.count, exported_at = HEADER.unpack_from(self._mm, pos)
+        self.exported_at = datetime.fromtimestamp(exported_at)
+        self._offsets_start = pos + HEADER.size
+        self._data_start = self._offsets_start + self.count * OFFSET.size
+        self._missing: Set[str] = set()
+
+    @classmethod
+    def open(cls, path: Path = DEFAULT_INDEX_FILE) -> Optional['LemmaIndex']:
+        """Open an index file, or return None if it doesn't exist."""
+        if not path or not Path(path).exists():
+            return None
+        return cls(path)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def drop_missing(self, lemma_ids: Set[str]) -> int:
+        """
+        Ignore forms whose lemma_id is not in lemma_ids (the lemmas table now),
+        i.e. lemmas merged or deleted since the export. Returns the number of
+        forms dropped; lookup() returns None for them.
+        """
+        dropped = 0
+        self._missing = set()
+        for record in self._mm[self._data_start:].split(b'\n'):
+            if not record:
+                continue
+            lemma_id = record.split(b'\0', 2)[1].decode('utf-8')
+            if lemma_id not in lemma_ids:
+                self._missing.add(lemma_id)
+                dropped += 1
+        return dropped
+
+    def _record_start(self, i: int) -> int:
+        (offset,) = OFFSET.unpack_from(self._mm, self._offsets_start + i * OFFSET.size)
+        return self._data_start + offset
+
+    def _form_at(self, start: int) -> bytes:
+        return self._mm[start:self._mm.find(b'\0', start)]
+
+    def lookup(self, word_form: str) -> Optional[Dict]:
+        """
+        Return {lemma_id, lemma_text, pos, gender} for a word form, or None.
+        Matching is on the lowercased form.
+        """
+        key = word_form.lower().strip().encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self._record_start(mid)
+            form = self._form_at(start)
+            if form < key:
+                lo = mid + 1
+            elif form > key:
+                hi = mid
+            else:
+                end = self._mm.find(b'\n', start)
+                _, lemma_id, lemma_text, pos, gender = self._mm[start:end].decode('utf-8').split('\0')
+                if lemma_id in self._missing:
+                    return None
+                return {
+                    'lemma_id': lemma_id,
+                    'lemma_text': lemma_text,
+                    'pos': pos,
+                    'gender': gender or None
+                }
+        return None
+
+
+def write_index(entries: Dict[str, Tuple[str, str, str, Optional[str]]], path: Path) -> int:
+    """
+    Write {form: (lemma_id, lemma_text, pos, gender)} to an index file.
+    Returns the number of records written.
+    """
+    records = []
+    for form, (lemma_id, lemma_text, pos, gender) in entries.items():
+        fields = (form, lemma_id, lemma_text, pos or '', gender or '')
+        records.append(('\0'.join(fields) + '\n').encode('utf-8'))
+    records.sort(key=lambda r: r[:r.index(b'\0')])
+
+    offsets = []
+    position = 0
+    for record in records:
+        offsets.append(position)
+        position += len(record)
+
+    tmp_path = Path(str(path) + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(INDEX_MAGIC)
+        f.write(HEADER.pack(len(records), int(time.time())))
+        for offset in offsets:
+            f.write(OFFSET.pack(offset))
+        for record in records:
+            f.write(record)
+    os.replace(tmp_path, path)
+
+    return len(records)
+
+
+def collect_unambiguous_forms(rows: Iterable[Dict]) -> Tuple[Dict, int]:
+    """
+    Reduce (word_text, lemma) rows to forms that always map to the same lemma.
+    Returns ({form: (lemma_id, lemma_text, pos, gender)}, ambiguous_count).
+    """
+    seen = {}
+    ambiguous = set()
+
+    for row in rows:
+        lemma = row.get('lemmas')
+        if not lemma or not row.get('word_text') or not row.get('lemma_id'):
+            continue
+        form = row['word_text'].lower().strip()
+        if not form or form in ambiguous:
+            continue
+
+        entry = (row['lemma_id'], lemma['lemma_text'], lemma.get('part_of_speech'), lemma.get('gender'))
+        if form in seen and seen[form][0] != entry[0]:
+            ambiguous.add(form)
+            del seen[form]
+            continue
+        seen[form] = entry
+
+    return seen, len(ambiguous)
+
+
+def fetch_all(db, table: str, columns: str, order: str) -> Iterable[Dict]:
+    """Page through a table 1000 rows at a time, ordered by a unique column so pages don't overlap."""
+    offset = 0
+    while True:
+        batch = db.table(table).select(columns).order(order).range(offset, offset + PAGE_SIZE - 1).execute()
+        if not batch.data:
+            break
+        yield from batch.data
+        if len(batch.data) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+
+
+def fetch_lemma_ids(db) -> Set[str]:
+    """Every lemma_id currently in the lemmas table (for drop_missing)."""
+    return {row['lemma_id'] for row in fetch_all(db, 'lemmas', 'lemma_id', 'lemma_id')}
+
+
+def build_index(output: Path = DEFAULT_INDEX_FILE) -> int:
+    """Export the index from the words and song_line_words tables."""
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv(SCRIPT_DIR.parent / '.env')
+    url = os.getenv('VITE_SUPABASE_URL')
+    key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+    if not url or not key:
+        print("ERROR: Supabase credentials not found in environment")
+        sys.exit(1)
+    db = create_client(url, key)
+
+    columns = 'word_text, lemma_id, lemmas(lemma_text, part_of_speech, gender)'
+
+    def all_rows():
+        for table in ('words', 'song_line_words'):
+            print(f"  Reading {table}...")
+            yield from fetch_all(db, table, columns, 'word_id')
+
+    entries, ambiguous = collect_unambiguous_forms(all_rows())
+    count = write_index(entries, output)
+
+    print(f"\nWrote {count} word forms to {output}")
+    print(f"  Skipped {ambiguous} ambiguous forms (mapped to several lemmas)")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the inflection-to-lemma index')
+    parser.add_argument('--build', action='store_true', help='Export index from Supabase')
+    parser.add_argument('--output', type=str, default=str(DEFAULT_INDEX_FILE), help='Index file path')
+    parser.add_argument('--lookup', type=str, help='Look up a word form in the index')
+    args = parser.parse_args()
+
+    if args.build:
+        build_index(Path(args.output))
+        return
+
+    if args.lookup:
+        index = LemmaIndex.open(Path(args.output))
+        if not index:
+            print(f"Index not found: {args.output} (run with --build first)")
+            sys.exit(1)
+        print(f"Index exported {index.exported_at:%Y-%m-%d %H:%M}")
+        print(index.lookup(args.lookup) or f"'{args.lookup}' not in index")
+        return
+
+    parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Set-based lemma merge engine shared by the dictionary maintenance scripts
+(merge_duplicate_lemmas, fix_validation_issues, apply_dictionary_fixes and the
+scripts generated by validate_dictionary_forms).
+
+A mapping of lemma texts is resolved to ids against one prefetch of the
+lemmas table, then applied by the merge_lemmas RPC (see
+supabase/migrations/20260201_merge_lemmas_rpc.sql) as a single transaction:
+words / song_line_words / user_lemma_progress are reassigned, validation
+reports and the duplicate lemmas are deleted.
+
+Entries whose duplicate is already gone are reported as missing, so a
+mapping can be re-run safely. Dry runs return the same per-lemma diff
+without changing anything.
+
+Usage from a script:
+    from lemma_merge import fetch_all_lemmas, merges_from_canonical_map, run_merges
+
+    lemmas = fetch_all_lemmas(db)
+    stats = run_merges(db, merges_from_canonical_map(LEMMA_MERGES), lemmas, dry_run=True)
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PAGE_SIZE = 1000
+
+# (duplicate_text, canonical_text or None to delete, pos_filter)
+MergeSpec = Tuple[str, Optional[str], Optional[str]]
+
+
+def fetch_all_lemmas(db) -> List[Dict]:
+    """Fetch all lemmas with pagination."""
+    all_lemmas = []
+    offset = 0
+    while True:
+        batch = db.table('lemmas').select('*').range(offset, offset + PAGE_SIZE - 1).execute()
+        all_lemmas.extend(batch.data)
+        if len(batch.data) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    return all_lemmas
+
+
+def merges_from_canonical_map(mapping: Dict) -> List[MergeSpec]:
+    """
+    Expand {canonical: [duplicates]} or {canonical: {'merge': [...], 'pos_filter': ...}}
+    (the LEMMA_MERGES format) into merge specs.
+    """
+    specs = []
+    for canonical, config in mapping.items():
+        if isinstance(config, dict):
+            duplicates = config['merge']
+            pos_filter = config.get('pos_filter')
+        else:
+            duplicates = config
+            pos_filter = None
+        for dup in duplicates:
+            specs.append((dup, canonical, pos_filter))
+    return specs
+
+
+def merges_from_garbage_map(mapping: Dict[str, Optional[str]]) -> List[MergeSpec]:
+    """Expand {garbage: canonical or None} (the GARBAGE_TO_CANONICAL format) into merge specs."""
+    return [(garbage, canonical, None) for garbage, canonical in mapping.items()]
+
+
+def deletes_from_list(lemma_texts: Iterable[str]) -> List[MergeSpec]:
+    """Turn a list of garbage lemma texts into delete specs."""
+    return [(text, None, None) for text in lemma_texts]
+
+
+def build_lemma_lookup(lemmas: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    """Index lemmas by lemma_text (several lemmas can share a text with different POS)."""
+    lookup = {}
+    for lemma in lemmas:
+        lookup.setdefault(lemma['lemma_text'], []).append(lemma)
+    return lookup
+
+
+def find_lemma(lookup: Dict[str, List[Dict]], text: str, pos_filter: Optional[str] = None) -> Optional[Dict]:
+    """Return the first lemma with this text (and POS, if given), or None."""
+    for lemma in lookup.get(text, []):
+        if not pos_filter or lemma.get('part_of_speech') == pos_filter:
+            return lemma
+    return None
+
+
+def plan_merges(specs: Iterable[MergeSpec], lemmas: Iterable[Dict],
+                delete_if_canonical_missing: bool = False) -> Tuple[List[Dict], List[str]]:
+    """
+    Resolve merge specs to ids.
+
+    Returns (plan, warnings) where plan is a list of
+    {duplicate_id, canonical_id, duplicate_text, canonical_text} ready for
+    apply_merges. Duplicates that don't exist are dropped silently (already
+    merged); missing canonicals are skipped with a warning, or turned into
+    deletes when delete_if_canonical_missing is set.
+    """
+    lookup = build_lemma_lookup(lemmas)
+    plan = []
+    warnings = []
+    planned = set()
+
+    for dup_text, canonical_text, pos_filter in specs:
+        dup = find_lemma(lookup, dup_text, pos_filter)
+        if not dup or dup['lemma_id'] in planned:
+            continue
+
+        canonical = None
+        if canonical_text:
+            canonical = find_lemma(lookup, canonical_text, pos_filter)
+            if not canonical and not delete_if_canonical_missing:
+                warnings.append(f"Canonical lemma '{canonical_text}' not found, skipping {dup_text}")
+                continue
+            if canonical and canonical['lemma_id'] == dup['lemma_id']:
+                continue
+
+        planned.add(dup['lemma_id'])
+        plan.append({
+            'duplicate_id': dup['lemma_id'],
+            'canonical_id': canonical['lemma_id'] if canonical else None,
+            'duplicate_text': dup_text,
+            'canonical_text': canonical['lemma_text'] if canonical else None,
+        })
+
+    return plan, warnings
+
+
+def apply_merges(db, plan: List[Dict], dry_run: bool = True) -> List[Dict]:
+    """
+    Run the merge_lemmas RPC for a plan in one transaction.
+    Returns one result per plan entry, annotated with the lemma texts.
+    """
+    if not plan:
+        return []
+
+    payload = [{'duplicate_id': p['duplicate_id'], 'canonical_id': p['canonical_id']} for p in plan]
+    response = db.rpc('merge_lemmas', {'p_merges': payload, 'p_dry_run': dry_run}).execute()
+    data = response.data or {}
+    if not data.get('success'):
+        raise RuntimeError(f"merge_lemmas failed: {data.get('error', 'no response')}")
+
+    texts = {p['duplicate_id']: p for p in plan}
+    results = []
+    for result in data['results']:
+        entry = texts.get(result['duplicate_id'], {})
+        result['duplicate_text'] = entry.get('duplicate_text')
+        result['canonical_text'] = entry.get('canonical_text')
+        results.append(result)
+    return results
+
+
+def summarize(results: Iterable[Dict]) -> Dict[str, int]:
+    """Aggregate RPC results into the counters the maintenance scripts report."""
+    stats = {
+        'merged': 0,
+        'deleted': 0,
+        'missing': 0,
+        'words_reassigned': 0,
+        'words_deleted': 0,
+        'song_line_words': 0,
+        'progress_moved': 0,
+        'progress_dropped': 0,
+    }
+    for r in results:
+        status = r['status']
+        if status == 'merged':
+            stats['merged'] += 1
+            stats['words_reassigned'] += r['words']
+        elif status == 'deleted':
+            stats['deleted'] += 1
+            stats['words_deleted'] += r['words']
+        else:
+            stats['missing'] += 1
+            continue
+        stats['song_line_words'] += r['song_line_words']
+        stats['progress_moved'] += r['progress_moved']
+        stats['progress_dropped'] += r['progress_dropped']
+    return stats
+
+
+def print_diff(results: Iterable[Dict]):
+    """Print one line per merged/deleted lemma."""
+    for r in results:
+        status = r['status']
+        if status == 'merged':
+            line = f"  {r['duplicate_text']} → {r['canonical_text']} ({r['words']} words"
+        elif status == 'deleted':
+            line = f"  DELETE: {r['duplicate_text']} ({r['words']} words"
+        else:
+            print(f"  {r['duplicate_text']}: {status.replace('_', ' ')} (already merged?)")
+            continue
+
+        if r['song_line_words']:
+            line += f", {r['song_line_words']} lyric words"
+        if r['progress_moved'] or r['progress_dropped']:
+            line += f", progress {r['progress_moved']} moved/{r['progress_dropped']} dropped"
+        print(line + ")")
+
+
+def run_merges(db, specs: Iterable[MergeSpec], lemmas: Optional[List[Dict]] = None,
+               dry_run: bool = True, delete_if_canonical_missing: bool = False) -> Dict[str, int]:
+    """
+    Plan, apply and print a whole mapping. Pass `lemmas` to reuse a prefetch
+    across several mappings; otherwise the lemmas table is fetched once here.
+    """
+    if lemmas is None:
+        lemmas = fetch_all_lemmas(db)
+
+    plan, warnings = plan_merges(specs, lemmas, delete_if_canonical_missing)
+    for warning in warnings:
+        print(f"  WARNING: {warning}")
+
+    results = apply_merges(db, plan, dry_run)
+    print_diff(results)
+
+    # Keep a shared prefetch in step with what was (or would be) removed
+    removed = {r['duplicate_id'] for r in results if r['status'] in ('merged', 'deleted')}
+    if removed:
+        lemmas[:] = [l for l in lemmas if l['lemma_id'] not in removed]
+
+    return summarize(results)
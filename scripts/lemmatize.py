@@ -1,6 +1,24 @@
 #!/usr/bin/env python3
 """
 Spanish word lemmatization and grammatical analysis using spaCy
+
+Usage:
+    python3 scripts/lemmatize.py tenía            # Analyze one word
+    python3 scripts/lemmatize.py < words.txt      # Batch mode: one word per line
+    python3 scripts/lemmatize.py --server         # Persistent JSON-lines server
+
+Server protocol (one JSON object per line on stdin, one reply per line on stdout):
+    {"id": 1, "words": ["tenía", "casas"]}
+        -> {"id": 1, "results": [{...analyze_word...}, {...}]}
+           (results[i] is null where words[i] is blank)
+    {"id": 2, "sentences": ["Cuando yo tenía seis años."]}
+        -> {"id": 2, "results": [[{...token...}, ...]]}
+    {"id": 3, "method": "shutdown"}
+        -> {"id": 3, "ok": true}   (server exits)
+
+The model is loaded once and every batch runs through nlp.pipe, so callers
+keep one process open instead of paying the model load per word. Batch mode
+writes its results every PIPE_BATCH_SIZE words rather than at end of input.
 """
 import sys
 import json
@@ -9,11 +27,12 @@ import spacy
 # Load Spanish model
 nlp = spacy.load('es_core_news_sm')
 
-def analyze_word(word):
-    """Analyze a Spanish word and return lemma + grammatical info"""
-    doc = nlp(word)
-    token = doc[0]
+# Batch size for nlp.pipe in batch/server modes
+PIPE_BATCH_SIZE = 256
 
+
+def analyze_token(word, token):
+    """Build the analysis dict for a spaCy token"""
     result = {
         'word': word,
         'lemma': token.lemma_,
@@ -36,16 +55,97 @@ def analyze_word(word):
 
     return result
 
+
+def analyze_word(word):
+    """Analyze a Spanish word and return lemma + grammatical info"""
+    doc = nlp(word)
+    return analyze_token(word, doc[0])
+
+
+def analyze_words(words):
+    """Analyze a batch of words with nlp.pipe (same output as analyze_word)"""
+    return [
+        analyze_token(word, doc[0])
+        for word, doc in zip(words, nlp.pipe(words, batch_size=PIPE_BATCH_SIZE))
+    ]
+
+
+def analyze_sentences(sentences):
+    """Analyze a batch of sentences, returning one token list per sentence"""
+    return [
+        [analyze_token(token.text, token) for token in doc if not token.is_space]
+        for doc in nlp.pipe(sentences, batch_size=PIPE_BATCH_SIZE)
+    ]
+
+
+def handle_request(request):
+    """Dispatch one server request and return the reply dict"""
+    reply = {'id': request.get('id')}
+
+    if request.get('method') == 'shutdown':
+        reply['ok'] = True
+    elif 'words' in request:
+        words = [w.strip() for w in request['words']]
+        analyzed = iter(analyze_words([w for w in words if w]))
+        # Blank words get null so results[i] stays aligned with words[i]
+        reply['results'] = [next(analyzed) if w else None for w in words]
+    elif 'sentences' in request:
+        reply['results'] = analyze_sentences(request['sentences'])
+    else:
+        reply['error'] = "Request must contain 'words', 'sentences' or method 'shutdown'"
+
+    return reply
+
+
+def run_batch(stdin=sys.stdin, stdout=sys.stdout):
+    """Analyze one word per line, writing results a pipe batch at a time"""
+    batch = []
+    for line in stdin:
+        word = line.strip()
+        if word:
+            batch.append(word)
+        if len(batch) == PIPE_BATCH_SIZE:
+            write_results(batch, stdout)
+            batch = []
+    write_results(batch, stdout)
+
+
+def write_results(words, stdout):
+    """Write one JSON line per analyzed word"""
+    for result in analyze_words(words):
+        stdout.write(json.dumps(result, ensure_ascii=False) + '\n')
+    stdout.flush()
+
+
+def run_server(stdin=sys.stdin, stdout=sys.stdout):
+    """Serve JSON-lines requests until EOF or a shutdown request"""
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            request = json.loads(line)
+            reply = handle_request(request)
+        except (ValueError, TypeError, AttributeError) as e:
+            request = {}
+            reply = {'id': None, 'error': str(e)}
+
+        stdout.write(json.dumps(reply, ensure_ascii=False) + '\n')
+        stdout.flush()
+
+        if request.get('method') == 'shutdown':
+            break
+
+
 if __name__ == '__main__':
     # Read words from stdin (one per line) or from argument
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1] == '--server':
+        run_server()
+    elif len(sys.argv) > 1:
         word = sys.argv[1]
         result = analyze_word(word)
         print(json.dumps(result, ensure_ascii=False))
     else:
         # Batch mode: read from stdin
-        for line in sys.stdin:
-            word = line.strip()
-            if word:
-                result = analyze_word(word)
-                print(json.dumps(result, ensure_ascii=False))
\ No newline at end of file
+        run_batch()
\ No newline at end of file
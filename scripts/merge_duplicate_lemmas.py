@@ -6,7 +6,8 @@ In Spanish dictionaries, you find:
 - Adjectives: masculine singular (bueno, not buena/buenos/buenas)
 - Numbers: full form (ciento, with note about cien)
 
-This script merges inflected forms into their canonical lemmas.
+This script merges inflected forms into their canonical lemmas. The merge runs
+as one transaction through lemma_merge.py and can be re-run safely.
 """
 
 import os
@@ -14,6 +15,8 @@ import sys
 from dotenv import load_dotenv
 from supabase import create_client
 
+from lemma_merge import build_lemma_lookup, fetch_all_lemmas, find_lemma, merges_from_canonical_map, run_merges
+
 # Load environment
 load_dotenv()
 
@@ -65,15 +68,6 @@ LEMMA_MERGES = {
 }
 
 
-def get_lemma(lemma_text, pos_filter=None):
-    """Get lemma by text, optionally filtering by POS."""
-    query = db.table('lemmas').select('*').eq('lemma_text', lemma_text)
-    if pos_filter:
-        query = query.eq('part_of_speech', pos_filter)
-    result = query.execute()
-    return result.data[0] if result.data else None
-
-
 def merge_lemmas(dry_run=True):
     """Merge duplicate lemmas into canonical forms."""
     print("=" * 80)
@@ -86,70 +80,38 @@ def merge_lemmas(dry_run=True):
     else:
         print("\n*** APPLYING CHANGES ***\n")
 
-    total_merged = 0
-    total_words_reassigned = 0
+    # One prefetch resolves every canonical and duplicate
+    all_lemmas = fetch_all_lemmas(db)
+    lemma_lookup = build_lemma_lookup(all_lemmas)
 
+    # Update translations on the canonical lemmas
     for canonical_text, config in LEMMA_MERGES.items():
-        duplicates = config['merge']
         new_translation = config.get('translation')
-        pos_filter = config.get('pos_filter')
-
-        # Get canonical lemma
-        canonical = get_lemma(canonical_text, pos_filter)
-        if not canonical:
-            print(f"\n  WARNING: Canonical lemma '{canonical_text}' not found, skipping")
+        canonical = find_lemma(lemma_lookup, canonical_text, config.get('pos_filter'))
+        if not canonical or not new_translation:
             continue
 
-        canonical_id = canonical['lemma_id']
-
-        print(f"\n{canonical_text} (canonical)")
-
-        # Update translation if specified
-        if new_translation and canonical.get('definitions', [''])[0] != new_translation:
-            old_trans = canonical.get('definitions', [''])[0]
-            print(f"  Translation: {old_trans} -> {new_translation}")
-            if not dry_run:
-                db.table('lemmas').update({'definitions': [new_translation]}).eq('lemma_id', canonical_id).execute()
-
-        # Process duplicates
-        for dup_text in duplicates:
-            dup = get_lemma(dup_text, pos_filter)
-            if not dup:
-                print(f"  {dup_text}: not found (already merged?)")
-                continue
-
-            dup_id = dup['lemma_id']
-
-            # Count words
-            words = db.table('words').select('word_id', count='exact').eq('lemma_id', dup_id).execute()
-            word_count = words.count or 0
-
-            print(f"  {dup_text} -> merge ({word_count} words)")
-
+        old_trans = (canonical.get('definitions') or [''])[0]
+        if old_trans != new_translation:
+            print(f"  {canonical_text} translation: {old_trans} -> {new_translation}")
             if not dry_run:
-                # Reassign words to canonical lemma
-                if word_count > 0:
-                    db.table('words').update({'lemma_id': canonical_id}).eq('lemma_id', dup_id).execute()
-
-                # Delete validation report
-                db.table('validation_reports').delete().eq('lemma_id', dup_id).execute()
-
-                # Delete duplicate lemma
-                db.table('lemmas').delete().eq('lemma_id', dup_id).execute()
+                db.table('lemmas').update({'definitions': [new_translation]}).eq('lemma_id', canonical['lemma_id']).execute()
 
-            total_merged += 1
-            total_words_reassigned += word_count
+    # Reassign words and delete duplicates in one transaction
+    print()
+    stats = run_merges(db, merges_from_canonical_map(LEMMA_MERGES), all_lemmas, dry_run)
 
     print("\n" + "=" * 80)
     print("SUMMARY")
     print("=" * 80)
-    print(f"  Lemmas merged: {total_merged}")
-    print(f"  Words reassigned: {total_words_reassigned}")
+    print(f"  Lemmas merged: {stats['merged']}")
+    print(f"  Words reassigned: {stats['words_reassigned']}")
+    print(f"  Lyric words reassigned: {stats['song_line_words']}")
 
     if dry_run:
         print("\n*** DRY RUN - Use --apply to make changes ***")
 
-    return total_merged, total_words_reassigned
+    return stats['merged'], stats['words_reassigned']
 
 
 def main():
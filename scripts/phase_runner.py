@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Run a subset of pipeline phases in dependency order within one process.
+
+Phases declare the phases they depend on; the runner starts every selected
+phase as soon as the selected phases it depends on have finished, so
+independent phases overlap (threads - the phases are network and API bound).
+A dependency that is not selected is assumed to have been run earlier.
+A phase that raises or returns a dict with an 'error' key fails, and the
+selected phases downstream of it are skipped.
+
+While more than one phase is selected, each phase's output is collected
+into whole lines and printed with a "[phase] " prefix, so progress lines
+written in pieces (print(..., end='')) by overlapping phases don't
+interleave.
+
+Datasets several phases read (lines, lemma maps, slang sets) go through a
+SharedData cache, so they are fetched once per run instead of once per phase.
+
+Usage:
+    runner = PhaseRunner([
+        Phase('write', run_write),
+        Phase('translate', run_translate, ('write',)),
+        ...
+    ])
+    results = runner.run(['write', 'translate'], shared=SharedData())
+    runner.print_timings()
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+PHASE_WORKERS = 3
+
+
+@dataclass
+class Phase:
+    """A named pipeline step. run(shared) returns a summary dict."""
+    name: str
+    run: Callable[['SharedData'], Optional[dict]]
+    depends_on: Tuple[str, ...] = ()
+
+
+@dataclass
+class PhaseResult:
+    status: str                      # 'ok', 'failed' or 'skipped'
+    seconds: float = 0.0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+
+class SharedData:
+    """
+    Thread-safe cache of datasets shared between phases. Loaders follow the
+    scripts' (success, data_or_error) convention; only successful loads are
+    cached.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, loader: Callable[[], Tuple[bool, object]]) -> Tuple[bool, object]:
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if key in self._data:
+                return True, self._data[key]
+            success, value = loader()
+            if success:
+                self._data[key] = value
+            return success, value
+
+    def put(self, key: str, value) -> None:
+        with self._lock:
+            self._data[key] = value
+
+    def invalidate(self, *keys: str) -> None:
+        """Drop datasets a phase has changed in the database."""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class PhaseOutput:
+    """
+    Stand-in for sys.stdout while phases overlap. Text written by a phase
+    thread is buffered until a newline and printed as whole lines prefixed
+    with the phase name; other threads write straight through.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def start(self, name: str) -> None:
+        self._local.name = name
+        self._local.buffer = ''
+
+    def finish(self) -> None:
+        if getattr(self._local, 'buffer', ''):
+            self._emit([self._local.buffer])
+        self._local.name = None
+
+    def _emit(self, lines: List[str]) -> None:
+        with self._lock:
+            for line in lines:
+                self.stream.write(f"[{self._local.name}] {line}\n")
+            self.stream.flush()
+
+    def write(self, text: str) -> int:
+        if getattr(self._local, 'name', None) is None:
+            with self._lock:
+                return self.stream.write(text)
+        *lines, self._local.buffer = (self._local.buffer + text).split('\n')
+        if lines:
+            self._emit(lines)
+        return len(text)
+
+    def flush(self) -> None:
+        # Partial lines stay buffered until their newline
+        if getattr(self._local, 'name', None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, attr):
+        return getattr(self.stream, attr)
+
+
+class PhaseRunner:
+    """Execute selected phases of a DAG, overlapping independent ones."""
+
+    def __init__(self, phases: Iterable[Phase], workers: int = PHASE_WORKERS):
+        self.phases = {phase.name: phase for phase in phases}
+        self.workers = workers
+        self.results: Dict[str, PhaseResult] = {}
+        self.order: List[str] = []
+        self.elapsed = 0.0
+
+        for phase in self.phases.values():
+            unknown = [dep for dep in phase.depends_on if dep not in self.phases]
+            if unknown:
+                raise ValueError(f"Phase '{phase.name}' depends on unknown phases: {unknown}")
+
+    def resolve(self, names: Iterable[str]) -> List[str]:
+        """Validate a selection and return it in dependency (topological) order."""
+        selected = set()
+        for name in names:
+            if name not in self.phases:
+                raise ValueError(f"Unknown phase '{name}'. Available: {', '.join(self.phases)}")
+            selected.add(name)
+
+        ordered = []
+        visiting = set()
+
+        def visit(name: str) -> None:
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle at phase '{name}'")
+            visiting.add(name)
+            for dep in self.phases[name].depends_on:
+                if dep in selected:
+                    visit(dep)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in self.phases:
+            if name in selected:
+                visit(name)
+        return ordered
+
+    def run(self, names: Iterable[str], shared: Optional[SharedData] = None) -> Dict[str, PhaseResult]:
+        """Run the selected phases. Returns {phase name: PhaseResult}."""
+        shared = shared if shared is not None else SharedData()
+        order = self.order = self.resolve(names)
+        pending = {name: {dep for dep in self.phases[name].depends_on if dep in order} for name in order}
+        self.results = {}
+        running = {}
+        started = time.perf_counter()
+
+        output = PhaseOutput(sys.stdout) if len(order) > 1 and self.workers > 1 else None
+
+        def execute(name: str) -> PhaseResult:
+            if output:
+                output.start(name)
+            start = time.perf_counter()
+            try:
+                result = self.phases[name].run(shared)
+            except Exception as e:
+                return PhaseResult('failed', time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+            finally:
+                if output:
+                    output.finish()
+            seconds = time.perf_counter() - start
+            if isinstance(result, dict) and result.get('error'):
+                return PhaseResult('failed', seconds, result, error=str(result['error']))
+            return PhaseResult('ok', seconds, result)
+
+        if output:
+            sys.stdout = output
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while pending or running:
+                    # Skip phases downstream of a failure, start phases that are ready
+                    for name in [n for n in order if n in pending]:
+                        deps = pending[name]
+                        failed = [d for d in deps if d in self.results and self.results[d].status != 'ok']
+                        if failed:
+                            self.results[name] = PhaseResult('skipped', error=f"{', '.join(failed)} did not complete")
+                            del pending[name]
+                        elif all(d in self.results for d in deps):
+                            running[executor.submit(execute, name)] = name
+                            del pending[name]
+
+                    if not running:
+                        continue
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.results[running.pop(future)] = future.result()
+        finally:
+            if output:
+                sys.stdout = output.stream
+
+        self.elapsed = time.perf_counter() - started
+        return {name: self.results[name] for name in order}
+
+    def print_timings(self) -> None:
+        """Print per-phase status and wall-clock time."""
+        print()
+        print("=" * 60)
+        print("PHASE TIMINGS")
+        print("=" * 60)
+        for name in self.order:
+            result = self.results[name]
+            note = f"  ({result.error[:60]})" if result.error else ""
+            print(f"  {name:<22} {result.status:<8} {result.seconds:>8.1f}s{note}")
+        print("-" * 60)
+        print(f"  {'total (wall clock)':<31} {self.elapsed:>8.1f}s")
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Structured (JSON) output from Claude responses.
+
+Scripts that ask Claude for JSON used to strip markdown fences and slice
+'{' / '[' by hand, and treated any parse failure as "valid" or "no fixes".
+This module parses responses incrementally instead:
+
+- JsonStream is fed text (all at once or chunk by chunk from a streaming
+  response). It skips any prose or ```json fence before the first '[' / '{',
+  and every time an element of the items array closes - the root array, or
+  the array under `items_key` in a root object - that element is parsed and
+  checked against a Schema on its own. A bare root array is taken as the
+  items even when `items_key` is set. A malformed or truncated tail only
+  loses the items it actually breaks.
+- Schema is a small per-prompt description of the fields an item (or the
+  whole response) must have.
+- parse_response() parses a finished response text; stream_response() streams
+  a Messages API call through JsonStream so items are kept even if the stream
+  is cut off, and parse_sse_lines() does the same for the raw server-sent
+  events of a `"stream": true` HTTP request (scripts without the SDK).
+  Scripts normally go through claude_client.ClaudeClient, which uses both.
+
+Usage:
+    GLOSS_SCHEMA = Schema({'index': int, 'translation': str})
+    result = stream_response(client, GLOSS_SCHEMA, model=..., max_tokens=..., messages=...)
+    for item in result.items: ...
+    if not result.complete: ...   # retry only what is missing
+
+    python3 scripts/structured_output.py --self-check   # Run the parser checks
+"""
+
+import json
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+NUMBER = (int, float)
+OPTIONAL_STR = (str, type(None))
+
+
+class Schema:
+    """
+    Required and optional fields (name -> type or tuple of types) of a JSON
+    object, plus an optional extra check returning an error message or None.
+    """
+
+    def __init__(self, required: Dict[str, Any] = None, optional: Dict[str, Any] = None,
+                 check: Callable[[dict], Optional[str]] = None):
+        self.required = required or {}
+        self.optional = optional or {}
+        self.check = check
+
+    def error(self, value) -> Optional[str]:
+        """Return why value does not match, or None if it does."""
+        if not isinstance(value, dict):
+            return f"expected object, got {type(value).__name__}"
+        for name, types in self.required.items():
+            if name not in value:
+                return f"missing '{name}'"
+            if not _is_type(value[name], types):
+                return f"'{name}' has type {type(value[name]).__name__}"
+        for name, types in self.optional.items():
+            if value.get(name) is not None and not _is_type(value[name], types):
+                return f"'{name}' has type {type(value[name]).__name__}"
+        return self.check(value) if self.check else None
+
+
+def _is_type(value, types) -> bool:
+    types = types if isinstance(types, tuple) else (types,)
+    # bool is an int subclass; only accept it where bool is asked for
+    if isinstance(value, bool) and bool not in types:
+        return False
+    return isinstance(value, types)
+
+
+@dataclass
+class StructuredResult:
+    """
+    items     - schema-valid elements of the items array, in order
+    invalid   - (raw element, reason) for elements that failed to parse/validate
+    value     - the whole parsed document, once it is complete
+    complete  - the document parsed in full (and, without an items array,
+                matched the schema)
+    error     - why the result is incomplete (parse error, stream error, ...)
+    interrupted - the request itself failed (API/network error), as opposed
+                to the model returning unusable JSON
+    text      - the raw response text received
+    usage     - token usage reported by the API (input_tokens, output_tokens,
+                cache_creation_input_tokens, cache_read_input_tokens)
+    """
+    items: List[Any] = field(default_factory=list)
+    invalid: List[Tuple[str, str]] = field(default_factory=list)
+    value: Any = None
+    complete: bool = False
+    error: Optional[str] = None
+    interrupted: bool = False
+    text: str = ''
+    usage: Dict[str, int] = field(default_factory=dict)
+
+
+class JsonStream:
+    """Incremental JSON parser yielding items of one array as they complete."""
+
+    def __init__(self, schema: Optional[Schema] = None, items_key: Optional[str] = None):
+        self.schema = schema
+        self.items_key = items_key
+        self.result = StructuredResult()
+        self._buffer = []
+        self._pos = 0            # absolute offset of the next character
+        self._root_start = None
+        self._root_is_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._key = None         # last object key read at depth 1
+        self._items_depth = None  # depth inside the items array
+        self._item_start = None
+        self._done = False
+
+    @property
+    def _text(self) -> str:
+        return ''.join(self._buffer)
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume more text. Returns the items completed by this chunk."""
+        if not chunk:
+            return []
+        self._buffer.append(chunk)
+        if self._done:
+            return []
+
+        before = len(self.result.items)
+
+        for ch in chunk:
+            pos = self._pos
+            self._pos += 1
+
+            if self._done:
+                break
+
+            if self._root_start is None:
+                if ch in '[{':
+                    self._root_start = pos
+                    self._root_is_array = ch == '['
+                    self._depth = 1
+                    if self._root_is_array:
+                        # A bare array is the items array, with or without items_key
+                        self._items_depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and not self._root_is_array:
+                        self._last_string = self._text[self._string_start + 1:pos]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+                self._start_item(pos)
+            elif ch == ':' and self._depth == 1:
+                self._key = self._last_string
+            elif ch in '[{':
+                self._start_item(pos)
+                self._depth += 1
+                if (ch == '[' and self._depth == 2 and not self._root_is_array
+                        and self.items_key is not None and self._key == self.items_key):
+                    self._items_depth = 2
+            elif ch in ']}':
+                if self._items_depth is not None and self._depth == self._items_depth:
+                    # Closing the items array itself ends a scalar item
+                    self._end_item(pos)
+                    self._items_depth = None if ch == ']' else self._items_depth
+                self._depth -= 1
+                if self._items_depth is not None and self._depth == self._items_depth and self._item_start is not None:
+                    self._end_item(pos + 1)
+                if self._depth == 0:
+                    self._finish(pos + 1)
+            elif ch == ',':
+                if self._items_depth is not None and self._depth == self._items_depth:
+                    self._end_item(pos)
+            elif not ch.isspace():
+                self._start_item(pos)
+
+        return self.result.items[before:]
+
+    def _start_item(self, pos: int) -> None:
+        if self._items_depth is not None and self._depth == self._items_depth and self._item_start is None:
+            self._item_start = pos
+
+    def _end_item(self, end: int) -> None:
+        if self._item_start is None:
+            return
+        raw = self._text[self._item_start:end]
+        self._item_start = None
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.result.invalid.append((raw, f"invalid JSON: {e}"))
+            return
+        reason = self.schema.error(item) if self.schema else None
+        if reason:
+            self.result.invalid.append((raw, reason))
+        else:
+            self.result.items.append(item)
+
+    def _finish(self, end: int) -> None:
+        self._done = True
+        raw = self._text[self._root_start:end]
+        try:
+            self.result.value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.result.error = f"invalid JSON: {e}"
+            return
+
+        has_items = self._root_is_array or self.items_key is not None
+        if not has_items and self.schema:
+            reason = self.schema.error(self.result.value)
+            if reason:
+                self.result.error = f"response does not match schema: {reason}"
+                return
+        if (self.items_key is not None and not self._root_is_array
+                and not (isinstance(self.result.value, dict)
+                         and isinstance(self.result.value.get(self.items_key), list))):
+            self.result.error = f"response has no '{self.items_key}' array"
+            return
+        self.result.complete = True
+
+    def close(self) -> StructuredResult:
+        """Finish parsing; a document that never closed is marked incomplete."""
+        self.result.text = self._text
+        if not self._done:
+            if self._root_start is None:
+                self.result.error = "no JSON found in response"
+            else:
+                self.result.error = "response ended before the JSON was complete"
+        return self.result
+
+
+def parse_response(text: str, schema: Optional[Schema] = None,
+                   items_key: Optional[str] = None) -> StructuredResult:
+    """Parse a complete response text."""
+    stream = JsonStream(schema, items_key)
+    stream.feed(text or '')
+    return stream.close()
+
+
+USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens')
+
+
+def _add_usage(result: StructuredResult, usage) -> None:
+    """Copy token counts from an SDK usage object or an API usage dict."""
+    for name in USAGE_FIELDS:
+        value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        if isinstance(value, int):
+            result.usage[name] = value
+
+
+def _interrupted(stream: JsonStream, error: Exception) -> StructuredResult:
+    """Close the stream and mark its result as cut off by error."""
+    result = stream.close()
+    result.complete = False
+    result.interrupted = True
+    result.error = f"{type(error).__name__}: {error}"
+    return result
+
+
+def stream_response(client, schema: Optional[Schema] = None, items_key: Optional[str] = None,
+                    **request) -> StructuredResult:
+    """
+    Run client.messages.stream(**request) (anthropic SDK) through a JsonStream.
+    For plain-text (non-JSON) responses, use result.text.
+    API/stream errors are reported in result.error with the items received so
+    far; they are not raised.
+    """
+    stream = JsonStream(schema, items_key)
+    try:
+        with client.messages.stream(**request) as response:
+            for chunk in response.text_stream:
+                stream.feed(chunk)
+            _add_usage(stream.result, response.get_final_message().usage)
+    except Exception as e:
+        return _interrupted(stream, e)
+    return stream.close()
+
+
+def parse_sse_lines(lines: Iterable[str], schema: Optional[Schema] = None,
+                    items_key: Optional[str] = None) -> StructuredResult:
+    """
+    Parse the server-sent event lines of a streaming Messages API response
+    (e.g. requests' response.iter_lines(decode_unicode=True)), feeding the
+    text deltas through a JsonStream. Error events and broken connections are
+    reported like in stream_response.
+    """
+    stream = JsonStream(schema, items_key)
+    try:
+        for line in lines:
+            if not line or not line.startswith('data:'):
+                continue
+            event = json.loads(line[5:])
+            if event.get('type') == 'content_block_delta' and event['delta'].get('type') == 'text_delta':
+                stream.feed(event['delta']['text'])
+            elif event.get('type') == 'message_start':
+                _add_usage(stream.result, event['message'].get('usage') or {})
+            elif event.get('type') == 'message_delta':
+                _add_usage(stream.result, event.get('usage') or {})
+            elif event.get('type') == 'error':
+                raise RuntimeError(event.get('error', {}).get('message', 'stream error'))
+    except Exception as e:
+        return _interrupted(stream, e)
+    return stream.close()
+
+
+# (description, text, schema, items_key, expected (complete, items, error))
+SELF_CHECKS = [
+    ("root array", '[{"a": 1}, {"a": 2}]', Schema({'a': int}), None, (True, [{'a': 1}, {'a': 2}], None)),
+    ("items under key", 'Sure:\n```json\n{"fixes": [{"a": 1}]}\n```', Schema({'a': int}), 'fixes',
+     (True, [{'a': 1}], None)),
+    ("bare array with items_key", '[{"a": 1}]', None, 'fixes', (True, [{'a': 1}], None)),
+    ("object without the key", '{"other": []}', None, 'fixes',
+     (False, [], "response has no 'fixes' array")),
+    ("key is not an array", '{"fixes": 3}', None, 'fixes', (False, [], "response has no 'fixes' array")),
+    ("truncated tail keeps items", '{"fixes": [{"a": 1}, {"a": 2}, {"a"', Schema({'a': int}), 'fixes',
+     (False, [{'a': 1}, {'a': 2}], "response ended before the JSON was complete")),
+    ("invalid item skipped", '[{"a": 1}, {"a": "x"}]', Schema({'a': int}), None, (True, [{'a': 1}], None)),
+    ("no JSON", 'No fixes needed.', None, 'fixes', (False, [], "no JSON found in response")),
+]
+
+
+def self_check() -> bool:
+    """Run parse_response over SELF_CHECKS. Returns True if every case matches."""
+    failures = 0
+    for description, text, schema, items_key, expected in SELF_CHECKS:
+        try:
+            result = parse_response(text, schema, items_key)
+            actual = (result.complete, result.items, result.error)
+        except Exception as e:
+            actual = f"{type(e).__name__}: {e}"
+        if actual != expected or (not isinstance(actual, str) and result.interrupted):
+            failures += 1
+            print(f"  FAIL {description}: got {actual}, expected {expected}")
+
+    if failures:
+        print(f"Parser self-check FAILED: {failures} of {len(SELF_CHECKS)} cases")
+        return False
+    print(f"Parser self-check passed ({len(SELF_CHECKS)} cases)")
+    return True
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['--self-check']:
+        print("Usage: python3 scripts/structured_output.py --self-check")
+        sys.exit(2)
+    sys.exit(0 if self_check() else 1)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Ledger of external API usage (Claude, DeepL) in a local SQLite file.
+
+Every request made through claude_client.ClaudeClient and every DeepL call
+(import_chapter lemma/sentence translation, import_lyrics --translate) is recorded:
+provider, model, phase, the chapter or song it was for (scope), items
+processed, tokens or characters, latency, status (ok / partial / error),
+whether it was a retry, and whether the prompt cache was hit. Each script
+invocation is a run.
+
+The report turns that into throughput (items/sec over the wall-clock span of
+the phase, so concurrent calls count once), p50/p95 latency, retry and error
+counts and estimated cost - the numbers needed to tune --workers, --rpm and
+batch sizes:
+
+    python scripts/usage_ledger.py                       # last run, per phase
+    python scripts/usage_ledger.py --runs 5 --by scope   # cost per chapter / song
+    python scripts/usage_ledger.py --since 7 --script import_lyrics
+    python scripts/usage_ledger.py --list-runs
+
+The ledger lives in scripts/.usage_ledger.sqlite; set USAGE_LEDGER_PATH to
+use another file, or to 'off' to record nothing. Costs are estimates from
+PRICES (USD) - update them when the providers' prices change.
+
+Recording from a script:
+    ledger.set_scope(f"chapter {chapter_number}")   # default for the process
+    with ledger.scope(f"song {title}"):             # for calls in this block
+        ...
+    ledger.record('deepl', None, 'translate', started, latency, items=len(texts), characters=n)
+"""
+
+import argparse
+import contextvars
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_PATH = Path(__file__).resolve().parent / '.usage_ledger.sqlite'
+
+TOKEN_FIELDS = ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens')
+
+# USD per million tokens (Claude) or characters (DeepL), by model, then provider
+PRICES = {
+    'claude-sonnet-4-20250514': {
+        'input_tokens': 3.00,
+        'output_tokens': 15.00,
+        'cache_creation_input_tokens': 3.75,
+        'cache_read_input_tokens': 0.30,
+    },
+    'deepl': {'characters': 25.00},
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    script TEXT NOT NULL,
+    args TEXT,
+    started_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calls (
+    call_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    provider TEXT NOT NULL,
+    model TEXT,
+    phase TEXT NOT NULL,
+    scope TEXT,
+    items INTEGER NOT NULL DEFAULT 1,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    cache_creation_input_tokens INTEGER NOT NULL DEFAULT 0,
+    cache_read_input_tokens INTEGER NOT NULL DEFAULT 0,
+    characters INTEGER NOT NULL DEFAULT 0,
+    cache_hit INTEGER NOT NULL DEFAULT 0,
+    started_at REAL NOT NULL,
+    latency_ms REAL NOT NULL,
+    status TEXT NOT NULL,
+    retry INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_calls_run ON calls(run_id);
+"""
+
+
+class UsageLedger:
+    """
+    Thread-safe recorder of API calls for one process (one run). The database
+    is opened, and the run registered, on the first recorded call.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('USAGE_LEDGER_PATH') or str(DEFAULT_PATH)
+        self.enabled = self.path != 'off'
+        self.run_id = uuid.uuid4().hex[:12]
+        self.default_scope = None
+        self._scope = contextvars.ContextVar('usage_scope', default=None)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def set_scope(self, scope: Optional[str]) -> None:
+        """Scope (e.g. 'chapter 3') for calls made anywhere in this process."""
+        self.default_scope = scope
+
+    @contextmanager
+    def scope(self, scope: Optional[str]):
+        """Scope for calls made in this block (this thread); None keeps the current one."""
+        if scope is None:
+            yield
+            return
+        token = self._scope.set(scope)
+        try:
+            yield
+        finally:
+            self._scope.reset(token)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.executescript(SCHEMA)
+            conn.execute(
+                "INSERT INTO runs (run_id, script, args, started_at) VALUES (?, ?, ?, ?)",
+                (self.run_id, Path(sys.argv[0]).stem or 'python', ' '.join(sys.argv[1:]), time.time())
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def record(self, provider: str, model: Optional[str], phase: str, started: float, latency: float,
+               status: str = 'ok', items: int = 1, usage: Optional[Dict[str, int]] = None,
+               characters: int = 0, retry: bool = False, error: Optional[str] = None) -> None:
+        """
+        Record one call. started is a time.time() timestamp, latency is in
+        seconds. A ledger that can't be written is disabled with a warning -
+        it never fails the calling script.
+        """
+        if not self.enabled:
+            return
+        usage = usage or {}
+        row = (
+            self.run_id, provider, model, phase, self._scope.get() or self.default_scope, items,
+            *(usage.get(name, 0) for name in TOKEN_FIELDS),
+            characters, int(usage.get('cache_read_input_tokens', 0) > 0),
+            started, latency * 1000, status, int(retry), error[:200] if error else None,
+        )
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT INTO calls (run_id, provider, model, phase, scope, items, "
+                    f"{', '.join(TOKEN_FIELDS)}, characters, cache_hit, started_at, latency_ms, "
+                    "status, retry, error) VALUES (" + ', '.join('?' * len(row)) + ")",
+                    row
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: usage ledger disabled ({self.path}): {e}")
+                self.enabled = False
+
+
+ledger = UsageLedger()
+
+
+# =============================================================================
+# REPORT
+# =============================================================================
+
+def call_cost(call: Dict) -> float:
+    """Estimated USD cost of a calls row (0 for unpriced models)."""
+    prices = PRICES.get(call['model']) or PRICES.get(call['provider']) or {}
+    return sum(call[name] * price for name, price in prices.items()) / 1_000_000
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def select_runs(conn: sqlite3.Connection, runs: int = 1, since_days: Optional[float] = None,
+                run_id: Optional[str] = None, script: Optional[str] = None) -> List[Dict]:
+    """Runs to report on: one run, the runs of the last days, or the last N runs."""
+    query = "SELECT * FROM runs WHERE 1=1"
+    params = []
+    if run_id:
+        query += " AND run_id = ?"
+        params.append(run_id)
+    if script:
+        query += " AND script = ?"
+        params.append(script)
+    if since_days is not None:
+        query += " AND started_at >= ?"
+        params.append(time.time() - since_days * 86400)
+    query += " ORDER BY started_at DESC"
+    if not run_id and since_days is None:
+        query += " LIMIT ?"
+        params.append(runs)
+    return [dict(row) for row in conn.execute(query, params)]
+
+
+def summarize(calls: Iterable[Dict], key) -> Dict[str, Dict]:
+    """Group calls by key(call) into throughput, latency, cache and cost totals."""
+    groups = {}
+    for call in calls:
+        group = groups.setdefault(key(call), {'calls': [], 'spans': {}})
+        group['calls'].append(call)
+        # Wall-clock span per run: concurrent calls overlap, so summing
+        # latencies would understate throughput
+        end = call['started_at'] + call['latency_ms'] / 1000
+        first, last = group['spans'].get(call['run_id'], (call['started_at'], end))
+        group['spans'][call['run_id']] = (min(first, call['started_at']), max(last, end))
+
+    summary = {}
+    for name, group in groups.items():
+        rows = group['calls']
+        items = sum(c['items'] for c in rows if c['status'] != 'error')
+        span = sum(last - first for first, last in group['spans'].values())
+        total_input = sum(c['input_tokens'] + c['cache_creation_input_tokens'] + c['cache_read_input_tokens']
+                          for c in rows)
+        latencies = [c['latency_ms'] for c in rows]
+        summary[name] = {
+            'calls': len(rows),
+            'retries': sum(c['retry'] for c in rows),
+            'errors': sum(c['status'] == 'error' for c in rows),
+            'partial': sum(c['status'] == 'partial' for c in rows),
+            'items': items,
+            'items_per_sec': items / span if span > 0 else 0.0,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'cached_pct': round(sum(c['cache_read_input_tokens'] for c in rows) / total_input * 100)
+                          if total_input else None,
+            'tokens': total_input + sum(c['output_tokens'] for c in rows),
+            'characters': sum(c['characters'] for c in rows),
+            'cost': sum(call_cost(c) for c in rows),
+        }
+    return summary
+
+
+def print_report(conn: sqlite3.Connection, runs: List[Dict], by: str = 'phase') -> None:
+    run_ids = [run['run_id'] for run in runs]
+    calls = [dict(row) for row in conn.execute(
+        f"SELECT * FROM calls WHERE run_id IN ({', '.join('?' * len(run_ids))}) ORDER BY started_at",
+        run_ids
+    )]
+
+    if by == 'scope':
+        key = lambda c: c['scope'] or '(unscoped)'
+    else:
+        key = lambda c: f"{c['provider']} {c['phase']}"
+    summary = summarize(calls, key)
+
+    scripts = sorted({run['script'] for run in runs})
+    since = datetime.fromtimestamp(min(run['started_at'] for run in runs)).strftime('%Y-%m-%d %H:%M')
+    print("=" * 110)
+    print(f"API USAGE - {len(runs)} run{'s' if len(runs) != 1 else ''} of {', '.join(scripts)} since {since}")
+    print("=" * 110)
+    print(f"  {by:<30} {'calls':>6} {'retry':>5} {'partl':>5} {'error':>5} {'items':>7} {'items/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'cached':>6} {'tokens':>9} {'chars':>8} {'cost $':>8}")
+    for name in sorted(summary, key=lambda n: -summary[n]['cost']):
+        s = summary[name]
+        cached = f"{s['cached_pct']}%" if s['cached_pct'] is not None else '-'
+        print(f"  {name[:30]:<30} {s['calls']:>6} {s['retries']:>5} {s['partial']:>5} {s['errors']:>5} "
+              f"{s['items']:>7} {s['items_per_sec']:>8.2f} {s['p50_ms']:>8.0f} {s['p95_ms']:>8.0f} "
+              f"{cached:>6} {s['tokens']:>9} {s['characters']:>8} {s['cost']:>8.4f}")
+    print("-" * 110)
+    total = {field: sum(s[field] for s in summary.values())
+             for field in ('retries', 'partial', 'errors', 'items', 'tokens', 'characters', 'cost')}
+    print(f"  {'total':<30} {len(calls):>6} {total['retries']:>5} {total['partial']:>5} {total['errors']:>5} "
+          f"{total['items']:>7} {'':>8} {'':>8} {'':>8} {'':>6} {total['tokens']:>9} {total['characters']:>8} "
+          f"{total['cost']:>8.4f}")
+
+    unpriced = sorted({c['model'] or c['provider'] for c in calls
+                       if c['model'] not in PRICES and c['provider'] not in PRICES})
+    if unpriced:
+        print(f"  No price for: {', '.join(unpriced)} (counted as $0 - add to PRICES)")
+
+
+def print_runs(conn: sqlite3.Connection, runs: List[Dict]) -> None:
+    print(f"  {'run':<12} {'started':<16} {'script':<28} {'calls':>6} {'cost $':>8}  args")
+    for run in runs:
+        calls = [dict(row) for row in conn.execute("SELECT * FROM calls WHERE run_id = ?", (run['run_id'],))]
+        started = datetime.fromtimestamp(run['started_at']).strftime('%Y-%m-%d %H:%M')
+        print(f"  {run['run_id']:<12} {started:<16} {run['script'][:28]:<28} {len(calls):>6} "
+              f"{sum(call_cost(c) for c in calls):>8.4f}  {(run['args'] or '')[:50]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report API throughput, latency and cost from the usage ledger')
+    parser.add_argument('--runs', type=int, default=1, help='Report on the last N runs (default: 1)')
+    parser.add_argument('--since', type=float, metavar='DAYS', help='Report on all runs of the last DAYS days')
+    parser.add_argument('--run', type=str, metavar='RUN_ID', help='Report on one run')
+    parser.add_argument('--script', type=str, help='Only runs of this script (e.g. import_lyrics)')
+    parser.add_argument('--by', choices=('phase', 'scope'), default='phase',
+                        help='Group by provider/phase, or by chapter/song (default: phase)')
+    parser.add_argument('--list-runs', action='store_true', help='List runs instead of reporting')
+    parser.add_argument('--db', type=str, help='Ledger file (default: USAGE_LEDGER_PATH or scripts/.usage_ledger.sqlite)')
+    args = parser.parse_args()
+
+    path = args.db or os.getenv('USAGE_LEDGER_PATH') or str(DEFAULT_PATH)
+    if not Path(path).exists():
+        print(f"No usage ledger at {path} - run a script that calls Claude or DeepL first")
+        sys.exit(1)
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+
+    runs = select_runs(conn, args.runs if not args.list_runs else max(args.runs, 20),
+                       args.since, args.run, args.script)
+    if not runs:
+        print("No matching runs")
+        sys.exit(1)
+
+    if args.list_runs:
+        print_runs(conn, runs)
+    else:
+        print_report(conn, runs, args.by)
+
+
+if __name__ == '__main__':
+    main()
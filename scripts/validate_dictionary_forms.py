@@ -9,6 +9,10 @@ This script uses Claude AI to check each lemma and identify:
 4. Duplicate lemmas with the same meaning
 
 For each issue found, it suggests the correct canonical form.
+
+Lemmas unchanged since their last check (same text, POS, gender, definitions
+and PROMPT_VERSION) are skipped and their stored issue is reused; pass --full
+to re-check everything. See validation_cache.py.
 """
 
 import os
@@ -20,6 +24,10 @@ from dotenv import load_dotenv
 from supabase import create_client
 import anthropic
 
+from claude_client import ClaudeClient
+from structured_output import NUMBER, OPTIONAL_STR, Schema
+from validation_cache import ValidationCache
+
 # Load environment
 load_dotenv()
 
@@ -28,10 +36,23 @@ db = create_client(
     os.getenv('VITE_SUPABASE_URL'),
     os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 )
-claude = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+claude = ClaudeClient(anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY')))
 
 BATCH_SIZE = 30  # Lemmas per API call
 
+# Bump when the validation prompt changes so every lemma is re-checked
+PROMPT_VERSION = 1
+
+# Fields of an AI issue that are stored with the fingerprint (the rest are
+# recomputed against the current lemmas on every run)
+ISSUE_FIELDS = ('lemma', 'issue_type', 'canonical_form', 'explanation', 'confidence')
+
+# One element of the AI response array
+ISSUE_SCHEMA = Schema(
+    {'lemma': str, 'issue_type': str, 'canonical_form': OPTIONAL_STR},
+    {'explanation': str, 'confidence': NUMBER},
+)
+
 
 def get_all_lemmas():
     """Fetch all lemmas with pagination."""
@@ -46,23 +67,10 @@ def get_all_lemmas():
     return all_lemmas
 
 
-def validate_batch_with_ai(lemmas_batch):
-    """Use Claude to validate a batch of lemmas for dictionary form correctness."""
-
-    # Format lemmas for the prompt
-    lemma_list = []
-    for l in lemmas_batch:
-        defs = l.get('definitions', [])
-        first_def = defs[0] if defs else 'NO TRANSLATION'
-        gender = l.get('gender', '')
-        gender_str = f", gender={gender}" if gender else ""
-        lemma_list.append(f"- {l['lemma_text']} (POS={l['part_of_speech']}{gender_str}): \"{first_def}\"")
+# Fixed instructions, sent as the cached system prefix (see claude_client.py)
+DICTIONARY_FORM_INSTRUCTIONS = """You are a Spanish language expert validating a vocabulary database.
 
-    lemmas_text = "\n".join(lemma_list)
-
-    prompt = f"""You are a Spanish language expert validating a vocabulary database.
-
-For each lemma below, determine if it is the CANONICAL DICTIONARY FORM. In Spanish dictionaries:
+For each lemma given, determine if it is the CANONICAL DICTIONARY FORM. In Spanish dictionaries:
 - VERBS: Always listed as infinitives ending in -ar, -er, or -ir (NOT conjugations like "compro", "hablas", "duermen")
 - ADJECTIVES: Listed as masculine singular (bueno, not buena/buenos/buenas)
 - NOUNS: Listed as singular (perro, not perros). With appropriate article (el/la).
@@ -72,9 +80,6 @@ Also identify:
 - GARBAGE: Misspelled words that don't exist in Spanish (like "llevarter", "trabajer")
 - DUPLICATES: Multiple lemmas that should be merged (same meaning, one is a variant)
 
-LEMMAS TO VALIDATE:
-{lemmas_text}
-
 Return a JSON array with objects for ONLY problematic lemmas. Skip lemmas that are correct.
 Each object should have:
 - "lemma": the problematic lemma text
@@ -85,43 +90,63 @@ Each object should have:
 
 Example response:
 [
-  {{"lemma": "compran", "issue_type": "conjugation", "canonical_form": "comprar", "explanation": "conjugated form (3rd person plural present) of comprar", "confidence": 99}},
-  {{"lemma": "llevarter", "issue_type": "garbage", "canonical_form": null, "explanation": "not a Spanish word, likely OCR/processing error", "confidence": 95}},
-  {{"lemma": "buenas", "issue_type": "variant", "canonical_form": "bueno", "explanation": "feminine plural of bueno, should merge", "confidence": 98}}
+  {"lemma": "compran", "issue_type": "conjugation", "canonical_form": "comprar", "explanation": "conjugated form (3rd person plural present) of comprar", "confidence": 99},
+  {"lemma": "llevarter", "issue_type": "garbage", "canonical_form": null, "explanation": "not a Spanish word, likely OCR/processing error", "confidence": 95},
+  {"lemma": "buenas", "issue_type": "variant", "canonical_form": "bueno", "explanation": "feminine plural of bueno, should merge", "confidence": 98}
 ]
 
 If ALL lemmas in this batch are correct dictionary forms, return an empty array: []
 
 Respond with ONLY the JSON array, no other text."""
 
-    try:
-        response = claude.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4000,
-            messages=[{"role": "user", "content": prompt}]
-        )
 
-        # Parse the response
-        response_text = response.content[0].text.strip()
+def validate_batch_with_ai(lemmas_batch):
+    """
+    Use Claude to validate a batch of lemmas for dictionary form correctness.
+    Returns (issues, complete). Issues are parsed as the response streams in,
+    so those before a failed request or malformed tail are kept; when the
+    response is incomplete, lemmas without an issue are unconfirmed.
+    """
+
+    # Format lemmas for the prompt
+    lemma_list = []
+    for l in lemmas_batch:
+        defs = l.get('definitions', [])
+        first_def = defs[0] if defs else 'NO TRANSLATION'
+        gender = l.get('gender', '')
+        gender_str = f", gender={gender}" if gender else ""
+        lemma_list.append(f"- {l['lemma_text']} (POS={l['part_of_speech']}{gender_str}): \"{first_def}\"")
+
+    lemmas_text = "\n".join(lemma_list)
+
+    result = claude.request(
+        'dictionary-forms', DICTIONARY_FORM_INSTRUCTIONS, f"LEMMAS TO VALIDATE:\n{lemmas_text}",
+        ISSUE_SCHEMA, max_tokens=4000, items=len(lemmas_batch)
+    )
+    complete = result.complete and not result.invalid
+    if not complete:
+        print(f"  Incomplete response ({len(result.items)} issues parsed): "
+              f"{result.error or result.invalid[0][1]}")
+    return result.items, complete
 
-        # Handle potential markdown code blocks
-        if response_text.startswith("```"):
-            lines = response_text.split("\n")
-            response_text = "\n".join(lines[1:-1])
 
-        issues = json.loads(response_text)
-        return issues
+def enrich_issue(issue, lemma_lookup):
+    """Attach lemma_id and canonical lookup info to an AI issue."""
+    lemma_text = issue.get('lemma')
+    if lemma_text and lemma_text in lemma_lookup:
+        issue['lemma_id'] = lemma_lookup[lemma_text]['lemma_id']
 
-    except json.JSONDecodeError as e:
-        print(f"  JSON parse error: {e}")
-        print(f"  Response: {response_text[:500]}")
-        return []
-    except Exception as e:
-        print(f"  API error: {e}")
-        return []
+        # Check if canonical form exists
+        canonical = issue.get('canonical_form')
+        if canonical and canonical in lemma_lookup:
+            issue['canonical_exists'] = True
+            issue['canonical_id'] = lemma_lookup[canonical]['lemma_id']
+        else:
+            issue['canonical_exists'] = False
+    return issue
 
 
-def run_validation(output_file=None, dry_run=True):
+def run_validation(output_file=None, dry_run=True, full=False):
     """Run dictionary form validation on all lemmas."""
     print("=" * 80)
     print("DICTIONARY FORM VALIDATION")
@@ -139,39 +164,48 @@ def run_validation(output_file=None, dry_run=True):
     # Build lookup for finding canonical forms
     lemma_lookup = {l['lemma_text']: l for l in all_lemmas}
 
-    all_issues = []
+    # Skip lemmas unchanged since their last check, reusing the stored issue
+    cache = ValidationCache(db, 'dictionary_form', PROMPT_VERSION, full=full)
+    to_check, unchanged = cache.split(all_lemmas)
+    cache.print_skip_ratio(len(all_lemmas), len(unchanged))
+
+    all_issues = [enrich_issue(dict(issue), lemma_lookup) for _, issue in unchanged if issue]
+    failed_batches = 0
 
     # Process in batches
-    total_batches = (len(all_lemmas) + BATCH_SIZE - 1) // BATCH_SIZE
+    total_batches = (len(to_check) + BATCH_SIZE - 1) // BATCH_SIZE
 
-    for i in range(0, len(all_lemmas), BATCH_SIZE):
-        batch = all_lemmas[i:i + BATCH_SIZE]
+    for i in range(0, len(to_check), BATCH_SIZE):
+        batch = to_check[i:i + BATCH_SIZE]
         batch_num = i // BATCH_SIZE + 1
 
         print(f"\nBatch {batch_num}/{total_batches} ({len(batch)} lemmas)...", end=" ", flush=True)
 
-        issues = validate_batch_with_ai(batch)
+        issues, complete = validate_batch_with_ai(batch)
 
         if issues:
             print(f"Found {len(issues)} issues")
             for issue in issues:
-                # Enrich with additional info
-                lemma_text = issue.get('lemma')
-                if lemma_text and lemma_text in lemma_lookup:
-                    issue['lemma_id'] = lemma_lookup[lemma_text]['lemma_id']
-
-                    # Check if canonical form exists
-                    canonical = issue.get('canonical_form')
-                    if canonical and canonical in lemma_lookup:
-                        issue['canonical_exists'] = True
-                        issue['canonical_id'] = lemma_lookup[canonical]['lemma_id']
-                    else:
-                        issue['canonical_exists'] = False
-
-                all_issues.append(issue)
-        else:
+                all_issues.append(enrich_issue(issue, lemma_lookup))
+        elif complete:
             print("OK")
 
+        # Only problematic lemmas come back - everything else is stored as
+        # clean if the response was complete. Otherwise the remaining lemmas
+        # are not fingerprinted, so the next run retries them.
+        if not complete:
+            failed_batches += 1
+        by_lemma = {issue['lemma']: issue for issue in issues}
+        try:
+            cache.save([
+                (l, {k: by_lemma[l['lemma_text']].get(k) for k in ISSUE_FIELDS}
+                 if l['lemma_text'] in by_lemma else None)
+                for l in batch
+                if complete or l['lemma_text'] in by_lemma
+            ])
+        except Exception as e:
+            print(f"  Warning: Could not save fingerprints: {e}")
+
         # Rate limiting
         time.sleep(0.5)
 
@@ -189,8 +223,12 @@ def run_validation(output_file=None, dry_run=True):
         by_type[issue_type].append(issue)
 
     print(f"\nTotal issues found: {len(all_issues)}")
+    print(f"Lemmas checked: {len(to_check)}, skipped (unchanged): {len(unchanged)}")
+    if failed_batches:
+        print(f"Incomplete batches: {failed_batches} (re-run to retry)")
     for issue_type, issues in sorted(by_type.items()):
         print(f"  {issue_type}: {len(issues)}")
+    claude.print_usage()
 
     # Show details by category
     for issue_type, issues in sorted(by_type.items()):
@@ -215,6 +253,8 @@ def run_validation(output_file=None, dry_run=True):
             json.dump({
                 'generated': datetime.now().isoformat(),
                 'total_lemmas': len(all_lemmas),
+                'checked': len(to_check),
+                'skipped_unchanged': len(unchanged),
                 'total_issues': len(all_issues),
                 'by_type': {k: len(v) for k, v in by_type.items()},
                 'issues': all_issues
@@ -258,146 +298,87 @@ AUTO-GENERATED: Apply dictionary form fixes.
 Generated: {timestamp}
 
 This script merges/deletes/renames lemmas based on AI validation.
-Review before running!
+Merges and deletes run as one transaction through lemma_merge.py, so the
+script must live in scripts/ and can be re-run safely.
+Review before running! Dry run by default, use --apply to make changes.
 """
 
 import os
+import sys
 from dotenv import load_dotenv
 from supabase import create_client
 
+from lemma_merge import deletes_from_list, fetch_all_lemmas, merges_from_canonical_map, run_merges
+
 load_dotenv()
 db = create_client(
     os.getenv('VITE_SUPABASE_URL'),
     os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 )
 
+MERGES = {merges!r}
 
-def get_lemma(text):
-    """Get lemma by text."""
-    result = db.table('lemmas').select('*').eq('lemma_text', text).execute()
-    return result.data[0] if result.data else None
-
-
-def merge_to_canonical(canonical_text, duplicates):
-    """Merge duplicate lemmas into canonical form."""
-    canonical = get_lemma(canonical_text)
-    if not canonical:
-        print(f"  WARNING: Canonical '{canonical_text}' not found")
-        return 0
-
-    merged = 0
-    for dup_text in duplicates:
-        dup = get_lemma(dup_text)
-        if not dup:
-            print(f"  {dup_text}: already merged or not found")
-            continue
-
-        # Count and reassign words
-        words = db.table('words').select('word_id', count='exact').eq('lemma_id', dup['lemma_id']).execute()
-        word_count = words.count or 0
-
-        if word_count > 0:
-            db.table('words').update({{'lemma_id': canonical['lemma_id']}}).eq('lemma_id', dup['lemma_id']).execute()
-
-        # Delete validation report
-        db.table('validation_reports').delete().eq('lemma_id', dup['lemma_id']).execute()
+DELETES = {deletes!r}
 
-        # Delete duplicate
-        db.table('lemmas').delete().eq('lemma_id', dup['lemma_id']).execute()
+RENAMES = {renames!r}
 
-        print(f"  {dup_text} → {canonical_text} ({word_count} words)")
-        merged += 1
 
-    return merged
-
-
-def delete_garbage(lemma_text):
-    """Delete garbage lemma and its words."""
-    lemma = get_lemma(lemma_text)
-    if not lemma:
-        return False
-
-    # Delete words
-    db.table('words').delete().eq('lemma_id', lemma['lemma_id']).execute()
-
-    # Delete validation report
-    db.table('validation_reports').delete().eq('lemma_id', lemma['lemma_id']).execute()
-
-    # Delete lemma
-    db.table('lemmas').delete().eq('lemma_id', lemma['lemma_id']).execute()
+def main():
+    dry_run = '--apply' not in sys.argv
 
-    print(f"  DELETED: {lemma_text}")
-    return True
+    print("=" * 80)
+    print("APPLYING DICTIONARY FORM FIXES" + (" (DRY RUN)" if dry_run else ""))
+    print("=" * 80)
 
+    lemmas = fetch_all_lemmas(db)
+    lemma_lookup = {{l['lemma_text']: l for l in lemmas}}
 
-def rename_lemma(old_text, new_text):
-    """Rename a lemma to its correct form."""
-    lemma = get_lemma(old_text)
-    if not lemma:
-        return False
+    # Renames whose target already exists become merges
+    specs = merges_from_canonical_map(MERGES)
+    renames = {{}}
+    for old, new in RENAMES.items():
+        if old not in lemma_lookup:
+            continue
+        if new in lemma_lookup:
+            specs.append((old, new, None))
+        else:
+            renames[old] = new
 
-    # Check if new form exists
-    existing = get_lemma(new_text)
-    if existing:
-        # Merge instead
-        return merge_to_canonical(new_text, [old_text])
+    print('\\nMERGING DUPLICATES...')
+    merged = run_merges(db, specs, lemmas, dry_run)
 
-    # Rename
-    db.table('lemmas').update({{'lemma_text': new_text}}).eq('lemma_id', lemma['lemma_id']).execute()
-    print(f"  RENAMED: {old_text} → {new_text}")
-    return True
+    print('\\nDELETING GARBAGE LEMMAS...')
+    deleted = run_merges(db, deletes_from_list(DELETES), lemmas, dry_run)
 
+    print('\\nRENAMING LEMMAS...')
+    for old, new in sorted(renames.items()):
+        print(f"  RENAMED: {{old}} → {{new}}")
+        if not dry_run:
+            db.table('lemmas').update({{'lemma_text': new}}).eq('lemma_id', lemma_lookup[old]['lemma_id']).execute()
 
-def main():
-    print("=" * 80)
-    print("APPLYING DICTIONARY FORM FIXES")
-    print("=" * 80)
+    total = merged['merged'] + deleted['deleted'] + len(renames)
 
-    total_merged = 0
-    total_deleted = 0
-    total_renamed = 0
-
-'''.format(timestamp=datetime.now().isoformat())
-
-    # Add merge operations
-    if merges:
-        script += "    # MERGES\n"
-        script += "    print('\\nMERGING DUPLICATES...')\n"
-        for canonical, dups in sorted(merges.items()):
-            dups_str = str(dups)
-            script += f"    total_merged += merge_to_canonical('{canonical}', {dups_str})\n"
-        script += "\n"
-
-    # Add delete operations
-    if deletes:
-        script += "    # DELETES\n"
-        script += "    print('\\nDELETING GARBAGE LEMMAS...')\n"
-        for lemma in sorted(deletes):
-            script += f"    if delete_garbage('{lemma}'): total_deleted += 1\n"
-        script += "\n"
-
-    # Add rename operations
-    if renames:
-        script += "    # RENAMES\n"
-        script += "    print('\\nRENAMING LEMMAS...')\n"
-        for old, new in sorted(renames.items()):
-            script += f"    if rename_lemma('{old}', '{new}'): total_renamed += 1\n"
-        script += "\n"
-
-    script += '''
     print()
     print("=" * 80)
     print("SUMMARY")
     print("=" * 80)
-    print(f"  Merged: {total_merged}")
-    print(f"  Deleted: {total_deleted}")
-    print(f"  Renamed: {total_renamed}")
-    print(f"  TOTAL: {total_merged + total_deleted + total_renamed}")
+    print(f"  Merged: {{merged['merged']}} ({{merged['words_reassigned']}} words reassigned)")
+    print(f"  Deleted: {{deleted['deleted']}} ({{deleted['words_deleted']}} words deleted)")
+    print(f"  Renamed: {{len(renames)}}")
+    print(f"  TOTAL: {{total}}")
+
+    if dry_run:
+        print("\\n*** DRY RUN - Use --apply to make changes ***")
 
 
 if __name__ == '__main__':
     main()
-'''
+'''.format(
+        timestamp=datetime.now().isoformat(),
+        merges={k: merges[k] for k in sorted(merges)},
+        deletes=sorted(deletes),
+        renames={k: renames[k] for k in sorted(renames)},
+    )
 
     with open(output_file, 'w') as f:
         f.write(script)
@@ -418,10 +399,12 @@ def main():
                         help='Generate a Python script to apply fixes')
     parser.add_argument('--fix-script', default='apply_dictionary_fixes.py',
                         help='Output file for fix script')
+    parser.add_argument('--full', action='store_true',
+                        help='Re-check lemmas even if unchanged since last run')
 
     args = parser.parse_args()
 
-    issues = run_validation(output_file=args.output)
+    issues = run_validation(output_file=args.output, full=args.full)
 
     if args.generate_fixes and issues:
         generate_fix_script(issues, args.fix_script)
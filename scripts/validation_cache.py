@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Incremental AI validation support.
+
+Each validator (exhaustive_ai_validation, validate_dictionary_forms,
+import_chapter --validate-ai) stores a content fingerprint per lemma in the
+lemma_validation_fingerprints table (see
+supabase/migrations/20260203_lemma_validation_fingerprints.sql). On the next
+run, lemmas whose fingerprint still matches are skipped and their stored
+result is reused, so routine validation only pays for lemmas that changed.
+
+The fingerprint covers lemma_text, part_of_speech, gender, definitions and
+the validator's prompt version - bump the version when a prompt changes.
+
+Usage from a validator:
+    cache = ValidationCache(db, 'exhaustive', PROMPT_VERSION)
+    changed, unchanged = cache.split(lemmas)
+    ... validate `changed` ...
+    cache.save([(lemma, result), ...])
+    cache.print_skip_ratio(len(lemmas), len(unchanged))
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TABLE = 'lemma_validation_fingerprints'
+PAGE_SIZE = 1000
+UPSERT_BATCH_SIZE = 500
+
+
+def lemma_fingerprint(lemma: Dict, prompt_version) -> str:
+    """Hash the lemma fields a validator looks at, plus the prompt version."""
+    content = [
+        lemma.get('lemma_text'),
+        lemma.get('part_of_speech'),
+        lemma.get('gender'),
+        lemma.get('definitions') or [],
+        str(prompt_version),
+    ]
+    encoded = json.dumps(content, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ValidationCache:
+    """Stored fingerprints and results for one validator."""
+
+    def __init__(self, db, validator: str, prompt_version, full: bool = False):
+        self.db = db
+        self.validator = validator
+        self.prompt_version = prompt_version
+        self.full = full
+        self._stored = None
+
+    def load(self) -> Dict[str, Dict]:
+        """Fetch {lemma_id: {fingerprint, result}} for this validator (once)."""
+        if self._stored is not None:
+            return self._stored
+
+        self._stored = {}
+        if self.full:
+            return self._stored
+
+        offset = 0
+        while True:
+            batch = self.db.table(TABLE).select('lemma_id, fingerprint, result').eq(
+                'validator', self.validator
+            ).range(offset, offset + PAGE_SIZE - 1).execute()
+            for row in batch.data:
+                self._stored[row['lemma_id']] = row
+            if len(batch.data) < PAGE_SIZE:
+                break
+            offset += PAGE_SIZE
+
+        return self._stored
+
+    def split(self, lemmas: Iterable[Dict]) -> Tuple[List[Dict], List[Tuple[Dict, Optional[Dict]]]]:
+        """
+        Split lemmas into (changed, unchanged). Unchanged entries are
+        (lemma, stored_result) pairs.
+        """
+        stored = self.load()
+        changed = []
+        unchanged = []
+        for lemma in lemmas:
+            row = stored.get(lemma['lemma_id'])
+            if row and row['fingerprint'] == lemma_fingerprint(lemma, self.prompt_version):
+                unchanged.append((lemma, row.get('result')))
+            else:
+                changed.append(lemma)
+        return changed, unchanged
+
+    def save(self, entries: Iterable[Tuple[Dict, Optional[Dict]]]) -> None:
+        """Record (lemma, result) pairs as validated with the current fingerprint."""
+        rows = [
+            {
+                'lemma_id': lemma['lemma_id'],
+                'validator': self.validator,
+                'fingerprint': lemma_fingerprint(lemma, self.prompt_version),
+                'result': strip_lemma(result),
+                'validated_at': datetime.now().isoformat(),
+            }
+            for lemma, result in entries
+        ]
+        for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+            self.db.table(TABLE).upsert(rows[i:i + UPSERT_BATCH_SIZE], on_conflict='lemma_id,validator').execute()
+
+    @staticmethod
+    def print_skip_ratio(total: int, skipped: int) -> None:
+        ratio = (skipped / total * 100) if total else 0
+        print(f"Unchanged since last validation: {skipped}/{total} ({ratio:.1f}%) skipped, "
+              f"{total - skipped} to validate")
+
+
+def strip_lemma(result: Optional[Dict]) -> Optional[Dict]:
+    """Drop the embedded lemma row validators attach to results before storing."""
+    if not isinstance(result, dict):
+        return result
+    return {k: v for k, v in result.items() if k != 'lemma'}
@@ -0,0 +1,155 @@
+-- Set-based lemma merge
+-- Used by the dictionary maintenance scripts (scripts/lemma_merge.py) to merge
+-- duplicate lemmas into canonical forms, or delete garbage lemmas, in a single
+-- transaction instead of one count/update/delete round trip per duplicate.
+--
+-- p_merges is a JSONB array of {"duplicate_id": uuid, "canonical_id": uuid | null}.
+-- A null canonical_id deletes the duplicate together with its words.
+--
+-- For each entry:
+--   words, song_line_words, song_lemmas, user_review_history -> reassigned to canonical
+--   user_lemma_progress -> moved to canonical unless the user already has a canonical row
+--   validation_reports  -> the duplicate's report is deleted
+--   lemmas              -> the duplicate is deleted
+--
+-- Entries whose duplicate no longer exists are reported as 'missing' and skipped,
+-- so the same mapping can be re-run safely. With p_dry_run the counts are
+-- computed but nothing is changed.
+
+CREATE OR REPLACE FUNCTION merge_lemmas(
+  p_merges JSONB,
+  p_dry_run BOOLEAN DEFAULT TRUE
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  v_entry JSONB;
+  v_dup_id UUID;
+  v_canonical_id UUID;
+  v_status TEXT;
+  v_words INTEGER;
+  v_song_line_words INTEGER;
+  v_song_lemmas INTEGER;
+  v_reports INTEGER;
+  v_progress_moved INTEGER;
+  v_progress_dropped INTEGER;
+  v_results JSONB := '[]'::jsonb;
+BEGIN
+  FOR v_entry IN SELECT * FROM jsonb_array_elements(p_merges)
+  LOOP
+    v_dup_id := (v_entry->>'duplicate_id')::uuid;
+    v_canonical_id := NULLIF(v_entry->>'canonical_id', '')::uuid;
+
+    IF NOT EXISTS (SELECT 1 FROM lemmas WHERE lemma_id = v_dup_id) THEN
+      v_results := v_results || jsonb_build_object(
+        'duplicate_id', v_dup_id, 'canonical_id', v_canonical_id, 'status', 'missing'
+      );
+      CONTINUE;
+    END IF;
+
+    IF v_canonical_id IS NOT NULL THEN
+      IF v_canonical_id = v_dup_id
+         OR NOT EXISTS (SELECT 1 FROM lemmas WHERE lemma_id = v_canonical_id) THEN
+        v_results := v_results || jsonb_build_object(
+          'duplicate_id', v_dup_id, 'canonical_id', v_canonical_id, 'status', 'canonical_missing'
+        );
+        CONTINUE;
+      END IF;
+      v_status := 'merged';
+    ELSE
+      v_status := 'deleted';
+    END IF;
+
+    -- Diff: row counts affected by this entry
+    SELECT COUNT(*) INTO v_words FROM words WHERE lemma_id = v_dup_id;
+    SELECT COUNT(*) INTO v_song_line_words FROM song_line_words WHERE lemma_id = v_dup_id;
+    SELECT COUNT(*) INTO v_song_lemmas FROM song_lemmas WHERE lemma_id = v_dup_id;
+    SELECT COUNT(*) INTO v_reports FROM validation_reports WHERE lemma_id = v_dup_id;
+
+    SELECT
+      COUNT(*) FILTER (WHERE c.user_id IS NULL),
+      COUNT(*) FILTER (WHERE c.user_id IS NOT NULL)
+    INTO v_progress_moved, v_progress_dropped
+    FROM user_lemma_progress d
+    LEFT JOIN user_lemma_progress c
+      ON c.user_id = d.user_id AND c.lemma_id = v_canonical_id
+    WHERE d.lemma_id = v_dup_id;
+
+    IF v_canonical_id IS NULL THEN
+      v_progress_dropped := v_progress_dropped + v_progress_moved;
+      v_progress_moved := 0;
+    END IF;
+
+    IF NOT p_dry_run THEN
+      IF v_canonical_id IS NOT NULL THEN
+        UPDATE words SET lemma_id = v_canonical_id WHERE lemma_id = v_dup_id;
+        UPDATE song_line_words SET lemma_id = v_canonical_id WHERE lemma_id = v_dup_id;
+        UPDATE user_review_history SET lemma_id = v_canonical_id WHERE lemma_id = v_dup_id;
+
+        -- song_lemmas is keyed by (song_id, lemma_id): fold counts into existing rows
+        UPDATE song_lemmas c
+        SET occurrence_count = c.occurrence_count + d.occurrence_count
+        FROM song_lemmas d
+        WHERE d.lemma_id = v_dup_id
+          AND c.lemma_id = v_canonical_id
+          AND c.song_id = d.song_id;
+
+        UPDATE song_lemmas d
+        SET lemma_id = v_canonical_id
+        WHERE d.lemma_id = v_dup_id
+          AND NOT EXISTS (
+            SELECT 1 FROM song_lemmas c
+            WHERE c.song_id = d.song_id AND c.lemma_id = v_canonical_id
+          );
+
+        -- user_lemma_progress is keyed by (user_id, lemma_id): keep the canonical row
+        UPDATE user_lemma_progress d
+        SET lemma_id = v_canonical_id, updated_at = NOW()
+        WHERE d.lemma_id = v_dup_id
+          AND NOT EXISTS (
+            SELECT 1 FROM user_lemma_progress c
+            WHERE c.user_id = d.user_id AND c.lemma_id = v_canonical_id
+          );
+      ELSE
+        DELETE FROM words WHERE lemma_id = v_dup_id;
+        DELETE FROM song_line_words WHERE lemma_id = v_dup_id;
+      END IF;
+
+      -- Remaining song_lemmas, user_lemma_progress and validation_reports rows cascade
+      DELETE FROM lemmas WHERE lemma_id = v_dup_id;
+    END IF;
+
+    v_results := v_results || jsonb_build_object(
+      'duplicate_id', v_dup_id,
+      'canonical_id', v_canonical_id,
+      'status', v_status,
+      'words', v_words,
+      'song_line_words', v_song_line_words,
+      'song_lemmas', v_song_lemmas,
+      'validation_reports', v_reports,
+      'progress_moved', v_progress_moved,
+      'progress_dropped', v_progress_dropped
+    );
+  END LOOP;
+
+  RETURN jsonb_build_object(
+    'success', true,
+    'dryRun', p_dry_run,
+    'results', v_results
+  );
+
+EXCEPTION WHEN OTHERS THEN
+  RETURN jsonb_build_object('success', false, 'error', SQLERRM);
+END;
+$$;
+
+-- Maintenance scripts run with the service role key, which bypasses RLS, so
+-- the function runs as the caller (no SECURITY DEFINER). Postgres grants
+-- EXECUTE to PUBLIC by default; revoke it so API clients can't merge or
+-- delete dictionary entries.
+REVOKE EXECUTE ON FUNCTION merge_lemmas FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION merge_lemmas TO service_role;
+
+COMMENT ON FUNCTION merge_lemmas IS 'Merges duplicate lemmas into canonical lemmas (or deletes them) in one transaction. Safe to re-run; p_dry_run returns the diff only.';
@@ -0,0 +1,172 @@
+-- Chapter statistics RPCs
+-- Used by scripts/content_pipeline/audit_fragments.py and
+-- scripts/chapter_review/review_chapter.py so their reports are computed in
+-- a single aggregate query instead of per-chapter / per-sentence round trips.
+
+-- ============================================
+-- Per-chapter counts (all chapters, or one when p_chapter_number is given)
+-- ============================================
+
+CREATE OR REPLACE FUNCTION get_chapter_stats(
+  p_chapter_number INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+  chapter_id UUID,
+  chapter_number INTEGER,
+  sentences BIGINT,
+  sentences_with_fragments BIGINT,
+  fragments BIGINT,
+  duplicate_fragments BIGINT,
+  last_fragment_sentence_order INTEGER,
+  words BIGINT,
+  orphan_words BIGINT,
+  unique_lemmas BIGINT,
+  phrase_occurrences BIGINT
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH ch AS (
+    SELECT c.chapter_id, c.chapter_number
+    FROM chapters c
+    WHERE p_chapter_number IS NULL OR c.chapter_number = p_chapter_number
+  ),
+  sentence_stats AS (
+    SELECT
+      s.chapter_id,
+      COUNT(*) AS sentences,
+      COUNT(*) FILTER (WHERE f.fragment_count > 0) AS sentences_with_fragments,
+      COALESCE(SUM(f.fragment_count), 0) AS fragments,
+      COALESCE(SUM(f.fragment_count - f.distinct_orders), 0) AS duplicate_fragments,
+      MAX(s.sentence_order) FILTER (WHERE f.fragment_count > 0) AS last_fragment_sentence_order
+    FROM sentences s
+    JOIN ch ON ch.chapter_id = s.chapter_id
+    LEFT JOIN (
+      SELECT sf.sentence_id,
+             COUNT(*) AS fragment_count,
+             COUNT(DISTINCT sf.fragment_order) AS distinct_orders
+      FROM sentence_fragments sf
+      GROUP BY sf.sentence_id
+    ) f ON f.sentence_id = s.sentence_id
+    GROUP BY s.chapter_id
+  ),
+  word_stats AS (
+    SELECT
+      w.chapter_id,
+      COUNT(*) AS words,
+      COUNT(*) FILTER (WHERE w.lemma_id IS NULL) AS orphan_words,
+      COUNT(DISTINCT w.lemma_id) AS unique_lemmas
+    FROM words w
+    JOIN ch ON ch.chapter_id = w.chapter_id
+    GROUP BY w.chapter_id
+  ),
+  phrase_stats AS (
+    SELECT s.chapter_id, COUNT(*) AS phrase_occurrences
+    FROM phrase_occurrences po
+    JOIN sentences s ON s.sentence_id = po.sentence_id
+    JOIN ch ON ch.chapter_id = s.chapter_id
+    GROUP BY s.chapter_id
+  )
+  SELECT
+    ch.chapter_id,
+    ch.chapter_number,
+    COALESCE(ss.sentences, 0),
+    COALESCE(ss.sentences_with_fragments, 0),
+    COALESCE(ss.fragments, 0),
+    COALESCE(ss.duplicate_fragments, 0),
+    ss.last_fragment_sentence_order,
+    COALESCE(ws.words, 0),
+    COALESCE(ws.orphan_words, 0),
+    COALESCE(ws.unique_lemmas, 0),
+    COALESCE(ps.phrase_occurrences, 0)
+  FROM ch
+  LEFT JOIN sentence_stats ss ON ss.chapter_id = ch.chapter_id
+  LEFT JOIN word_stats ws ON ws.chapter_id = ch.chapter_id
+  LEFT JOIN phrase_stats ps ON ps.chapter_id = ch.chapter_id
+  ORDER BY ch.chapter_number;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_chapter_stats TO authenticated;
+
+COMMENT ON FUNCTION get_chapter_stats IS 'Per-chapter sentence, fragment, word, lemma and phrase counts in one query. NULL chapter number returns every chapter.';
+
+-- ============================================
+-- Lemma usage histogram for one chapter
+-- ============================================
+
+CREATE OR REPLACE FUNCTION get_chapter_lemma_usage(
+  p_chapter_number INTEGER
+)
+RETURNS TABLE (
+  lemma_id UUID,
+  lemma_text TEXT,
+  language_code TEXT,
+  part_of_speech TEXT,
+  gender TEXT,
+  definitions JSONB,
+  is_stop_word BOOLEAN,
+  is_reviewed BOOLEAN,
+  admin_notes TEXT,
+  usage_in_chapter BIGINT,
+  word_forms TEXT[]
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT
+    l.lemma_id,
+    l.lemma_text,
+    l.language_code,
+    l.part_of_speech,
+    l.gender,
+    l.definitions,
+    l.is_stop_word,
+    l.is_reviewed,
+    l.admin_notes,
+    COUNT(*) AS usage_in_chapter,
+    ARRAY_AGG(DISTINCT w.word_text) AS word_forms
+  FROM words w
+  JOIN chapters c ON c.chapter_id = w.chapter_id
+  JOIN lemmas l ON l.lemma_id = w.lemma_id
+  WHERE c.chapter_number = p_chapter_number
+  GROUP BY l.lemma_id
+  ORDER BY usage_in_chapter DESC, l.lemma_text;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_chapter_lemma_usage TO authenticated;
+
+COMMENT ON FUNCTION get_chapter_lemma_usage IS 'Lemmas used in a chapter with usage counts and distinct word forms, most used first.';
+
+-- ============================================
+-- Sentences that still have no fragments (all chapters)
+-- ============================================
+
+CREATE OR REPLACE FUNCTION get_sentences_without_fragments()
+RETURNS TABLE (
+  chapter_number INTEGER,
+  sentence_id UUID,
+  sentence_order INTEGER,
+  sentence_text TEXT,
+  sentence_translation TEXT
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT c.chapter_number, s.sentence_id, s.sentence_order, s.sentence_text, s.sentence_translation
+  FROM sentences s
+  JOIN chapters c ON c.chapter_id = s.chapter_id
+  WHERE NOT EXISTS (
+    SELECT 1 FROM sentence_fragments sf WHERE sf.sentence_id = s.sentence_id
+  )
+  ORDER BY c.chapter_number, s.sentence_order;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_sentences_without_fragments TO authenticated;
+
+COMMENT ON FUNCTION get_sentences_without_fragments IS 'Sentences with no sentence_fragments rows, ordered by chapter and sentence order.';
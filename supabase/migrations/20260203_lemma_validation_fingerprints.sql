@@ -0,0 +1,26 @@
+-- Lemma Validation Fingerprints
+-- Lets the AI validation scripts skip lemmas that haven't changed since their
+-- last validation (see scripts/validation_cache.py).
+--
+-- One row per (lemma, validator). The fingerprint is a hash of the lemma's
+-- lemma_text, part_of_speech, gender and definitions plus the validator's
+-- prompt version, so editing a lemma or the prompt invalidates it.
+
+CREATE TABLE lemma_validation_fingerprints (
+  lemma_id UUID NOT NULL REFERENCES lemmas(lemma_id) ON DELETE CASCADE,
+  validator TEXT NOT NULL,
+  fingerprint TEXT NOT NULL,
+  result JSONB,
+  validated_at TIMESTAMPTZ DEFAULT NOW(),
+
+  PRIMARY KEY (lemma_id, validator)
+);
+
+CREATE INDEX idx_lemma_validation_fingerprints_validator ON lemma_validation_fingerprints(validator);
+
+-- Enable RLS with no policies: only the service role (validation scripts) can access it
+ALTER TABLE lemma_validation_fingerprints ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE lemma_validation_fingerprints IS 'Content fingerprints of the last AI validation per lemma and validator, used to re-validate only changed lemmas';
+COMMENT ON COLUMN lemma_validation_fingerprints.validator IS 'exhaustive (chapter_review/exhaustive_ai_validation.py), dictionary_form (validate_dictionary_forms.py), chapter_lemma (import_chapter.py --validate-ai)';
+COMMENT ON COLUMN lemma_validation_fingerprints.result IS 'Validator result for this lemma, so skipped lemmas can still be reported';
@@ -0,0 +1,62 @@
+-- Bulk lemma context RPC
+-- Used by import_chapter.py (batch_translate_lemmas, batch_validate_lemmas) and
+-- scripts/chapter_review/exhaustive_ai_validation.py to fetch usage context for
+-- a whole set of lemmas in one call instead of a words query plus a sentences
+-- query per lemma.
+--
+-- For each lemma that has words: up to p_max_forms distinct word forms, the
+-- total usage count and the earliest example sentence (by chapter, then
+-- sentence order) with its translation. Lemmas without words are omitted.
+
+CREATE OR REPLACE FUNCTION get_lemma_contexts(
+  p_lemma_ids UUID[],
+  p_max_forms INTEGER DEFAULT 10
+)
+RETURNS TABLE (
+  lemma_id UUID,
+  word_forms TEXT[],
+  usage_count BIGINT,
+  example_sentence TEXT,
+  example_translation TEXT
+)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  WITH usage AS (
+    SELECT
+      w.lemma_id,
+      (ARRAY_AGG(DISTINCT w.word_text ORDER BY w.word_text))[1:p_max_forms] AS word_forms,
+      COUNT(*) AS usage_count
+    FROM words w
+    WHERE w.lemma_id = ANY(p_lemma_ids)
+    GROUP BY w.lemma_id
+  ),
+  example AS (
+    SELECT DISTINCT ON (w.lemma_id)
+      w.lemma_id,
+      s.sentence_text,
+      s.sentence_translation
+    FROM words w
+    JOIN sentences s ON s.sentence_id = w.sentence_id
+    JOIN chapters c ON c.chapter_id = s.chapter_id
+    WHERE w.lemma_id = ANY(p_lemma_ids)
+    ORDER BY w.lemma_id, c.chapter_number, s.sentence_order, w.word_position
+  )
+  SELECT
+    u.lemma_id,
+    u.word_forms,
+    u.usage_count,
+    e.sentence_text,
+    NULLIF(e.sentence_translation, '')
+  FROM usage u
+  LEFT JOIN example e ON e.lemma_id = u.lemma_id;
+$$;
+
+-- Content scripts run with the service role key, which bypasses RLS, so the
+-- function runs as the caller (no SECURITY DEFINER). Postgres grants EXECUTE
+-- to PUBLIC by default; revoke it so API clients can't call it.
+REVOKE EXECUTE ON FUNCTION get_lemma_contexts FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_lemma_contexts TO service_role;
+
+COMMENT ON FUNCTION get_lemma_contexts IS 'Word forms, usage count and first example sentence (with translation) for a set of lemmas, in one query.';
@@ -0,0 +1,23 @@
+-- Unique phrase occurrences per sentence
+-- import_chapter.py --detect-phrases writes a chapter's phrase occurrences with
+-- one upsert on (phrase_id, sentence_id) instead of a select-then-insert per
+-- phrase, which needs a unique constraint to conflict on.
+
+-- Remove duplicates left by earlier runs, keeping the oldest row (rows with
+-- no created_at sort last, occurrence_id breaks ties)
+DELETE FROM phrase_occurrences
+WHERE occurrence_id IN (
+  SELECT occurrence_id
+  FROM (
+    SELECT occurrence_id,
+           ROW_NUMBER() OVER (
+             PARTITION BY phrase_id, sentence_id
+             ORDER BY created_at NULLS LAST, occurrence_id
+           ) AS rn
+    FROM phrase_occurrences
+  ) ranked
+  WHERE rn > 1
+);
+
+ALTER TABLE phrase_occurrences
+  ADD CONSTRAINT phrase_occurrences_phrase_sentence_key UNIQUE (phrase_id, sentence_id);
@@ -0,0 +1,107 @@
+-- Quick-check rules RPC
+-- Used by scripts/chapter_review/batch_quick_check.py and
+-- scripts/chapter_review/review_chapter.py. Runs the automated lemma rules
+-- (translation prefixes, noun articles, infinitives) and the orphan-word check
+-- for every chapter and song in one query instead of per-chapter
+-- words / lemmas / orphan round trips.
+--
+-- Returns one row per issue:
+--   scope          'chapter' or 'song'
+--   chapter_number set for chapter rows
+--   song_id        set for song rows
+--   issue_type     verbs_missing_to | nouns_missing_the | nouns_without_article |
+--                  verbs_not_infinitive | orphan_words
+--   item_id        lemma_id (word_id / song_line_words word_id for orphan_words)
+--   item_text      lemma_text (word_text for orphan_words)
+--   detail         first definition, for the prefix rules
+
+CREATE OR REPLACE FUNCTION get_quick_check_issues(
+  p_chapter_number INTEGER DEFAULT NULL,
+  p_include_songs BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE (
+  scope TEXT,
+  chapter_number INTEGER,
+  song_id UUID,
+  issue_type TEXT,
+  item_id UUID,
+  item_text TEXT,
+  detail TEXT
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH lemma_issues AS (
+    SELECT l.lemma_id, l.lemma_text, r.issue_type, r.detail
+    FROM lemmas l
+    CROSS JOIN LATERAL (VALUES
+      ('verbs_missing_to',
+        l.part_of_speech = 'VERB'
+        AND COALESCE(l.definitions->>0, '') <> ''
+        AND l.definitions->>0 NOT LIKE 'to %',
+        l.definitions->>0),
+      ('nouns_missing_the',
+        l.part_of_speech = 'NOUN'
+        AND COALESCE(l.definitions->>0, '') <> ''
+        AND l.definitions->>0 NOT LIKE 'the %',
+        l.definitions->>0),
+      ('nouns_without_article',
+        l.part_of_speech = 'NOUN'
+        AND l.lemma_text NOT LIKE 'el %'
+        AND l.lemma_text NOT LIKE 'la %',
+        NULL),
+      ('verbs_not_infinitive',
+        l.part_of_speech = 'VERB'
+        AND RIGHT(l.lemma_text, 1) IN ('é', 'í', 'ó', 'á', 'ú'),
+        NULL)
+    ) AS r(issue_type, failed, detail)
+    WHERE r.failed
+  ),
+  ch AS (
+    SELECT c.chapter_id, c.chapter_number
+    FROM chapters c
+    WHERE p_chapter_number IS NULL OR c.chapter_number = p_chapter_number
+  ),
+  chapter_lemmas AS (
+    SELECT DISTINCT ch.chapter_number, w.lemma_id
+    FROM words w
+    JOIN ch ON ch.chapter_id = w.chapter_id
+    WHERE w.lemma_id IS NOT NULL
+  ),
+  song_lemmas_used AS (
+    SELECT DISTINCT slw.song_id, slw.lemma_id
+    FROM song_line_words slw
+    WHERE p_include_songs AND slw.lemma_id IS NOT NULL
+  )
+  SELECT 'chapter', cl.chapter_number, NULL::uuid, li.issue_type, li.lemma_id, li.lemma_text, li.detail
+  FROM chapter_lemmas cl
+  JOIN lemma_issues li ON li.lemma_id = cl.lemma_id
+
+  UNION ALL
+
+  SELECT 'chapter', ch.chapter_number, NULL::uuid, 'orphan_words', w.word_id, w.word_text, NULL
+  FROM words w
+  JOIN ch ON ch.chapter_id = w.chapter_id
+  WHERE w.lemma_id IS NULL
+
+  UNION ALL
+
+  SELECT 'song', NULL, sl.song_id, li.issue_type, li.lemma_id, li.lemma_text, li.detail
+  FROM song_lemmas_used sl
+  JOIN lemma_issues li ON li.lemma_id = sl.lemma_id
+
+  UNION ALL
+
+  SELECT 'song', NULL, slw.song_id, 'orphan_words', slw.word_id, slw.word_text, NULL
+  FROM song_line_words slw
+  WHERE p_include_songs AND slw.lemma_id IS NULL
+
+  -- item_id last makes the order total, so .range() pages don't overlap
+  ORDER BY 1, 2, 3, 4, 6, 5;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_quick_check_issues TO authenticated;
+
+COMMENT ON FUNCTION get_quick_check_issues IS 'Automated lemma rule and orphan-word issues for all chapters (or one) and songs, one row per issue.';
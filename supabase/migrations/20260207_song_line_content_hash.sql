@@ -0,0 +1,119 @@
+-- Content hashes for incremental lyric re-import
+-- Used by scripts/import_lyrics.py (--write, --translate, --extract-lemmas,
+-- --detect-occurrences). Each song_lines row carries a hash of its line_text,
+-- and each downstream phase records the hash it last processed. A phase only
+-- reworks lines whose recorded hash differs from content_hash, so editing one
+-- verse re-translates, re-tokenizes and re-matches just that verse.
+
+ALTER TABLE song_lines
+  ADD COLUMN content_hash TEXT GENERATED ALWAYS AS (md5(line_text)) STORED,
+  ADD COLUMN translated_hash TEXT,
+  ADD COLUMN words_hash TEXT,
+  ADD COLUMN occurrences_hash TEXT;
+
+COMMENT ON COLUMN song_lines.content_hash IS 'md5(line_text), maintained by Postgres';
+COMMENT ON COLUMN song_lines.translated_hash IS 'content_hash the current translation was produced from';
+COMMENT ON COLUMN song_lines.words_hash IS 'content_hash the song_line_words rows were produced from';
+COMMENT ON COLUMN song_lines.occurrences_hash IS 'content_hash the phrase/slang occurrence rows were produced from';
+
+-- Mark work done by earlier (non-incremental) runs as current
+UPDATE song_lines SET translated_hash = content_hash
+WHERE COALESCE(translation, '') <> '';
+
+UPDATE song_lines sl SET words_hash = sl.content_hash
+WHERE EXISTS (SELECT 1 FROM song_line_words w WHERE w.line_id = sl.line_id);
+
+UPDATE song_lines sl SET occurrences_hash = sl.content_hash
+FROM song_sections ss
+WHERE ss.section_id = sl.section_id
+  AND (EXISTS (SELECT 1 FROM song_line_phrase_occurrences o WHERE o.song_id = ss.song_id)
+    OR EXISTS (SELECT 1 FROM song_line_slang_occurrences o WHERE o.song_id = ss.song_id));
+
+
+-- Replace the words of a set of lines in one transaction.
+--   p_lines  [{line_id, content_hash}] - the lines (and text versions) processed
+--   p_words  song_line_words rows for those lines
+-- Old words for the lines are deleted, the new rows inserted and words_hash set.
+CREATE OR REPLACE FUNCTION replace_song_line_words(
+  p_lines JSONB,
+  p_words JSONB
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  v_inserted INTEGER;
+BEGIN
+  DELETE FROM song_line_words w
+  USING jsonb_to_recordset(p_lines) AS l(line_id UUID, content_hash TEXT)
+  WHERE w.line_id = l.line_id;
+
+  INSERT INTO song_line_words (word_text, lemma_id, song_id, section_id, line_id, word_position, grammatical_info)
+  SELECT word_text, lemma_id, song_id, section_id, line_id, word_position, grammatical_info
+  FROM jsonb_to_recordset(p_words) AS w(
+    word_text TEXT, lemma_id UUID, song_id UUID, section_id UUID,
+    line_id UUID, word_position INTEGER, grammatical_info JSONB
+  );
+  GET DIAGNOSTICS v_inserted = ROW_COUNT;
+
+  UPDATE song_lines sl SET words_hash = l.content_hash
+  FROM jsonb_to_recordset(p_lines) AS l(line_id UUID, content_hash TEXT)
+  WHERE sl.line_id = l.line_id;
+
+  RETURN v_inserted;
+END;
+$$;
+
+-- Replace the phrase and slang occurrences of a set of lines in one transaction.
+--   p_lines               [{line_id, content_hash}]
+--   p_phrase_occurrences  song_line_phrase_occurrences rows for those lines
+--   p_slang_occurrences   song_line_slang_occurrences rows for those lines
+CREATE OR REPLACE FUNCTION replace_song_line_occurrences(
+  p_lines JSONB,
+  p_phrase_occurrences JSONB,
+  p_slang_occurrences JSONB
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+  DELETE FROM song_line_phrase_occurrences o
+  USING jsonb_to_recordset(p_lines) AS l(line_id UUID, content_hash TEXT)
+  WHERE o.line_id = l.line_id;
+
+  DELETE FROM song_line_slang_occurrences o
+  USING jsonb_to_recordset(p_lines) AS l(line_id UUID, content_hash TEXT)
+  WHERE o.line_id = l.line_id;
+
+  INSERT INTO song_line_phrase_occurrences (phrase_id, line_id, song_id, section_id, start_position, end_position)
+  SELECT phrase_id, line_id, song_id, section_id, start_position, end_position
+  FROM jsonb_to_recordset(p_phrase_occurrences) AS o(
+    phrase_id UUID, line_id UUID, song_id UUID, section_id UUID,
+    start_position INTEGER, end_position INTEGER
+  );
+
+  INSERT INTO song_line_slang_occurrences (slang_id, line_id, song_id, section_id, start_position, end_position)
+  SELECT slang_id, line_id, song_id, section_id, start_position, end_position
+  FROM jsonb_to_recordset(p_slang_occurrences) AS o(
+    slang_id UUID, line_id UUID, song_id UUID, section_id UUID,
+    start_position INTEGER, end_position INTEGER
+  );
+
+  UPDATE song_lines sl SET occurrences_hash = l.content_hash
+  FROM jsonb_to_recordset(p_lines) AS l(line_id UUID, content_hash TEXT)
+  WHERE sl.line_id = l.line_id;
+END;
+$$;
+
+-- Content scripts run with the service role key, which bypasses RLS, so the
+-- functions run as the caller (no SECURITY DEFINER). Postgres grants EXECUTE
+-- to PUBLIC by default; revoke it so API clients can't call them.
+REVOKE EXECUTE ON FUNCTION replace_song_line_words FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION replace_song_line_occurrences FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION replace_song_line_words TO service_role;
+GRANT EXECUTE ON FUNCTION replace_song_line_occurrences TO service_role;
+
+COMMENT ON FUNCTION replace_song_line_words IS 'Atomically replace song_line_words for a set of lines and record the content hash they were built from.';
+COMMENT ON FUNCTION replace_song_line_occurrences IS 'Atomically replace phrase/slang occurrences for a set of lines and record the content hash they were matched against.';
@@ -0,0 +1,61 @@
+-- Apply occurrence diffs in one transaction
+-- Used by scripts/import_lyrics.py --detect-occurrences, which now computes
+-- phrase/slang occurrences for the whole catalogue, diffs them against the
+-- stored rows and sends only the rows to delete and insert. Supersedes
+-- replace_song_line_occurrences (20260207), which rewrote every occurrence of
+-- a line even when nothing about it had changed.
+--
+--   p_lines                    [{line_id, content_hash}] - lines whose
+--                              occurrences_hash should be recorded, with the
+--                              value to record (see the column comment)
+--   p_phrase_deletes           occurrence_ids to delete from song_line_phrase_occurrences
+--   p_slang_deletes            occurrence_ids to delete from song_line_slang_occurrences
+--   p_phrase_inserts           song_line_phrase_occurrences rows to insert
+--   p_slang_inserts            song_line_slang_occurrences rows to insert
+
+DROP FUNCTION IF EXISTS replace_song_line_occurrences(JSONB, JSONB, JSONB);
+
+CREATE OR REPLACE FUNCTION apply_song_line_occurrence_changes(
+  p_lines JSONB,
+  p_phrase_deletes UUID[],
+  p_slang_deletes UUID[],
+  p_phrase_inserts JSONB,
+  p_slang_inserts JSONB
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+  DELETE FROM song_line_phrase_occurrences WHERE occurrence_id = ANY(p_phrase_deletes);
+  DELETE FROM song_line_slang_occurrences WHERE occurrence_id = ANY(p_slang_deletes);
+
+  INSERT INTO song_line_phrase_occurrences (phrase_id, line_id, song_id, section_id, start_position, end_position)
+  SELECT phrase_id, line_id, song_id, section_id, start_position, end_position
+  FROM jsonb_to_recordset(p_phrase_inserts) AS o(
+    phrase_id UUID, line_id UUID, song_id UUID, section_id UUID,
+    start_position INTEGER, end_position INTEGER
+  );
+
+  INSERT INTO song_line_slang_occurrences (slang_id, line_id, song_id, section_id, start_position, end_position)
+  SELECT slang_id, line_id, song_id, section_id, start_position, end_position
+  FROM jsonb_to_recordset(p_slang_inserts) AS o(
+    slang_id UUID, line_id UUID, song_id UUID, section_id UUID,
+    start_position INTEGER, end_position INTEGER
+  );
+
+  UPDATE song_lines sl SET occurrences_hash = l.content_hash
+  FROM jsonb_to_recordset(p_lines) AS l(line_id UUID, content_hash TEXT)
+  WHERE sl.line_id = l.line_id;
+END;
+$$;
+
+-- Content scripts run with the service role key, which bypasses RLS, so the
+-- function runs as the caller (no SECURITY DEFINER). Postgres grants EXECUTE
+-- to PUBLIC by default; revoke it so API clients can't call it.
+REVOKE EXECUTE ON FUNCTION apply_song_line_occurrence_changes FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_song_line_occurrence_changes TO service_role;
+
+COMMENT ON COLUMN song_lines.occurrences_hash IS 'md5 of content_hash and the song''s phrase/slang vocabulary the occurrence rows were matched against, so vocabulary changes re-match the song';
+
+COMMENT ON FUNCTION apply_song_line_occurrence_changes IS 'Atomically delete/insert phrase and slang occurrence rows and record the content hash of the lines they were matched against.';